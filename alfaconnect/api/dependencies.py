@@ -1,118 +1,173 @@
 """
 FastAPI dependencies for authentication and common utilities
 """
-from fastapi import Header, HTTPException, status
+from fastapi import Header, HTTPException, Query, status
 from typing import Optional
-import urllib.parse
-import hmac
-import hashlib
-import json
 import logging
 
-from database.webapp.user_queries import get_user_by_telegram_id
-from database.webapp.user_status_queries import is_user_online
+from api.session_tokens import (
+    InvalidInitData,
+    InvalidSessionToken,
+    validate_init_data,
+    verify_session_token,
+)
+from database.basic.user_cache import get_cached_user
 from config import settings
 
 logger = logging.getLogger(__name__)
 
 
+def _bearer_token(authorization: Optional[str]) -> Optional[str]:
+    if authorization and authorization[:7].lower() == "bearer ":
+        return authorization[7:].strip() or None
+    return None
+
+
+def _checked(user: Optional[dict]) -> dict:
+    """Keshdagi qator nusxasi (endpoint'lar uni o'zgartiradi); bloklangan user - 403"""
+    if not user:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="User not found"
+        )
+    if user.get("is_blocked"):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="User is blocked"
+        )
+    return dict(user)
+
+
+async def get_user_from_token(token: str, telegram_id: Optional[int] = None) -> dict:
+    """
+    Resolve the user of a session token: signature/expiry are checked without
+    DB access, the row comes from the in-process user cache.
+
+    Raises:
+        HTTPException 401: invalid/expired token, or the user's role changed
+            since the token was issued (client must call /api/webapp/validate again)
+        HTTPException 403: telegram_id does not match the token, or user is blocked
+    """
+    try:
+        claims = verify_session_token(token)
+    except InvalidSessionToken as e:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail=str(e),
+            headers={"WWW-Authenticate": "Bearer"}
+        )
+
+    if telegram_id is not None and telegram_id != claims["tid"]:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="telegram_id does not match session token"
+        )
+
+    user = await get_cached_user(claims["tid"])
+    if not user or user.get("id") != claims["uid"] or user.get("role") != claims.get("role"):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Session is no longer valid, please re-authenticate",
+            headers={"WWW-Authenticate": "Bearer"}
+        )
+    return _checked(user)
+
+
+async def get_request_user(
+    authorization: Optional[str] = Header(None),
+    telegram_id: Optional[int] = Query(None, description="Telegram user ID (legacy; use Authorization: Bearer)")
+) -> dict:
+    """
+    Current user for /api/chat/* and /api/user/* endpoints.
+
+    Authorization: Bearer <token> (from /api/webapp/validate) is preferred.
+    Until WEBAPP_REQUIRE_TOKEN is enabled, a bare telegram_id query parameter
+    is still accepted for older clients; either way the user row comes from
+    the TTL cache, not a new DB connection per request.
+    """
+    token = _bearer_token(authorization)
+    if token:
+        return await get_user_from_token(token, telegram_id)
+
+    if telegram_id is None or settings.WEBAPP_REQUIRE_TOKEN:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Missing session token",
+            headers={"WWW-Authenticate": "Bearer"}
+        )
+    return _checked(await get_cached_user(telegram_id))
+
+
 async def get_current_user_from_init_data(
-    x_telegram_init_data: Optional[str] = Header(None, alias="X-Telegram-Init-Data")
+    x_telegram_init_data: Optional[str] = Header(None, alias="X-Telegram-Init-Data"),
+    authorization: Optional[str] = Header(None)
 ) -> dict:
     """
     Get current user from Telegram WebApp initData header.
     Validates Telegram signature and extracts user info.
-    
+
     This is the secure way to authenticate users in Telegram WebApp.
     No query params needed - all auth info comes from validated initData.
-    
+    A session token (Authorization: Bearer) is accepted as well.
+
     Args:
         x_telegram_init_data: Telegram WebApp initData from X-Telegram-Init-Data header
-        
+        authorization: Optional "Bearer <session token>"
+
     Returns:
         User dict from database
-        
+
     Raises:
         HTTPException 401: If initData is missing or invalid
         HTTPException 404: If user not found in database
     """
-    # If no initData header, try to get from query (fallback for development)
+    token = _bearer_token(authorization)
+    if token:
+        return await get_user_from_token(token)
+
     if not x_telegram_init_data:
-        # For development/testing - allow query param fallback
-        # In production, this should be removed
         logger.warning("No X-Telegram-Init-Data header found")
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Missing Telegram initData. Please provide X-Telegram-Init-Data header."
         )
-    
+
     try:
-        # 1. Parse and validate initData
-        data = dict(urllib.parse.parse_qsl(x_telegram_init_data))
-        check_hash = data.pop("hash", None)
-        
-        if not check_hash:
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Invalid initData: missing hash"
-            )
-        
-        # 2. Verify Telegram signature
-        data_check_string = "\n".join(
-            f"{k}={v}" for k, v in sorted(data.items())
-        )
-        
-        secret_key = hmac.new(
-            b"WebAppData",
-            settings.BOT_TOKEN.encode(),
-            hashlib.sha256
-        ).digest()
-        
-        calculated_hash = hmac.new(
-            secret_key,
-            data_check_string.encode(),
-            hashlib.sha256
-        ).hexdigest()
-        
-        if calculated_hash != check_hash:
-            logger.warning("Invalid Telegram signature detected")
+        # 1. Verify Telegram signature (secret key is computed once per process)
+        try:
+            data = validate_init_data(x_telegram_init_data)
+        except InvalidInitData as e:
+            if e.signature:
+                logger.warning("Invalid Telegram signature detected")
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Invalid Telegram signature"
+                detail=e.detail if e.signature else f"Invalid initData: {e.detail}"
             )
-        
-        # 3. Extract user telegram_id from initData
-        user_data_raw = data.get("user")
-        if not user_data_raw:
+
+        # 2. Extract user telegram_id from initData
+        user_data = data.get("user")
+        if not user_data:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="No user data in initData"
             )
-        
-        try:
-            user_data = json.loads(user_data_raw)
-            telegram_id = user_data.get("id")
-            if not telegram_id:
-                raise HTTPException(
-                    status_code=status.HTTP_401_UNAUTHORIZED,
-                    detail="No telegram_id in user data"
-                )
-        except json.JSONDecodeError:
+        telegram_id = user_data.get("id") if isinstance(user_data, dict) else None
+        if not telegram_id:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Invalid user JSON in initData"
+                detail="No telegram_id in user data"
             )
-        
-        # 4. Get user from database
-        user = await get_user_by_telegram_id(telegram_id)
+
+        # 3. Get user (TTL cache, invalidated on role/block changes)
+        user = await get_cached_user(telegram_id)
         if not user:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="User not found in database"
             )
-        
-        return user
-        
+
+        return dict(user)
+
     except HTTPException:
         raise
     except Exception as e:
@@ -121,4 +176,3 @@ async def get_current_user_from_init_data(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Authentication error: {str(e)}"
         )
-
@@ -0,0 +1,228 @@
+"""
+Media fayllarni berish (voice/rasmlar)
+
+- Ruxsat qarori bitta DB so'rovida (user + chat + xabar egaligi) olinadi va
+  (telegram_id, chat_id, message_id) bo'yicha MEDIA_ACCESS_CACHE_TTL soniya
+  keshlanadi - audio seek'dagi har bir Range so'rovi DB ga bormaydi.
+- Xabar media fayllari o'zgarmaydi (atomik rename bilan yoziladi), shuning
+  uchun kuchli ETag, Last-Modified, 304 va uzoq muddatli "private, immutable"
+  Cache-Control beriladi. Blob store'dagi fayl uchun ETag = sha256, eski
+  fayllar uchun hajm + mtime.
+- Fayl xabarning attachments["blobs"] orqali blob store'dan olinadi
+  (forward qilingan xabar ham o'z URL'i bilan shu blob'ni oladi); blobs'siz
+  eski xabarlar uchun MEDIA_ROOT/{voice,images}/{chat_id}/ dagi fayl.
+- Range: bitta oraliq (bytes=a-b, a-, -n) 206 bilan; bir nechta oraliq
+  bo'lsa butun fayl (RFC 9110 ruxsat beradi); noto'g'ri oraliq 416.
+- MEDIA_ACCEL_REDIRECT_PREFIX berilsa baytlarni nginx uzatadi
+  (X-Accel-Redirect); Range/ETag ni ham nginx boshqaradi.
+"""
+import json
+import os
+import re
+from email.utils import formatdate, parsedate_to_datetime
+from pathlib import Path
+from typing import AsyncIterator, Dict, Optional, Tuple
+
+import aiofiles
+from fastapi import HTTPException, Request
+from fastapi.responses import Response, StreamingResponse
+
+from config import settings
+from database.basic.media_blobs import blob_store
+from database.connections import get_connection
+from utils.blob_store import is_sha256
+from utils.ttl_cache import TTLCache
+
+MEDIA_CHUNK_SIZE = 64 * 1024
+
+_RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+_access_cache = TTLCache(maxsize=20000, ttl=settings.MEDIA_ACCESS_CACHE_TTL)
+
+
+# ---------- Ruxsat ----------
+
+def _blobs(row) -> Dict[str, str]:
+    value = row["blobs"]
+    if isinstance(value, str):
+        value = json.loads(value)
+    return value if isinstance(value, dict) else {}
+
+
+def _decide(row) -> int:
+    """HTTP status: 200 ruxsat, 403/404 rad"""
+    if row is None:
+        return 404  # user topilmadi
+    if row["client_id"] is None:
+        return 404  # chat topilmadi
+    role = row["role"] or "client"
+    user_id = row["user_id"]
+    if role == "client":
+        allowed = row["client_id"] == user_id
+    elif role == "callcenter_supervisor":
+        allowed = True
+    elif role == "callcenter_operator":
+        allowed = row["operator_id"] == user_id
+    else:
+        allowed = False
+    if not allowed:
+        return 403
+    if row["message_chat_id"] != row["chat_id"]:
+        return 404  # xabar boshqa chatniki yoki yo'q
+    return 200
+
+
+async def authorize_media(telegram_id: int, chat_id: int, message_id: int) -> Dict[str, str]:
+    """
+    Raise HTTPException unless the user may read media of this chat message.
+    Returns the message's blob hashes ({"original": sha256, ...}; {} for legacy files).
+    """
+    key = (telegram_id, chat_id, message_id)
+    blobs = _access_cache.get(key)
+    if blobs is not None:
+        return blobs
+    conn = await get_connection()
+    try:
+        row = await conn.fetchrow(
+            """
+            SELECT u.id as user_id, u.role, $2::bigint as chat_id,
+                   c.client_id, c.operator_id, m.chat_id as message_chat_id,
+                   m.attachments -> 'blobs' as blobs
+            FROM users u
+            LEFT JOIN chats c ON c.id = $2
+            LEFT JOIN messages m ON m.id = $3
+            WHERE u.telegram_id = $1
+            """,
+            telegram_id, chat_id, message_id
+        )
+    finally:
+        await conn.close()
+    status = _decide(row)
+    if status == 403:
+        raise HTTPException(status_code=403, detail="Access denied")
+    if status == 404:
+        raise HTTPException(status_code=404, detail="File not found")
+    # Faqat ruxsatlar keshlanadi - yangi tayinlangan operator darhol kiradi
+    blobs = _blobs(row)
+    _access_cache.set(key, blobs)
+    return blobs
+
+
+def blob_path(blobs: Dict[str, str], variant: str) -> Optional[Path]:
+    """Xabar blob'i (variant bo'yicha) fayl yo'li; blob yo'q bo'lsa None"""
+    sha256 = blobs.get(variant)
+    return blob_store.path_for(sha256) if is_sha256(sha256) else None
+
+
+# ---------- Fayl javobi ----------
+
+def make_etag(stat: os.stat_result) -> str:
+    return f'"{stat.st_size:x}-{stat.st_mtime_ns:x}"'
+
+
+def parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """
+    Range sarlavhasidan (start, end) (end inclusive).
+    None - butun fayl; ValueError - qondirib bo'lmaydigan oraliq (416).
+    """
+    match = _RANGE_RE.match(header.strip().replace(" ", ""))
+    if not match:
+        return None  # bir nechta oraliq yoki boshqa birlik - butun fayl
+    start_s, end_s = match.groups()
+    if not start_s and not end_s:
+        return None
+    if not start_s:
+        suffix = int(end_s)
+        if suffix == 0:
+            raise ValueError("Empty suffix range")
+        return max(0, size - suffix), size - 1
+    start = int(start_s)
+    end = min(int(end_s), size - 1) if end_s else size - 1
+    if start >= size or start > end:
+        raise ValueError("Range not satisfiable")
+    return start, end
+
+
+def _not_modified(request: Request, etag: str, mtime: float) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = {tag.strip() for tag in if_none_match.split(",")}
+        return "*" in tags or etag in tags or f"W/{etag}" in tags
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            return int(mtime) <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+async def _read_range(path: Path, start: int, length: int) -> AsyncIterator[bytes]:
+    async with aiofiles.open(path, "rb") as f:
+        await f.seek(start)
+        remaining = length
+        while remaining > 0:
+            chunk = await f.read(min(MEDIA_CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+def media_file_response(
+    request: Request,
+    path: Path,
+    media_type: str,
+    extra_headers: Optional[Dict[str, str]] = None,
+    sha256: Optional[str] = None
+) -> Response:
+    """
+    Immutable media fayl uchun javob (304 / 206 / 200 / 416 yoki X-Accel-Redirect).
+    sha256 berilsa (blob store) ETag shu hash - touch qilingan blob'da ham o'zgarmaydi.
+    """
+    try:
+        stat = path.stat()
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="File not found")
+
+    etag = f'"{sha256}"' if sha256 else make_etag(stat)
+    headers = {
+        "ETag": etag,
+        "Last-Modified": formatdate(stat.st_mtime, usegmt=True),
+        "Cache-Control": f"private, max-age={settings.MEDIA_CACHE_MAX_AGE}, immutable",
+        "Accept-Ranges": "bytes",
+        **(extra_headers or {}),
+    }
+
+    if _not_modified(request, etag, stat.st_mtime):
+        return Response(status_code=304, headers=headers)
+
+    if settings.MEDIA_ACCEL_REDIRECT_PREFIX:
+        relative = path.resolve().relative_to(Path(settings.MEDIA_ROOT).resolve()).as_posix()
+        headers["X-Accel-Redirect"] = settings.MEDIA_ACCEL_REDIRECT_PREFIX.rstrip("/") + "/" + relative
+        return Response(status_code=200, headers=headers, media_type=media_type)
+
+    size = stat.st_size
+    byte_range = None
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if range_header and (if_range is None or if_range.strip() == etag):
+        try:
+            byte_range = parse_range(range_header, size)
+        except ValueError:
+            return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{size}"})
+
+    status_code = 200
+    start, length = 0, size
+    if byte_range is not None:
+        start, end = byte_range
+        length = end - start + 1
+        status_code = 206
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    headers["Content-Length"] = str(length)
+
+    if request.method == "HEAD":
+        return Response(status_code=status_code, headers=headers, media_type=media_type)
+    return StreamingResponse(
+        _read_range(path, start, length), status_code=status_code, headers=headers, media_type=media_type
+    )
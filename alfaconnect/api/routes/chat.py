@@ -1,14 +1,14 @@
 """
 Chat-related API endpoints
 """
-from fastapi import APIRouter, HTTPException, Query, Body, UploadFile, File
+from fastapi import APIRouter, HTTPException, Query, Body, UploadFile, File, Depends
 from typing import Optional, List, Dict, Any
 from pydantic import BaseModel
-from datetime import datetime
+from datetime import date, datetime
+import asyncpg
 import os
 import uuid
 import logging
-from pathlib import Path
 
 logger = logging.getLogger(__name__)
 from database.webapp.chat_queries import (
@@ -28,6 +28,10 @@ from database.webapp.chat_queries import (
     unpin_chat,
     get_pinned_chats
 )
+from api.dependencies import get_request_user
+from api.uploads import stage_upload
+from database.basic.media_blobs import blob_store
+from utils.image_variants import ImagePipelineBusy, variant_names
 from api.routes.websocket import (
     send_chat_assigned_event,
     send_chat_inactive_event,
@@ -36,6 +40,7 @@ from api.routes.websocket import (
 )
 from database.webapp.message_queries import (
     create_message,
+    create_media_message,
     get_chat_messages,
     get_unread_messages_count,
     get_message_by_id,
@@ -45,13 +50,20 @@ from database.webapp.message_queries import (
     get_message_reactions,
     toggle_message_reaction,
     search_messages,
+    search_all_messages,
+    SEARCH_MAX_CANDIDATES,
     forward_message,
     get_chat_media,
     edit_message,
     get_message_thread
 )
+from database.webapp.chat_sync_queries import (
+    InvalidSyncCursor,
+    SYNC_MAX_CHANGES,
+    get_chat_changes
+)
 from database.webapp.user_queries import get_user_by_telegram_id, get_user_by_id
-from config import settings
+from database.connections import get_connection
 from database.webapp.staff_chat_queries import (
     create_staff_chat,
     get_staff_chats,
@@ -107,23 +119,18 @@ class ReactionRequest(BaseModel):
 
 @router.get("/list")
 async def get_chats(
-    telegram_id: int = Query(..., description="Telegram user ID"),
+    user: dict = Depends(get_request_user),
     status: Optional[str] = Query(None, description="Chat status filter (active, inactive)")
 ):
     """
     Get chats for user based on their role
     """
     try:
-        # Get user to determine role
-        user = await get_user_by_telegram_id(telegram_id)
-        if not user:
-            raise HTTPException(status_code=404, detail="User not found")
-        
         user_id = user.get('id')
         role = user.get('role')
         
         # Debug logging
-        print(f"[API] /chat/list: telegram_id={telegram_id}, user_id={user_id}, role={role}")
+        print(f"[API] /chat/list: telegram_id={user.get('telegram_id')}, user_id={user_id}, role={role}")
         
         chats = await get_user_chats(user_id, role, status)
         
@@ -243,7 +250,7 @@ async def get_active_chat_stats():
 
 @router.get("/inbox")
 async def get_inbox(
-    telegram_id: int = Query(..., description="Telegram user ID"),
+    user: dict = Depends(get_request_user),
     limit: int = Query(20, ge=1, le=100, description="Maximum number of chats"),
     cursor_ts: Optional[str] = Query(None, description="Cursor timestamp (ISO format)"),
     cursor_id: Optional[int] = Query(None, description="Cursor chat ID")
@@ -253,11 +260,6 @@ async def get_inbox(
     Only accessible by supervisors.
     """
     try:
-        # Get user to verify role
-        user = await get_user_by_telegram_id(telegram_id)
-        if not user:
-            raise HTTPException(status_code=404, detail="User not found")
-        
         role = user.get('role')
         if role != 'callcenter_supervisor':
             raise HTTPException(status_code=403, detail="Only supervisors can access inbox")
@@ -293,7 +295,7 @@ async def get_inbox(
 
 @router.get("/active")
 async def get_active_chats(
-    telegram_id: int = Query(..., description="Telegram user ID"),
+    user: dict = Depends(get_request_user),
     limit: int = Query(20, ge=1, le=100, description="Maximum number of chats"),
     cursor_ts: Optional[str] = Query(None, description="Cursor timestamp (ISO format)"),
     cursor_id: Optional[int] = Query(None, description="Cursor chat ID")
@@ -303,11 +305,6 @@ async def get_active_chats(
     Only accessible by supervisors.
     """
     try:
-        # Get user to verify role
-        user = await get_user_by_telegram_id(telegram_id)
-        if not user:
-            raise HTTPException(status_code=404, detail="User not found")
-        
         role = user.get('role')
         if role != 'callcenter_supervisor':
             raise HTTPException(status_code=403, detail="Only supervisors can access active chats")
@@ -345,7 +342,7 @@ async def get_active_chats(
 
 @router.get("/my")
 async def get_my_chats(
-    telegram_id: int = Query(..., description="Telegram user ID"),
+    user: dict = Depends(get_request_user),
     limit: int = Query(20, ge=1, le=100, description="Maximum number of chats"),
     cursor_ts: Optional[str] = Query(None, description="Cursor timestamp (ISO format)"),
     cursor_id: Optional[int] = Query(None, description="Cursor chat ID")
@@ -354,11 +351,6 @@ async def get_my_chats(
     Get operator's assigned chats with cursor-based pagination.
     """
     try:
-        # Get user to determine operator ID
-        user = await get_user_by_telegram_id(telegram_id)
-        if not user:
-            raise HTTPException(status_code=404, detail="User not found")
-        
         user_id = user.get('id')
         role = user.get('role')
         
@@ -394,6 +386,108 @@ async def get_my_chats(
         raise HTTPException(status_code=500, detail=f"Error fetching operator chats: {str(e)}")
 
 
+@router.get("/search")
+async def search_all_chats_endpoint(
+    user: dict = Depends(get_request_user),
+    query: str = Query(..., description="Search query string", min_length=1),
+    limit: int = Query(20, ge=1, le=100, description="Maximum number of results"),
+    cursor_rank: Optional[float] = Query(None, description="Cursor rank (next_cursor.rank)"),
+    cursor_id: Optional[int] = Query(None, description="Cursor message ID (next_cursor.id)"),
+    cursor_max_id: Optional[int] = Query(None, description="Candidate window bound (next_cursor.max_id)"),
+    operator_id: Optional[int] = Query(None, description="Only chats assigned to this operator (supervisors)"),
+    date_from: Optional[date] = Query(None, description="From date (YYYY-MM-DD)"),
+    date_to: Optional[date] = Query(None, description="To date (YYYY-MM-DD, inclusive)")
+):
+    """
+    Search messages across all chats visible to the caller.
+    Supervisors see every chat, operators their assigned chats, clients their own chats.
+    Results are ordered by relevance with keyset pagination (next_cursor).
+
+    Only the newest max_candidates (SEARCH_MAX_CANDIDATES) matching messages are
+    ranked; older matches need a narrower date/operator filter. The window is
+    fixed at the first page: pass next_cursor.rank/id/max_id back unchanged so
+    later pages neither skip nor repeat hits when new messages arrive.
+    """
+    try:
+        role = user.get('role')
+        client_id = None
+        if role == 'callcenter_operator':
+            operator_id = user.get('id')
+        elif role != 'callcenter_supervisor':
+            operator_id = None
+            client_id = user.get('id')
+        
+        if date_from and date_to and date_from > date_to:
+            raise HTTPException(status_code=400, detail="date_from must be before date_to")
+        
+        result = await search_all_messages(
+            query,
+            limit=limit,
+            cursor_rank=cursor_rank,
+            cursor_id=cursor_id,
+            operator_id=operator_id,
+            client_id=client_id,
+            date_from=date_from,
+            date_to=date_to,
+            cursor_max_id=cursor_max_id
+        )
+        
+        for message in result["results"]:
+            if message.get('created_at'):
+                message['created_at'] = message['created_at'].isoformat()
+            if message.get('edited_at'):
+                message['edited_at'] = message['edited_at'].isoformat()
+        
+        return {
+            "query": query,
+            "results": result["results"],
+            "count": len(result["results"]),
+            "next_cursor": result["next_cursor"],
+            "max_candidates": SEARCH_MAX_CANDIDATES
+        }
+    except HTTPException:
+        raise
+    except asyncpg.exceptions.QueryCanceledError:
+        raise HTTPException(status_code=504, detail="Search took too long, please refine the query or date range")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error searching messages: {str(e)}")
+
+
+@router.get("/sync")
+async def sync_chats_endpoint(
+    user: dict = Depends(get_request_user),
+    cursor: Optional[str] = Query(None, description="Cursor from the previous sync (omit to start)"),
+    limit: int = Query(SYNC_MAX_CHANGES, ge=1, le=SYNC_MAX_CHANGES, description="Maximum number of changes")
+):
+    """
+    Get every chat/message change visible to the caller since the cursor.
+    Supervisors see all chats; operators and clients see their own chats.
+    reset=true means the client must reload its chats and continue from the returned cursor;
+    has_more=true means the client should call again immediately with the returned cursor.
+    """
+    try:
+        result = await get_chat_changes(
+            user.get('id'),
+            see_all=user.get('role') == 'callcenter_supervisor',
+            cursor=cursor,
+            limit=limit
+        )
+        
+        for message in result["messages"]:
+            if message.get('created_at'):
+                message['created_at'] = message['created_at'].isoformat()
+            if message.get('edited_at'):
+                message['edited_at'] = message['edited_at'].isoformat()
+        
+        return result
+    except InvalidSyncCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error syncing chats: {str(e)}")
+
+
 @router.post("/mark-inactive")
 async def mark_inactive_chats_endpoint():
     """
@@ -410,10 +504,8 @@ async def mark_inactive_chats_endpoint():
         
         # Get chats that will be marked inactive (before marking)
         from database.webapp.chat_queries import get_chat_by_id
-        import asyncpg
-        from config import settings
         
-        conn = await asyncpg.connect(settings.DB_URL)
+        conn = await get_connection()
         try:
             chat_ids = await conn.fetch("""
                 SELECT id FROM chats
@@ -779,18 +871,13 @@ async def get_chat_client_info_endpoint(chat_id: int):
 
 @router.get("/staff/list")
 async def get_staff_chats_endpoint(
-    telegram_id: int = Query(..., description="Telegram user ID")
+    user: dict = Depends(get_request_user)
 ):
     """
     Get staff chats for a user (both as sender and receiver).
     Only accessible by operators and supervisors.
     """
     try:
-        # Get user to determine role
-        user = await get_user_by_telegram_id(telegram_id)
-        if not user:
-            raise HTTPException(status_code=404, detail="User not found")
-        
         user_id = user.get('id')
         role = user.get('role')
         
@@ -819,7 +906,7 @@ async def get_staff_chats_endpoint(
 
 @router.post("/staff/create")
 async def create_staff_chat_endpoint(
-    telegram_id: int = Query(..., description="Telegram user ID (sender)"),
+    user: dict = Depends(get_request_user),
     request: CreateStaffChatRequest = Body(...)
 ):
     """
@@ -827,11 +914,6 @@ async def create_staff_chat_endpoint(
     Only accessible by operators and supervisors.
     """
     try:
-        # Get user to determine role
-        user = await get_user_by_telegram_id(telegram_id)
-        if not user:
-            raise HTTPException(status_code=404, detail="User not found")
-        
         sender_id = user.get('id')
         role = user.get('role')
         
@@ -876,18 +958,13 @@ async def create_staff_chat_endpoint(
 @router.get("/staff/{chat_id}")
 async def get_staff_chat_endpoint(
     chat_id: int,
-    telegram_id: int = Query(..., description="Telegram user ID")
+    user: dict = Depends(get_request_user)
 ):
     """
     Get staff chat by ID (with authorization check).
     Only accessible by operators and supervisors who are participants.
     """
     try:
-        # Get user to determine role
-        user = await get_user_by_telegram_id(telegram_id)
-        if not user:
-            raise HTTPException(status_code=404, detail="User not found")
-        
         user_id = user.get('id')
         role = user.get('role')
         
@@ -917,7 +994,7 @@ async def get_staff_chat_endpoint(
 @router.get("/staff/{chat_id}/messages")
 async def get_staff_messages_endpoint(
     chat_id: int,
-    telegram_id: int = Query(..., description="Telegram user ID"),
+    user: dict = Depends(get_request_user),
     limit: int = Query(100, ge=1, le=200, description="Maximum number of messages"),
     offset: int = Query(0, ge=0, description="Offset for pagination")
 ):
@@ -928,17 +1005,11 @@ async def get_staff_messages_endpoint(
     try:
         print(f"[API] /chat/staff/{chat_id}/messages: Request received", {
             "chat_id": chat_id,
-            "telegram_id": telegram_id,
+            "telegram_id": user.get('telegram_id'),
             "limit": limit,
             "offset": offset
         })
         
-        # Get user to determine role
-        user = await get_user_by_telegram_id(telegram_id)
-        if not user:
-            print(f"[API] /chat/staff/{chat_id}/messages: User not found")
-            raise HTTPException(status_code=404, detail="User not found")
-        
         user_id = user.get('id')
         role = user.get('role')
         
@@ -1002,7 +1073,7 @@ async def get_staff_messages_endpoint(
 @router.post("/staff/{chat_id}/messages")
 async def send_staff_message_endpoint(
     chat_id: int,
-    telegram_id: int = Query(..., description="Telegram user ID (sender)"),
+    user: dict = Depends(get_request_user),
     request: SendStaffMessageRequest = Body(...)
 ):
     """
@@ -1010,11 +1081,6 @@ async def send_staff_message_endpoint(
     Only accessible by operators and supervisors who are participants.
     """
     try:
-        # Get user to determine role
-        user = await get_user_by_telegram_id(telegram_id)
-        if not user:
-            raise HTTPException(status_code=404, detail="User not found")
-        
         sender_id = user.get('id')
         role = user.get('role')
         
@@ -1061,7 +1127,7 @@ async def send_staff_message_endpoint(
 
 @router.get("/staff/available")
 async def get_available_staff_endpoint(
-    telegram_id: int = Query(..., description="Telegram user ID")
+    user: dict = Depends(get_request_user)
 ):
     """
     Get list of available staff members for chat (operators and supervisors).
@@ -1069,11 +1135,6 @@ async def get_available_staff_endpoint(
     Only accessible by operators and supervisors.
     """
     try:
-        # Get user to determine role
-        user = await get_user_by_telegram_id(telegram_id)
-        if not user:
-            raise HTTPException(status_code=404, detail="User not found")
-        
         user_id = user.get('id')
         role = user.get('role')
         
@@ -1100,18 +1161,13 @@ async def get_available_staff_endpoint(
 @router.put("/staff/{chat_id}/close")
 async def close_staff_chat_endpoint(
     chat_id: int,
-    telegram_id: int = Query(..., description="Telegram user ID")
+    user: dict = Depends(get_request_user)
 ):
     """
     Mark staff chat as inactive.
     Only accessible by operators and supervisors who are participants.
     """
     try:
-        # Get user to determine role
-        user = await get_user_by_telegram_id(telegram_id)
-        if not user:
-            raise HTTPException(status_code=404, detail="User not found")
-        
         user_id = user.get('id')
         role = user.get('role')
         
@@ -1136,7 +1192,7 @@ async def close_staff_chat_endpoint(
 
 @router.get("/ccs/statistics")
 async def get_ccs_statistics_endpoint(
-    telegram_id: int = Query(..., description="Telegram user ID")
+    user: dict = Depends(get_request_user)
 ):
     """
     Get comprehensive CCS statistics:
@@ -1148,11 +1204,6 @@ async def get_ccs_statistics_endpoint(
     Only accessible by supervisors and operators.
     """
     try:
-        # Get user to verify role
-        user = await get_user_by_telegram_id(telegram_id)
-        if not user:
-            raise HTTPException(status_code=404, detail="User not found")
-        
         role = user.get('role')
         if role not in ('callcenter_supervisor', 'callcenter_operator'):
             raise HTTPException(status_code=403, detail="Only supervisors and operators can access CCS statistics")
@@ -1188,18 +1239,13 @@ async def get_ccs_statistics_endpoint(
 @router.get("/ccs/operator/{operator_id}")
 async def get_operator_stats_endpoint(
     operator_id: int,
-    telegram_id: int = Query(..., description="Telegram user ID")
+    user: dict = Depends(get_request_user)
 ):
     """
     Get detailed statistics for a specific operator.
     Only accessible by supervisors and operators.
     """
     try:
-        # Get user to verify role
-        user = await get_user_by_telegram_id(telegram_id)
-        if not user:
-            raise HTTPException(status_code=404, detail="User not found")
-        
         role = user.get('role')
         if role not in ('callcenter_supervisor', 'callcenter_operator'):
             raise HTTPException(status_code=403, detail="Only supervisors and operators can access operator statistics")
@@ -1230,18 +1276,13 @@ async def get_operator_stats_endpoint(
 
 @router.get("/ccs/online-summary")
 async def get_online_summary_endpoint(
-    telegram_id: int = Query(..., description="Telegram user ID")
+    user: dict = Depends(get_request_user)
 ):
     """
     Get quick summary of online users.
     Used for real-time updates via WebSocket.
     """
     try:
-        # Get user to verify role
-        user = await get_user_by_telegram_id(telegram_id)
-        if not user:
-            raise HTTPException(status_code=404, detail="User not found")
-        
         role = user.get('role')
         if role not in ('callcenter_supervisor', 'callcenter_operator'):
             raise HTTPException(status_code=403, detail="Only supervisors and operators can access online summary")
@@ -1256,7 +1297,7 @@ async def get_online_summary_endpoint(
 
 @router.get("/ccs/recent-clients")
 async def get_recent_clients_endpoint(
-    telegram_id: int = Query(..., description="Telegram user ID"),
+    user: dict = Depends(get_request_user),
     limit: int = Query(50, ge=1, le=100, description="Maximum number of clients")
 ):
     """
@@ -1264,11 +1305,6 @@ async def get_recent_clients_endpoint(
     Only accessible by supervisors and operators.
     """
     try:
-        # Get user to verify role
-        user = await get_user_by_telegram_id(telegram_id)
-        if not user:
-            raise HTTPException(status_code=404, detail="User not found")
-        
         role = user.get('role')
         if role not in ('callcenter_supervisor', 'callcenter_operator'):
             raise HTTPException(status_code=403, detail="Only supervisors and operators can access client list")
@@ -1293,7 +1329,7 @@ async def get_recent_clients_endpoint(
 async def toggle_reaction(
     chat_id: int,
     message_id: int,
-    telegram_id: int = Query(..., description="Telegram user ID"),
+    user: dict = Depends(get_request_user),
     reaction: ReactionRequest = Body(...)
 ):
     """
@@ -1303,11 +1339,6 @@ async def toggle_reaction(
     If user has no reaction, add it.
     """
     try:
-        # Get user
-        user = await get_user_by_telegram_id(telegram_id)
-        if not user:
-            raise HTTPException(status_code=404, detail="User not found")
-        
         user_id = user.get('id')
         
         # Verify message exists and belongs to chat
@@ -1342,17 +1373,12 @@ async def toggle_reaction(
 async def get_reactions(
     chat_id: int,
     message_id: int,
-    telegram_id: int = Query(..., description="Telegram user ID")
+    user: dict = Depends(get_request_user)
 ):
     """
     Get all reactions for a message.
     """
     try:
-        # Get user (for auth, but reactions are visible to all chat participants)
-        user = await get_user_by_telegram_id(telegram_id)
-        if not user:
-            raise HTTPException(status_code=404, detail="User not found")
-        
         # Verify message exists and belongs to chat
         message = await get_message_by_id(message_id)
         if not message:
@@ -1376,17 +1402,12 @@ async def search_chat_messages(
     chat_id: int,
     query: str = Query(..., description="Search query string", min_length=1),
     limit: int = Query(50, description="Maximum number of results", ge=1, le=100),
-    telegram_id: int = Query(..., description="Telegram user ID")
+    user: dict = Depends(get_request_user)
 ):
     """
     Search messages in a chat using full-text search.
     """
     try:
-        # Get user (for auth)
-        user = await get_user_by_telegram_id(telegram_id)
-        if not user:
-            raise HTTPException(status_code=404, detail="User not found")
-        
         # Verify chat exists
         chat = await get_chat_by_id(chat_id)
         if not chat:
@@ -1415,18 +1436,13 @@ class ForwardRequest(BaseModel):
 async def forward_chat_message(
     chat_id: int,
     message_id: int,
-    telegram_id: int = Query(..., description="Telegram user ID"),
+    user: dict = Depends(get_request_user),
     request: ForwardRequest = Body(...)
 ):
     """
     Forward a message to another chat.
     """
     try:
-        # Get user
-        user = await get_user_by_telegram_id(telegram_id)
-        if not user:
-            raise HTTPException(status_code=404, detail="User not found")
-        
         user_id = user.get('id')
         user_role = user.get('role', 'client')
         
@@ -1480,22 +1496,21 @@ async def forward_chat_message(
 ALLOWED_AUDIO_FORMATS = ["audio/mpeg", "audio/mp3", "audio/ogg", "audio/wav", "audio/webm", "audio/opus", "audio/mp4", "audio/aac", "audio/x-m4a"]
 MAX_AUDIO_SIZE = 20 * 1024 * 1024  # 20MB
 
+# Image file validation
+ALLOWED_IMAGE_FORMATS = ["image/jpeg", "image/jpg", "image/png", "image/gif", "image/webp"]
+MAX_IMAGE_SIZE = 10 * 1024 * 1024  # 10MB
+
 
 @router.post("/{chat_id}/messages/voice")
 async def upload_voice_message(
     chat_id: int,
-    telegram_id: int = Query(..., description="Telegram user ID"),
+    user: dict = Depends(get_request_user),
     audio: UploadFile = File(..., description="Audio file")
 ):
     """
     Upload a voice message to a chat.
     """
     try:
-        # Get user
-        user = await get_user_by_telegram_id(telegram_id)
-        if not user:
-            raise HTTPException(status_code=404, detail="User not found")
-        
         user_id = user.get('id')
         user_role = user.get('role', 'client')
         
@@ -1511,19 +1526,6 @@ async def upload_voice_message(
                 detail=f"Invalid audio format. Allowed: {', '.join(ALLOWED_AUDIO_FORMATS)}"
             )
         
-        # Read audio file
-        audio_data = await audio.read()
-        audio_size = len(audio_data)
-        
-        if audio_size > MAX_AUDIO_SIZE:
-            raise HTTPException(
-                status_code=400,
-                detail=f"Audio file too large. Maximum size: {MAX_AUDIO_SIZE / (1024 * 1024)}MB"
-            )
-        
-        if audio_size == 0:
-            raise HTTPException(status_code=400, detail="Audio file is empty")
-        
         # Determine file extension
         content_type_to_ext = {
             "audio/mpeg": "mp3",
@@ -1538,7 +1540,6 @@ async def upload_voice_message(
         }
         file_ext = content_type_to_ext.get(audio.content_type, "mp3")
         
-        # Create message first to get message_id
         # Determine sender_type based on role
         if user_role in ('callcenter_operator', 'callcenter_supervisor'):
             sender_type = 'operator'
@@ -1547,69 +1548,38 @@ async def upload_voice_message(
             sender_type = 'client'
             operator_id = None
         
-        message_id = await create_message(
-            chat_id=chat_id,
-            sender_id=user_id,
-            sender_type=sender_type,
-            message_text="",
-            operator_id=operator_id,
-            attachments=None
-        )
-        
-        if not message_id:
-            raise HTTPException(status_code=500, detail="Failed to create message")
-        
-        # Save audio file and update message in one transaction
-        voice_dir = Path(settings.MEDIA_ROOT) / "voice" / str(chat_id)
-        voice_dir.mkdir(parents=True, exist_ok=True)
-        
-        audio_filename = f"{message_id}.{file_ext}"
-        audio_path = voice_dir / audio_filename
-        
-        audio_url = f"/api/media/voice/{chat_id}/{audio_filename}"
-        attachments = {
-            "type": "voice",
-            "url": audio_url,
-            "filename": audio_filename,
-            "size": audio_size,
-            "duration": None
-        }
+        # Stream audio to a temp file (size limit + sha256 while streaming)
+        staged = await stage_upload(audio, blob_store.tmp_dir, MAX_AUDIO_SIZE, label="Audio file")
+        
+        # Message + attachments in one transaction; the file goes into the blob store inside it
+        async def place_audio(conn, message_id: int) -> Dict[str, Any]:
+            audio_filename = f"{message_id}.{file_ext}"
+            blobs = await staged.store(conn, audio.content_type)
+            return {
+                "type": "voice",
+                "url": f"/api/media/voice/{chat_id}/{audio_filename}",
+                "filename": audio_filename,
+                "size": staged.size,
+                "sha256": staged.sha256,
+                "blobs": blobs,
+                "duration": None
+            }
         
-        # Save file and update database in one try-except block
-        import asyncpg
-        conn = None
         try:
-            # Save audio file first
-            with open(audio_path, "wb") as f:
-                f.write(audio_data)
-            
-            # Update message with audio attachment
-            conn = await asyncpg.connect(settings.DB_URL)
-            try:
-                await conn.execute(
-                    "UPDATE messages SET attachments = $1 WHERE id = $2",
-                    asyncpg.types.pgjsonb.encode(attachments),
-                    message_id
-                )
-            finally:
-                await conn.close()
-                conn = None
+            message_id = await create_media_message(
+                chat_id=chat_id,
+                sender_id=user_id,
+                sender_type=sender_type,
+                message_text="",
+                operator_id=operator_id,
+                place_file=place_audio
+            )
         except Exception as e:
-            # If file save or DB update fails, clean up
-            if conn:
-                try:
-                    await conn.execute("DELETE FROM messages WHERE id = $1", message_id)
-                    await conn.close()
-                except:
-                    pass
-            # Try to delete file if it was created
-            try:
-                if audio_path.exists():
-                    audio_path.unlink()
-            except:
-                pass
+            await staged.discard()
             raise HTTPException(status_code=500, detail=f"Failed to save audio file: {str(e)}")
         
+        audio_url = f"/api/media/voice/{chat_id}/{message_id}.{file_ext}"
+        
         # Get updated message
         message = await get_message_by_id(message_id)
         
@@ -1631,7 +1601,7 @@ async def upload_voice_message(
 @router.post("/{chat_id}/messages/image")
 async def upload_image_message(
     chat_id: int,
-    telegram_id: int = Query(..., description="Telegram user ID"),
+    user: dict = Depends(get_request_user),
     image: UploadFile = File(..., description="Image file"),
     message_text: Optional[str] = Query("", description="Optional message text")
 ):
@@ -1639,11 +1609,6 @@ async def upload_image_message(
     Upload an image message to a chat.
     """
     try:
-        # Get user
-        user = await get_user_by_telegram_id(telegram_id)
-        if not user:
-            raise HTTPException(status_code=404, detail="User not found")
-        
         user_id = user.get('id')
         user_role = user.get('role', 'client')
         
@@ -1669,19 +1634,6 @@ async def upload_image_message(
                 detail=f"Invalid image format. Allowed: {', '.join(ALLOWED_IMAGE_FORMATS)}"
             )
         
-        # Read image file
-        image_data = await image.read()
-        image_size = len(image_data)
-        
-        if image_size > MAX_IMAGE_SIZE:
-            raise HTTPException(
-                status_code=400,
-                detail=f"Image file too large. Maximum size: {MAX_IMAGE_SIZE / (1024 * 1024)}MB"
-            )
-        
-        if image_size == 0:
-            raise HTTPException(status_code=400, detail="Image file is empty")
-        
         # Determine file extension
         content_type_to_ext = {
             "image/jpeg": "jpg",
@@ -1700,71 +1652,60 @@ async def upload_image_message(
             sender_type = 'client'
             operator_id_for_message = None
         
-        # Create message first to get message_id
-        message_id = await create_message(
-            chat_id=chat_id,
-            sender_id=user_id,
-            sender_type=sender_type,
-            message_text=message_text.strip() if message_text else "",
-            operator_id=operator_id_for_message,
-            attachments=None
-        )
+        # Stream image to a temp file (size limit + sha256 while streaming)
+        staged = await stage_upload(image, blob_store.tmp_dir, MAX_IMAGE_SIZE, label="Image file")
         
-        if not message_id:
-            raise HTTPException(status_code=500, detail="Failed to create message")
-        
-        # Save image file and update message
-        image_dir = Path(settings.MEDIA_ROOT) / "images" / str(chat_id)
-        image_dir.mkdir(parents=True, exist_ok=True)
-        
-        image_filename = f"{message_id}.{file_ext}"
-        image_path = image_dir / image_filename
-        
-        image_url = f"/api/media/images/{chat_id}/{image_filename}"
-        attachments = {
-            "type": "image",
-            "url": image_url,
-            "filename": image_filename,
-            "size": image_size,
-            "width": None,
-            "height": None
-        }
+        # Strip EXIF, downsize, build webp/thumbnail variants in the process pool
+        try:
+            processed = await staged.process_image(file_ext)
+        except ImagePipelineBusy:
+            await staged.discard()
+            raise HTTPException(
+                status_code=503,
+                detail="Image processing is busy, please retry",
+                headers={"Retry-After": "5"}
+            )
+        except Exception as e:
+            await staged.discard()
+            logger.warning(f"Image processing failed for chat {chat_id}: {e}")
+            raise HTTPException(status_code=400, detail="Invalid or unsupported image file")
+        
+        # Message + attachments in one transaction; files go into the blob store inside it
+        async def place_image(conn, message_id: int) -> Dict[str, Any]:
+            image_filename = f"{message_id}.{file_ext}"
+            blobs = await staged.store(conn, image.content_type)
+            return {
+                "type": "image",
+                "url": f"/api/media/images/{chat_id}/{image_filename}",
+                "filename": image_filename,
+                "size": staged.size,
+                "sha256": staged.sha256,
+                "blobs": blobs,
+                "width": processed["width"],
+                "height": processed["height"],
+                "variants": {
+                    variant: f"/api/media/images/{chat_id}/{name}"
+                    for variant, name in variant_names(str(message_id)).items() if variant in blobs
+                },
+                "thumb_width": processed["thumb_width"],
+                "thumb_height": processed["thumb_height"]
+            }
         
-        # Save file and update database
-        import asyncpg
-        conn = None
         try:
-            # Save image file first
-            with open(image_path, "wb") as f:
-                f.write(image_data)
-            
-            # Update message with image attachment
-            conn = await asyncpg.connect(settings.DB_URL)
-            try:
-                await conn.execute(
-                    "UPDATE messages SET attachments = $1 WHERE id = $2",
-                    asyncpg.types.pgjsonb.encode(attachments),
-                    message_id
-                )
-            finally:
-                await conn.close()
-                conn = None
+            message_id = await create_media_message(
+                chat_id=chat_id,
+                sender_id=user_id,
+                sender_type=sender_type,
+                message_text=message_text.strip() if message_text else "",
+                operator_id=operator_id_for_message,
+                place_file=place_image
+            )
         except Exception as e:
-            # If file save or DB update fails, clean up
-            if conn:
-                try:
-                    await conn.execute("DELETE FROM messages WHERE id = $1", message_id)
-                    await conn.close()
-                except:
-                    pass
-            # Try to delete file if it was created
-            try:
-                if image_path.exists():
-                    image_path.unlink()
-            except:
-                pass
+            await staged.discard()
             raise HTTPException(status_code=500, detail=f"Failed to save image file: {str(e)}")
         
+        image_url = f"/api/media/images/{chat_id}/{message_id}.{file_ext}"
+        
         # Get updated message
         message = await get_message_by_id(message_id)
         
@@ -1786,7 +1727,7 @@ async def upload_image_message(
 @router.get("/{chat_id}/media")
 async def get_chat_media_endpoint(
     chat_id: int,
-    telegram_id: int = Query(..., description="Telegram user ID"),
+    user: dict = Depends(get_request_user),
     media_type: Optional[str] = Query(None, description="Media type filter: 'image', 'video', or None for all"),
     limit: int = Query(50, ge=1, le=200, description="Maximum number of media items")
 ):
@@ -1794,11 +1735,6 @@ async def get_chat_media_endpoint(
     Get media files (images/videos) from a chat.
     """
     try:
-        # Get user
-        user = await get_user_by_telegram_id(telegram_id)
-        if not user:
-            raise HTTPException(status_code=404, detail="User not found")
-        
         user_id = user.get('id')
         user_role = user.get('role', 'client')
         
@@ -1848,18 +1784,13 @@ class EditMessageRequest(BaseModel):
 async def edit_message_endpoint(
     chat_id: int,
     message_id: int,
-    telegram_id: int = Query(..., description="Telegram user ID"),
+    user: dict = Depends(get_request_user),
     request: EditMessageRequest = Body(...)
 ):
     """
     Edit a message. Only the message owner can edit it within 15 minutes.
     """
     try:
-        # Get user
-        user = await get_user_by_telegram_id(telegram_id)
-        if not user:
-            raise HTTPException(status_code=404, detail="User not found")
-        
         user_id = user.get('id')
         
         # Validate message text
@@ -1897,17 +1828,12 @@ async def edit_message_endpoint(
 @router.post("/{chat_id}/pin")
 async def pin_chat_endpoint(
     chat_id: int,
-    telegram_id: int = Query(..., description="Telegram user ID")
+    user: dict = Depends(get_request_user)
 ):
     """
     Pin a chat for a user.
     """
     try:
-        # Get user
-        user = await get_user_by_telegram_id(telegram_id)
-        if not user:
-            raise HTTPException(status_code=404, detail="User not found")
-        
         user_id = user.get('id')
         
         # Verify chat exists
@@ -1931,17 +1857,12 @@ async def pin_chat_endpoint(
 @router.delete("/{chat_id}/pin")
 async def unpin_chat_endpoint(
     chat_id: int,
-    telegram_id: int = Query(..., description="Telegram user ID")
+    user: dict = Depends(get_request_user)
 ):
     """
     Unpin a chat for a user.
     """
     try:
-        # Get user
-        user = await get_user_by_telegram_id(telegram_id)
-        if not user:
-            raise HTTPException(status_code=404, detail="User not found")
-        
         user_id = user.get('id')
         
         # Unpin chat
@@ -1959,17 +1880,12 @@ async def unpin_chat_endpoint(
 
 @router.get("/pinned")
 async def get_pinned_chats_endpoint(
-    telegram_id: int = Query(..., description="Telegram user ID")
+    user: dict = Depends(get_request_user)
 ):
     """
     Get all pinned chats for a user.
     """
     try:
-        # Get user
-        user = await get_user_by_telegram_id(telegram_id)
-        if not user:
-            raise HTTPException(status_code=404, detail="User not found")
-        
         user_id = user.get('id')
         
         # Get pinned chats
@@ -1986,17 +1902,12 @@ async def get_pinned_chats_endpoint(
 async def mark_message_read_endpoint(
     chat_id: int,
     message_id: int,
-    telegram_id: int = Query(..., description="Telegram user ID")
+    user: dict = Depends(get_request_user)
 ):
     """
     Mark a message as read.
     """
     try:
-        # Get user
-        user = await get_user_by_telegram_id(telegram_id)
-        if not user:
-            raise HTTPException(status_code=404, detail="User not found")
-        
         user_id = user.get('id')
         
         # Verify message exists and belongs to chat
@@ -2030,17 +1941,12 @@ async def mark_message_read_endpoint(
 async def get_message_reads_endpoint(
     chat_id: int,
     message_id: int,
-    telegram_id: int = Query(..., description="Telegram user ID")
+    user: dict = Depends(get_request_user)
 ):
     """
     Get list of users who read a message.
     """
     try:
-        # Get user
-        user = await get_user_by_telegram_id(telegram_id)
-        if not user:
-            raise HTTPException(status_code=404, detail="User not found")
-        
         # Verify message exists and belongs to chat
         message = await get_message_by_id(message_id)
         if not message or message.get('chat_id') != chat_id:
@@ -2059,17 +1965,12 @@ async def get_message_reads_endpoint(
 @router.post("/{chat_id}/read")
 async def mark_chat_read_endpoint(
     chat_id: int,
-    telegram_id: int = Query(..., description="Telegram user ID")
+    user: dict = Depends(get_request_user)
 ):
     """
     Mark all unread messages in a chat as read.
     """
     try:
-        # Get user
-        user = await get_user_by_telegram_id(telegram_id)
-        if not user:
-            raise HTTPException(status_code=404, detail="User not found")
-        
         user_id = user.get('id')
         
         # Verify chat exists
@@ -2091,17 +1992,12 @@ async def mark_chat_read_endpoint(
 async def get_message_thread_endpoint(
     chat_id: int,
     message_id: int,
-    telegram_id: int = Query(..., description="Telegram user ID")
+    user: dict = Depends(get_request_user)
 ):
     """
     Get all replies to a specific message (thread).
     """
     try:
-        # Get user
-        user = await get_user_by_telegram_id(telegram_id)
-        if not user:
-            raise HTTPException(status_code=404, detail="User not found")
-        
         # Verify message exists and belongs to chat
         message = await get_message_by_id(message_id)
         if not message or message.get('chat_id') != chat_id:
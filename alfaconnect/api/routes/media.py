@@ -0,0 +1,114 @@
+"""
+Media file endpoints (voice messages, chat images)
+"""
+import re
+from pathlib import Path
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException, Query, Request
+
+from api.media import authorize_media, blob_path, media_file_response
+from config import settings
+
+router = APIRouter()
+
+# Fayl nomi: {message_id}.{ext}, rasm variantlari: {message_id}.webp, {message_id}_thumb.webp
+_MEDIA_FILENAME_RE = re.compile(r"^(\d+)(_thumb)?\.([A-Za-z0-9]+)$")
+
+AUDIO_MEDIA_TYPES = {
+    "mp3": "audio/mpeg",
+    "ogg": "audio/ogg",
+    "opus": "audio/ogg",
+    "wav": "audio/wav",
+    "webm": "audio/webm",
+    "mp4": "audio/mp4",
+    "m4a": "audio/mp4",
+    "aac": "audio/aac",
+}
+
+IMAGE_MEDIA_TYPES = {
+    "jpg": "image/jpeg",
+    "jpeg": "image/jpeg",
+    "png": "image/png",
+    "gif": "image/gif",
+    "webp": "image/webp",
+}
+
+
+def _parse_filename(filename: str) -> re.Match:
+    match = _MEDIA_FILENAME_RE.match(filename)
+    if not match:
+        raise HTTPException(status_code=400, detail="Invalid filename format")
+    return match
+
+
+@router.api_route("/voice/{chat_id}/{filename}", methods=["GET", "HEAD"])
+async def get_voice_file(
+    request: Request,
+    chat_id: int,
+    filename: str,
+    telegram_id: int = Query(..., description="Telegram user ID for authorization")
+):
+    """Serve voice message files with access control (Range/ETag supported)"""
+    match = _parse_filename(filename)
+    blobs = await authorize_media(telegram_id, chat_id, int(match.group(1)))
+
+    media_type = AUDIO_MEDIA_TYPES.get(match.group(3).lower(), "audio/mpeg")
+    path = blob_path(blobs, "original")
+    if path is not None:
+        return media_file_response(request, path, media_type, sha256=blobs["original"])
+    # Store'gacha yozilgan eski fayl
+    media_path = Path(settings.MEDIA_ROOT) / "voice" / str(chat_id) / filename
+    return media_file_response(request, media_path, media_type)
+
+
+@router.api_route("/images/{chat_id}/{filename}", methods=["GET", "HEAD"])
+async def get_image_file(
+    request: Request,
+    chat_id: int,
+    filename: str,
+    telegram_id: int = Query(..., description="Telegram user ID for authorization"),
+    variant: Optional[str] = Query(None, description="'thumb' or 'webp'; omitted = original (webp if the client accepts it)")
+):
+    """Serve chat images and their thumbnail/WebP variants with access control"""
+    if variant not in (None, "thumb", "webp", "original"):
+        raise HTTPException(status_code=400, detail="Invalid variant. Use 'thumb', 'webp' or 'original'")
+
+    match = _parse_filename(filename)
+    message_id = match.group(1)
+    blobs = await authorize_media(telegram_id, chat_id, int(message_id))
+    image_dir = Path(settings.MEDIA_ROOT) / "images" / str(chat_id)
+
+    # So'ralgan fayl nomi qaysi variant: {id}_thumb.webp, {id}.webp (asl rasm webp bo'lmasa) yoki asl
+    if match.group(2):
+        own_variant = "thumb"
+    elif match.group(3).lower() == "webp" and "webp" in blobs:
+        own_variant = "webp"
+    else:
+        own_variant = "original"
+
+    # Variant tanlash: aniq so'ralgan variant yoki Accept: image/webp bo'yicha
+    candidates = []
+    if variant == "thumb":
+        candidates.append(("thumb", f"{message_id}_thumb.webp"))
+    elif variant == "webp" or (variant is None and not match.group(2)
+                               and "image/webp" in request.headers.get("accept", "")):
+        candidates.append(("webp", f"{message_id}.webp"))
+    candidates.append((own_variant, filename))  # variant hali yo'q (eski rasmlar) - asl fayl
+
+    for key, name in candidates:
+        path = blob_path(blobs, key)
+        sha256 = blobs.get(key) if path is not None else None
+        if path is None:
+            path = image_dir / name  # store'gacha yozilgan eski fayl
+        if path.exists():
+            ext = name.rsplit(".", 1)[-1].lower()
+            return media_file_response(
+                request,
+                path,
+                IMAGE_MEDIA_TYPES.get(ext, "application/octet-stream"),
+                extra_headers={"Vary": "Accept"},
+                sha256=sha256
+            )
+
+    raise HTTPException(status_code=404, detail="File not found")
@@ -3,6 +3,7 @@ Metrics endpoint for monitoring
 """
 from fastapi import APIRouter
 from utils.monitoring import get_metrics_summary
+from database.basic.order_counters import fetch_order_counters
 
 router = APIRouter()
 
@@ -11,7 +12,8 @@ router = APIRouter()
 async def get_metrics():
     """
     Get monitoring metrics summary.
-    Returns API latency (p95), WebSocket connections, cron jobs, and DB conflicts.
+    Returns API latency (p95), WebSocket connections, cron jobs, DB conflicts
+    and DB pool size / acquire wait time.
     """
     try:
         metrics = await get_metrics_summary()
@@ -19,3 +21,15 @@ async def get_metrics():
     except Exception as e:
         return {"error": str(e)}
 
+
+@router.get("/order-counters")
+async def get_order_counters():
+    """
+    Barcha rollar dashboard'lari uchun ariza sonlari (bitta DB so'rovi).
+    Har bir order turi: total / active / urgent va aktiv arizalar status bo'yicha.
+    """
+    try:
+        counters = await fetch_order_counters()
+        return counters.to_dict()
+    except Exception as e:
+        return {"error": str(e)}
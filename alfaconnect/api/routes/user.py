@@ -18,9 +18,10 @@ from database.webapp.user_queries import (
 )
 from database.webapp.user_status_queries import (
     update_user_last_seen,
+    get_user_status,
     is_user_online
 )
-from api.dependencies import get_current_user_from_init_data
+from api.dependencies import get_current_user_from_init_data, get_request_user
 from typing import Optional
 
 router = APIRouter()
@@ -150,15 +151,11 @@ async def bootstrap_user(
 
 
 @router.get("/info")
-async def get_user_info(telegram_id: int = Query(..., description="Telegram user ID")):
+async def get_user_info(user: dict = Depends(get_request_user)):
     """
-    Get user info by telegram_id
+    Get user info (session token, or legacy telegram_id query parameter)
     """
     try:
-        user = await get_user_by_telegram_id(telegram_id)
-        if not user:
-            raise HTTPException(status_code=404, detail="User not found")
-        
         # Convert datetime objects to strings
         if user.get('created_at'):
             user['created_at'] = user['created_at'].isoformat()
@@ -173,17 +170,13 @@ async def get_user_info(telegram_id: int = Query(..., description="Telegram user
 
 
 @router.get("/role")
-async def get_user_role(telegram_id: int = Query(..., description="Telegram user ID")):
+async def get_user_role(user: dict = Depends(get_request_user)):
     """
-    Get user role by telegram_id
+    Get user role (session token, or legacy telegram_id query parameter)
     """
     try:
-        user = await get_user_by_telegram_id(telegram_id)
-        if not user:
-            raise HTTPException(status_code=404, detail="User not found")
-        
         return {
-            "telegram_id": telegram_id,
+            "telegram_id": user.get('telegram_id'),
             "role": user.get('role'),
             "user_id": user.get('id')
         }
@@ -255,19 +248,25 @@ async def list_clients(
 @router.get("/clients/search")
 async def search_clients_endpoint(
     q: str = Query(..., description="Search query"),
-    limit: int = Query(20, ge=1, le=100, description="Maximum number of results")
+    limit: int = Query(20, ge=1, le=100, description="Maximum number of results"),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page")
 ):
     """
-    Search clients by name, phone, or abonent_id.
+    Search clients by name, username, phone, ID, abonent_id or application number.
+    Fuzzy (trigram) matches are ranked by similarity; use next_cursor for the next page.
     Includes is_online and last_seen_at for presence tracking.
     """
     try:
         from database.webapp.user_status_queries import is_user_online
         
-        if len(q) < 2:
-            return {"clients": [], "count": 0}
+        if len(q.strip()) < 2:
+            return {"clients": [], "count": 0, "next_cursor": None}
         
-        clients = await search_clients(q, limit=limit)
+        try:
+            page = await search_clients(q, limit=limit, cursor=cursor)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        clients = page["items"]
         
         # Convert datetime objects to strings and calculate is_online
         for client in clients:
@@ -286,7 +285,9 @@ async def search_clients_endpoint(
                 if last_seen_at:
                     client['last_seen_at'] = last_seen_at.isoformat() if hasattr(last_seen_at, 'isoformat') else last_seen_at
         
-        return {"clients": clients, "count": len(clients)}
+        return {"clients": clients, "count": len(clients), "next_cursor": page["next_cursor"]}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error searching clients: {str(e)}")
 
@@ -365,9 +366,14 @@ async def get_authenticated_user(
         if current_user.get('role') in ('callcenter_operator', 'callcenter_supervisor'):
             operator_id = current_user.get('id')
         
-        # Calculate is_online from last_seen_at using TTL
-        last_seen_at = current_user.get('last_seen_at')
-        calculated_is_online = is_user_online(last_seen_at)
+        # Presence tracker is fresher than users.last_seen_at (flushed in batches)
+        presence_status = await get_user_status(current_user.get('id'))
+        if presence_status:
+            last_seen_at = presence_status['last_seen_at']
+            calculated_is_online = presence_status['is_online']
+        else:
+            last_seen_at = current_user.get('last_seen_at')
+            calculated_is_online = is_user_online(last_seen_at)
         
         # Convert datetime objects to strings
         if last_seen_at and hasattr(last_seen_at, 'isoformat'):
@@ -413,7 +419,7 @@ async def update_user_status(
     - When is_online=true: User is online, last_seen_at updated to now
     - When is_online=false: User is offline, last_seen_at updated to now (for "X minutes ago" calculation)
     
-    ⚡ Lightweight: Simple DB update, no external calls.
+    ⚡ Lightweight: In-memory presence update, no DB write per heartbeat.
     
     🔐 Authentication: Uses Telegram WebApp initData from X-Telegram-Init-Data header.
     """
@@ -426,29 +432,24 @@ async def update_user_status(
         # is_online from request (True when webapp open, False when closing)
         is_online = request.is_online
         
-        # Update both last_seen_at and is_online in database
+        # Presence tracker (in memory); users.last_seen_at/is_online are flushed in batches
         # When going offline, last_seen_at = now (the moment they went offline)
-        success = await update_user_last_seen(
+        changed = await update_user_last_seen(
             user_id=user_id,
             last_seen_at=now,
-            is_online=is_online
+            is_online=is_online,
+            role=user_role
         )
         
-        if not success:
-            raise HTTPException(status_code=500, detail="Failed to update user status in database")
-        
-        # Update in-memory presence tracking (used by WebSocket system)
-        try:
-            from api.routes.websocket import online_users, online_status_timestamp, broadcast_user_status
-            online_users[user_id] = is_online
-            online_status_timestamp[user_id] = now
-            
-            # Broadcast status change to other users via WebSocket
-            await broadcast_user_status(user_id, is_online, user_role)
-        except Exception as ws_error:
-            # WebSocket broadcast is optional, log but don't fail
-            import logging
-            logging.warning(f"WebSocket broadcast failed: {ws_error}")
+        # Broadcast only real online <-> offline transitions
+        if changed:
+            try:
+                from api.routes.websocket import broadcast_user_status
+                await broadcast_user_status(user_id, is_online, user_role)
+            except Exception as ws_error:
+                # WebSocket broadcast is optional, log but don't fail
+                import logging
+                logging.warning(f"WebSocket broadcast failed: {ws_error}")
         
         return {
             "status": "success",
@@ -494,27 +495,21 @@ async def update_user_status_dev(
         
         is_online = request.is_online
         
-        # Update both last_seen_at and is_online in database
-        success = await update_user_last_seen(
+        # Presence tracker (in memory); users.last_seen_at/is_online are flushed in batches
+        changed = await update_user_last_seen(
             user_id=user_id,
             last_seen_at=now,
-            is_online=is_online
+            is_online=is_online,
+            role=user_role
         )
         
-        if not success:
-            raise HTTPException(status_code=500, detail="Failed to update user status in database")
-        
-        # Update in-memory presence tracking (used by WebSocket system)
-        try:
-            from api.routes.websocket import online_users, online_status_timestamp, broadcast_user_status
-            online_users[user_id] = is_online
-            online_status_timestamp[user_id] = now
-            
-            # Broadcast status change to other users via WebSocket
-            await broadcast_user_status(user_id, is_online, user_role)
-        except Exception as ws_error:
-            import logging
-            logging.warning(f"[DEV] WebSocket broadcast failed: {ws_error}")
+        if changed:
+            try:
+                from api.routes.websocket import broadcast_user_status
+                await broadcast_user_status(user_id, is_online, user_role)
+            except Exception as ws_error:
+                import logging
+                logging.warning(f"[DEV] WebSocket broadcast failed: {ws_error}")
         
         return {
             "status": "success",
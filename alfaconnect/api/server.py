@@ -11,16 +11,17 @@ from urllib.parse import urlparse
 
 from fastapi import FastAPI, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse, FileResponse, Response
+from fastapi.responses import JSONResponse, Response
 from fastapi.staticfiles import StaticFiles
 from starlette.middleware.base import BaseHTTPMiddleware
 from starlette.types import Message
-from pathlib import Path
 
-from api.routes import user, chat, websocket, metrics
+from api.routes import user, chat, websocket, metrics, media
 from api.ws import chat as ws_chat
+from api.ws import user as ws_user
 from api.webapp_auth import router as webapp_auth_router
 from api.exceptions import APIException
+from database.connections import init_pool, close_pool
 from config import settings
 
 logger = logging.getLogger(__name__)
@@ -180,80 +181,23 @@ app.include_router(user.router, prefix="/api/user", tags=["user"])
 app.include_router(chat.router, prefix="/api/chat", tags=["chat"])
 app.include_router(websocket.router, prefix="/api/ws", tags=["websocket"])
 app.include_router(ws_chat.router, prefix="/api", tags=["websocket-new"])  # New WS endpoint: /api/ws/chat
+app.include_router(ws_user.router, prefix="/api", tags=["websocket-new"])  # Multiplexed WS: /api/ws/user
 app.include_router(metrics.router, prefix="/api", tags=["metrics"])
+app.include_router(media.router, prefix="/api/media", tags=["media"])
 app.include_router(webapp_auth_router, tags=["webapp-auth"])  # WebApp validation: /api/webapp/validate
 
 
-# Media files endpoint
-@app.get("/api/media/voice/{chat_id}/{filename}")
-async def get_voice_file(
-    chat_id: int,
-    filename: str,
-    telegram_id: int = Query(..., description="Telegram user ID for authorization")
-):
-    """Serve voice message files with access control"""
-    from database.webapp.user_queries import get_user_by_telegram_id
-    from database.webapp.chat_queries import get_chat_by_id
-    import asyncpg
-    
-    # Get user
-    user = await get_user_by_telegram_id(telegram_id)
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-    
-    user_id = user.get('id')
-    user_role = user.get('role', 'client')
-    
-    # Verify chat exists and user has access
-    chat = await get_chat_by_id(chat_id)
-    if not chat:
-        raise HTTPException(status_code=404, detail="Chat not found")
-    
-    # Check access: client can only access their own chats, operators can access assigned chats
-    chat_client_id = chat.get('client_id')
-    chat_operator_id = chat.get('operator_id')
-    
-    has_access = False
-    if user_role == 'client' and chat_client_id == user_id:
-        has_access = True
-    elif user_role in ('callcenter_operator', 'callcenter_supervisor'):
-        # Operators can access if assigned or supervisor
-        if user_role == 'callcenter_supervisor' or chat_operator_id == user_id:
-            has_access = True
-    
-    if not has_access:
-        raise HTTPException(status_code=403, detail="Access denied")
-    
-    # Extract message_id from filename (format: {message_id}.{ext})
-    try:
-        message_id = int(filename.split('.')[0])
-    except ValueError:
-        raise HTTPException(status_code=400, detail="Invalid filename format")
-    
-    # Verify message belongs to this chat
-    conn = await asyncpg.connect(settings.DB_URL)
-    try:
-        message = await conn.fetchrow(
-            "SELECT id, chat_id FROM messages WHERE id = $1",
-            message_id
-        )
-        if not message or message['chat_id'] != chat_id:
-            raise HTTPException(status_code=404, detail="File not found")
-    finally:
-        await conn.close()
-    
-    media_path = Path(settings.MEDIA_ROOT) / "voice" / str(chat_id) / filename
-    if not media_path.exists():
-        raise HTTPException(status_code=404, detail="File not found")
-    
-    return FileResponse(media_path, media_type="audio/mpeg")
-
-
 @app.on_event("startup")
 async def startup_event():
     """Initialize services on application startup."""
     logger.info("Application is starting up")
     
+    # API event loop uchun umumiy DB connection pool
+    try:
+        await init_pool()
+    except Exception as e:
+        logger.error(f"Failed to initialize DB pool: {e}")
+    
     # Initialize Redis if enabled
     if settings.REDIS_ENABLED:
         try:
@@ -279,8 +223,7 @@ async def startup_event():
             # Update WebSocket manager to use Redis PubSub
             from api.ws.manager import manager
             pubsub_manager = RedisPubSubManager(redis_pool=redis_pool)
-            manager.use_redis_pubsub = True
-            manager.pubsub_manager = pubsub_manager
+            manager.set_pubsub_manager(pubsub_manager)
             
             logger.info("WebSocket manager configured with Redis PubSub")
         except Exception as e:
@@ -288,6 +231,13 @@ async def startup_event():
             logger.warning("Continuing without Redis PubSub support")
     else:
         logger.info("Redis PubSub is disabled")
+    
+    # Presence: heartbeat'lar xotirada, users.last_seen_at batch flush
+    try:
+        from database.webapp.presence import presence
+        await presence.start()
+    except Exception as e:
+        logger.error(f"Failed to start presence tracker: {e}")
 
 
 @app.on_event("shutdown")
@@ -304,6 +254,25 @@ async def shutdown_event():
                 logger.info("Redis PubSub disconnected")
         except Exception as e:
             logger.error(f"Error disconnecting Redis: {e}")
+    
+    # Rasm variantlari process pool'i
+    try:
+        from api.uploads import image_pipeline
+        image_pipeline.shutdown()
+    except Exception as e:
+        logger.error(f"Error shutting down image pipeline: {e}")
+    
+    # Presence: oxirgi flush (pool yopilishidan oldin)
+    try:
+        from database.webapp.presence import presence
+        await presence.stop()
+    except Exception as e:
+        logger.error(f"Error stopping presence tracker: {e}")
+    
+    try:
+        await close_pool()
+    except Exception as e:
+        logger.error(f"Error closing DB pool: {e}")
 
 
 @app.get("/api/health")
@@ -318,6 +287,13 @@ async def health_check():
     }
 
 
+@app.get("/api/health/ws")
+async def websocket_health():
+    """Chat WebSocket fan-out: ulanishlar, navbat va yuborish kechikishi"""
+    from api.ws.manager import manager
+    return manager.stats()
+
+
 @app.get("/api/config")
 @app.get("/config")
 async def get_config(request: Request, origin: Optional[str] = Query(default=None)):
@@ -0,0 +1,129 @@
+"""
+WebApp session token'lari
+
+initData (Telegram imzosi) /api/webapp/validate da bir marta tekshiriladi
+va qisqa muddatli imzolangan token beriladi:
+    base64url(payload).base64url(HMAC-SHA256(key, payload))
+    payload = {"uid": users.id, "tid": telegram_id, "role": ..., "iat": ..., "exp": ...}
+
+Token tekshiruvi DB ga bormaydi: kalitlar (Telegram WebAppData secret va
+token kaliti) jarayon davomida bir marta hisoblanadi. User qatori esa
+database/basic/user_cache.py TTL keshidan olinadi - role/blok o'zgarganda
+invalidate_user() uni tozalaydi.
+"""
+import base64
+import hashlib
+import hmac
+import json
+import time
+import urllib.parse
+from functools import lru_cache
+from typing import Any, Dict, Optional, Tuple
+
+from config import settings
+
+
+class InvalidInitData(Exception):
+    """initData buzilgan yoki imzosi noto'g'ri"""
+
+    def __init__(self, detail: str, signature: bool = False, expired: bool = False):
+        super().__init__(detail)
+        self.detail = detail
+        self.signature = signature  # True - imzo mos kelmadi (403), aks holda format xatosi
+        self.expired = expired  # True - auth_date WEBAPP_INIT_DATA_MAX_AGE dan eski (401)
+
+
+class InvalidSessionToken(Exception):
+    """Token buzilgan, imzosi noto'g'ri yoki muddati o'tgan"""
+
+
+# ---------- Kalitlar (bir marta) ----------
+
+@lru_cache(maxsize=1)
+def _webapp_secret() -> bytes:
+    return hmac.new(b"WebAppData", settings.BOT_TOKEN.encode(), hashlib.sha256).digest()
+
+
+@lru_cache(maxsize=1)
+def _token_key() -> bytes:
+    if settings.WEBAPP_TOKEN_SECRET:
+        return settings.WEBAPP_TOKEN_SECRET.encode()
+    return hmac.new(b"AlfaConnectSession", settings.BOT_TOKEN.encode(), hashlib.sha256).digest()
+
+
+# ---------- initData ----------
+
+def validate_init_data(init_data: str) -> Dict[str, Any]:
+    """
+    Telegram WebApp initData imzosini va yoshini (auth_date) tekshirish.
+    Bir marta ushlab olingan initData bilan cheksiz token olib bo'lmasligi
+    uchun WEBAPP_INIT_DATA_MAX_AGE dan eski initData rad etiladi.
+
+    Returns: initData maydonlari ("user" JSON sifatida ochilgan)
+    Raises: InvalidInitData
+    """
+    data = dict(urllib.parse.parse_qsl(init_data))
+    check_hash = data.pop("hash", None)
+    if not check_hash:
+        raise InvalidInitData("Missing hash in initData")
+
+    data_check_string = "\n".join(f"{k}={v}" for k, v in sorted(data.items()))
+    calculated_hash = hmac.new(_webapp_secret(), data_check_string.encode(), hashlib.sha256).hexdigest()
+    if not hmac.compare_digest(calculated_hash, check_hash):
+        raise InvalidInitData("Invalid Telegram signature", signature=True)
+
+    try:
+        auth_date = int(data["auth_date"])
+    except (KeyError, ValueError):
+        raise InvalidInitData("Missing or invalid auth_date in initData")
+    max_age = settings.WEBAPP_INIT_DATA_MAX_AGE
+    if max_age and time.time() - auth_date > max_age:
+        raise InvalidInitData("initData expired, reopen the WebApp", expired=True)
+
+    if data.get("user"):
+        try:
+            data["user"] = json.loads(data["user"])
+        except json.JSONDecodeError:
+            raise InvalidInitData("Invalid user JSON in initData")
+    return data
+
+
+# ---------- Token ----------
+
+def _b64encode(raw: bytes) -> str:
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+
+def _b64decode(value: str) -> bytes:
+    return base64.urlsafe_b64decode(value + "=" * (-len(value) % 4))
+
+
+def issue_session_token(user: Dict[str, Any], ttl: Optional[int] = None) -> Tuple[str, int]:
+    """User qatori uchun token. Returns: (token, exp unix vaqti)"""
+    now = int(time.time())
+    exp = now + (ttl or settings.WEBAPP_TOKEN_TTL)
+    payload = json.dumps(
+        {"uid": user["id"], "tid": user["telegram_id"], "role": user.get("role"), "iat": now, "exp": exp},
+        separators=(",", ":"),
+    ).encode()
+    signature = hmac.new(_token_key(), payload, hashlib.sha256).digest()
+    return f"{_b64encode(payload)}.{_b64encode(signature)}", exp
+
+
+def verify_session_token(token: str) -> Dict[str, Any]:
+    """Token imzosi va muddatini tekshirish (DB siz). Returns: payload"""
+    try:
+        payload_part, signature_part = token.split(".")
+        payload = _b64decode(payload_part)
+        signature = _b64decode(signature_part)
+    except (ValueError, TypeError):
+        raise InvalidSessionToken("Malformed session token")
+
+    expected = hmac.new(_token_key(), payload, hashlib.sha256).digest()
+    if not hmac.compare_digest(expected, signature):
+        raise InvalidSessionToken("Invalid session token signature")
+
+    claims = json.loads(payload)
+    if claims.get("exp", 0) < time.time():
+        raise InvalidSessionToken("Session token expired")
+    return claims
@@ -0,0 +1,130 @@
+"""
+Streaming media uploads
+
+UploadFile chunk-by-chunk (UPLOAD_CHUNK_SIZE) temp faylga aiofiles orqali
+yoziladi: butun fayl xotirada ushlanmaydi, event loop bloklanmaydi. Hajm
+limiti yozish paytida tekshiriladi, sha256 shu zahoti hisoblanadi. Temp
+fayl blob store'ning tmp papkasida (blob_store.tmp_dir) - store'ga
+o'tkazish bir fayl tizimi ichidagi atomik rename.
+
+Rasmlar image_pipeline (utils/image_variants.py) orqali temp fayl joyida
+qayta ishlanadi; variantlar ham store'ga alohida blob sifatida o'tadi.
+"""
+import hashlib
+import logging
+import uuid
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict
+
+import aiofiles
+import aiofiles.os
+from fastapi import HTTPException, UploadFile
+
+from config import settings
+from database.basic.media_blobs import store_blob
+from utils.image_variants import ImagePipeline
+
+logger = logging.getLogger(__name__)
+
+UPLOAD_CHUNK_SIZE = 256 * 1024  # 256KB
+
+# Rasm variantlari uchun process pool (birinchi rasmda ishga tushadi)
+image_pipeline = ImagePipeline(
+    workers=settings.IMAGE_WORKERS,
+    max_pending=settings.IMAGE_MAX_PENDING,
+    queue_timeout=settings.IMAGE_QUEUE_TIMEOUT,
+    max_dimension=settings.IMAGE_MAX_DIMENSION,
+    thumb_dimension=settings.IMAGE_THUMB_DIMENSION,
+    webp_quality=settings.IMAGE_WEBP_QUALITY,
+)
+
+
+@dataclass
+class StagedUpload:
+    """Temp faylga yozilgan upload"""
+    temp_path: Path
+    size: int
+    sha256: str
+    variants: Dict[str, Path] = field(default_factory=dict)  # variant -> temp fayl
+    variant_sha256: Dict[str, str] = field(default_factory=dict)
+
+    async def process_image(self, ext: str) -> Dict[str, Any]:
+        """
+        Rasmni image_pipeline'da qayta ishlash (EXIF, o'lcham, webp/thumb).
+        size/sha256 saqlanadigan faylga moslab yangilanadi.
+        """
+        result = await image_pipeline.process(str(self.temp_path), ext)
+        self.size = result["size"]
+        self.sha256 = result["sha256"]
+        self.variants = {
+            variant: self.temp_path.parent / name for variant, name in result["variants"].items()
+        }
+        self.variant_sha256 = result["variant_sha256"]
+        return result
+
+    async def store(self, conn, content_type: str) -> Dict[str, str]:
+        """
+        Temp fayl va variantlarni blob store'ga o'tkazish (conn tranzaksiyasi ichida).
+        Blob'lar attachments["blobs"] orqali xabarga bog'lanadi; tranzaksiya
+        bekor bo'lsa fayllar `gc --orphans` bilan tozalanadi.
+        Returns: {"original": sha256, variant: sha256, ...}
+        """
+        blobs = {"original": self.sha256}
+        await store_blob(conn, self.temp_path, self.sha256, self.size, content_type)
+        for variant, temp_path in self.variants.items():
+            sha256 = self.variant_sha256[variant]
+            size = (await aiofiles.os.stat(temp_path)).st_size
+            await store_blob(conn, temp_path, sha256, size, "image/webp")
+            blobs[variant] = sha256
+        return blobs
+
+    async def discard(self) -> None:
+        await remove_quietly(self.temp_path)
+        for temp_path in self.variants.values():
+            await remove_quietly(temp_path)
+
+
+async def remove_quietly(path: Path) -> None:
+    try:
+        await aiofiles.os.remove(path)
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        logger.warning(f"Could not remove {path}: {e}")
+
+
+async def stage_upload(upload: UploadFile, directory: Path, max_size: int, label: str = "File") -> StagedUpload:
+    """
+    Stream an upload into a temp file inside `directory`.
+
+    Raises HTTPException(400) if the file is empty or larger than max_size
+    (checked while streaming, the temp file is removed).
+    """
+    await aiofiles.os.makedirs(directory, exist_ok=True)
+    temp_path = directory / f".upload-{uuid.uuid4().hex}.part"
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        async with aiofiles.open(temp_path, "wb") as f:
+            while True:
+                chunk = await upload.read(UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > max_size:
+                    raise HTTPException(
+                        status_code=400,
+                        detail=f"{label} too large. Maximum size: {max_size / (1024 * 1024)}MB"
+                    )
+                digest.update(chunk)
+                await f.write(chunk)
+        if size == 0:
+            raise HTTPException(status_code=400, detail=f"{label} is empty")
+    except BaseException:
+        await remove_quietly(temp_path)
+        raise
+    finally:
+        await upload.close()
+
+    return StagedUpload(temp_path=temp_path, size=size, sha256=digest.hexdigest())
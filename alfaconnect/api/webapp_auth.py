@@ -1,13 +1,13 @@
 """
 Telegram WebApp Authentication
-Validates Telegram WebApp initData signature
+Validates Telegram WebApp initData signature and issues a session token
 """
+from datetime import datetime, timezone
+
 from fastapi import APIRouter, HTTPException, Query
-import urllib.parse
-import hmac
-import hashlib
-import json
-from config import settings
+
+from api.session_tokens import InvalidInitData, issue_session_token, validate_init_data
+from database.basic.user_cache import get_cached_user
 
 router = APIRouter(prefix="/api/webapp", tags=["WebApp Auth"])
 
@@ -32,75 +32,61 @@ async def validate_telegram_webapp(init_data: str = Query(..., description="Tele
                 "last_name": "Doe",
                 "username": "johndoe",
                 ...
-            }
+            },
+            "token": "<session token>",   # null if the user is not registered / blocked
+            "token_type": "Bearer",
+            "expires_at": "2025-01-24T12:00:00+00:00",
+            "user_id": 42,
+            "role": "client"
         }
         
+        The token goes into "Authorization: Bearer <token>" for /api/chat/* and
+        /api/user/* requests; it is checked without DB access.
+        
     Raises:
         400: Missing or invalid data
+        401: initData older than WEBAPP_INIT_DATA_MAX_AGE (auth_date)
         403: Invalid Telegram signature (security violation)
     """
     try:
-        # 1. Parse initData from Telegram WebApp
-        data = dict(urllib.parse.parse_qsl(init_data))
-        check_hash = data.pop("hash", None)
-        
-        if not check_hash:
-            raise HTTPException(
-                status_code=400,
-                detail="Missing hash in initData"
-            )
-        
-        # 2. Build data_check_string (sorted alphabetically by key)
-        # This matches Telegram's signature verification algorithm
-        data_check_string = "\n".join(
-            f"{k}={v}" for k, v in sorted(data.items())
-        )
-        
-        # 3. Calculate HMAC-SHA256
-        # Step 1: Create secret key from BOT_TOKEN
-        secret_key = hmac.new(
-            b"WebAppData",
-            settings.BOT_TOKEN.encode(),
-            hashlib.sha256
-        ).digest()
-        
-        # Step 2: Create HMAC signature
-        calculated_hash = hmac.new(
-            secret_key,
-            data_check_string.encode(),
-            hashlib.sha256
-        ).hexdigest()
-        
-        # 4. Compare signatures
-        if calculated_hash != check_hash:
-            print(f"[SECURITY] Invalid Telegram signature!")
-            print(f"  Expected: {check_hash}")
-            print(f"  Calculated: {calculated_hash}")
-            raise HTTPException(
-                status_code=403,
-                detail="Invalid Telegram signature - possible tampering detected"
-            )
+        # 1-4. Parse initData and verify HMAC-SHA256 signature
+        # (secret key derived from BOT_TOKEN once per process)
+        try:
+            data = validate_init_data(init_data)
+        except InvalidInitData as e:
+            if e.signature:
+                print(f"[SECURITY] Invalid Telegram signature!")
+                raise HTTPException(
+                    status_code=403,
+                    detail="Invalid Telegram signature - possible tampering detected"
+                )
+            print(f"⚠️ [Telegram WebApp] {e.detail}")
+            raise HTTPException(status_code=401 if e.expired else 400, detail=e.detail)
         
         print(f"✅ [Telegram WebApp] initData signature verified successfully")
         
-        # 5. Parse user JSON from initData
-        user_data = {}
-        user_data_raw = data.get("user")
+        # 5. User from initData
+        user_data = data.get("user") or {}
+        if user_data:
+            print(f"   User: {user_data.get('first_name')} {user_data.get('last_name')} (ID: {user_data.get('id')})")
         
-        if user_data_raw:
-            try:
-                user_data = json.loads(user_data_raw)
-                print(f"   User: {user_data.get('first_name')} {user_data.get('last_name')} (ID: {user_data.get('id')})")
-            except json.JSONDecodeError as e:
-                print(f"⚠️ [Telegram WebApp] Failed to parse user JSON: {e}")
-                raise HTTPException(
-                    status_code=400,
-                    detail="Invalid user JSON in initData"
-                )
+        # 6. Session token (only for registered, non-blocked users)
+        token = expires_at = user_id = role = None
+        db_user = await get_cached_user(user_data["id"]) if user_data.get("id") else None
+        if db_user and not db_user.get("is_blocked"):
+            token, exp = issue_session_token(db_user)
+            expires_at = datetime.fromtimestamp(exp, tz=timezone.utc).isoformat()
+            user_id = db_user.get("id")
+            role = db_user.get("role")
         
         return {
             "ok": True,
-            "user": user_data
+            "user": user_data,
+            "token": token,
+            "token_type": "Bearer",
+            "expires_at": expires_at,
+            "user_id": user_id,
+            "role": role
         }
     
     except HTTPException:
@@ -5,6 +5,7 @@ from json.decoder import JSONDecodeError
 import logging
 
 from api.ws.manager import manager
+from api.routes.websocket import PONG_FRAME
 from api.ws.rate_limiter import WebSocketRateLimiter, WebsocketTooManyRequests
 from api.exceptions import AuthenticationError, AuthorizationError, NotFoundError
 from database.webapp.user_queries import get_user_by_telegram_id
@@ -36,7 +37,7 @@ async def handle_typing(
         # Update typing status
         await manager.set_typing_status(chat_id, user_id, is_typing)
         
-        # Broadcast typing event to all participants (sender will ignore their own typing)
+        # Broadcast typing event to all participants (throttled per user; sender will ignore their own typing)
         await manager.broadcast_typing_event(chat_id, user_id, is_typing)
         
     except Exception as e:
@@ -71,6 +72,28 @@ def can_user_access_chat(user_id: int, chat_id: int, chat: dict) -> bool:
     return user_id in allowed_users
 
 
+async def get_accessible_chat(chat_id: int, user_id: int, user_role: str) -> dict:
+    """
+    Load a chat the user may follow over WebSocket: its client, its
+    operator, or any supervisor (read-only).
+
+    Raises:
+        NotFoundError: chat does not exist
+        AuthorizationError: user is not a participant
+    """
+    chat = await get_chat_by_id(chat_id)
+    if not chat:
+        raise NotFoundError("Chat not found")
+    
+    allowed_users = [chat.get('client_id')]
+    if chat.get('operator_id'):
+        allowed_users.append(chat.get('operator_id'))
+    
+    if user_id not in allowed_users and user_role != 'callcenter_supervisor':
+        raise AuthorizationError("Access denied")
+    return chat
+
+
 @router.websocket("/ws/chat")
 async def chat_ws(
     websocket: WebSocket,
@@ -110,26 +133,15 @@ async def chat_ws(
 
     # 2) Permission - Check if user can access chat
     try:
-        chat = await get_chat_by_id(chat_id)
-        if not chat:
-            logger.warning(f"Chat {chat_id} not found")
-            await websocket.close(code=4404, reason="Chat not found")
-            return
-        
-        client_id = chat.get('client_id')
-        operator_id = chat.get('operator_id')
-        
-        # Allow client, operator, or supervisor
-        allowed_users = [client_id]
-        if operator_id:
-            allowed_users.append(operator_id)
-        
-        is_supervisor = user_role == 'callcenter_supervisor'
-        
-        if user_id not in allowed_users and not is_supervisor:
-            logger.warning(f"User {user_id} not authorized for chat {chat_id}")
-            await websocket.close(code=4403, reason="Access denied")
-            return
+        chat = await get_accessible_chat(chat_id, user_id, user_role)
+    except NotFoundError:
+        logger.warning(f"Chat {chat_id} not found")
+        await websocket.close(code=4404, reason="Chat not found")
+        return
+    except AuthorizationError:
+        logger.warning(f"User {user_id} not authorized for chat {chat_id}")
+        await websocket.close(code=4403, reason="Access denied")
+        return
     except Exception as e:
         logger.error(f"Error checking chat permission: {e}", exc_info=True)
         await websocket.close(code=4403, reason="Permission check failed")
@@ -182,12 +194,8 @@ async def chat_ws(
                 
                 # Heartbeat (ping/pong)
                 if message_type == "ping" or data == "ping":
-                    try:
-                        await websocket.send_json({"type": "pong"})
-                    except (WebSocketDisconnect, RuntimeError):
-                        # Disconnect detected while sending pong
-                        logger.info(f"WebSocket disconnected while sending pong: chat_id={chat_id}, user_id={user_id}")
-                        break
+                    # Outbound navbat orqali (broadcast'lar bilan tartib saqlanadi)
+                    manager.send(websocket, PONG_FRAME)
                     continue
                 
                 # Handle other message types using manager handlers
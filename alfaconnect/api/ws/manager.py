@@ -1,46 +1,80 @@
 # app/ws/manager.py
 
-from typing import Dict, Set, Optional
+from typing import Dict, Iterable, Optional, Set, Tuple
 from fastapi import WebSocket
 from collections import defaultdict
-import asyncio
-import json
 import logging
-from datetime import datetime, timedelta
+import time
+from datetime import datetime
+
+from api.ws.outbound import CoalescingWriter, ConnectionWriter, SendMetrics
+from api.ws.serialization import encode_event
+from config import settings
 
 logger = logging.getLogger(__name__)
 
+# Topic nomlari: "chat:<id>" (Redis orqali instance'lar o'rtasida ham),
+# "staff:<id>", "stats" (lokal)
+STATS_TOPIC = "stats"
+
+
+def chat_topic(chat_id: int) -> str:
+    return f"chat:{chat_id}"
+
+
+def staff_topic(chat_id: int) -> str:
+    return f"staff:{chat_id}"
+
+
+def _is_shared(topic: str) -> bool:
+    """Redis PubSub orqali tarqatiladigan topic'lar"""
+    return topic.startswith("chat:")
+
 
 class ChatWSManager:
     """
     Enhanced WebSocket Manager with decorator pattern for handlers
     Based on fastapi-chat patterns
+
+    Barcha WebSocket'lar uchun yagona topic registry: har bir ulanish
+    register() qilinadi (outbound navbat + user_id), keyin topic'larga
+    obuna bo'ladi. /api/ws/user bitta ulanishda bir nechta topic'ga,
+    eski /api/ws/chat, /api/ws/stats va /api/ws/staff-chat esa bittaga
+    obuna bo'ladi. Registry o'zgarishlari await'siz bajariladi, shuning
+    uchun lock kerak emas.
     """
-    
+
     def __init__(self, use_redis_pubsub: bool = False, redis_pubsub_manager=None):
         """
         Initialize WebSocket Manager.
-        
+
         Args:
             use_redis_pubsub: If True, use Redis PubSub for distributed messaging
             redis_pubsub_manager: Optional RedisPubSubManager instance
         """
-        self.rooms: Dict[int, Set[WebSocket]] = defaultdict(set)
+        self.topics: Dict[str, Set[WebSocket]] = {}
         self.user_connections: Dict[int, Set[WebSocket]] = defaultdict(set)  # user_id -> {ws1, ws2}
-        self._lock = asyncio.Lock()
+        self._ws_topics: Dict[WebSocket, Set[str]] = {}
+        self._ws_user: Dict[WebSocket, int] = {}
+        # Har bir ulanishning outbound navbati (api/ws/outbound.py)
+        self._writers: Dict[WebSocket, ConnectionWriter] = {}
+        self.send_metrics = SendMetrics()
         self.handlers: Dict[str, callable] = {}  # message_type -> handler function
         self.use_redis_pubsub = use_redis_pubsub
-        self.pubsub_manager = redis_pubsub_manager
-        self._pubsub_tasks: Dict[int, asyncio.Task] = {}  # chat_id -> pubsub reader task
+        self.pubsub_manager = None
+        if redis_pubsub_manager:
+            self.set_pubsub_manager(redis_pubsub_manager)
         # Typing status tracking: {chat_id: {user_id: timestamp}}
         self.typing_status: Dict[int, Dict[int, datetime]] = defaultdict(dict)
         # Typing timeout in seconds (auto-clear after 3 seconds to match frontend)
         self.typing_timeout = 3
+        # Typing throttle: (topic, user_id) -> oxirgi yuborilgan "typing: true" vaqti
+        self._typing_sent: Dict[Tuple[str, int], float] = {}
 
     def handler(self, message_type: str):
         """
         Decorator to register a message handler.
-        
+
         Usage:
             @manager.handler("message")
             async def handle_message(websocket, incoming_message, **kwargs):
@@ -52,10 +86,174 @@ class ChatWSManager:
             return func
         return decorator
 
+    # ---------- Registry ----------
+
+    def register(self, ws: WebSocket, user_id: Optional[int] = None, coalesce: bool = False) -> None:
+        """
+        Ulanishni ro'yxatga olish: outbound navbat va (bo'lsa) user_id.
+        coalesce=True - event'lar WS_COALESCE_WINDOW ichida massiv frame'ga yig'iladi
+        """
+        if ws not in self._writers:
+            if coalesce and settings.WS_COALESCE_WINDOW > 0:
+                writer = CoalescingWriter(ws, settings.WS_SEND_QUEUE_SIZE, self.send_metrics,
+                                          settings.WS_COALESCE_WINDOW)
+            else:
+                writer = ConnectionWriter(ws, settings.WS_SEND_QUEUE_SIZE, self.send_metrics)
+            self._writers[ws] = writer
+            self._ws_topics[ws] = set()
+        if user_id is not None:
+            self._ws_user[ws] = user_id
+            self.user_connections[user_id].add(ws)
+
+    def unregister(self, ws: WebSocket) -> None:
+        """Barcha topic'lardan chiqarish, writer'ni to'xtatish"""
+        for topic in tuple(self._ws_topics.get(ws, ())):
+            self.unsubscribe(ws, topic)
+        self._ws_topics.pop(ws, None)
+        writer = self._writers.pop(ws, None)
+        if writer:
+            writer.stop()
+        user_id = self._ws_user.pop(ws, None)
+        if user_id is not None and user_id in self.user_connections:
+            self.user_connections[user_id].discard(ws)
+            if not self.user_connections[user_id]:
+                del self.user_connections[user_id]
+
+    def subscribe(self, ws: WebSocket, topic: str) -> bool:
+        """Topic'ga obuna. Returns: yangi obuna bo'ldimi"""
+        self.register(ws)
+        if topic in self._ws_topics[ws]:
+            return False
+        subscribers = self.topics.setdefault(topic, set())
+        subscribers.add(ws)
+        self._ws_topics[ws].add(topic)
+        # Bu instance'da topic'ning birinchi obunachisi - Redis kanaliga obuna
+        if len(subscribers) == 1 and _is_shared(topic) and self.use_redis_pubsub and self.pubsub_manager:
+            self.pubsub_manager.subscribe(topic)
+        return True
+
+    def unsubscribe(self, ws: WebSocket, topic: str) -> bool:
+        """Topic obunasini bekor qilish. Returns: obuna bormidi"""
+        topics = self._ws_topics.get(ws)
+        if not topics or topic not in topics:
+            return False
+        topics.discard(topic)
+        user_id = self._ws_user.get(ws)
+        if user_id is not None:
+            self._typing_sent.pop((topic, user_id), None)
+        subscribers = self.topics.get(topic)
+        if subscribers is not None:
+            subscribers.discard(ws)
+            if not subscribers:
+                del self.topics[topic]
+                if _is_shared(topic) and self.use_redis_pubsub and self.pubsub_manager:
+                    self.pubsub_manager.unsubscribe(topic)
+        return True
+
+    def topics_of(self, ws: WebSocket) -> Set[str]:
+        return set(self._ws_topics.get(ws, ()))
+
+    def user_of(self, ws: WebSocket) -> Optional[int]:
+        return self._ws_user.get(ws)
+
+    def topic_size(self, topic: str) -> int:
+        return len(self.topics.get(topic, ()))
+
+    def subscribers(self, topic: str) -> Iterable[WebSocket]:
+        return tuple(self.topics.get(topic, ()))
+
+    # ---------- Yuborish ----------
+
+    def send(self, ws: WebSocket, message: str, key: Optional[str] = None) -> bool:
+        """
+        Queue a text frame for one WebSocket (its writer task sends it).
+        `key`: holat event'lari uchun - batch rejimida faqat oxirgisi yuboriladi.
+
+        Returns:
+            False if the connection is closed/evicted or not managed here
+        """
+        writer = self._writers.get(ws)
+        if writer is None:
+            return False
+        return writer.enqueue(message, key)
+
+    def publish_local(self, topic: str, message: str, exclude_user_id: Optional[int] = None,
+                      key: Optional[str] = None) -> int:
+        """
+        Broadcast a frame to this instance's subscribers of a topic.
+
+        Membership is snapshotted and each socket's outbound queue gets the
+        frame - nothing is awaited per socket, so a slow client cannot stall
+        other topics or connect/disconnect.
+
+        Returns:
+            Number of sockets the frame was queued for
+        """
+        sent = 0
+        for ws in tuple(self.topics.get(topic, ())):
+            if exclude_user_id is not None and self._ws_user.get(ws) == exclude_user_id:
+                continue
+            if self.send(ws, message, key):
+                sent += 1
+        return sent
+
+    async def publish(self, topic: str, message: str, exclude_user_id: Optional[int] = None,
+                      key: Optional[str] = None) -> int:
+        """Lokal obunachilar + (chat topic'lari uchun) boshqa instance'lar"""
+        if _is_shared(topic) and self.use_redis_pubsub and self.pubsub_manager:
+            try:
+                await self.pubsub_manager.publish(topic, message)
+            except Exception as e:
+                logger.error(f"Error publishing to Redis for topic {topic}: {e}")
+        return self.publish_local(topic, message, exclude_user_id, key)
+
+    def send_to_user(self, user_id: int, message: str, topic: Optional[str] = None,
+                     key: Optional[str] = None) -> int:
+        """Userning (topic berilsa - shu topic'ga obuna) barcha ulanishlariga"""
+        sent = 0
+        for ws in tuple(self.user_connections.get(user_id, ())):
+            if topic is not None and topic not in self._ws_topics.get(ws, ()):
+                continue
+            if self.send(ws, message, key):
+                sent += 1
+        return sent
+
+    def set_pubsub_manager(self, pubsub_manager):
+        """Redis PubSub'ni ulash: boshqa instance'lar xabarlari lokal topic'larga"""
+        self.pubsub_manager = pubsub_manager
+        self.use_redis_pubsub = True
+        pubsub_manager.on_message = self._on_pubsub_message
+        # Allaqachon ochiq topic'lar
+        for topic in self.topics:
+            if _is_shared(topic):
+                pubsub_manager.subscribe(topic)
+
+    async def _on_pubsub_message(self, channel: str, data: str):
+        """Reader task'dan: kanal (= topic) -> lokal obunachilar"""
+        if _is_shared(channel):
+            self.publish_local(channel, data)
+
+    def stats(self) -> dict:
+        """Ulanishlar soni va yuborish metrikalari (GET /api/health/ws)"""
+        return {
+            "topics": len(self.topics),
+            "connections": len(self._writers),
+            "users": len(self.user_connections),
+            "queue_size": settings.WS_SEND_QUEUE_SIZE,
+            **self.send_metrics.snapshot(),
+            **({
+                "pubsub_channels": self.pubsub_manager.channel_count,
+                "pubsub_received": self.pubsub_manager.received,
+                "pubsub_skipped_own": self.pubsub_manager.skipped_own,
+            } if self.pubsub_manager else {}),
+        }
+
+    # ---------- Chat topic'lari (/api/ws/chat va /api/ws/user) ----------
+
     async def connect(self, chat_id: int, ws: WebSocket, accept_already_called: bool = False):
         """
         Connect a WebSocket to a chat room
-        
+
         Args:
             chat_id: Chat room ID
             ws: WebSocket instance
@@ -63,191 +261,121 @@ class ChatWSManager:
         """
         if not accept_already_called:
             await ws.accept()
-        
-        async with self._lock:
-            self.rooms[chat_id].add(ws)
-            logger.info(f"WebSocket connected to chat {chat_id}. Total connections: {len(self.rooms[chat_id])}")
-            
-            # If using Redis PubSub and this is the first connection to this chat, subscribe
-            if self.use_redis_pubsub and self.pubsub_manager and chat_id not in self._pubsub_tasks:
-                await self._setup_redis_pubsub(chat_id)
-
-    async def _setup_redis_pubsub(self, chat_id: int):
-        """Setup Redis PubSub subscription for a chat."""
-        if not self.pubsub_manager:
-            return
-            
-        try:
-            await self.pubsub_manager.connect()
-            pubsub_subscriber = await self.pubsub_manager.subscribe(str(chat_id))
-            # Start background task to read from PubSub
-            task = asyncio.create_task(self._pubsub_data_reader(chat_id, pubsub_subscriber))
-            self._pubsub_tasks[chat_id] = task
-            logger.info(f"Redis PubSub setup for chat {chat_id}")
-        except Exception as e:
-            logger.error(f"Failed to setup Redis PubSub for chat {chat_id}: {e}")
 
-    async def _pubsub_data_reader(self, chat_id: int, pubsub_subscriber):
-        """
-        Background task to read messages from Redis PubSub and broadcast to WebSocket clients.
-        """
-        try:
-            while True:
-                message = await pubsub_subscriber.get_message(ignore_subscribe_messages=True, timeout=1.0)
-                if message is not None:
-                    channel = message["channel"].decode("utf-8") if isinstance(message["channel"], bytes) else message["channel"]
-                    if channel == str(chat_id):
-                        data = message["data"].decode("utf-8") if isinstance(message["data"], bytes) else message["data"]
-                        # Broadcast to all WebSocket connections in this chat
-                        await self._broadcast_to_room(chat_id, data)
-        except asyncio.CancelledError:
-            logger.info(f"PubSub reader task cancelled for chat {chat_id}")
-        except Exception as e:
-            logger.exception(f"Error in PubSub reader for chat {chat_id}: {e}")
+        self.register(ws)
+        self.subscribe(ws, chat_topic(chat_id))
+        logger.info(f"WebSocket connected to chat {chat_id}. Total connections: {self.topic_size(chat_topic(chat_id))}")
 
     async def _broadcast_to_room(self, chat_id: int, message: str):
-        """Broadcast message to all WebSocket connections in a room."""
-        disconnected = []
-        async with self._lock:
-            room = self.rooms.get(chat_id, set())
-            for ws in list(room):
-                try:
-                    if hasattr(ws, 'client_state') and ws.client_state.name != 'CONNECTED':
-                        disconnected.append(ws)
-                        continue
-                    await ws.send_text(message)
-                except Exception as e:
-                    logger.warning(f"Error broadcasting to WebSocket in chat {chat_id}: {e}")
-                    disconnected.append(ws)
-        
-        # Clean up disconnected WebSockets
-        if disconnected:
-            async with self._lock:
-                room = self.rooms.get(chat_id)
-                if room:
-                    for ws in disconnected:
-                        room.discard(ws)
-                    if not room:
-                        self.rooms.pop(chat_id, None)
-                        # Cancel PubSub task if no connections
-                        if chat_id in self._pubsub_tasks:
-                            self._pubsub_tasks[chat_id].cancel()
-                            del self._pubsub_tasks[chat_id]
-                            if self.pubsub_manager:
-                                await self.pubsub_manager.unsubscribe(str(chat_id))
+        """Broadcast message to all WebSocket connections in a room (local only)."""
+        self.publish_local(chat_topic(chat_id), message)
 
     async def disconnect(self, chat_id: int, ws: WebSocket):
-        """Disconnect a WebSocket from a chat room"""
-        async with self._lock:
-            room = self.rooms.get(chat_id)
-            if room and ws in room:
-                room.remove(ws)
-                logger.info(f"WebSocket disconnected from chat {chat_id}. Remaining connections: {len(room)}")
-            
-            # If no connections left, cleanup
-            if room and not room:
-                self.rooms.pop(chat_id, None)
-                logger.info(f"Chat room {chat_id} removed (no connections)")
-                
-                # Cancel PubSub task
-                if chat_id in self._pubsub_tasks:
-                    self._pubsub_tasks[chat_id].cancel()
-                    del self._pubsub_tasks[chat_id]
-                    if self.pubsub_manager:
-                        await self.pubsub_manager.unsubscribe(str(chat_id))
+        """Disconnect a WebSocket from a chat room (and release its outbound queue)"""
+        if self.unsubscribe(ws, chat_topic(chat_id)):
+            logger.info(f"WebSocket disconnected from chat {chat_id}. Remaining connections: {self.topic_size(chat_topic(chat_id))}")
+        if not self._ws_topics.get(ws):
+            self.unregister(ws)
 
     async def emit(self, chat_id: int, event: str, payload: dict):
         """
         Emit an event to all WebSocket connections in a chat room.
         If Redis PubSub is enabled, also publishes to Redis for distributed messaging.
-        
+
         Args:
             chat_id: Chat room ID
             event: Event name (e.g., "message.new")
             payload: Event payload data
         """
-        msg = json.dumps({"event": event, "payload": payload}, ensure_ascii=False)
-        
-        # If using Redis PubSub, publish to Redis (other instances will pick it up)
-        if self.use_redis_pubsub and self.pubsub_manager:
-            try:
-                await self.pubsub_manager.publish(str(chat_id), msg)
-            except Exception as e:
-                logger.error(f"Error publishing to Redis for chat {chat_id}: {e}")
-        
-        # Also broadcast directly to local connections
-        await self._broadcast_to_room(chat_id, msg)
+        topic = chat_topic(chat_id)
+        # "topic" - /api/ws/user ulanishida event qaysi chatga tegishli ekani
+        msg = encode_event({"event": event, "topic": topic, "payload": payload})
+
+        # Redis: other instances pick it up; this instance's reader skips its own
+        # messages, local clients get them directly
+        await self.publish(topic, msg)
 
     async def send_error(self, message: str, websocket: WebSocket):
         """Send an error message to a WebSocket client."""
         try:
-            error_msg = json.dumps({"status": "error", "message": message}, ensure_ascii=False)
-            await websocket.send_text(error_msg)
+            error_msg = encode_event({"status": "error", "message": message})
+            if websocket in self._writers:
+                self.send(websocket, error_msg)
+            else:
+                await websocket.send_text(error_msg)
         except Exception as e:
             logger.error(f"Error sending error message: {e}")
 
     async def add_user_connection(self, user_id: int, websocket: WebSocket):
         """Add a user's WebSocket connection (for tracking user connections across chats)."""
-        async with self._lock:
-            self.user_connections[user_id].add(websocket)
+        self.register(websocket, user_id)
 
     async def remove_user_connection(self, user_id: int, websocket: WebSocket):
         """Remove a user's WebSocket connection."""
-        async with self._lock:
-            if user_id in self.user_connections:
-                self.user_connections[user_id].discard(websocket)
-                if not self.user_connections[user_id]:
-                    del self.user_connections[user_id]
+        if user_id in self.user_connections:
+            self.user_connections[user_id].discard(websocket)
+            if not self.user_connections[user_id]:
+                del self.user_connections[user_id]
+        if self._ws_user.get(websocket) == user_id:
+            del self._ws_user[websocket]
 
     async def set_typing_status(self, chat_id: int, user_id: int, is_typing: bool):
         """
         Set typing status for a user in a chat.
-        
+
         Args:
             chat_id: Chat room ID
             user_id: User ID
             is_typing: True if typing, False to clear
         """
-        async with self._lock:
-            if is_typing:
-                self.typing_status[chat_id][user_id] = datetime.now()
-            else:
-                if chat_id in self.typing_status and user_id in self.typing_status[chat_id]:
-                    del self.typing_status[chat_id][user_id]
-                    if not self.typing_status[chat_id]:
-                        del self.typing_status[chat_id]
+        if is_typing:
+            self.typing_status[chat_id][user_id] = datetime.now()
+        else:
+            if chat_id in self.typing_status and user_id in self.typing_status[chat_id]:
+                del self.typing_status[chat_id][user_id]
+                if not self.typing_status[chat_id]:
+                    del self.typing_status[chat_id]
+
+    def allow_typing_broadcast(self, topic: str, user_id: int, is_typing: bool) -> bool:
+        """
+        Typing throttle (user + topic bo'yicha): "typing: true" WS_TYPING_THROTTLE
+        soniyada ko'pi bilan bir marta, "typing: false" faqat oldin true
+        yuborilgan va client'lar hali o'chirmagan bo'lsa (typing_timeout).
+        """
+        key = (topic, user_id)
+        now = time.monotonic()
+        if is_typing:
+            last = self._typing_sent.get(key)
+            if last is not None and now - last < settings.WS_TYPING_THROTTLE:
+                return False
+            self._typing_sent[key] = now
+            return True
+        last = self._typing_sent.pop(key, None)
+        return last is not None and now - last < self.typing_timeout
 
     async def broadcast_typing_event(self, chat_id: int, user_id: int, is_typing: bool):
         """
         Broadcast typing event to all WebSocket connections in a chat room.
-        
+
         Args:
             chat_id: Chat room ID
             user_id: User ID who is typing
             is_typing: True if typing, False to clear
         """
+        topic = chat_topic(chat_id)
+        if not self.allow_typing_broadcast(topic, user_id, is_typing):
+            return
         event = {
             "event": "typing",
+            "topic": topic,
             "payload": {
                 "chat_id": chat_id,
                 "user_id": user_id,
                 "is_typing": is_typing,
             }
         }
-        
-        msg = json.dumps(event, ensure_ascii=False)
-        
-        # If using Redis PubSub, publish to Redis
-        if self.use_redis_pubsub and self.pubsub_manager:
-            try:
-                await self.pubsub_manager.publish(str(chat_id), msg)
-            except Exception as e:
-                logger.error(f"Error publishing typing event to Redis for chat {chat_id}: {e}")
-        
-        # Broadcast directly to local connections
-        await self._broadcast_to_room(chat_id, msg)
+        await self.publish(topic, encode_event(event), key=f"typing:{topic}:{user_id}")
 
 
 # Global manager instance (default, without Redis PubSub)
 manager = ChatWSManager()
-
@@ -0,0 +1,202 @@
+"""
+WebSocket outbound navbatlari
+
+Har bir ulanishning o'z chegaralangan navbati va uni bo'shatuvchi writer
+task'i bor. Broadcast faqat navbatga qo'yadi (await yo'q), shuning uchun
+sekin client boshqa xonalarni va connect/disconnect ni to'xtatib qo'ymaydi.
+Navbat to'lsa client "slow consumer" sifatida 1013 kodi bilan uziladi.
+
+Navbatga qo'yishdan yuborilgunicha bo'lgan kechikish SendMetrics da
+yig'iladi (GET /api/health/ws).
+
+CoalescingWriter (/api/ws/user?batch=1): qisqa oyna ichida kelgan
+event'lar bitta JSON massiv frame'iga yig'iladi; bir xil `key` li
+event'lardan (typing, stats.changed, user.online/offline) faqat oxirgisi
+qoladi.
+"""
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Dict, Optional
+
+from fastapi import WebSocket
+
+logger = logging.getLogger(__name__)
+
+# RFC 6455: 1013 Try Again Later
+SLOW_CONSUMER_CLOSE_CODE = 1013
+
+
+class SendMetrics:
+    """Yuborish kechikishi (oxirgi `window` ta namuna) va hisoblagichlar"""
+
+    def __init__(self, window: int = 4096):
+        self._latencies: deque = deque(maxlen=window)
+        self.sent = 0
+        self.frames = 0
+        self.coalesced = 0
+        self.failed = 0
+        self.evicted = 0
+        self.max_queue_depth = 0
+
+    def observe(self, latency: float) -> None:
+        self.sent += 1
+        self._latencies.append(latency)
+
+    def snapshot(self) -> Dict[str, float]:
+        samples = sorted(self._latencies)
+
+        def pct(p: float) -> float:
+            if not samples:
+                return 0.0
+            return round(samples[min(len(samples) - 1, int(len(samples) * p))] * 1000, 3)
+
+        return {
+            "sent": self.sent,
+            "frames": self.frames,
+            "coalesced": self.coalesced,
+            "failed": self.failed,
+            "evicted": self.evicted,
+            "max_queue_depth": self.max_queue_depth,
+            "latency_ms_p50": pct(0.50),
+            "latency_ms_p95": pct(0.95),
+            "latency_ms_p99": pct(0.99),
+            "latency_ms_max": pct(1.0),
+        }
+
+
+class ConnectionWriter:
+    """Bitta WebSocket uchun navbat + writer task"""
+
+    def __init__(self, ws: WebSocket, maxsize: int, metrics: SendMetrics):
+        self.ws = ws
+        self.metrics = metrics
+        self.closed = False
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+        self._task = asyncio.create_task(self._run())
+        self._close_task: Optional[asyncio.Task] = None
+
+    def enqueue(self, message: str, key: Optional[str] = None) -> bool:
+        """
+        Xabarni navbatga qo'yish (kutmaydi). Navbat to'lsa ulanish uziladi.
+        `key` faqat CoalescingWriter uchun (bu yerda e'tiborsiz).
+        """
+        if self.closed:
+            return False
+        try:
+            self._queue.put_nowait((time.perf_counter(), message))
+        except asyncio.QueueFull:
+            self.metrics.evicted += 1
+            logger.warning(f"Slow WebSocket consumer evicted (queue full: {self._queue.maxsize})")
+            self._close(evict=True)  # receive loop disconnect'ni ko'radi va xonadan chiqaradi
+            return False
+        depth = self._queue.qsize()
+        if depth > self.metrics.max_queue_depth:
+            self.metrics.max_queue_depth = depth
+        return True
+
+    async def _run(self) -> None:
+        try:
+            while True:
+                enqueued_at, message = await self._queue.get()
+                try:
+                    await self.ws.send_text(message)
+                except Exception as e:
+                    # Ulanish yopilgan - receive loop o'zi tozalaydi
+                    self.metrics.failed += 1
+                    logger.debug(f"WebSocket send failed: {e}")
+                    self._close()
+                    return
+                self.metrics.frames += 1
+                self.metrics.observe(time.perf_counter() - enqueued_at)
+        except asyncio.CancelledError:
+            pass
+
+    def _close(self, evict: bool = False) -> None:
+        if self.closed:
+            return
+        self.closed = True
+        if evict:
+            self._task.cancel()
+            # Havola saqlanadi - aks holda task GC bo'lishi mumkin, xatosi esa ko'rinmaydi
+            self._close_task = asyncio.create_task(self._close_socket())
+            self._close_task.add_done_callback(self._close_done)
+
+    @staticmethod
+    def _close_done(task: asyncio.Task) -> None:
+        if not task.cancelled() and task.exception() is not None:
+            logger.warning(f"Closing slow WebSocket consumer failed: {task.exception()!r}")
+
+    async def _close_socket(self) -> None:
+        await self.ws.close(code=SLOW_CONSUMER_CLOSE_CODE, reason="Slow consumer")
+
+    def stop(self) -> None:
+        """Writer'ni to'xtatish (disconnect); navbatda qolganlar tashlanadi"""
+        self.closed = True
+        self._task.cancel()
+
+
+class CoalescingWriter(ConnectionWriter):
+    """
+    Event'larni `window` soniya yig'ib, bitta "[e1,e2,...]" frame qilib yuboradi.
+
+    Frame'lar allaqachon JSON matn (encode_event), massiv ularni vergul bilan
+    ulash orqali tuziladi - qayta kodlash yo'q. `key` li event yangisi kelsa
+    eskisi tashlanadi va yangisi oxiriga qo'yiladi (holat event'lari uchun).
+    maxsize - yig'ilayotgan (hali yuborilmagan) event'lar chegarasi.
+    """
+
+    def __init__(self, ws: WebSocket, maxsize: int, metrics: SendMetrics, window: float):
+        self.window = window
+        self._maxsize = maxsize
+        self._pending: Dict[object, tuple] = {}  # key -> (enqueued_at, frame)
+        self._seq = 0
+        self._wakeup = asyncio.Event()
+        super().__init__(ws, maxsize, metrics)
+
+    def enqueue(self, message: str, key: Optional[str] = None) -> bool:
+        if self.closed:
+            return False
+        if key is None:
+            self._seq += 1
+            key = self._seq
+        elif self._pending.pop(key, None) is not None:
+            self.metrics.coalesced += 1
+        if len(self._pending) >= self._maxsize:
+            self.metrics.evicted += 1
+            logger.warning(f"Slow WebSocket consumer evicted (pending events: {self._maxsize})")
+            self._close(evict=True)
+            return False
+        self._pending[key] = (time.perf_counter(), message)
+        depth = len(self._pending)
+        if depth > self.metrics.max_queue_depth:
+            self.metrics.max_queue_depth = depth
+        self._wakeup.set()
+        return True
+
+    async def _run(self) -> None:
+        try:
+            while True:
+                await self._wakeup.wait()
+                # Oyna: shu vaqt ichida kelgan event'lar bitta frame'ga tushadi
+                await asyncio.sleep(self.window)
+                self._wakeup.clear()
+                batch = self._pending
+                self._pending = {}
+                if not batch:
+                    continue
+                frame = "[" + ",".join(message for _, message in batch.values()) + "]"
+                try:
+                    await self.ws.send_text(frame)
+                except Exception as e:
+                    self.metrics.failed += 1
+                    logger.debug(f"WebSocket send failed: {e}")
+                    self._close()
+                    return
+                self.metrics.frames += 1
+                sent_at = time.perf_counter()
+                for enqueued_at, _ in batch.values():
+                    self.metrics.observe(sent_at - enqueued_at)
+        except asyncio.CancelledError:
+            pass
@@ -1,10 +1,22 @@
 """
 Redis PubSub Manager for distributed WebSocket messaging
 Based on fastapi-chat patterns
+
+Jarayonda bitta PubSub ulanishi va bitta reader task:
+- kanal obunalari reference-count qilinadi va bitta SUBSCRIBE/UNSUBSCRIBE
+  buyrug'iga yig'iladi (event loop'ning bitta qadamida kelganlari);
+- reader kelgan xabarni kanal bo'yicha on_message(channel, data) ga beradi;
+- har bir xabar "<instance_id>:<data>" ko'rinishida publish qilinadi, reader
+  shu instance'ning o'z xabarlarini tashlab yuboradi (lokal clientlar ularni
+  to'g'ridan-to'g'ri oladi).
 """
-import redis.asyncio as aioredis
+import asyncio
+import json
 import logging
-from typing import Optional
+import uuid
+from typing import Awaitable, Callable, Dict, Optional, Set
+
+import redis.asyncio as aioredis
 
 logger = logging.getLogger(__name__)
 
@@ -14,11 +26,11 @@ class RedisPubSubManager:
     Manages Redis PubSub connections for distributed WebSocket messaging.
     Allows multiple server instances to broadcast messages to WebSocket clients.
     """
-    
+
     def __init__(self, redis_pool: Optional[aioredis.ConnectionPool] = None):
         """
         Initialize Redis PubSub Manager.
-        
+
         Args:
             redis_pool: Optional Redis connection pool. If None, will create new connection.
         """
@@ -26,6 +38,16 @@ class RedisPubSubManager:
         self.redis_connection: Optional[aioredis.Redis] = None
         self.pubsub: Optional[aioredis.client.PubSub] = None
         self._connected = False
+        self.instance_id = uuid.uuid4().hex
+        # Boshqa instance'dan kelgan xabar: (channel, data)
+        self.on_message: Optional[Callable[[str, str], Awaitable[None]]] = None
+        self._refs: Dict[str, int] = {}
+        self._pending_subscribe: Set[str] = set()
+        self._pending_unsubscribe: Set[str] = set()
+        self._flush_task: Optional[asyncio.Task] = None
+        self._reader_task: Optional[asyncio.Task] = None
+        self.received = 0
+        self.skipped_own = 0
 
     async def _get_redis_connection(self) -> aioredis.Redis:
         """Get or create Redis connection."""
@@ -37,63 +59,118 @@ class RedisPubSubManager:
     async def connect(self):
         """Connect to Redis and create PubSub instance."""
         if self._connected:
-            logger.warning("Redis PubSub already connected")
             return
-            
+
         try:
             self.redis_connection = await self._get_redis_connection()
             self.pubsub = self.redis_connection.pubsub()
             self._connected = True
-            logger.info("Redis PubSub connected successfully")
+            logger.info(f"Redis PubSub connected successfully (instance {self.instance_id})")
         except Exception as e:
             logger.error(f"Failed to connect to Redis PubSub: {e}")
             raise
 
-    async def subscribe(self, channel: str) -> aioredis.client.PubSub:
-        """
-        Subscribe to a Redis channel.
-        
-        Args:
-            channel: Channel name (e.g., chat_id or chat_guid)
-            
-        Returns:
-            PubSub instance for reading messages
-        """
-        if not self._connected:
-            await self.connect()
-        
-        await self.pubsub.subscribe(channel)
-        logger.debug(f"Subscribed to Redis channel: {channel}")
-        return self.pubsub
-
-    async def unsubscribe(self, channel: str):
-        """Unsubscribe from a Redis channel."""
-        if not self._connected or not self.pubsub:
-            return
-            
+    # ---------- Obunalar (ref-count + batch) ----------
+
+    def subscribe(self, channel: str) -> None:
+        """Kanalga obuna (ref-count); Redis'ga keyingi batch bilan yuboriladi"""
+        count = self._refs.get(channel, 0)
+        self._refs[channel] = count + 1
+        if count == 0:
+            self._pending_unsubscribe.discard(channel)
+            self._pending_subscribe.add(channel)
+            self._schedule_flush()
+
+    def unsubscribe(self, channel: str) -> None:
+        """Obunani bo'shatish; oxirgi foydalanuvchi chiqqanda UNSUBSCRIBE"""
+        count = self._refs.get(channel, 0)
+        if count <= 1:
+            self._refs.pop(channel, None)
+            if count == 1:
+                self._pending_subscribe.discard(channel)
+                self._pending_unsubscribe.add(channel)
+                self._schedule_flush()
+        else:
+            self._refs[channel] = count - 1
+
+    @property
+    def channel_count(self) -> int:
+        return len(self._refs)
+
+    def _schedule_flush(self) -> None:
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_subscriptions())
+
+    async def _flush_subscriptions(self) -> None:
+        await asyncio.sleep(0)  # shu loop qadamidagi boshqa o'zgarishlarni ham yig'ish
         try:
-            await self.pubsub.unsubscribe(channel)
-            logger.debug(f"Unsubscribed from Redis channel: {channel}")
+            await self.connect()
+            while self._pending_subscribe or self._pending_unsubscribe:
+                subscribe = list(self._pending_subscribe)
+                unsubscribe = list(self._pending_unsubscribe)
+                self._pending_subscribe.clear()
+                self._pending_unsubscribe.clear()
+                if subscribe:
+                    await self.pubsub.subscribe(*subscribe)
+                    logger.debug(f"Subscribed to {len(subscribe)} Redis channel(s)")
+                if unsubscribe:
+                    await self.pubsub.unsubscribe(*unsubscribe)
+                    logger.debug(f"Unsubscribed from {len(unsubscribe)} Redis channel(s)")
+            if self._reader_task is None or self._reader_task.done():
+                self._reader_task = asyncio.create_task(self._reader())
         except Exception as e:
-            logger.error(f"Error unsubscribing from channel {channel}: {e}")
+            logger.error(f"Error updating Redis subscriptions: {e}")
+
+    # ---------- Reader ----------
+
+    async def _reader(self) -> None:
+        """Bitta reader: barcha kanallar xabarlari on_message ga"""
+        while True:
+            try:
+                message = await self.pubsub.get_message(ignore_subscribe_messages=True, timeout=None)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Error reading Redis PubSub: {e}")
+                await asyncio.sleep(1)
+                continue
+            if message is None or message.get("type") != "message":
+                continue
+
+            channel = message["channel"]
+            if isinstance(channel, bytes):
+                channel = channel.decode("utf-8")
+            data = message["data"]
+            if isinstance(data, bytes):
+                data = data.decode("utf-8")
+
+            origin, sep, payload = data.partition(":")
+            if sep and origin == self.instance_id:
+                self.skipped_own += 1
+                continue
+            self.received += 1
+            if self.on_message:
+                try:
+                    await self.on_message(channel, payload if sep else data)
+                except Exception as e:
+                    logger.exception(f"Error delivering Redis message from {channel}: {e}")
 
     async def publish(self, channel: str, message: str | dict):
         """
         Publish a message to a Redis channel.
-        
+
         Args:
             channel: Channel name
             message: Message to publish (str or dict, will be JSON-encoded if dict)
         """
         if not self._connected:
             await self.connect()
-        
-        import json
+
         if isinstance(message, dict):
             message = json.dumps(message, ensure_ascii=False)
-        
+
         try:
-            await self.redis_connection.publish(channel, message)
+            await self.redis_connection.publish(channel, f"{self.instance_id}:{message}")
             logger.debug(f"Published message to Redis channel: {channel}")
         except Exception as e:
             logger.error(f"Error publishing to channel {channel}: {e}")
@@ -103,7 +180,11 @@ class RedisPubSubManager:
         """Disconnect from Redis."""
         if not self._connected:
             return
-            
+
+        for task in (self._flush_task, self._reader_task):
+            if task and not task.done():
+                task.cancel()
+        self._flush_task = self._reader_task = None
         try:
             if self.pubsub:
                 await self.pubsub.close()
@@ -113,4 +194,3 @@ class RedisPubSubManager:
             logger.info("Redis PubSub disconnected")
         except Exception as e:
             logger.error(f"Error disconnecting from Redis: {e}")
-
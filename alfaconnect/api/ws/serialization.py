@@ -0,0 +1,42 @@
+"""
+WebSocket event'larini bir marta JSON'ga o'girish
+
+Broadcast'da event bitta matn frame'iga bir marta kodlanadi va barcha
+qabul qiluvchilarga shu satr yuboriladi (har socket uchun send_json emas).
+orjson o'rnatilgan bo'lsa u ishlatiladi, aks holda standart json.
+datetime/date/time (ISO 8601), Decimal va UUID qo'lda o'girishsiz ishlaydi.
+"""
+import json
+from datetime import date, datetime, time
+from decimal import Decimal
+from typing import Any
+from uuid import UUID
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson ixtiyoriy
+    orjson = None
+
+
+def _default(value: Any) -> Any:
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, UUID):
+        return str(value)
+    if isinstance(value, (set, frozenset, tuple)):
+        return list(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+if orjson is not None:
+    _OPTIONS = orjson.OPT_NON_STR_KEYS
+
+    def encode_event(event: Any) -> str:
+        """Event -> JSON matn frame (orjson)"""
+        return orjson.dumps(event, default=_default, option=_OPTIONS).decode("utf-8")
+else:
+    def encode_event(event: Any) -> str:
+        """Event -> JSON matn frame (standart json)"""
+        return json.dumps(event, default=_default, ensure_ascii=False, separators=(",", ":"))
@@ -0,0 +1,225 @@
+# app/ws/user.py
+"""
+User-level multiplexed WebSocket: /api/ws/user
+
+Bitta ulanish (bitta auth, bitta outbound navbat) orqali client chat,
+staff chat va stats topic'lariga obuna bo'ladi - chat boshiga alohida
+/api/ws/chat, /api/ws/stats va /api/ws/staff-chat socket'lari o'rniga.
+
+Client -> server:
+    {"type": "subscribe",   "topic": "chat:12" | "staff:3" | "stats"}
+    {"type": "unsubscribe", "topic": ...}
+    {"type": "typing",  "topic": "chat:12" | "staff:3", "is_typing": true}
+    {"type": "message", "topic": "staff:3", "message_text": "..."}
+    {"type": "ping"}
+
+Server -> client:
+    {"type": "ready", "user_id": ..., "role": ...}
+    {"type": "subscribed" | "unsubscribed", "topic": ...}
+    {"type": "error", "topic": ..., "message": ...}
+    topic event'lari eski endpoint'lar bilan bir xil frame'lar:
+      chat:<id>  - {"event": ..., "topic": "chat:<id>", "payload": {...}}
+      staff:<id> - {"type": "staff.*" | "initial_messages" | "message_sent", "chat_id": <id>, ...}
+      stats      - {"type": "stats.*" | "chat.*" | "user.*" | "message.reaction", ...}
+
+?batch=1: server -> client frame'lari JSON massiv bo'ladi - WS_COALESCE_WINDOW
+ichida kelgan event'lar bitta frame'da, typing / stats.changed /
+user.online|offline esa faqat oxirgi holati bilan.
+
+Auth: ?token=<session token> (/api/webapp/validate); WEBAPP_REQUIRE_TOKEN
+o'chiq bo'lsa eski ?telegram_id= ham qabul qilinadi.
+"""
+from typing import Optional
+import logging
+
+from fastapi import APIRouter, HTTPException, Query, WebSocket, WebSocketDisconnect
+
+from api.dependencies import get_request_user
+from api.exceptions import AuthorizationError, NotFoundError
+from api.routes.websocket import (
+    PONG_FRAME,
+    STAFF_ROLES,
+    handle_staff_client_message,
+    join_staff_chat,
+    join_stats,
+    leave_stats,
+)
+from api.ws.chat import get_accessible_chat
+from api.ws.manager import manager, STATS_TOPIC
+from api.ws.rate_limiter import WebSocketRateLimiter
+from api.ws.serialization import encode_event
+from config import settings
+from database.webapp.presence import presence
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+
+def _parse_topic(topic) -> tuple:
+    """"chat:12" -> ("chat", 12); "stats" -> ("stats", None); noto'g'ri bo'lsa (None, None)"""
+    if topic == STATS_TOPIC:
+        return STATS_TOPIC, None
+    if not isinstance(topic, str):
+        return None, None
+    kind, _, raw_id = topic.partition(":")
+    if kind not in ("chat", "staff") or not raw_id.isdigit():
+        return None, None
+    return kind, int(raw_id)
+
+
+def _send_error(websocket: WebSocket, message: str, topic: Optional[str] = None) -> None:
+    manager.send(websocket, encode_event({"type": "error", "topic": topic, "message": message}))
+
+
+async def _subscribe(websocket: WebSocket, user: dict, topic) -> None:
+    kind, object_id = _parse_topic(topic)
+    if kind is None:
+        _send_error(websocket, "Unknown topic", topic)
+        return
+    if topic in manager.topics_of(websocket):
+        manager.send(websocket, encode_event({"type": "subscribed", "topic": topic}))
+        return
+    if len(manager.topics_of(websocket)) >= settings.WS_MAX_TOPICS:
+        _send_error(websocket, f"Too many subscriptions (max {settings.WS_MAX_TOPICS})", topic)
+        return
+
+    user_id, user_role = user["id"], user.get("role")
+    if kind == "chat":
+        try:
+            await get_accessible_chat(object_id, user_id, user_role)
+        except (NotFoundError, AuthorizationError) as e:
+            _send_error(websocket, e.detail, topic)
+            return
+        manager.subscribe(websocket, topic)
+    elif kind == "staff":
+        error = await join_staff_chat(websocket, object_id, user_id, user_role)
+        if error:
+            _send_error(websocket, error, topic)
+            return
+    else:
+        if user_role not in STAFF_ROLES:
+            _send_error(websocket, "Only operators and supervisors can subscribe to stats", topic)
+            return
+        await join_stats(websocket, user_id, user_role)
+
+    manager.send(websocket, encode_event({"type": "subscribed", "topic": topic}))
+
+
+async def _unsubscribe(websocket: WebSocket, user: dict, topic, notify: bool = True) -> None:
+    kind, object_id = _parse_topic(topic)
+    if kind == STATS_TOPIC:
+        await leave_stats(websocket, user["id"], user.get("role"))
+    elif kind == "chat":
+        if manager.unsubscribe(websocket, topic):
+            await manager.set_typing_status(object_id, user["id"], False)
+    elif kind is not None:
+        manager.unsubscribe(websocket, topic)
+    if notify:
+        manager.send(websocket, encode_event({"type": "unsubscribed", "topic": topic}))
+
+
+async def _handle_topic_message(websocket: WebSocket, user: dict, data: dict) -> None:
+    """typing / message: faqat obuna bo'lingan topic uchun"""
+    topic = data.get("topic")
+    kind, object_id = _parse_topic(topic)
+    if kind is None or topic not in manager.topics_of(websocket):
+        _send_error(websocket, "Not subscribed to topic", topic)
+        return
+
+    if kind == "staff":
+        await handle_staff_client_message(websocket, object_id, user["id"], data)
+    elif kind == "chat" and data.get("type") == "typing":
+        is_typing = data.get("is_typing", True)
+        await manager.set_typing_status(object_id, user["id"], is_typing)
+        await manager.broadcast_typing_event(object_id, user["id"], is_typing)
+    else:
+        _send_error(websocket, f"Unsupported message type for {kind} topic", topic)
+
+
+@router.websocket("/ws/user")
+async def user_ws(
+    websocket: WebSocket,
+    token: Optional[str] = Query(None, description="Session token from /api/webapp/validate"),
+    telegram_id: Optional[int] = Query(None, description="Telegram user ID (legacy)"),
+    batch: bool = Query(False, description="Coalesce server events into JSON array frames")
+):
+    """
+    Single multiplexed WebSocket per user (chat, staff chat and stats topics).
+    """
+    try:
+        user = await get_request_user(
+            authorization=f"Bearer {token}" if token else None,
+            telegram_id=telegram_id
+        )
+    except HTTPException as e:
+        await websocket.close(code=4403 if e.status_code == 403 else 4401, reason=str(e.detail))
+        return
+
+    user_id = user["id"]
+    user_role = user.get("role")
+
+    rate_limiter = None
+    if settings.RATE_LIMIT_ENABLED:
+        rate_limiter = WebSocketRateLimiter(
+            times=settings.WS_RATE_LIMIT_TIMES,
+            seconds=settings.WS_RATE_LIMIT_SECONDS
+        )
+
+    await websocket.accept()
+    manager.register(websocket, user_id, coalesce=batch)
+    manager.send(websocket, encode_event({"type": "ready", "user_id": user_id, "role": user_role}))
+    logger.info(f"[USER-WS] User {user_id} ({user_role}) connected (batch: {batch})")
+
+    try:
+        while True:
+            try:
+                data = await websocket.receive_json()
+            except (WebSocketDisconnect, RuntimeError):
+                break
+            except ValueError:
+                _send_error(websocket, "Invalid message format")
+                continue
+            if not isinstance(data, dict):
+                _send_error(websocket, "Invalid message format")
+                continue
+
+            if rate_limiter and not await rate_limiter.check_rate_limit(websocket):
+                logger.warning(f"[USER-WS] Rate limit exceeded for user {user_id}")
+                await websocket.close(code=1008, reason="Rate limit exceeded")
+                break
+
+            message_type = data.get("type")
+            try:
+                if message_type == "ping":
+                    if STATS_TOPIC in manager.topics_of(websocket):
+                        presence.touch(user_id, user_role)
+                    manager.send(websocket, PONG_FRAME)
+                elif message_type == "subscribe":
+                    await _subscribe(websocket, user, data.get("topic"))
+                elif message_type == "unsubscribe":
+                    await _unsubscribe(websocket, user, data.get("topic"))
+                elif message_type in ("typing", "message"):
+                    await _handle_topic_message(websocket, user, data)
+                else:
+                    _send_error(websocket, f"Unknown message type: {message_type}")
+            except Exception as e:
+                logger.error(f"[USER-WS] Error handling {message_type} from user {user_id}: {e}", exc_info=True)
+                _send_error(websocket, f"Error processing {message_type}", data.get("topic"))
+
+    except WebSocketDisconnect:
+        pass
+    except Exception as e:
+        logger.exception(f"[USER-WS] Unexpected error for user {user_id}: {e}")
+    finally:
+        for topic in manager.topics_of(websocket):
+            try:
+                await _unsubscribe(websocket, user, topic, notify=False)
+            except Exception as e:
+                logger.warning(f"[USER-WS] Error leaving {topic} for user {user_id}: {e}")
+        manager.unregister(websocket)
+        logger.info(f"[USER-WS] User {user_id} disconnected")
+        try:
+            await websocket.close()
+        except Exception:
+            pass
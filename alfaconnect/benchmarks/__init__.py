@@ -0,0 +1 @@
+# Benchmark skriptlari (python -m benchmarks.<nomi> - alfaconnect papkasidan)
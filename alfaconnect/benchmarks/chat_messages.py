@@ -0,0 +1,176 @@
+"""
+Chat xabarlarini yuklash benchmark'i: eski (xabarlar so'rovi + reaksiyalar
+GROUP BY + o'qilganlar GROUP BY, 3 round-trip) vs yangi bitta so'rov
+(database/webapp/message_queries.load_chat_messages, message_counters va
+chat_read_state bilan).
+
+Vaqtinchalik bench_chat sxemasida 10 000 xabarli chat yaratiladi, har bir
+xabarga bir nechta reaksiya va o'qilganlar qo'shiladi, so'ng 064 va 066
+migratsiyalari shu sxemaga qo'llanadi (eski yo'l message_reads nusxasidan
+o'qiydi, chunki 066 uni watermark'larga siqib o'chiradi). Oxirgi sahifa
+(offset) va cursor sahifalari o'lchanadi. Oxirida sxema o'chiriladi.
+
+Ishga tushirish (alfaconnect papkasidan, .env dagi DB_URL ishlatiladi):
+    python -m benchmarks.chat_messages [--repeat 50] [--limit 100]
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from pathlib import Path
+
+import asyncpg
+
+from config import settings
+from database.webapp.message_queries import load_chat_messages
+
+SCHEMA = "bench_chat"
+MESSAGES = 10_000
+MIGRATIONS_DIR = Path(__file__).resolve().parent.parent / "database" / "migrations"
+MIGRATIONS = ("064_message_counters.sql", "066_chat_read_state.sql")
+
+SETUP_SQL = f"""
+DROP SCHEMA IF EXISTS {SCHEMA} CASCADE;
+CREATE SCHEMA {SCHEMA};
+SET search_path TO {SCHEMA}, public;
+CREATE TABLE users (id bigserial PRIMARY KEY, full_name text, telegram_id bigint, role text);
+CREATE TABLE chats (id bigserial PRIMARY KEY, client_id bigint NOT NULL, operator_id bigint);
+INSERT INTO chats (client_id, operator_id) VALUES (2, 1);
+CREATE TABLE messages (
+    id bigserial PRIMARY KEY, chat_id bigint NOT NULL, sender_type text NOT NULL,
+    sender_id bigint REFERENCES users(id), operator_id bigint, message_text text NOT NULL,
+    attachments jsonb, created_at timestamptz NOT NULL DEFAULT now(),
+    forwarded_from_message_id bigint, forwarded_from_chat_id bigint, forwarded_from_user_id bigint,
+    edited_at timestamptz, reply_to_message_id bigint REFERENCES messages(id)
+);
+CREATE INDEX ON messages (chat_id, created_at DESC, id DESC);
+CREATE TABLE message_reactions (
+    id bigserial PRIMARY KEY, message_id bigint NOT NULL REFERENCES messages(id) ON DELETE CASCADE,
+    user_id bigint NOT NULL, emoji varchar(10) NOT NULL, created_at timestamptz NOT NULL DEFAULT now(),
+    UNIQUE (message_id, user_id)
+);
+CREATE TABLE message_reads (
+    id bigserial PRIMARY KEY, message_id bigint NOT NULL REFERENCES messages(id) ON DELETE CASCADE,
+    user_id bigint NOT NULL, read_at timestamptz NOT NULL DEFAULT now(),
+    created_at timestamptz NOT NULL DEFAULT now(), UNIQUE (message_id, user_id)
+);
+CREATE INDEX ON message_reads (message_id);
+INSERT INTO users (full_name, telegram_id, role)
+SELECT 'User ' || g, 100000 + g, CASE WHEN g % 2 = 0 THEN 'client' ELSE 'callcenter_operator' END
+FROM generate_series(1, 20) g;
+INSERT INTO messages (chat_id, sender_type, sender_id, message_text, created_at, reply_to_message_id)
+SELECT 1, 'client', 1 + g % 20, 'Xabar ' || g, now() - make_interval(secs => {MESSAGES} - g),
+       CASE WHEN g % 7 = 0 AND g > 1 THEN g - 1 END
+FROM generate_series(1, {MESSAGES}) g;
+INSERT INTO message_reactions (message_id, user_id, emoji)
+SELECT m.id, u, (ARRAY['👍', '❤️', '😂'])[1 + (m.id + u) % 3]
+FROM messages m, generate_series(1, 4) u WHERE m.id % 3 = 0;
+INSERT INTO message_reads (message_id, user_id)
+SELECT m.id, u FROM messages m, generate_series(1, 5) u WHERE u <> m.sender_id;
+CREATE TABLE legacy_reads AS TABLE message_reads;
+CREATE INDEX ON legacy_reads (message_id);
+"""
+
+LEGACY_PAGE_SQL = """
+SELECT m.*, u.full_name as sender_name, u.telegram_id as sender_telegram_id, u.role as sender_role,
+       reply_msg.id as reply_to_id, reply_msg.message_text as reply_to_text,
+       reply_msg.sender_id as reply_to_sender_id, reply_msg.sender_type as reply_to_sender_type,
+       reply_user.full_name as reply_to_sender_name
+FROM messages m
+LEFT JOIN users u ON m.sender_id = u.id
+LEFT JOIN messages reply_msg ON m.reply_to_message_id = reply_msg.id
+LEFT JOIN users reply_user ON reply_msg.sender_id = reply_user.id
+WHERE m.chat_id = $1
+ORDER BY m.created_at DESC, m.id DESC
+LIMIT $2 OFFSET $3
+"""
+
+
+async def _legacy_load(conn, chat_id: int, limit: int, offset: int) -> list:
+    """Eski yo'l: sahifa + 2 ta bulk so'rov (reaksiyalar, o'qilganlar)"""
+    rows = await conn.fetch(LEGACY_PAGE_SQL, chat_id, limit, offset)
+    messages = [dict(r) for r in reversed(rows)]
+    ids = [m["id"] for m in messages]
+    reactions = await conn.fetch(
+        """SELECT message_id, emoji, COUNT(*) as count, array_agg(user_id ORDER BY created_at) as user_ids
+           FROM message_reactions WHERE message_id = ANY($1::bigint[])
+           GROUP BY message_id, emoji ORDER BY message_id, count DESC, emoji""",
+        ids,
+    )
+    reads = await conn.fetch(
+        """SELECT message_id, COUNT(*) as read_count FROM legacy_reads
+           WHERE message_id = ANY($1::bigint[]) GROUP BY message_id""",
+        ids,
+    )
+    by_message: dict = {}
+    for r in reactions:
+        by_message.setdefault(r["message_id"], []).append(
+            {"emoji": r["emoji"], "count": r["count"], "users": r["user_ids"]}
+        )
+    read_counts = {r["message_id"]: r["read_count"] for r in reads}
+    for m in messages:
+        m["reactions"] = by_message.get(m["id"], [])
+        m["read_count"] = read_counts.get(m["id"], 0)
+    return messages
+
+
+async def _measure(fn, repeat: int) -> list:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        await fn()
+        timings.append((time.perf_counter() - started) * 1000)
+    return timings
+
+
+def _report(label: str, legacy: list, single: list) -> None:
+    print(
+        f"{label:<18} legacy p50 {statistics.median(legacy):7.2f} ms | "
+        f"single p50 {statistics.median(single):7.2f} ms | "
+        f"speedup {statistics.median(legacy) / statistics.median(single):4.1f}x"
+    )
+
+
+async def main(repeat: int, limit: int) -> None:
+    conn = await asyncpg.connect(settings.DB_URL)
+    try:
+        await conn.execute(SETUP_SQL)
+        for name in MIGRATIONS:
+            await conn.execute((MIGRATIONS_DIR / name).read_text(encoding="utf-8").replace("public.", ""))
+        await conn.execute("ANALYZE")
+
+        # Natijalar bir xilligini tekshirish
+        legacy = await _legacy_load(conn, 1, limit, 0)
+        single = await load_chat_messages(conn, 1, limit=limit)
+        assert [(m["id"], m["read_count"], m["reactions"]) for m in legacy] == \
+               [(m["id"], m["read_count"], m["reactions"]) for m in single], "natijalar mos emas"
+
+        for label, offset in (("latest page", 0), ("offset 5000", 5000)):
+            _report(
+                label,
+                await _measure(lambda: _legacy_load(conn, 1, limit, offset), repeat),
+                await _measure(lambda: load_chat_messages(conn, 1, limit=limit, offset=offset), repeat),
+            )
+
+        cursor = single[0]
+        _report(
+            "cursor page",
+            await _measure(lambda: _legacy_load(conn, 1, limit, limit), repeat),
+            await _measure(
+                lambda: load_chat_messages(
+                    conn, 1, limit=limit, cursor_ts=cursor["created_at"], cursor_id=cursor["id"]
+                ),
+                repeat,
+            ),
+        )
+    finally:
+        await conn.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+        await conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--limit", type=int, default=100)
+    args = parser.parse_args()
+    asyncio.run(main(args.repeat, args.limit))
@@ -0,0 +1,99 @@
+"""
+Rasm variantlari benchmark'i (utils/image_variants.py): images/sec.
+
+Vaqtinchalik papkada sintetik JPEG rasmlar (standart: 48 ta, 4000x3000,
+EXIF bilan) yaratiladi va ImagePipeline orqali 1..N worker bilan qayta
+ishlanadi. Har bir worker soni uchun images/sec va images/sec/core
+chiqariladi. Oxirida max_pending=2, queue_timeout=0 bilan backpressure
+(ImagePipelineBusy) soni ko'rsatiladi. DB kerak emas.
+
+Ishga tushirish (alfaconnect papkasidan):
+    python -m benchmarks.image_variants [--images 48] [--width 4000] [--height 3000]
+"""
+import argparse
+import asyncio
+import os
+import shutil
+import tempfile
+import time
+from pathlib import Path
+
+from PIL import Image
+
+from utils.image_variants import ImagePipeline, ImagePipelineBusy
+
+
+def _make_source(path: Path, width: int, height: int) -> None:
+    gradient = Image.linear_gradient("L").resize((width, height))
+    noise = Image.effect_noise((width, height), 64)
+    image = Image.merge("RGB", (gradient, noise, gradient.transpose(Image.Transpose.FLIP_LEFT_RIGHT)))
+    exif = Image.Exif()
+    exif[0x0112] = 6  # Orientation: rotate 90
+    exif[0x010F] = "BenchCam"
+    image.save(path, "JPEG", quality=90, exif=exif)
+
+
+def _prepare(directory: Path, source: Path, count: int) -> list:
+    paths = []
+    for i in range(count):
+        target = directory / f"{i}.jpg"
+        shutil.copyfile(source, target)
+        paths.append(target)
+    return paths
+
+
+async def _run(pipeline: ImagePipeline, paths: list) -> tuple:
+    busy = 0
+
+    async def one(path: Path) -> None:
+        nonlocal busy
+        try:
+            await pipeline.process(str(path), "jpg")
+        except ImagePipelineBusy:
+            busy += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(p) for p in paths))
+    return time.perf_counter() - started, busy
+
+
+async def main(count: int, width: int, height: int) -> None:
+    cores = os.cpu_count() or 1
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp_dir = Path(tmp)
+        source = tmp_dir / "source.jpg"
+        _make_source(source, width, height)
+        print(f"source {width}x{height}, {source.stat().st_size / 1024:.0f} KB, {cores} CPU core(s)")
+
+        for workers in sorted({1, max(1, cores // 2), cores}):
+            run_dir = tmp_dir / f"w{workers}"
+            run_dir.mkdir()
+            pipeline = ImagePipeline(workers=workers, max_pending=workers * 4, queue_timeout=600)
+            try:
+                await pipeline.process(str(_prepare(run_dir, source, 1)[0]), "jpg")  # warm-up (spawn)
+                elapsed, _ = await _run(pipeline, _prepare(run_dir, source, count))
+            finally:
+                pipeline.shutdown()
+            rate = count / elapsed
+            print(f"{workers:>2} worker(s): {rate:6.2f} images/sec | {rate / workers:6.2f} images/sec/core")
+
+        run_dir = tmp_dir / "busy"
+        run_dir.mkdir()
+        pipeline = ImagePipeline(workers=1, max_pending=2, queue_timeout=0)
+        try:
+            _, busy = await _run(pipeline, _prepare(run_dir, source, 10))
+        finally:
+            pipeline.shutdown()
+        print(f"backpressure (max_pending=2, 10 at once): {busy} rejected with ImagePipelineBusy")
+
+        sample = Image.open(tmp_dir / "w1" / "0.jpg")
+        print(f"output {sample.size[0]}x{sample.size[1]}, EXIF tags left: {len(sample.getexif())}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--images", type=int, default=48)
+    parser.add_argument("--width", type=int, default=4000)
+    parser.add_argument("--height", type=int, default=3000)
+    args = parser.parse_args()
+    asyncio.run(main(args.images, args.width, args.height))
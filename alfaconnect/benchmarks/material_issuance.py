@@ -0,0 +1,138 @@
+"""
+Ombordan material berish benchmark'i: eski per-row tsikl vs set-based
+create_material_and_technician_entry() (database/warehouse/inbox.py).
+
+Vaqtinchalik bench_issue sxemasida materials / material_requests /
+material_and_technician / staff_orders yaratiladi. 1, 20 va 100 materialli
+arizalar uchun har bir usul bir necha marta o'lchanadi (har safar so'rovlar
+qayta "tasdiqlanmagan" holatga qaytariladi). Oxirida sxema o'chiriladi.
+
+Ishga tushirish (alfaconnect papkasidan, .env dagi DB_URL ishlatiladi):
+    python -m benchmarks.material_issuance [--repeat 20]
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import asyncpg
+
+from config import settings
+from database.warehouse.inbox import create_material_and_technician_entry
+
+SCHEMA = "bench_issue"
+SIZES = (1, 20, 100)
+
+SETUP_SQL = f"""
+DROP SCHEMA IF EXISTS {SCHEMA} CASCADE;
+CREATE SCHEMA {SCHEMA};
+SET search_path TO {SCHEMA}, public;
+CREATE TABLE materials (
+    id bigserial PRIMARY KEY, name text, price numeric DEFAULT 1000,
+    quantity int DEFAULT 1000000, material_unit text DEFAULT 'dona'
+);
+CREATE TABLE staff_orders (id bigserial PRIMARY KEY, user_id bigint, application_number text);
+CREATE TABLE material_requests (
+    id bigserial PRIMARY KEY, user_id bigint, material_id bigint, quantity int DEFAULT 1,
+    source_type varchar(20) DEFAULT 'warehouse', warehouse_approved boolean DEFAULT FALSE,
+    application_number varchar(50)
+);
+CREATE INDEX ON material_requests (application_number);
+CREATE TABLE material_and_technician (
+    id bigserial PRIMARY KEY, user_id bigint NOT NULL, material_id bigint NOT NULL, quantity int,
+    application_number text, issued_by int, issued_at timestamptz DEFAULT NOW(),
+    material_name text, material_unit text DEFAULT 'dona',
+    price numeric(10,2) DEFAULT 0, total_price numeric(10,2) DEFAULT 0,
+    CONSTRAINT ux_mat_tech_user_material UNIQUE (user_id, material_id)
+);
+INSERT INTO materials (name) SELECT 'Material ' || g FROM generate_series(1, 100) g;
+"""
+
+
+async def _legacy_issue(conn, order_id: int, warehouse_user_id: int) -> None:
+    """Eski tsikl (har bir material uchun 5 ta so'rov, tranzaksiyasiz)"""
+    order = await conn.fetchrow("SELECT user_id, application_number FROM staff_orders WHERE id = $1", order_id)
+    technician_id, app = order["user_id"], order["application_number"]
+    requests = await conn.fetch(
+        "SELECT material_id, quantity, source_type FROM material_requests WHERE application_number = $1", app
+    )
+    for mr in requests:
+        material_id, quantity = mr["material_id"], mr["quantity"]
+        info = await conn.fetchrow(
+            "SELECT name, price, COALESCE(material_unit, 'dona') AS material_unit FROM materials WHERE id = $1",
+            material_id,
+        )
+        existing = await conn.fetchrow(
+            "SELECT id FROM material_and_technician WHERE user_id = $1 AND material_id = $2",
+            technician_id, material_id,
+        )
+        total = info["price"] * quantity
+        if existing:
+            await conn.execute(
+                """UPDATE material_and_technician SET quantity = quantity + $1, total_price = total_price + $2,
+                   issued_by = $3, issued_at = NOW() WHERE user_id = $4 AND material_id = $5""",
+                quantity, total, warehouse_user_id, technician_id, material_id,
+            )
+        else:
+            await conn.execute(
+                """INSERT INTO material_and_technician (user_id, material_id, quantity, application_number,
+                   material_name, material_unit, price, total_price, issued_by, issued_at)
+                   VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, NOW())""",
+                technician_id, material_id, quantity, app, info["name"], info["material_unit"],
+                info["price"], total, warehouse_user_id,
+            )
+        await conn.execute("UPDATE materials SET quantity = GREATEST(0, quantity - $1) WHERE id = $2", quantity, material_id)
+        await conn.execute(
+            "UPDATE material_requests SET warehouse_approved = TRUE WHERE application_number = $1 AND material_id = $2",
+            app, material_id,
+        )
+
+
+async def _prepare(conn, size: int) -> int:
+    app = f"STAFF-TECH-B2C-{size:04d}"
+    order_id = await conn.fetchval(
+        "INSERT INTO staff_orders (user_id, application_number) VALUES ($1, $2) RETURNING id", 1000 + size, app
+    )
+    await conn.execute(
+        """INSERT INTO material_requests (user_id, material_id, quantity, application_number)
+           SELECT 1000 + $1, g, 2, $2 FROM generate_series(1, $1) g""",
+        size, app,
+    )
+    return order_id
+
+
+async def _measure(conn, fn, order_id: int, repeat: int) -> list:
+    timings = []
+    for _ in range(repeat):
+        await conn.execute("UPDATE material_requests SET warehouse_approved = FALSE")
+        started = time.perf_counter()
+        await fn(order_id)
+        timings.append((time.perf_counter() - started) * 1000)
+    return timings
+
+
+async def main(repeat: int) -> None:
+    conn = await asyncpg.connect(settings.DB_URL)
+    try:
+        await conn.execute(SETUP_SQL)
+        for size in SIZES:
+            order_id = await _prepare(conn, size)
+            legacy = await _measure(conn, lambda oid: _legacy_issue(conn, oid, 1), order_id, repeat)
+            set_based = await _measure(
+                conn, lambda oid: create_material_and_technician_entry(oid, "staff", 1, conn), order_id, repeat
+            )
+            print(
+                f"{size:>3} materials: legacy p50 {statistics.median(legacy):8.2f} ms | "
+                f"set-based p50 {statistics.median(set_based):8.2f} ms | "
+                f"speedup {statistics.median(legacy) / statistics.median(set_based):5.1f}x"
+            )
+    finally:
+        await conn.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+        await conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    asyncio.run(main(args.repeat))
@@ -0,0 +1,111 @@
+"""
+Content-addressed media store benchmark'i (utils/blob_store.py).
+
+Vaqtinchalik papkada N ta xabar media'si yoziladi; fayllar P ta noyob
+payload'dan olinadi (qayta yuborilgan / forward qilingan rasm va voice,
+qayta yaratilgan AKT). Eski sxema - har bir xabar uchun alohida fayl
+(MEDIA_ROOT/images/{chat}/{id}.jpg), yangi sxema - sha256 bo'yicha
+BlobStore. Diskdagi hajm va yozish vaqti chiqariladi.
+Oxirida hash hisoblashning xotira cho'qqisi: butun faylni o'qish
+(eski _calculate_file_hash) vs bo'laklab (hash_file). DB kerak emas.
+
+Ishga tushirish (alfaconnect papkasidan):
+    python -m benchmarks.media_dedup [--messages 2000] [--payloads 400] [--size-kb 256] [--hash-mb 64]
+"""
+import argparse
+import hashlib
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+from utils.blob_store import BlobStore, hash_file
+
+
+def _disk_usage(root: Path) -> int:
+    seen = set()
+    total = 0
+    for directory, _, files in os.walk(root):
+        for name in files:
+            stat = os.stat(os.path.join(directory, name))
+            if stat.st_ino not in seen:
+                seen.add(stat.st_ino)
+                total += stat.st_blocks * 512
+    return total
+
+
+def _legacy(root: Path, messages: list, payloads: list) -> float:
+    started = time.perf_counter()
+    for message_id, (chat_id, index) in enumerate(messages, start=1):
+        directory = root / "images" / str(chat_id)
+        directory.mkdir(parents=True, exist_ok=True)
+        (directory / f"{message_id}.jpg").write_bytes(payloads[index])
+    return time.perf_counter() - started
+
+
+def _blobs(root: Path, messages: list, payloads: list) -> float:
+    store = BlobStore(root / "blobs")
+    store.tmp_dir.mkdir(parents=True, exist_ok=True)
+    started = time.perf_counter()
+    for message_id, (_, index) in enumerate(messages, start=1):
+        # upload oqimi: tmp fayl + yozish paytida hash, keyin put()
+        temp = store.tmp_dir / f".upload-{message_id}.part"
+        temp.write_bytes(payloads[index])
+        store.put_sync(temp, hashlib.sha256(payloads[index]).hexdigest())
+    return time.perf_counter() - started
+
+
+def _hash_peak(label: str, fn, path: Path) -> None:
+    tracemalloc.start()
+    started = time.perf_counter()
+    fn(path)
+    elapsed = time.perf_counter() - started
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    print(f"{label:<10} {elapsed * 1000:8.1f} ms | peak {peak / (1024 * 1024):8.1f} MB")
+
+
+def _read_all(path: Path) -> str:
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def main(count: int, unique: int, size_kb: int, hash_mb: int) -> None:
+    rng = random.Random(42)
+    payloads = [os.urandom(size_kb * 1024) for _ in range(unique)]
+    # Mashhur fayllar ko'p qayta yuboriladi (Zipf'ga yaqin taqsimot)
+    weights = [1 / (i + 1) for i in range(unique)]
+    messages = [(rng.randrange(1, 200), rng.choices(range(unique), weights)[0]) for _ in range(count)]
+    distinct = len({index for _, index in messages})
+
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        elapsed = _legacy(root / "legacy", messages, payloads)
+        legacy_bytes = _disk_usage(root / "legacy")
+        print(f"legacy     {count} files: {elapsed * 1000:8.1f} ms | {legacy_bytes / (1024 * 1024):8.1f} MB on disk")
+
+        elapsed = _blobs(root / "store", messages, payloads)
+        blob_bytes = _disk_usage(root / "store")
+        print(
+            f"blobs      {distinct} blobs: {elapsed * 1000:8.1f} ms | {blob_bytes / (1024 * 1024):8.1f} MB on disk "
+            f"({blob_bytes / legacy_bytes:.0%} of legacy)"
+        )
+
+        big = root / "akt.bin"
+        with open(big, "wb") as f:
+            for _ in range(hash_mb):
+                f.write(os.urandom(1024 * 1024))
+        _hash_peak("read()", _read_all, big)
+        _hash_peak("hash_file", hash_file, big)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=2000)
+    parser.add_argument("--payloads", type=int, default=400)
+    parser.add_argument("--size-kb", type=int, default=256)
+    parser.add_argument("--hash-mb", type=int, default=64)
+    args = parser.parse_args()
+    main(args.messages, args.payloads, args.size_kb, args.hash_mb)
@@ -0,0 +1,101 @@
+"""
+Media berish benchmark'i: parallel Range so'rovlari (audio seek).
+
+Eski yo'l - FileResponse (Range'siz, har safar butun fayl) vs
+api/media.media_file_response (206 + faqat so'ralgan oraliq, ETag/304).
+Javoblar ASGI darajasida (uvicorn'siz) chaqiriladi, yuborilgan baytlar va
+vaqt o'lchanadi; ruxsat tekshiruvi (DB) bu benchmark'ga kirmaydi.
+
+Ishga tushirish (alfaconnect papkasidan):
+    python -m benchmarks.media_serving [--requests 200] [--size-mb 5] [--range-kb 64]
+"""
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+from pathlib import Path
+
+from fastapi import Request
+from fastapi.responses import FileResponse
+
+from api.media import media_file_response
+
+
+def _request(headers: dict) -> Request:
+    scope = {
+        "type": "http",
+        "method": "GET",
+        "path": "/api/media/voice/1/1.mp3",
+        "headers": [(k.lower().encode(), v.encode()) for k, v in headers.items()],
+        "query_string": b"",
+    }
+    return Request(scope)
+
+
+async def _send_and_count(response) -> tuple:
+    sent = 0
+    status = None
+
+    async def receive():
+        await asyncio.sleep(3600)
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        nonlocal sent, status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+        elif message["type"] == "http.response.body":
+            sent += len(message.get("body", b""))
+
+    await response({"type": "http", "method": "GET", "headers": []}, receive, send)
+    return status, sent
+
+
+async def _legacy(path: Path, headers: dict) -> tuple:
+    return await _send_and_count(FileResponse(path, media_type="audio/mpeg"))
+
+
+async def _ranged(path: Path, headers: dict) -> tuple:
+    return await _send_and_count(media_file_response(_request(headers), path, "audio/mpeg"))
+
+
+async def _run(label: str, fn, path: Path, requests: list) -> None:
+    started = time.perf_counter()
+    results = await asyncio.gather(*(fn(path, headers) for headers in requests))
+    elapsed = time.perf_counter() - started
+    total = sum(sent for _, sent in results)
+    statuses = sorted({status for status, _ in results})
+    print(
+        f"{label:<10} {len(requests)} requests: {elapsed * 1000:8.1f} ms | "
+        f"{total / (1024 * 1024):8.1f} MB sent | status {statuses}"
+    )
+
+
+async def main(count: int, size_mb: int, range_kb: int) -> None:
+    size = size_mb * 1024 * 1024
+    span = range_kb * 1024
+    rng = random.Random(42)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "1.mp3"
+        path.write_bytes(os.urandom(size))
+
+        seeks = []
+        for _ in range(count):
+            start = rng.randrange(0, size - span)
+            seeks.append({"Range": f"bytes={start}-{start + span - 1}"})
+        await _run("legacy", _legacy, path, seeks)
+        await _run("range", _ranged, path, seeks)
+
+        etag = media_file_response(_request({}), path, "audio/mpeg").headers["etag"]
+        await _run("304", _ranged, path, [{"If-None-Match": etag}] * count)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--size-mb", type=int, default=5)
+    parser.add_argument("--range-kb", type=int, default=64)
+    args = parser.parse_args()
+    asyncio.run(main(args.requests, args.size_mb, args.range_kb))
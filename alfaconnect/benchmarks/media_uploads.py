@@ -0,0 +1,96 @@
+"""
+Media upload benchmark'i: eski yo'l (await upload.read() + bloklovchi
+open().write()) vs api/uploads.stage_upload (chunk'lab aiofiles bilan).
+
+N ta parallel upload (standart: 50 x 10MB) UploadFile ko'rinishida
+(Starlette kabi SpooledTemporaryFile, 1MB dan keyin diskka) tayyorlanadi va
+bir vaqtda yoziladi. Har bir usul alohida jarayonda ishlaydi; peak RSS
+o'sishi (ru_maxrss) va umumiy vaqt chiqariladi. DB kerak emas.
+
+Ishga tushirish (alfaconnect papkasidan):
+    python -m benchmarks.media_uploads [--uploads 50] [--size-mb 10]
+"""
+import argparse
+import asyncio
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from fastapi import UploadFile
+
+from api.uploads import stage_upload
+
+SPOOL_MAX_SIZE = 1024 * 1024  # Starlette multipart default
+
+
+def _make_uploads(count: int, size_mb: int) -> list:
+    block = os.urandom(1024 * 1024)
+    uploads = []
+    for i in range(count):
+        spool = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+        for _ in range(size_mb):
+            spool.write(block)
+        spool.seek(0)
+        uploads.append(UploadFile(file=spool, filename=f"upload-{i}.bin", size=size_mb * 1024 * 1024))
+    return uploads
+
+
+async def _legacy(upload: UploadFile, directory: Path, index: int) -> None:
+    data = await upload.read()
+    with open(directory / f"{index}.bin", "wb") as f:
+        f.write(data)
+
+
+async def _streaming(upload: UploadFile, directory: Path, index: int, max_size: int) -> None:
+    staged = await stage_upload(upload, directory, max_size)
+    await staged.commit(directory / f"{index}.bin")
+
+
+def _max_rss_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # Linux: KB
+
+
+async def _run(mode: str, count: int, size_mb: int) -> None:
+    uploads = _make_uploads(count, size_mb)
+    baseline = _max_rss_mb()
+    with tempfile.TemporaryDirectory() as tmp:
+        directory = Path(tmp)
+        started = time.perf_counter()
+        if mode == "legacy":
+            await asyncio.gather(*(_legacy(u, directory, i) for i, u in enumerate(uploads)))
+        else:
+            max_size = (size_mb + 1) * 1024 * 1024
+            await asyncio.gather(*(_streaming(u, directory, i, max_size) for i, u in enumerate(uploads)))
+        elapsed = time.perf_counter() - started
+    print(
+        f"{mode:<9} {count} x {size_mb}MB: {elapsed:6.2f} s | "
+        f"peak RSS +{_max_rss_mb() - baseline:7.1f} MB"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--uploads", type=int, default=50)
+    parser.add_argument("--size-mb", type=int, default=10)
+    parser.add_argument("--mode", choices=("legacy", "streaming"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        asyncio.run(_run(args.mode, args.uploads, args.size_mb))
+        return
+
+    # Har bir usul alohida jarayonda - ru_maxrss bir-biriga aralashmasligi uchun
+    for mode in ("legacy", "streaming"):
+        subprocess.run(
+            [sys.executable, "-m", "benchmarks.media_uploads", "--mode", mode,
+             "--uploads", str(args.uploads), "--size-mb", str(args.size_mb)],
+            check=True,
+        )
+
+
+if __name__ == "__main__":
+    main()
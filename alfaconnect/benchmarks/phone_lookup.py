@@ -0,0 +1,106 @@
+"""
+Telefon bo'yicha user qidirish benchmark'i (1M qatorli sintetik jadval).
+
+Vaqtinchalik (TEMP) bench_users jadvali yaratiladi - haqiqiy users jadvaliga
+tegilmaydi. Uch usul solishtiriladi:
+  - regexp:  WHERE regexp_replace(phone, '[^0-9]', '', 'g') = ...  (eski, seq scan)
+  - indexed: WHERE phone_digits = $1  (060 migratsiya, btree)
+  - cached:  find_user_by_phone() keshi (telefon -> telegram_id -> qator), DB siz
+
+Ishga tushirish (alfaconnect papkasidan, .env dagi DB_URL ishlatiladi):
+    python -m benchmarks.phone_lookup [--users 1000000] [--lookups 200]
+"""
+import argparse
+import asyncio
+import random
+import time
+
+import asyncpg
+
+from config import settings
+from database.basic.phone import phone_lookup_key
+from database.basic.user_cache import get_cached_user_by_phone_key, remember_user
+
+SETUP_SQL = """
+CREATE TEMP TABLE bench_users (
+    id bigserial PRIMARY KEY,
+    telegram_id bigint,
+    full_name text,
+    phone text,
+    phone_digits text GENERATED ALWAYS AS (
+        CASE
+            WHEN regexp_replace(phone, '[^0-9]', '', 'g') = '' THEN NULL
+            WHEN length(regexp_replace(phone, '[^0-9]', '', 'g')) = 9
+                THEN '998' || regexp_replace(phone, '[^0-9]', '', 'g')
+            ELSE regexp_replace(phone, '[^0-9]', '', 'g')
+        END
+    ) STORED
+);
+INSERT INTO bench_users (telegram_id, full_name, phone)
+SELECT g, 'User ' || g, '+998' || lpad((900000000 + g)::text, 9, '0')
+FROM generate_series(1, {users}) g;
+"""
+
+REGEXP_SQL = """
+SELECT id, telegram_id, full_name, phone FROM bench_users
+WHERE regexp_replace(phone, '[^0-9]', '', 'g') = regexp_replace($1, '[^0-9]', '', 'g')
+LIMIT 1
+"""
+
+INDEXED_SQL = "SELECT id, telegram_id, full_name, phone, phone_digits FROM bench_users WHERE phone_digits = $1 ORDER BY id LIMIT 1"
+
+
+async def _time_queries(conn, sql: str, args) -> float:
+    started = time.perf_counter()
+    for arg in args:
+        await conn.fetchrow(sql, arg)
+    return (time.perf_counter() - started) / len(args) * 1000
+
+
+async def _time_cached(phones) -> float:
+    keys = [phone_lookup_key(p) for p in phones]
+    for telegram_id, key in enumerate(keys, start=1):
+        remember_user({"telegram_id": telegram_id, "phone_digits": key})
+    started = time.perf_counter()
+    for phone in phones:
+        await get_cached_user_by_phone_key(phone_lookup_key(phone))
+    return (time.perf_counter() - started) / len(phones) * 1000
+
+
+async def main(users: int, lookups: int) -> None:
+    conn = await asyncpg.connect(settings.DB_URL)
+    try:
+        print(f"building bench_users with {users} rows ...")
+        started = time.perf_counter()
+        await conn.execute(SETUP_SQL.format(users=int(users)))
+        await conn.execute("CREATE INDEX ON bench_users(phone_digits)")
+        await conn.execute("ANALYZE bench_users")
+        print(f"  done in {time.perf_counter() - started:.1f}s")
+
+        # Turli formatda kiritilgan raqamlar (operator qo'lda yozgandek)
+        ids = random.sample(range(1, users + 1), lookups)
+        raw = [f"{900000000 + i:09d}" for i in ids]
+        phones = [f"+998 {r[:2]} {r[2:5]} {r[5:7]} {r[7:]}" if n % 2 else r for n, r in enumerate(raw)]
+        keys = [phone_lookup_key(p) for p in phones]
+
+        regexp_lookups = max(1, lookups // 20)  # seq scan sekin - kamroq namuna
+        regexp_ms = await _time_queries(conn, REGEXP_SQL, phones[:regexp_lookups])
+        indexed_ms = await _time_queries(conn, INDEXED_SQL, keys)
+        cached_ms = await _time_cached(phones)
+
+        plan = await conn.fetch("EXPLAIN " + INDEXED_SQL, keys[0])
+        print(f"regexp_replace scan: {regexp_ms:10.3f} ms/lookup ({regexp_lookups} lookups)")
+        print(f"phone_digits index:  {indexed_ms:10.3f} ms/lookup ({lookups} lookups)")
+        print(f"in-process cache:    {cached_ms:10.4f} ms/lookup ({lookups} lookups)")
+        print(f"speedup (index vs scan): {regexp_ms / indexed_ms:.0f}x")
+        print("plan:", plan[0][0])
+    finally:
+        await conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=1_000_000)
+    parser.add_argument("--lookups", type=int, default=200)
+    args = parser.parse_args()
+    asyncio.run(main(args.users, args.lookups))
@@ -0,0 +1,62 @@
+"""
+Presence tracker benchmark'i (database/webapp/presence.py).
+
+N ta user har --heartbeat soniyada /api/user/me/status yuboradi (simulyatsiya,
+vaqt soxta). Eski yo'l - har heartbeat uchun bitta UPDATE users (yangi
+connection bilan), yangi yo'l - xotirada touch() va har --flush soniyada
+o'zgargan userlar uchun bitta batch UPDATE. Yoziladigan statement va qator
+soni hamda touch() narxi chiqariladi. DB kerak emas (flush SQL'i
+chaqirilmaydi, faqat dirty yozuvlar sanaladi).
+
+Ishga tushirish (alfaconnect papkasidan):
+    python -m benchmarks.presence_flush [--users 2000] [--minutes 10] [--heartbeat 30] [--flush 5]
+"""
+import argparse
+import random
+import time
+from datetime import datetime, timedelta, timezone
+
+from database.webapp.presence import PresenceTracker
+
+
+def main(users: int, minutes: int, heartbeat: int, flush: int) -> None:
+    rng = random.Random(42)
+    tracker = PresenceTracker(flush_interval=flush)
+    start = datetime.now(timezone.utc)
+    # Har user o'z fazasida heartbeat yuboradi
+    phases = [rng.uniform(0, heartbeat) for _ in range(users)]
+    events = sorted(
+        (phase + k * heartbeat, user_id)
+        for user_id, phase in enumerate(phases, start=1)
+        for k in range(int(minutes * 60 / heartbeat))
+    )
+
+    statements = rows = 0
+    next_flush = flush
+    started = time.perf_counter()
+    for offset, user_id in events:
+        while offset >= next_flush:
+            dirty = [entry for entry in tracker._entries.values() if entry.dirty]
+            if dirty:
+                statements += 1
+                rows += len(dirty)
+                for entry in dirty:
+                    entry.dirty = False
+            next_flush += flush
+        tracker.touch(user_id, "client", at=start + timedelta(seconds=offset))
+    elapsed = time.perf_counter() - started
+
+    print(f"heartbeats          {len(events)}")
+    print(f"legacy  UPDATEs     {len(events):8d} statements | {len(events):8d} rows")
+    print(f"presence flushes    {statements:8d} statements | {rows:8d} rows")
+    print(f"touch()+flush scan  {elapsed / len(events) * 1e6:8.2f} us/heartbeat")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--minutes", type=int, default=10)
+    parser.add_argument("--heartbeat", type=int, default=30)
+    parser.add_argument("--flush", type=int, default=5)
+    args = parser.parse_args()
+    main(args.users, args.minutes, args.heartbeat, args.flush)
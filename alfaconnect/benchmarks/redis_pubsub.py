@@ -0,0 +1,121 @@
+"""
+Redis PubSub fan-in benchmark'i (api/ws/pubsub_manager.py). Lokal Redis kerak.
+
+Ikki "instance" (A va B) bir xil --channels ta chat kanaliga obuna bo'ladi,
+A har kanalga --messages ta xabar publish qiladi.
+
+  - legacy: eski sxema - kanal boshiga bitta reader task, hammasi bitta
+    umumiy PubSub'dan get_message(timeout=1.0) qiladi va boshqa kanal
+    xabarini tashlaydi (task'lar bir-birining xabarini "o'g'irlaydi");
+    publisher ham o'z xabarini qayta oladi.
+  - mux: RedisPubSubManager - bitta reader, kanal bo'yicha demux,
+    instance_id bo'yicha o'z xabarlari tashlanadi.
+
+B da yetkazilgan / yo'qolgan xabarlar, A da o'ziga qaytgan xabarlar va
+soniyasiga yetkazish tezligi chiqariladi.
+
+Ishga tushirish (alfaconnect papkasidan):
+    python -m benchmarks.redis_pubsub [--host localhost] [--port 6379] [--channels 200] [--messages 50]
+"""
+import argparse
+import asyncio
+import time
+from collections import Counter
+
+import redis.asyncio as aioredis
+
+from api.ws.pubsub_manager import RedisPubSubManager
+
+
+async def _legacy(pool, channels: list, messages: int) -> None:
+    redis = aioredis.Redis(connection_pool=pool)
+    pubsub = redis.pubsub()
+    await pubsub.subscribe(*channels)
+    delivered = Counter()
+
+    async def reader(channel: str):
+        while True:
+            message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+            if message is not None:
+                name = message["channel"].decode("utf-8")
+                if name == channel:
+                    delivered[channel] += 1
+
+    tasks = [asyncio.create_task(reader(channel)) for channel in channels]
+    await asyncio.sleep(0.2)
+    started = time.perf_counter()
+    for i in range(messages):
+        for channel in channels:
+            await redis.publish(channel, f'{{"n": {i}}}')
+    await asyncio.sleep(2)
+    elapsed = time.perf_counter() - started - 2
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    await pubsub.close()
+    await redis.close()
+
+    total = len(channels) * messages
+    got = sum(delivered.values())
+    print(f"legacy  delivered {got:7d}/{total} | lost {total - got:7d} | publish {total / elapsed:9.0f} msg/s "
+          f"| {len(channels)} reader tasks, own messages re-delivered locally")
+
+
+async def _mux(pool, channels: list, messages: int) -> None:
+    a = RedisPubSubManager(redis_pool=pool)
+    b = RedisPubSubManager(redis_pool=pool)
+    delivered = Counter()
+    done = asyncio.Event()
+    total = len(channels) * messages
+    last = None
+
+    async def on_b(channel: str, data: str):
+        nonlocal last
+        last = time.perf_counter()
+        delivered[channel] += 1
+        if sum(delivered.values()) == total:
+            done.set()
+
+    b.on_message = on_b
+    for channel in channels:
+        a.subscribe(channel)
+        b.subscribe(channel)
+        b.subscribe(channel)  # ikkinchi foydalanuvchi - bitta SUBSCRIBE
+    await asyncio.sleep(0.5)
+
+    started = time.perf_counter()
+    for i in range(messages):
+        for channel in channels:
+            await a.publish(channel, f'{{"n": {i}}}')
+    try:
+        await asyncio.wait_for(done.wait(), timeout=10)
+    except asyncio.TimeoutError:
+        pass
+    elapsed = (last or time.perf_counter()) - started
+
+    got = sum(delivered.values())
+    print(f"mux     delivered {got:7d}/{total} | lost {total - got:7d} | {got / elapsed:9.0f} msg/s end-to-end "
+          f"| A: own skipped {a.skipped_own}, delivered {a.received} | channels {b.channel_count}")
+    await a.disconnect()
+    await b.disconnect()
+
+
+async def main(args) -> None:
+    pool = aioredis.ConnectionPool(host=args.host, port=args.port, decode_responses=False)
+    try:
+        await aioredis.Redis(connection_pool=pool).ping()
+    except Exception as e:
+        raise SystemExit(f"Redis {args.host}:{args.port} ga ulanib bo'lmadi: {e}")
+    channels = [f"bench:chat:{i}" for i in range(args.channels)]
+    await _legacy(pool, channels, args.messages)
+    await _mux(pool, channels, args.messages)
+    await pool.disconnect()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, default=6379)
+    parser.add_argument("--channels", type=int, default=200)
+    parser.add_argument("--messages", type=int, default=50)
+    asyncio.run(main(parser.parse_args()))
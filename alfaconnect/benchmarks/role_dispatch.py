@@ -0,0 +1,138 @@
+"""
+Rol bo'yicha dispatch benchmark'i.
+
+Har bir rol o'z router'idagi menyu tugmalari va callback'laridan update'lar
+yasaladi va ikki usulda dispatch qilinadi:
+  - before: oddiy Router._propagate_event (barcha router'lar ketma-ket)
+  - after:  RoleDispatchRouter (rol bo'yicha + menyu matn xaritasi)
+
+Handler'lar chaqirilmaydi - inner middleware tanlangan handler'ni yozib oladi va
+to'xtaydi, ya'ni faqat dispatch (filtrlarni tekshirish) narxi o'lchanadi.
+DB ishlatilmaydi: user qatorlari xotiradan beriladi.
+
+Ishga tushirish (alfaconnect papkasidan, .env sozlangan bo'lishi kerak):
+    python -m benchmarks.role_dispatch [--rounds 20]
+"""
+import argparse
+import asyncio
+import functools
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Tuple
+
+from aiogram import Bot, Dispatcher, Router
+from aiogram.fsm.storage.memory import MemoryStorage
+from aiogram.types import CallbackQuery, Chat, Message, Update, User
+
+import database.basic.user as user_queries
+from middlewares import UserContextMiddleware
+from utils.role_dispatch import _handler_keys
+
+ROLES = [
+    "warehouse", "admin", "client", "manager", "junior_manager",
+    "controller", "technician", "callcenter_operator", "callcenter_supervisor",
+]
+
+
+async def _fake_get_user_by_telegram_id(telegram_id: int) -> Dict[str, Any]:
+    role = ROLES[telegram_id % len(ROLES)]
+    return {"id": telegram_id, "telegram_id": telegram_id, "role": role, "language": "uz", "is_blocked": False}
+
+
+def _collect_values(router: Router, update_type: str, attr: str, out: List[str]) -> None:
+    """Router daraxtidagi handler'lar kutadigan text/data qiymatlari (F.text.in_, F.data == ...)"""
+    observer = router.observers.get(update_type)
+    for handler in observer.handlers if observer else []:
+        keys = _handler_keys(handler.filters or [], attr, None)
+        if isinstance(keys, tuple):
+            if keys[0] == "exact":
+                out.extend(sorted(keys[1]))
+            else:
+                out.append(keys[1] + "1")
+    for sub in router.sub_routers:
+        _collect_values(sub, update_type, attr, out)
+
+
+def _build_updates(root) -> List[Tuple[str, Update]]:
+    """Har bir rol o'z menyu tugmalari va callback'larini yuboradi"""
+    updates = []
+    update_id = 0
+    for index, role in enumerate(ROLES):
+        user = User(id=index, is_bot=False, first_name=role)
+        chat = Chat(id=index, type="private")
+        texts: List[str] = []
+        callbacks: List[str] = []
+        _collect_values(root._role_routers[role], "message", "text", texts)
+        _collect_values(root._role_routers[role], "callback_query", "data", callbacks)
+        for text in texts:
+            update_id += 1
+            message = Message(message_id=update_id, date=datetime.now(), chat=chat, from_user=user, text=text)
+            updates.append((role, Update(update_id=update_id, message=message)))
+        for data in callbacks:
+            update_id += 1
+            message = Message(message_id=update_id, date=datetime.now(), chat=chat, from_user=user, text="-")
+            callback = CallbackQuery(id=str(update_id), from_user=user, chat_instance="1", message=message, data=data)
+            updates.append((role, Update(update_id=update_id, callback_query=callback)))
+    return updates
+
+
+async def _run(dp: Dispatcher, bot: Bot, updates, rounds: int) -> float:
+    # Isitish (kesh va xaritalarni to'ldirish)
+    for _, update in updates:
+        await dp.feed_update(bot, update)
+    started = time.perf_counter()
+    for _ in range(rounds):
+        for _, update in updates:
+            await dp.feed_update(bot, update)
+    return (time.perf_counter() - started) / (rounds * len(updates)) * 1e6
+
+
+async def main(rounds: int) -> None:
+    user_queries.get_user_by_telegram_id = _fake_get_user_by_telegram_id
+    from handlers import router as root
+
+    selected: Dict[int, str] = {}
+
+    async def capture(handler, event, data):
+        selected[data["event_update"].update_id] = data["handler"].callback.__qualname__
+        return True
+
+    root.message.middleware(capture)
+    root.callback_query.middleware(capture)
+
+    dp = Dispatcher(storage=MemoryStorage())
+    dp.update.outer_middleware(UserContextMiddleware())
+    dp.include_router(root)
+    bot = Bot(token="123456:benchmark")
+
+    updates = _build_updates(root)
+
+    after_picked: Dict[int, str] = {}
+    before_picked: Dict[int, str] = {}
+
+    selected = after_picked
+    after_us = await _run(dp, bot, updates, rounds)
+
+    # Oddiy Router: barcha router'lar ro'yxatdagi tartibda ketma-ket
+    root._propagate_event = functools.partial(Router._propagate_event, root)
+    selected = before_picked
+    before_us = await _run(dp, bot, updates, rounds)
+    del root._propagate_event
+
+    mismatches = [uid for uid in before_picked if before_picked[uid] != after_picked.get(uid)]
+    print(f"updates per round: {len(updates)} ({len(ROLES)} roles), rounds: {rounds}")
+    print(f"before (linear):     {before_us:8.1f} us/update")
+    print(f"after (role-keyed):  {after_us:8.1f} us/update")
+    print(f"speedup:             {before_us / after_us:8.2f}x")
+    print(f"handled: {len(after_picked)}, handler mismatches: {len(mismatches)}")
+    for uid in mismatches[:10]:
+        print(f"  update {uid}: before={before_picked[uid]} after={after_picked.get(uid)}")
+
+    await bot.session.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rounds", type=int, default=20)
+    args = parser.parse_args()
+    asyncio.run(main(args.rounds))
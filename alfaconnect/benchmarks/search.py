@@ -0,0 +1,181 @@
+"""
+Qidiruv benchmark'i: eski ILIKE '%term%' vs database/basic/search.py (pg_trgm + prefix).
+
+Vaqtinchalik bench_search sxemasida users/materials/order jadvallari yaratiladi,
+061 migratsiyadagi indekslar qo'llanadi va aralash so'rovlar (ism, xato yozilgan
+ism, qisqa matn, telefon/ID, ariza raqami) uchun p50/p95 kechikish o'lchanadi.
+Oxirida sxema o'chiriladi.
+
+Ishga tushirish (alfaconnect papkasidan, .env dagi DB_URL ishlatiladi):
+    python -m benchmarks.search [--users 1000000] [--materials 50000] [--target-p95-ms 50]
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import time
+from pathlib import Path
+
+import asyncpg
+
+from config import settings
+from database.basic.search import search_materials, search_users
+
+SCHEMA = "bench_search"
+MIGRATION = Path(__file__).resolve().parent.parent / "database" / "migrations" / "061_trigram_search_indexes.sql"
+
+FIRST = ["Alisher", "Bobur", "Dilshod", "Jasur", "Nodira", "Malika", "Sardor", "Umid", "Zarina", "Otabek",
+         "Shahnoza", "Sherzod", "Gulnora", "Rustam", "Kamola", "Farrux", "Aziz", "Madina", "Islom", "Nilufar"]
+LAST = ["Karimov", "Toshmatov", "Rahimov", "Yusupov", "Abdullayev", "Ergashev", "Nazarov", "Qodirov",
+        "Saidov", "Xolmatov", "Mirzayev", "Sobirov", "Ismoilov", "Jo'rayev", "Hamidov", "Aliyev"]
+MATERIALS = ["Kabel UTP", "Optik kabel", "Router", "Konnektor RJ45", "Splitter", "ONU terminal",
+             "Patch cord", "Kronshteyn", "Mufta", "Adapter SC", "Switch", "Antenna"]
+
+SETUP_SQL = f"""
+DROP SCHEMA IF EXISTS {SCHEMA} CASCADE;
+CREATE SCHEMA {SCHEMA};
+SET search_path TO {SCHEMA}, public;
+CREATE TABLE users (
+    id bigserial PRIMARY KEY, telegram_id bigint, full_name text, username text, phone text,
+    phone_digits text GENERATED ALWAYS AS (regexp_replace(phone, '[^0-9]', '', 'g')) STORED,
+    role text, language text DEFAULT 'uz', region text, address text, abonent_id text,
+    is_blocked boolean DEFAULT false, is_online boolean DEFAULT false, last_seen_at timestamptz,
+    created_at timestamptz DEFAULT now(), updated_at timestamptz DEFAULT now()
+);
+CREATE TABLE materials (
+    id serial PRIMARY KEY, name text, price numeric, description text, quantity int,
+    serial_number text, material_unit text DEFAULT 'dona',
+    created_at timestamp DEFAULT now(), updated_at timestamp DEFAULT now()
+);
+CREATE TABLE staff_orders (id bigserial PRIMARY KEY, user_id bigint, abonent_id text, application_number text);
+CREATE TABLE connection_orders (id bigserial PRIMARY KEY, user_id bigint, application_number text);
+CREATE TABLE technician_orders (id bigserial PRIMARY KEY, user_id bigint, application_number text);
+CREATE TABLE smart_service_orders (id bigserial PRIMARY KEY, user_id bigint, application_number text);
+"""
+
+OLD_USERS_SQL = """
+SELECT id, telegram_id, full_name, username, phone FROM users
+WHERE role = 'client' AND (full_name ILIKE $1 OR username ILIKE $1 OR phone ILIKE $1
+      OR CAST(telegram_id AS TEXT) ILIKE $1)
+ORDER BY full_name LIMIT 20
+"""
+
+OLD_MATERIALS_SQL = "SELECT id, name FROM materials WHERE name ILIKE $1 ORDER BY name LIMIT 20"
+
+
+def _array(values) -> str:
+    return "ARRAY[" + ",".join("'" + v.replace("'", "''") + "'" for v in values) + "]"
+
+
+async def _populate(conn, users: int, materials: int) -> None:
+    first = _array(FIRST)
+    last = _array(LAST)
+    await conn.execute(f"""
+        INSERT INTO users (telegram_id, full_name, username, phone, role, abonent_id)
+        SELECT 5000000000 + g,
+               ({first})[1 + g % {len(FIRST)}] || ' ' || ({last})[1 + (g / {len(FIRST)}) % {len(LAST)}] || ' ' || g,
+               'user' || g,
+               '+998' || lpad((900000000 + g)::text, 9, '0'),
+               CASE WHEN g % 10 = 0 THEN 'technician' ELSE 'client' END,
+               (100000 + g)::text
+        FROM generate_series(1, {users}) g
+    """)
+    names = _array(MATERIALS)
+    await conn.execute(f"""
+        INSERT INTO materials (name, quantity, serial_number)
+        SELECT ({names})[1 + g % {len(MATERIALS)}] || ' ' || g, g % 100, 'SN' || lpad(g::text, 8, '0')
+        FROM generate_series(1, {materials}) g
+    """)
+    await conn.execute(f"""
+        INSERT INTO staff_orders (user_id, abonent_id, application_number)
+        SELECT 1, g::text, 'STAFF-CONN-B2C-' || lpad(g::text, 4, '0') FROM generate_series(1, {users // 10}) g
+    """)
+    migration = MIGRATION.read_text().replace("public.", "")
+    migration = migration.replace("CREATE EXTENSION IF NOT EXISTS pg_trgm;", "")
+    await conn.execute(migration)
+    await conn.execute("ANALYZE")
+
+
+def _queries(users: int):
+    rnd = random.Random(7)
+    out = []
+    for _ in range(40):
+        out.append(("name", f"{rnd.choice(FIRST)} {rnd.choice(LAST)}"))
+        out.append(("typo", rnd.choice(LAST)[:-2] + "ob"))
+        out.append(("short", rnd.choice(FIRST)[:2]))
+        out.append(("phone", f"90{rnd.randint(0, users):07d}"[:7]))
+        out.append(("id", str(5000000000 + rnd.randint(1, users))))
+        out.append(("app", f"STAFF-CONN-B2C-{rnd.randint(1, max(1, users // 10)):04d}"))
+    return out
+
+
+async def _measure(fn, args) -> list:
+    timings = []
+    for arg in args:
+        started = time.perf_counter()
+        await fn(arg)
+        timings.append((time.perf_counter() - started) * 1000)
+    return timings
+
+
+def _report(label: str, timings: list, target: float) -> bool:
+    p50 = statistics.median(timings)
+    p95 = sorted(timings)[max(0, int(len(timings) * 0.95) - 1)]
+    ok = p95 <= target
+    print(f"  {label:<22} p50 {p50:8.2f} ms   p95 {p95:8.2f} ms   {'OK' if ok else 'SLOW'}")
+    return ok
+
+
+async def main(users: int, materials: int, target: float) -> None:
+    conn = await asyncpg.connect(settings.DB_URL)
+    try:
+        await conn.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        print(f"building {SCHEMA}: {users} users, {materials} materials ...")
+        started = time.perf_counter()
+        await conn.execute(SETUP_SQL)
+        await _populate(conn, users, materials)
+        print(f"  done in {time.perf_counter() - started:.1f}s")
+
+        queries = _queries(users)
+        kinds = sorted({kind for kind, _ in queries})
+        all_ok = True
+
+        print("users (old ILIKE '%term%'):")
+        for kind in kinds:
+            args = [q for k, q in queries if k == kind][:10]
+            timings = await _measure(lambda q: conn.fetch(OLD_USERS_SQL, f"%{q}%"), args)
+            _report(kind, timings, target)
+
+        print("users (search_users):")
+        for kind in kinds:
+            args = [q for k, q in queries if k == kind]
+            timings = await _measure(lambda q: search_users(q, roles=["client"], conn=conn), args)
+            all_ok &= _report(kind, timings, target)
+
+        # Keyset: 5-sahifagacha yurish
+        page = await search_users(FIRST[0], conn=conn)
+        pages = 1
+        while page["next_cursor"] and pages < 5:
+            page = await search_users(FIRST[0], cursor=page["next_cursor"], conn=conn)
+            pages += 1
+        print(f"  keyset pages walked: {pages}")
+
+        material_args = list(MATERIALS) + ["SN0001", "kab", "Rutr"]
+        print("materials (old ILIKE):")
+        _report("name", await _measure(lambda q: conn.fetch(OLD_MATERIALS_SQL, f"%{q}%"), material_args), target)
+        print("materials (search_materials):")
+        all_ok &= _report("name", await _measure(lambda q: search_materials(q, conn=conn), material_args), target)
+
+        print(f"target p95 <= {target} ms: {'met' if all_ok else 'NOT met'}")
+    finally:
+        await conn.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+        await conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=1_000_000)
+    parser.add_argument("--materials", type=int, default=50_000)
+    parser.add_argument("--target-p95-ms", type=float, default=50.0)
+    args = parser.parse_args()
+    asyncio.run(main(args.users, args.materials, args.target_p95_ms))
@@ -0,0 +1,67 @@
+"""
+WebApp autentifikatsiya benchmark'i (api/session_tokens.py).
+
+Har bir so'rovdagi auth narxi (DB siz):
+  - legacy-initData: initData parse + BOT_TOKEN dan secret'ni qayta hisoblash + HMAC
+  - initData: validate_init_data (secret bir marta hisoblangan)
+  - token: verify_session_token (imzo + muddat)
+Eski yo'lda bundan tashqari har so'rovda get_user_by_telegram_id (yangi DB
+connection) bor edi; endi user qatori user_cache TTL keshidan olinadi.
+
+Ishga tushirish (alfaconnect papkasidan):
+    python -m benchmarks.session_auth [--iterations 100000]
+"""
+import argparse
+import hashlib
+import hmac
+import json
+import time
+import urllib.parse
+
+from api.session_tokens import _webapp_secret, issue_session_token, validate_init_data, verify_session_token
+from config import settings
+
+
+def _legacy_validate(init_data: str) -> None:
+    data = dict(urllib.parse.parse_qsl(init_data))
+    check_hash = data.pop("hash", None)
+    data_check_string = "\n".join(f"{k}={v}" for k, v in sorted(data.items()))
+    secret_key = hmac.new(b"WebAppData", settings.BOT_TOKEN.encode(), hashlib.sha256).digest()
+    calculated = hmac.new(secret_key, data_check_string.encode(), hashlib.sha256).hexdigest()
+    assert calculated == check_hash
+    json.loads(data["user"])
+
+
+def _init_data() -> str:
+    data = {
+        "query_id": "AAHdF6IQAAAAAN0XohDhrOrc",
+        "user": json.dumps({"id": 123456789, "first_name": "John", "last_name": "Doe",
+                            "username": "johndoe", "language_code": "uz"}),
+        "auth_date": str(int(time.time())),
+    }
+    data_check_string = "\n".join(f"{k}={v}" for k, v in sorted(data.items()))
+    data["hash"] = hmac.new(_webapp_secret(), data_check_string.encode(), hashlib.sha256).hexdigest()
+    return urllib.parse.urlencode(data)
+
+
+def _run(label: str, fn, arg, iterations: int) -> None:
+    started = time.perf_counter()
+    for _ in range(iterations):
+        fn(arg)
+    elapsed = time.perf_counter() - started
+    print(f"{label:<15} {iterations / elapsed:10.0f} ops/sec | {elapsed / iterations * 1e6:6.2f} us/op")
+
+
+def main(iterations: int) -> None:
+    init_data = _init_data()
+    token, _ = issue_session_token({"id": 42, "telegram_id": 123456789, "role": "client"})
+    _run("legacy-initData", _legacy_validate, init_data, iterations)
+    _run("initData", validate_init_data, init_data, iterations)
+    _run("token", verify_session_token, token, iterations)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=100000)
+    args = parser.parse_args()
+    main(args.iterations)
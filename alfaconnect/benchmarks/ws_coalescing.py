@@ -0,0 +1,120 @@
+"""
+Supervisor WebSocket event coalescing benchmark'i (api/ws/outbound.py
+CoalescingWriter, ChatWSManager.allow_typing_broadcast).
+
+Band call-center simulyatsiyasi: --supervisors ta socket har biri --chats
+ta chat topic'iga va "stats" ga obuna. --seconds davomida har 10 ms da:
+  - har chatda client/operator klaviatura bosadi (--keys-per-sec, chat
+    boshiga) - handle_typing bilan bir xil yo'l (set_typing_status +
+    broadcast_typing_event), ba'zan typing: false;
+  - message.read (--reads-per-sec), stats.changed (--stats-per-sec) va
+    user.online/offline (--presence-per-sec) event'lari.
+
+  - legacy: typing throttle o'chiq, har event alohida frame
+  - batched: WS_TYPING_THROTTLE + /api/ws/user?batch=1 (WS_COALESCE_WINDOW)
+
+Yuborilgan frame'lar, yetkazilgan event'lar, yig'ilib tashlangan holat
+event'lari, CPU vaqti va kechikish chiqariladi. Tarmoq/DB kerak emas.
+
+Ishga tushirish (alfaconnect papkasidan):
+    python -m benchmarks.ws_coalescing [--supervisors 20] [--chats 100] [--seconds 5]
+"""
+import argparse
+import asyncio
+import random
+import time
+
+from api.routes.websocket import broadcast_user_status, send_message_read_event, send_stats_changed_event
+from api.ws.manager import manager, chat_topic, STATS_TOPIC
+from api.ws.outbound import SendMetrics
+from config import settings
+
+TICK = 0.01
+
+
+class FakeWebSocket:
+    def __init__(self):
+        self.frames = 0
+
+    async def send_text(self, message: str) -> None:
+        self.frames += 1
+        await asyncio.sleep(0)  # transport'ga yozish - loop'ga navbat beradi
+
+    async def close(self, code: int = 1000, reason: str = "") -> None:
+        pass
+
+
+def _per_tick(rng: random.Random, per_sec: float) -> int:
+    """Soniyasiga per_sec -> shu tick'dagi event soni (o'rtacha)"""
+    expected = per_sec * TICK
+    return int(expected) + (1 if rng.random() < expected - int(expected) else 0)
+
+
+async def _run(label: str, batched: bool, args) -> None:
+    settings.WS_TYPING_THROTTLE = args.typing_throttle if batched else 0.0
+    settings.WS_COALESCE_WINDOW = args.window_ms / 1000
+    manager.send_metrics = SendMetrics()
+    rng = random.Random(42)
+
+    sockets = [FakeWebSocket() for _ in range(args.supervisors)]
+    for i, ws in enumerate(sockets):
+        manager.register(ws, 900000 + i, coalesce=batched)
+        manager.subscribe(ws, STATS_TOPIC)
+        for chat_id in range(args.chats):
+            manager.subscribe(ws, chat_topic(chat_id))
+
+    generated = 0
+    ticks = int(args.seconds / TICK)
+    started_cpu = time.process_time()
+    started = time.perf_counter()
+    for tick in range(ticks):
+        for chat_id in range(args.chats):
+            for _ in range(_per_tick(rng, args.keys_per_sec)):
+                user_id = chat_id * 2 + rng.randrange(2)  # client yoki operator
+                is_typing = rng.random() > 0.05
+                await manager.set_typing_status(chat_id, user_id, is_typing)
+                await manager.broadcast_typing_event(chat_id, user_id, is_typing)
+                generated += 1
+        for _ in range(_per_tick(rng, args.reads_per_sec)):
+            await send_message_read_event(rng.randrange(args.chats), tick, rng.randrange(args.chats * 2))
+            generated += 1
+        for _ in range(_per_tick(rng, args.stats_per_sec)):
+            await send_stats_changed_event(rng.randrange(50), [{"operator_id": 1, "count": rng.randrange(10)}])
+            generated += 1
+        for _ in range(_per_tick(rng, args.presence_per_sec)):
+            await broadcast_user_status(rng.randrange(200), rng.random() < 0.5, "callcenter_operator")
+            generated += 1
+        # Tick jadvali bo'yicha (generator CPU'ni hisobga olgan holda)
+        await asyncio.sleep(max(0.0, started + (tick + 1) * TICK - time.perf_counter()))
+    await asyncio.sleep(args.window_ms / 1000 + 0.2)  # writer'lar oxirgi batch'ni yuborsin
+    cpu = time.process_time() - started_cpu
+
+    metrics = manager.send_metrics.snapshot()
+    frames = sum(ws.frames for ws in sockets)
+    for ws in sockets:
+        manager.unregister(ws)
+    await asyncio.sleep(0)
+    print(
+        f"{label:<8} generated {generated:6d} | frames {frames:7d} ({frames / args.seconds / args.supervisors:6.0f}/s per socket) "
+        f"| events delivered {metrics['sent']:7d} | coalesced {metrics['coalesced']:6d} "
+        f"| CPU {cpu:5.2f} s | p50 {metrics['latency_ms_p50']:6.2f} ms | p95 {metrics['latency_ms_p95']:6.2f} ms"
+    )
+
+
+async def main(args) -> None:
+    await _run("legacy", False, args)
+    await _run("batched", True, args)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--supervisors", type=int, default=20)
+    parser.add_argument("--chats", type=int, default=100)
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--keys-per-sec", type=float, default=4)
+    parser.add_argument("--reads-per-sec", type=float, default=50)
+    parser.add_argument("--stats-per-sec", type=float, default=20)
+    parser.add_argument("--presence-per-sec", type=float, default=10)
+    parser.add_argument("--window-ms", type=float, default=30)
+    parser.add_argument("--typing-throttle", type=float, default=1.0)
+    asyncio.run(main(parser.parse_args()))
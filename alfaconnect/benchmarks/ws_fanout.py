@@ -0,0 +1,134 @@
+"""
+Chat WebSocket fan-out benchmark'i (api/ws/manager.py, api/ws/outbound.py).
+
+--sockets ta soxta WebSocket --rooms ta xonaga taqsimlanadi, ularning
+--slow-percent foizi har send_text da --slow-ms kutadi (sekin tarmoq).
+--events ta emit --rate tezlikda (soniyasiga) tasodifiy xonalarga yuboriladi.
+
+  - legacy: eski _broadcast_to_room - global lock ostida har socketga
+    ketma-ket await send_text
+  - queued: ChatWSManager - snapshot + har ulanish navbati va writer task'i
+
+Tez clientlar uchun emit -> send_text kechikishi (p50/p95/p99) va umumiy
+vaqt chiqariladi. Oxirida bitta "qotib qolgan" client navbati to'lganda
+uzilishi tekshiriladi. Tarmoq/DB kerak emas.
+
+Ishga tushirish (alfaconnect papkasidan):
+    python -m benchmarks.ws_fanout [--sockets 5000] [--rooms 500] [--events 2000] [--rate 500]
+"""
+import argparse
+import asyncio
+import random
+import time
+
+from api.ws.manager import ChatWSManager
+from config import settings
+
+
+class _State:
+    name = "CONNECTED"
+
+
+class FakeWebSocket:
+    def __init__(self, delay: float, latencies: list):
+        self.delay = delay
+        self.latencies = latencies
+        self.client_state = _State()
+        self.close_code = None
+
+    async def send_text(self, message: str) -> None:
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        else:
+            await asyncio.sleep(0)  # transport'ga yozish - loop'ga navbat beradi
+        if self.latencies is not None:
+            self.latencies.append(time.perf_counter() - float(message))
+
+    async def close(self, code: int = 1000, reason: str = "") -> None:
+        self.close_code = code
+
+
+class LegacyManager:
+    """Eski ChatWSManager._broadcast_to_room (lock ostida ketma-ket send)"""
+
+    def __init__(self):
+        self.rooms = {}
+        self._lock = asyncio.Lock()
+
+    async def connect(self, chat_id, ws, accept_already_called=True):
+        async with self._lock:
+            self.rooms.setdefault(chat_id, set()).add(ws)
+
+    async def _broadcast_to_room(self, chat_id, message):
+        async with self._lock:
+            for ws in list(self.rooms.get(chat_id, set())):
+                try:
+                    if ws.client_state.name != "CONNECTED":
+                        continue
+                    await ws.send_text(message)
+                except Exception:
+                    pass
+
+
+def _pct(samples: list, p: float) -> float:
+    return samples[min(len(samples) - 1, int(len(samples) * p))] * 1000 if samples else 0.0
+
+
+async def _run(label: str, manager, args) -> None:
+    rng = random.Random(42)
+    fast = []
+    for i in range(args.sockets):
+        slow = rng.random() * 100 < args.slow_percent
+        ws = FakeWebSocket(args.slow_ms / 1000 if slow else 0, None if slow else fast)
+        await manager.connect(i % args.rooms, ws, accept_already_called=True)
+
+    started = time.perf_counter()
+    tasks = []
+    for _ in range(args.events):
+        room = rng.randrange(args.rooms)
+        tasks.append(asyncio.create_task(manager._broadcast_to_room(room, repr(time.perf_counter()))))
+        await asyncio.sleep(1 / args.rate)
+    await asyncio.gather(*tasks)
+    expected = len(fast)
+    # queued: writer task'lar navbatni bo'shatguncha kutish
+    while True:
+        await asyncio.sleep(0.01)
+        if len(fast) == expected:
+            break
+        expected = len(fast)
+    elapsed = time.perf_counter() - started
+
+    fast.sort()
+    print(
+        f"{label:<7} {elapsed:6.2f} s | fast sends {len(fast):7d} | "
+        f"p50 {_pct(fast, 0.5):8.2f} ms | p95 {_pct(fast, 0.95):8.2f} ms | p99 {_pct(fast, 0.99):8.2f} ms"
+    )
+
+
+async def _eviction() -> None:
+    manager = ChatWSManager()
+    stalled = FakeWebSocket(3600, None)
+    await manager.connect(1, stalled, accept_already_called=True)
+    for _ in range(settings.WS_SEND_QUEUE_SIZE + 2):
+        await manager._broadcast_to_room(1, repr(time.perf_counter()))
+    await asyncio.sleep(0.01)
+    print(f"stalled client: close code {stalled.close_code}, stats {manager.stats()}")
+
+
+async def main(args) -> None:
+    await _run("legacy", LegacyManager(), args)
+    manager = ChatWSManager()
+    await _run("queued", manager, args)
+    print(f"queued  metrics: {manager.send_metrics.snapshot()}")
+    await _eviction()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sockets", type=int, default=5000)
+    parser.add_argument("--rooms", type=int, default=500)
+    parser.add_argument("--events", type=int, default=2000)
+    parser.add_argument("--rate", type=float, default=500)
+    parser.add_argument("--slow-percent", type=float, default=1.0)
+    parser.add_argument("--slow-ms", type=float, default=50)
+    asyncio.run(main(parser.parse_args()))
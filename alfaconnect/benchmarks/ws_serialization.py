@@ -0,0 +1,91 @@
+"""
+WebSocket event serializatsiyasi benchmark'i (api/ws/serialization.py).
+
+Bitta chat.message event'i --recipients ta socketga yuborilganda CPU narxi:
+  - legacy: datetime'larni Python loop'ida isoformat() + har qabul
+    qiluvchi uchun send_json (json.dumps, Starlette bilan bir xil)
+  - json-once: encode_event'ning standart json varianti, bir marta
+  - encode_event: joriy encode_event (orjson bo'lsa orjson), bir marta
+Har socket uchun frame'ni UTF-8 ga o'girish (server transport'i qiladigan
+ish) ham hisobga olinadi. Tarmoq kerak emas.
+
+Ishga tushirish (alfaconnect papkasidan):
+    python -m benchmarks.ws_serialization [--recipients 1000] [--events 200]
+"""
+import argparse
+import json
+import time
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+
+from api.ws import serialization
+from api.ws.serialization import encode_event
+
+
+def _message(i: int) -> dict:
+    now = datetime.now(timezone.utc)
+    return {
+        "id": 100000 + i,
+        "chat_id": 4242,
+        "sender_id": 17,
+        "sender_type": "operator",
+        "operator_id": 17,
+        "message_text": "Assalomu alaykum! Arizangiz qabul qilindi, usta 30 daqiqada yetib boradi. " * 2,
+        "attachments": {"type": "image", "url": f"/api/media/images/4242/{i}", "width": 1280, "height": 960},
+        "created_at": now,
+        "updated_at": now,
+        "edited_at": None,
+        "read_at": now - timedelta(seconds=5),
+        "tariff_price": Decimal("149000.00"),
+        "reactions": [{"emoji": "👍", "user_id": 3}, {"emoji": "🔥", "user_id": 9}],
+        "client_name": "Abdullayev Jasur",
+        "operator_name": "Karimova Dilnoza",
+    }
+
+
+def _legacy(message: dict, recipients: int) -> None:
+    serialized = {}
+    for key, value in message.items():
+        if hasattr(value, "isoformat"):
+            serialized[key] = value.isoformat()
+        elif isinstance(value, dict):
+            serialized[key] = {k: v.isoformat() if hasattr(v, "isoformat") else v for k, v in value.items()}
+        elif isinstance(value, Decimal):
+            serialized[key] = float(value)  # send_json Decimal'ni o'gira olmaydi
+        else:
+            serialized[key] = value
+    event = {"event": "message.new", "payload": serialized}
+    for _ in range(recipients):
+        json.dumps(event, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+def _json_once(message: dict, recipients: int) -> None:
+    frame = json.dumps({"event": "message.new", "payload": message}, default=serialization._default,
+                       ensure_ascii=False, separators=(",", ":"))
+    for _ in range(recipients):
+        frame.encode("utf-8")
+
+
+def _encode_event(message: dict, recipients: int) -> None:
+    frame = encode_event({"event": "message.new", "payload": message})
+    for _ in range(recipients):
+        frame.encode("utf-8")
+
+
+def main(recipients: int, events: int) -> None:
+    messages = [_message(i) for i in range(events)]
+    backend = "orjson" if serialization.orjson is not None else "json"
+    for label, fn in (("legacy", _legacy), ("json-once", _json_once), (f"encode_event[{backend}]", _encode_event)):
+        started = time.process_time()
+        for message in messages:
+            fn(message, recipients)
+        elapsed = time.process_time() - started
+        print(f"{label:<22} {elapsed / events * 1e3:8.3f} ms CPU/event @ {recipients} recipients")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--recipients", type=int, default=1000)
+    parser.add_argument("--events", type=int, default=200)
+    args = parser.parse_args()
+    main(args.recipients, args.events)
@@ -33,8 +33,33 @@ class Settings(BaseSettings):
     DATABASE_URL: Optional[str] = None  # FastAPI uchun (psycopg2 format)
     DB_SSL_MODE: Optional[str] = None  # SSL mode: 'require', 'disable', yoki None (default: disable)
     
+    # Database connection pool (database/connections.py)
+    DB_POOL_MIN_SIZE: int = 2
+    DB_POOL_MAX_SIZE: int = 20
+    DB_POOL_MAX_INACTIVE_LIFETIME: float = 300.0  # Idle connection'lar shu soniyadan keyin yopiladi
+    DB_POOL_MAX_QUERIES: int = 50000  # Shuncha so'rovdan keyin connection qayta yaratiladi
+    DB_POOL_ACQUIRE_TIMEOUT: float = 10.0  # Pool'dan connection kutish chegarasi (soniya)
+    
+    # User qatori keshi (database/basic/user_cache.py)
+    USER_CACHE_TTL: float = 60.0
+    USER_CACHE_MAXSIZE: int = 10000
+    PHONE_CACHE_TTL: float = 600.0  # telefon -> telegram_id xaritasi (qator o'zi user keshidan olinadi)
+    
     # Media
     MEDIA_ROOT: str = "media"
+    MEDIA_ACCESS_CACHE_TTL: float = 60.0  # media ruxsat qarori keshi (api/media.py)
+    MEDIA_CACHE_MAX_AGE: int = 31536000  # xabar media fayllari o'zgarmaydi
+    MEDIA_ACCEL_REDIRECT_PREFIX: Optional[str] = None  # masalan "/protected-media" (nginx internal location)
+    MEDIA_BLOB_DIR: str = "blobs"  # MEDIA_ROOT ichidagi content-addressed store (utils/blob_store.py)
+    MEDIA_BLOB_GC_GRACE_HOURS: float = 24.0  # ref_count=0 blob shuncha vaqtdan keyin o'chiriladi
+    
+    # Rasm variantlari (utils/image_variants.py)
+    IMAGE_WORKERS: int = 0  # 0 = CPU yadrolari soni
+    IMAGE_MAX_PENDING: int = 32  # pool'dagi bir vaqtdagi ishlar chegarasi
+    IMAGE_QUEUE_TIMEOUT: float = 5.0  # navbat to'la bo'lsa shuncha kutib 503
+    IMAGE_MAX_DIMENSION: int = 2048
+    IMAGE_THUMB_DIMENSION: int = 320
+    IMAGE_WEBP_QUALITY: int = 80
     
     # WebApp settings
     WEBAPP_URL: str
@@ -45,6 +70,16 @@ class Settings(BaseSettings):
     PUBLIC_HOST: Optional[str] = None
     WS_URL: Optional[str] = None
     
+    # WebApp session token'lari (api/session_tokens.py)
+    WEBAPP_TOKEN_TTL: int = 3600  # soniya; muddati o'tsa /api/webapp/validate qayta chaqiriladi
+    WEBAPP_INIT_DATA_MAX_AGE: int = 86400  # soniya; auth_date shundan eski initData rad etiladi (0 - tekshirilmaydi)
+    WEBAPP_TOKEN_SECRET: Optional[str] = None  # berilmasa BOT_TOKEN dan hosil qilinadi
+    WEBAPP_REQUIRE_TOKEN: bool = False  # True - faqat telegram_id query bilan kelgan so'rovlar 401
+    
+    # Presence (database/webapp/presence.py)
+    PRESENCE_FLUSH_INTERVAL: float = 5.0  # soniya; users.last_seen_at/is_online shu oraliqda batch yoziladi
+    PRESENCE_RETENTION: float = 600.0  # soniya; offline user yozuvi xotirada shuncha turadi
+    
     # Redis settings (for PubSub and caching)
     REDIS_ENABLED: bool = False
     REDIS_HOST: str = "localhost"
@@ -59,6 +94,10 @@ class Settings(BaseSettings):
     RATE_LIMIT_ENABLED: bool = True
     WS_RATE_LIMIT_TIMES: int = 50  # Number of requests
     WS_RATE_LIMIT_SECONDS: int = 10  # Time window in seconds
+    WS_SEND_QUEUE_SIZE: int = 256  # ulanish outbound navbati; to'lsa client uziladi (api/ws/outbound.py)
+    WS_MAX_TOPICS: int = 100  # /api/ws/user: bitta socket obuna bo'lishi mumkin bo'lgan topic'lar soni
+    WS_COALESCE_WINDOW: float = 0.03  # soniya; /api/ws/user?batch=1 event'larni shu oyna ichida bitta frame'ga yig'adi
+    WS_TYPING_THROTTLE: float = 1.0  # soniya; user+chat bo'yicha typing broadcast oralig'i
     
     # CORS
     ALLOWED_ORIGINS: Optional[str] = None  # Comma-separated list of allowed origins
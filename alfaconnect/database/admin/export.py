@@ -1,8 +1,7 @@
 # database/admin/export.py
 
-import asyncpg
 from typing import List, Dict, Any
-from config import settings
+from database.connections import get_connection
 
 def _get_time_condition(time_period: str, column: str) -> str:
     """
@@ -28,7 +27,7 @@ def _get_time_condition(time_period: str, column: str) -> str:
 
 async def get_admin_users_for_export(user_type: str = "all") -> List[Dict[str, Any]]:
     """Admin uchun foydalanuvchilar ro'yxatini export qilish"""
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         # Build query based on user type
         if user_type == "clients":
@@ -64,7 +63,7 @@ async def get_admin_connection_orders_for_export(time_period: str = "total") ->
     """Admin uchun connection orders ro'yxatini export qilish
     time_period: 'today', 'week', 'month', 'total'
     """
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         time_condition = _get_time_condition(time_period, "co.created_at")
         rows = await conn.fetch(
@@ -96,7 +95,7 @@ async def get_admin_technician_orders_for_export(time_period: str = "total") ->
     """Admin uchun technician orders ro'yxatini export qilish
     time_period: 'today', 'week', 'month', 'total'
     """
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         time_condition = _get_time_condition(time_period, "tech_orders.created_at")
         rows = await conn.fetch(
@@ -127,7 +126,7 @@ async def get_admin_staff_orders_for_export(time_period: str = "total") -> List[
     """Admin uchun staff orders ro'yxatini export qilish
     time_period: 'today', 'week', 'month', 'total'
     """
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         time_condition = _get_time_condition(time_period, "so.created_at")
         rows = await conn.fetch(
@@ -159,7 +158,7 @@ async def get_admin_statistics_for_export(time_period: str = "total") -> Dict[st
     """Admin uchun statistikalar
     time_period: 'today', 'week', 'month', 'total'
     """
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         # Note: total_users and total_materials are not time-filtered
         time_condition_co = _get_time_condition(time_period, "created_at")
@@ -1,12 +1,11 @@
 # database/admin/orders.py
 
-import asyncpg
 from typing import List, Dict, Any
-from config import settings
+from database.connections import get_connection
 
 async def get_connection_orders(limit: int = 50, offset: int = 0) -> List[Dict[str, Any]]:
     """Connection orders ro'yxati"""
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         rows = await conn.fetch(
             """
@@ -42,7 +41,7 @@ async def get_connection_orders(limit: int = 50, offset: int = 0) -> List[Dict[s
 
 async def get_technician_orders(limit: int = 50, offset: int = 0) -> List[Dict[str, Any]]:
     """Technician orders ro'yxati"""
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         rows = await conn.fetch(
             """
@@ -80,7 +79,7 @@ async def get_technician_orders(limit: int = 50, offset: int = 0) -> List[Dict[s
 
 async def get_staff_orders(limit: int = 50, offset: int = 0) -> List[Dict[str, Any]]:
     """Staff orders ro'yxati"""
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         rows = await conn.fetch(
             """
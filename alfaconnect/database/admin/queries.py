@@ -1,12 +1,11 @@
 # database/admin/queries.py
 
-import asyncpg
 from typing import List, Dict, Any, Optional
-from config import settings
+from database.connections import get_connection
 
 async def get_user_statistics() -> Dict[str, Any]:
     """Foydalanuvchilar statistikasi"""
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         # Get basic stats
         stats = await conn.fetchrow(
@@ -43,7 +42,7 @@ async def get_user_statistics() -> Dict[str, Any]:
 
 async def get_system_overview() -> Dict[str, Any]:
     """Tizim umumiy ko'rinishi"""
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         overview = await conn.fetchrow(
             """
@@ -90,7 +89,7 @@ async def get_system_overview() -> Dict[str, Any]:
 
 async def get_recent_activity(limit: int = 10) -> List[Dict[str, Any]]:
     """So'nggi faoliyat"""
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         rows = await conn.fetch(
             """
@@ -128,7 +127,7 @@ async def get_recent_activity(limit: int = 10) -> List[Dict[str, Any]]:
 
 async def get_performance_metrics() -> Dict[str, Any]:
     """Ishlash ko'rsatkichlari"""
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         metrics = await conn.fetchrow(
             """
@@ -145,7 +144,7 @@ async def get_performance_metrics() -> Dict[str, Any]:
 
 async def get_database_info() -> Dict[str, Any]:
     """Database ma'lumotlari"""
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         info = await conn.fetchrow(
             """
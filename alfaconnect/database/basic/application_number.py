@@ -0,0 +1,102 @@
+# database/basic/application_number.py
+# Ariza raqamlarini (application_number) ajratish.
+#
+# Avval har bir yaratishda `MAX(CAST(SUBSTRING(application_number ...)))+1`
+# hisoblanardi - bu butun jadvalni skanerlardi va parallel yaratishda bir xil
+# raqam chiqishi mumkin edi. Endi har bir prefix (masalan STAFF-CONN-B2C-) uchun
+# application_number_counters jadvalida hisoblagich saqlanadi va
+# `UPDATE ... RETURNING` bilan atomik oshiriladi (O(1), qator lock'i bilan).
+#
+# Hisoblagichlar 059_application_number_counters.sql migratsiyasida mavjud
+# maksimumlardan to'ldiriladi. Migratsiyada yo'q prefix birinchi marta
+# so'ralganda shu yerda bir marta MAX skan bilan yaratiladi.
+
+import re
+from typing import Dict, List, Optional
+
+# Ariza turi -> (raqam prefiksi, jadval)
+APPLICATION_KINDS: Dict[str, tuple] = {
+    "STAFF-CONN": ("STAFF-CONN-{business_type}-", "staff_orders"),
+    "STAFF-TECH": ("STAFF-TECH-{business_type}-", "staff_orders"),
+    "CONN": ("CONN-{business_type}-", "connection_orders"),
+    "TECH": ("TECH-{business_type}-", "technician_orders"),
+    "SMA": ("SMA-", "smart_service_orders"),
+}
+
+
+def application_prefix(kind: str, business_type: Optional[str] = None) -> str:
+    """Ariza turi va biznes turidan raqam prefiksini olish (masalan 'STAFF-TECH-B2B-')"""
+    try:
+        template, _ = APPLICATION_KINDS[kind]
+    except KeyError:
+        raise ValueError(f"Unknown application kind: {kind}")
+    return template.format(business_type=business_type or "B2C")
+
+
+def format_application_number(prefix: str, number: int) -> str:
+    return f"{prefix}{number:04d}"
+
+
+async def _seed_counter(conn, kind: str, prefix: str) -> None:
+    """Hisoblagich yo'q bo'lsa, jadvaldagi mavjud maksimumdan yaratish (bir marta)"""
+    _, table = APPLICATION_KINDS[kind]
+    await conn.execute(
+        f"""
+        INSERT INTO application_number_counters (prefix, last_value)
+        SELECT $1, COALESCE(MAX(CAST(SUBSTRING(application_number FROM '([0-9]+)$') AS BIGINT)), 0)
+        FROM {table}
+        WHERE application_number ~ $2
+        ON CONFLICT (prefix) DO NOTHING
+        """,
+        prefix,
+        "^" + re.escape(prefix) + "[0-9]+$",
+    )
+
+
+async def reserve_application_numbers(
+    conn,
+    kind: str,
+    count: int,
+    business_type: Optional[str] = None,
+) -> List[str]:
+    """
+    Ketma-ket `count` ta ariza raqamini bitta so'rov bilan band qilish
+    (ko'p ariza yaratishda har biri uchun alohida murojaat qilmaslik uchun).
+
+    Args:
+        conn: DB connection (tranzaksiya ichida bo'lsa, hisoblagich qatori
+              tranzaksiya oxirigacha bloklanadi)
+        kind: 'STAFF-CONN', 'STAFF-TECH', 'CONN', 'TECH' yoki 'SMA'
+        count: Nechta raqam kerak
+        business_type: 'B2C' / 'B2B' (SMA uchun ishlatilmaydi)
+
+    Returns:
+        List[str]: Band qilingan raqamlar, o'sish tartibida
+    """
+    if count < 1:
+        raise ValueError("count must be positive")
+    prefix = application_prefix(kind, business_type)
+
+    query = """
+        UPDATE application_number_counters
+        SET last_value = last_value + $2, updated_at = NOW()
+        WHERE prefix = $1
+        RETURNING last_value
+    """
+    last_value = await conn.fetchval(query, prefix, count)
+    if last_value is None:
+        await _seed_counter(conn, kind, prefix)
+        last_value = await conn.fetchval(query, prefix, count)
+
+    first = last_value - count + 1
+    return [format_application_number(prefix, n) for n in range(first, last_value + 1)]
+
+
+async def next_application_number(
+    conn,
+    kind: str,
+    business_type: Optional[str] = None,
+) -> str:
+    """Keyingi ariza raqamini olish (masalan 'STAFF-CONN-B2C-0042')"""
+    numbers = await reserve_application_numbers(conn, kind, 1, business_type)
+    return numbers[0]
@@ -1,5 +1,5 @@
-import asyncpg
-from config import settings
+from database.connections import get_connection
+from database.basic.user_cache import get_cached_user, invalidate_user
 from typing import Optional
 
 async def update_user_language(telegram_id: int, language: str) -> bool:
@@ -12,12 +12,13 @@ async def update_user_language(telegram_id: int, language: str) -> bool:
     Returns:
         bool: Muvaffaqiyatli yangilangan bo'lsa True
     """
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         result = await conn.execute(
             'UPDATE users SET language = $1 WHERE telegram_id = $2',
             language, telegram_id
         )
+        invalidate_user(telegram_id)
         return result == "UPDATE 1"
     except Exception as e:
         print(f"Til yangilashda xatolik: {e}")
@@ -28,21 +29,18 @@ async def update_user_language(telegram_id: int, language: str) -> bool:
 async def get_user_language(telegram_id: int) -> Optional[str]:
     """Foydalanuvchi tilini oladi.
     
+    Joriy update uchun UserContextMiddleware yuklagan user qatoridan (yoki
+    TTL keshdan) o'qiydi - alohida DB so'rovi faqat kesh bo'sh bo'lsa bajariladi.
+    
     Args:
         telegram_id: Telegram foydalanuvchi IDsi
         
     Returns:
         Optional[str]: Foydalanuvchi tili (uz yoki ru) yoki None
     """
-    conn = await asyncpg.connect(settings.DB_URL)
     try:
-        result = await conn.fetchval(
-            'SELECT language FROM users WHERE telegram_id = $1',
-            telegram_id
-        )
-        return result
+        user = await get_cached_user(telegram_id)
+        return user.get('language') if user else None
     except Exception as e:
         print(f"Til olishda xatolik: {e}")
-        return None
-    finally:
-        await conn.close()
\ No newline at end of file
+        return None
\ No newline at end of file
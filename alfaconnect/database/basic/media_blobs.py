@@ -0,0 +1,394 @@
+# database/basic/media_blobs.py
+# Content-addressed media store'ning DB qismi (068_media_blobs.sql).
+#
+# Fayllar utils/blob_store.py da sha256 bo'yicha bir marta saqlanadi, bu yerda
+# media_blobs qatori yuritiladi. ref_count ni triggerlar hisoblaydi
+# (messages.attachments->'blobs', akt_documents.file_hash) - kod faqat blob'ni
+# ro'yxatdan o'tkazadi va faylni joylaydi.
+#
+# Tartib muhim: avval register_blob (sha256 bo'yicha advisory lock + qator),
+# keyin fayl joylanadi. GC blob'ning advisory lock'ini session darajasida
+# oladi, qatorni o'chirib commit qiladi, shundan keyingina faylni unlink
+# qiladi va lock'ni qo'yib yuboradi. Bir vaqtdagi upload GC ni kutadi va
+# faylni qaytadan joylaydi; GC tranzaksiyasi bekor bo'lsa fayl o'chirilmaydi.
+# Tranzaksiyasi bekor bo'lgan upload'ning fayli (yoki GC commit'dan keyin
+# to'xtab qolsa) DB qatorisiz qoladi - uni `gc --orphans` grace muddatidan
+# keyin o'chiradi.
+#
+#     python -m database.basic.media_blobs gc [--orphans] [--recount]
+#     python -m database.basic.media_blobs import-legacy [--batch 200]
+#     python -m database.basic.media_blobs prune-legacy
+
+import argparse
+import asyncio
+import json
+import mimetypes
+import os
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from config import settings
+from database.connections import get_connection
+from utils.blob_store import BlobStore, hash_file, is_sha256
+
+blob_store = BlobStore(Path(settings.MEDIA_ROOT) / settings.MEDIA_BLOB_DIR)
+
+# Eski (store'gacha bo'lgan) media papkalari: MEDIA_ROOT/{voice,images}/{chat_id}/{fayl}
+LEGACY_MEDIA_DIRS = ("voice", "images")
+LEGACY_URL_PREFIX = "/api/media/"
+
+# register_blob va GC o'rtasidagi advisory lock kaliti
+_BLOB_LOCK_KEY = "hashtext('media_blob:' || {})"
+
+
+async def register_blob(conn, sha256: str, size: int, content_type: Optional[str]) -> None:
+    """
+    media_blobs qatorini yaratish yoki qulflash (chaqiruvchi tranzaksiyasi ichida).
+    Mavjud, hali havola qilinmagan blob'ning grace muddati yangilanadi.
+    GC shu blob faylini o'chirayotgan bo'lsa, tugashini kutadi.
+    """
+    await conn.execute(f"SELECT pg_advisory_xact_lock({_BLOB_LOCK_KEY.format('$1')})", sha256)
+    await conn.execute(
+        """
+        INSERT INTO media_blobs (sha256, size, content_type)
+        VALUES ($1, $2, $3)
+        ON CONFLICT (sha256) DO UPDATE
+        SET unreferenced_at = CASE WHEN media_blobs.ref_count <= 0 THEN now() END
+        """,
+        sha256, size, content_type
+    )
+
+
+async def store_blob(conn, source, sha256: str, size: int, content_type: Optional[str]) -> Path:
+    """Blob'ni ro'yxatdan o'tkazib source faylni store'ga ko'chirish (source yo'qoladi)"""
+    await register_blob(conn, sha256, size, content_type)
+    return await blob_store.put(source, sha256)
+
+
+async def store_file(path, content_type: Optional[str] = None) -> Tuple[str, Path]:
+    """
+    Tayyor faylni (masalan, yaratilgan AKT) store'ga o'tkazish.
+    Hash bo'laklab, event loop'dan tashqarida hisoblanadi.
+
+    Returns: (sha256, blob yo'li)
+    """
+    sha256, size = await asyncio.to_thread(hash_file, path)
+    conn = await get_connection()
+    try:
+        async with conn.transaction():
+            blob_path = await store_blob(conn, path, sha256, size, content_type)
+    finally:
+        await conn.close()
+    return sha256, blob_path
+
+
+# ---------- GC ----------
+
+def _grace_seconds(grace_hours: Optional[float]) -> float:
+    return (settings.MEDIA_BLOB_GC_GRACE_HOURS if grace_hours is None else grace_hours) * 3600
+
+
+async def collect_garbage(grace_hours: Optional[float] = None, batch: int = 500) -> int:
+    """
+    ref_count=0 bo'lganiga grace muddatidan oshgan blob'larni o'chirish.
+    Fayl faqat qator o'chirilishi commit qilingandan keyin unlink qilinadi.
+    """
+    grace = _grace_seconds(grace_hours)
+    removed = 0
+    last = ""
+    conn = await get_connection()
+    try:
+        while True:
+            candidates = await conn.fetch(
+                """
+                SELECT sha256 FROM media_blobs
+                WHERE ref_count <= 0
+                  AND unreferenced_at < now() - make_interval(secs => $1)
+                  AND sha256 > $3
+                ORDER BY sha256
+                LIMIT $2
+                """,
+                grace, batch, last
+            )
+            if not candidates:
+                return removed
+            last = candidates[-1]["sha256"]
+
+            # Upload'lar register_blob da shu lock'ni kutadi; band bo'lsa keyingi GC'ga qoladi
+            locked = [
+                row["sha256"] for row in candidates
+                if await conn.fetchval(f"SELECT pg_try_advisory_lock({_BLOB_LOCK_KEY.format('$1')})", row["sha256"])
+            ]
+            try:
+                async with conn.transaction():
+                    rows = await conn.fetch(
+                        """
+                        DELETE FROM media_blobs
+                        WHERE sha256 = ANY($1::text[])
+                          AND ref_count <= 0
+                          AND unreferenced_at < now() - make_interval(secs => $2)
+                        RETURNING sha256
+                        """,
+                        locked, grace
+                    )
+                # Commit'dan keyin, lock hali bizda - hech kim qatorni qayta yaratmagan
+                for row in rows:
+                    blob_store.remove(row["sha256"])
+                removed += len(rows)
+            finally:
+                for sha256 in locked:
+                    await conn.fetchval(f"SELECT pg_advisory_unlock({_BLOB_LOCK_KEY.format('$1')})", sha256)
+            if len(candidates) < batch:
+                return removed
+    finally:
+        await conn.close()
+
+
+async def remove_orphans(grace_hours: Optional[float] = None, batch: int = 1000) -> int:
+    """DB qatori yo'q blob fayllar va eski tmp fayllar (grace muddatidan eski)"""
+    cutoff = time.time() - _grace_seconds(grace_hours)
+    removed = 0
+
+    if blob_store.tmp_dir.is_dir():
+        for entry in os.scandir(blob_store.tmp_dir):
+            if entry.is_file() and entry.stat().st_mtime < cutoff:
+                os.remove(entry.path)
+                removed += 1
+
+    async def check(chunk: List[Tuple[str, Path]]) -> int:
+        rows = await conn.fetch(
+            "SELECT sha256 FROM media_blobs WHERE sha256 = ANY($1::text[])",
+            [sha for sha, _ in chunk]
+        )
+        known = {row["sha256"] for row in rows}
+        count = 0
+        for sha, path in chunk:
+            if sha not in known and path.stat().st_mtime < cutoff:
+                blob_store.remove(sha)
+                count += 1
+        return count
+
+    conn = await get_connection()
+    try:
+        chunk: List[Tuple[str, Path]] = []
+        for item in blob_store.iter_blobs():
+            chunk.append(item)
+            if len(chunk) >= batch:
+                removed += await check(chunk)
+                chunk = []
+        if chunk:
+            removed += await check(chunk)
+    finally:
+        await conn.close()
+    return removed
+
+
+async def recount_blobs() -> int:
+    """ref_count ni messages/akt_documents dan qayta hisoblash; tuzatilgan qatorlar soni"""
+    conn = await get_connection()
+    try:
+        return await conn.fetchval("SELECT media_blobs_recount()")
+    finally:
+        await conn.close()
+
+
+# ---------- Eski fayllarni ko'chirish ----------
+
+def _legacy_path(url: Optional[str]) -> Optional[Path]:
+    """/api/media/{voice|images}/{chat_id}/{fayl} -> MEDIA_ROOT/{voice|images}/{chat_id}/{fayl}"""
+    if not url or not url.startswith(LEGACY_URL_PREFIX):
+        return None
+    parts = url[len(LEGACY_URL_PREFIX):].split("?", 1)[0].split("/")
+    if len(parts) != 3 or parts[0] not in LEGACY_MEDIA_DIRS or not parts[1].isdigit():
+        return None
+    if parts[2] in ("", ".", "..") or "\\" in parts[2]:
+        return None
+    return Path(settings.MEDIA_ROOT).joinpath(*parts)
+
+
+def _link_in_place(path: Path, blob_path: Path) -> None:
+    """Eski faylni blob'ga hard link bilan almashtirish (bir xil fayllar bitta inode)"""
+    if os.path.samefile(path, blob_path):
+        return
+    temp = path.with_name(f".{path.name}.blob")
+    try:
+        os.link(blob_path, temp)
+    except OSError:
+        return  # boshqa fayl tizimi - eski fayl prune-legacy gacha qoladi
+    os.replace(temp, path)
+
+
+async def _import_file(conn, path: Path) -> Optional[str]:
+    if not path.is_file():
+        return None
+    sha256, size = await asyncio.to_thread(hash_file, path)
+    await register_blob(conn, sha256, size, mimetypes.guess_type(path.name)[0])
+    blob_path = await asyncio.to_thread(blob_store.put_sync, path, sha256, True)
+    await asyncio.to_thread(_link_in_place, path, blob_path)
+    return sha256
+
+
+async def _import_messages(conn, batch: int) -> int:
+    imported = 0
+    last_id = 0
+    while True:
+        rows = await conn.fetch(
+            """
+            SELECT id, attachments
+            FROM messages
+            WHERE id > $1
+              AND attachments ? 'url'
+              AND NOT attachments ? 'blobs'
+            ORDER BY id
+            LIMIT $2
+            """,
+            last_id, batch
+        )
+        if not rows:
+            return imported
+        for row in rows:
+            last_id = row["id"]
+            attachments = json.loads(row["attachments"])
+            if not isinstance(attachments, dict):
+                continue
+            urls = {"original": attachments.get("url")}
+            if isinstance(attachments.get("variants"), dict):
+                urls.update(attachments["variants"])
+            async with conn.transaction():
+                blobs: Dict[str, str] = {}
+                for variant, url in urls.items():
+                    path = _legacy_path(url)
+                    sha256 = await _import_file(conn, path) if path else None
+                    if sha256:
+                        blobs[variant] = sha256
+                if "original" not in blobs:
+                    continue  # fayl topilmadi - xabar o'zgartirilmaydi
+                # ref_count'ni trigger oshiradi
+                await conn.execute(
+                    "UPDATE messages SET attachments = attachments || jsonb_build_object('blobs', $2::jsonb) WHERE id = $1",
+                    row["id"], json.dumps(blobs)
+                )
+            imported += 1
+
+
+async def _import_akt_documents(conn) -> int:
+    imported = 0
+    blob_root = blob_store.root.resolve()
+    rows = await conn.fetch("SELECT id, akt_number, file_path, file_hash FROM akt_documents ORDER BY id")
+    for row in rows:
+        path = Path(row["file_path"])
+        if not path.is_file() or blob_root in path.resolve().parents:
+            continue
+        async with conn.transaction():
+            sha256, size = await asyncio.to_thread(hash_file, path)
+            await register_blob(conn, sha256, size, mimetypes.guess_type(path.name)[0])
+            blob_path = await asyncio.to_thread(blob_store.put_sync, path, sha256, True)
+            await conn.execute(
+                "UPDATE akt_documents SET file_path = $2, file_hash = $3 WHERE id = $1",
+                row["id"], str(blob_path), sha256
+            )
+        # Faqat shu qator ishlatardi; documents/ dagi yuborilgunga qadar nusxa ham
+        for old in {path, Path("documents") / f"{row['akt_number']}.docx"}:
+            if old.is_file() and (await asyncio.to_thread(hash_file, old))[0] == sha256:
+                os.remove(old)
+        imported += 1
+    return imported
+
+
+async def import_legacy(batch: int = 200) -> Dict[str, int]:
+    """
+    Store'gacha yozilgan voice/rasm/AKT fayllarini store'ga o'tkazish.
+    Xabarlarning eski fayllari blob'ga hard link bo'lib qoladi (qo'shimcha
+    joy olmaydi, eski URL'lar ishlayveradi); ularni prune-legacy o'chiradi.
+    """
+    conn = await get_connection()
+    try:
+        return {
+            "messages": await _import_messages(conn, batch),
+            "akt_documents": await _import_akt_documents(conn),
+        }
+    finally:
+        await conn.close()
+
+
+def _prune_file(path: Path, sha256: str) -> bool:
+    """Eski fayl blob bilan bir xil bo'lsa va blob store'da bo'lsa o'chirish"""
+    if not is_sha256(sha256) or not path.is_file() or path.name.startswith(".") or not blob_store.exists(sha256):
+        return False
+    if hash_file(path)[0] != sha256:
+        return False  # fayl import'dan keyin almashtirilgan
+    os.remove(path)
+    return True
+
+
+async def prune_legacy(batch: int = 500) -> int:
+    """
+    Store'ga o'tkazilgan (attachments'da 'blobs' bor) xabarlarning eski
+    voice/rasm fayllarini o'chirish. Ko'chirilmagan xabarlarning va hech
+    qaysi xabarga tegishli bo'lmagan fayllarga tegilmaydi.
+    """
+    removed = 0
+    last_id = 0
+    conn = await get_connection()
+    try:
+        while True:
+            rows = await conn.fetch(
+                """
+                SELECT id, attachments
+                FROM messages
+                WHERE id > $1
+                  AND attachments ? 'url'
+                  AND attachments ? 'blobs'
+                ORDER BY id
+                LIMIT $2
+                """,
+                last_id, batch
+            )
+            if not rows:
+                return removed
+            for row in rows:
+                last_id = row["id"]
+                attachments = json.loads(row["attachments"])
+                blobs = attachments.get("blobs") if isinstance(attachments, dict) else None
+                if not isinstance(blobs, dict):
+                    continue
+                urls = {"original": attachments.get("url")}
+                if isinstance(attachments.get("variants"), dict):
+                    urls.update(attachments["variants"])
+                for variant, url in urls.items():
+                    path = _legacy_path(url)
+                    sha256 = blobs.get(variant)
+                    if path and isinstance(sha256, str) and await asyncio.to_thread(_prune_file, path, sha256):
+                        removed += 1
+    finally:
+        await conn.close()
+
+
+# ---------- CLI ----------
+
+async def _main(args) -> None:
+    if args.command == "gc":
+        if args.recount:
+            print(f"recounted {await recount_blobs()} blob(s)")
+        print(f"removed {await collect_garbage(args.grace_hours)} unreferenced blob(s)")
+        if args.orphans:
+            print(f"removed {await remove_orphans(args.grace_hours)} orphan file(s)")
+    elif args.command == "import-legacy":
+        result = await import_legacy(args.batch)
+        print(f"imported {result['messages']} message(s), {result['akt_documents']} AKT document(s)")
+    elif args.command == "prune-legacy":
+        print(f"removed {await prune_legacy()} legacy file(s)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Content-addressed media store: GC va eski fayllarni ko'chirish")
+    sub = parser.add_subparsers(dest="command", required=True)
+    gc = sub.add_parser("gc", help="Havola qilinmagan blob'larni o'chirish")
+    gc.add_argument("--grace-hours", type=float, default=None)
+    gc.add_argument("--orphans", action="store_true", help="DB qatori yo'q fayllarni ham tozalash")
+    gc.add_argument("--recount", action="store_true", help="Avval ref_count ni qayta hisoblash")
+    legacy = sub.add_parser("import-legacy", help="Eski voice/rasm/AKT fayllarini store'ga o'tkazish")
+    legacy.add_argument("--batch", type=int, default=200)
+    sub.add_parser("prune-legacy", help="Store'ga o'tkazilgan eski fayllarni o'chirish")
+    asyncio.run(_main(parser.parse_args()))
@@ -0,0 +1,130 @@
+# database/basic/order_counters.py
+# Dashboard hisoblagichlari (order_status_counters jadvalidan).
+#
+# Avval har bir dashboard/inbox sanog'i order jadvallarida COUNT(*) FILTER
+# skanini o'z connection'ida bajarardi. Endi sonlar 062_order_status_counters.sql
+# triggerlari orqali (order_type, status, is_active, region, business_type)
+# kalitlari bo'yicha saqlanadi; "urgent" (1 kundan eski aktiv arizalar)
+# order_counters_sweep() bilan oshirib boriladi.
+#
+# fetch_order_counters() barcha rollar uchun barcha sonlarni bitta so'rov
+# (order_counters_snapshot) bilan oladi; qolgani Python'da yig'iladi.
+
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional, Union
+
+from database.connections import get_connection
+
+ORDER_TYPES = ("connection_orders", "staff_orders", "technician_orders", "smart_service_orders")
+
+# Urgent sweep'lar orasidagi minimal vaqt (soniya)
+URGENT_SWEEP_INTERVAL = 60
+
+
+@dataclass(frozen=True)
+class _CounterRow:
+    order_type: str
+    status: str
+    is_active: bool
+    region: str
+    business_type: str
+    total: int
+    urgent: int
+
+
+def _as_set(value: Union[None, str, Iterable[str]]) -> Optional[set]:
+    if value is None:
+        return None
+    if isinstance(value, str):
+        return {value}
+    return set(value)
+
+
+class OrderCounters:
+    """order_status_counters snapshot'i ustida filtrlab sanash"""
+
+    def __init__(self, rows: Iterable[Any]):
+        self.rows: List[_CounterRow] = [
+            _CounterRow(
+                r["order_type"], r["status"], r["is_active"], r["region"],
+                r["business_type"], int(r["total"]), int(r["urgent"]),
+            )
+            for r in rows
+        ]
+
+    def count(
+        self,
+        order_type: Union[str, Iterable[str], None] = None,
+        status: Union[str, Iterable[str], None] = None,
+        exclude_status: Union[str, Iterable[str], None] = None,
+        active: Optional[bool] = True,
+        region: Union[str, Iterable[str], None] = None,
+        business_type: Union[str, Iterable[str], None] = None,
+        urgent: bool = False,
+    ) -> int:
+        """
+        Filtrlarga mos arizalar soni.
+        active=None - aktiv/noaktiv farqi yo'q; urgent=True - faqat urgent sanog'i.
+        """
+        types = _as_set(order_type)
+        statuses = _as_set(status)
+        excluded = _as_set(exclude_status) or set()
+        regions = _as_set(region)
+        business_types = _as_set(business_type)
+
+        result = 0
+        for row in self.rows:
+            if types is not None and row.order_type not in types:
+                continue
+            if statuses is not None and row.status not in statuses:
+                continue
+            if row.status in excluded:
+                continue
+            if active is not None and row.is_active != active:
+                continue
+            if regions is not None and row.region not in regions:
+                continue
+            if business_types is not None and row.business_type not in business_types:
+                continue
+            result += row.urgent if urgent else row.total
+        return result
+
+    def summary(self, order_type: Union[str, Iterable[str], None] = None, **filters) -> Dict[str, int]:
+        """{"total", "active", "urgent"} - eski COUNT(*) FILTER natijasi shaklida"""
+        return {
+            "total": self.count(order_type, active=None, **filters),
+            "active": self.count(order_type, **filters),
+            "urgent": self.count(order_type, urgent=True, **filters),
+        }
+
+    def by_status(self, order_type: str, active: Optional[bool] = True) -> Dict[str, int]:
+        result: Dict[str, int] = {}
+        for row in self.rows:
+            if row.order_type != order_type or (active is not None and row.is_active != active):
+                continue
+            if row.status:
+                result[row.status] = result.get(row.status, 0) + row.total
+        return result
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Barcha order turlari: total/active/urgent + aktiv arizalar status bo'yicha"""
+        data: Dict[str, Any] = {}
+        for order_type in ORDER_TYPES:
+            data[order_type] = self.summary(order_type)
+            data[order_type]["by_status"] = self.by_status(order_type)
+        data["overall"] = self.summary()
+        return data
+
+
+async def fetch_order_counters(conn=None, sweep_interval: int = URGENT_SWEEP_INTERVAL) -> OrderCounters:
+    """Barcha hisoblagichlarni bitta so'rov bilan olish (kerak bo'lsa urgent sweep bilan)"""
+    sql = "SELECT * FROM order_counters_snapshot(make_interval(secs => $1))"
+    if conn is not None:
+        rows = await conn.fetch(sql, sweep_interval)
+    else:
+        conn = await get_connection()
+        try:
+            rows = await conn.fetch(sql, sweep_interval)
+        finally:
+            await conn.close()
+    return OrderCounters(rows)
@@ -2,9 +2,9 @@
 # Telefon raqamlari bilan bog'liq umumiy funksiyalar
 
 import re
-import asyncpg
 from typing import Optional, Dict, Any
-from config import settings
+from database.connections import get_connection
+from database.basic.user_cache import get_cached_user_by_phone_key, remember_user
 
 # Telefon raqam validatsiyasi uchun regex
 _PHONE_RE = re.compile(
@@ -35,34 +35,60 @@ def normalize_phone(raw: str) -> Optional[str]:
     
     return raw if raw.startswith("+") else ("+" + digits if digits else None)
 
+def phone_lookup_key(raw: str) -> Optional[str]:
+    """
+    Telefon raqamidan qidiruv kalitini olish: E.164 raqamlari, '+' siz
+    (masalan '998901234567'). users.phone_digits ustuni bilan bir xil qoida.
+    """
+    normalized = normalize_phone(raw)
+    if not normalized:
+        return None
+    return re.sub(r"[^\d]", "", normalized) or None
+
+# users.phone_digits ustuni (060 migratsiya) va get_user_by_telegram_id bilan bir xil ustunlar
+USER_LOOKUP_COLUMNS = """
+    id, telegram_id, full_name, username, phone, phone_digits, role, language,
+    region, address, abonent_id, is_blocked, is_online, last_seen_at,
+    created_at, updated_at
+"""
+
 async def find_user_by_phone(phone: str) -> Optional[Dict[str, Any]]:
     """
     Telefon raqam orqali user topish.
+
+    Avval jarayon ichidagi kesh (telefon -> telegram_id -> user qatori),
+    keyin users.phone_digits indeksi bo'yicha bitta qatorli so'rov (bir xil
+    raqam bir nechta userda bo'lsa - eng eski id).
     
     Args:
-        phone: Qidiriladigan telefon raqam
+        phone: Qidiriladigan telefon raqam (istalgan formatda)
         
     Returns:
         User ma'lumotlari yoki None
     """
-    normalized_phone = normalize_phone(phone)
-    if not normalized_phone:
+    key = phone_lookup_key(phone)
+    if not key:
         return None
+
+    user = await get_cached_user_by_phone_key(key)
+    if user is not None:
+        return user
     
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         row = await conn.fetchrow(
-            """
-            SELECT id, full_name, phone, username, telegram_id, role, language, is_blocked, created_at
-            FROM users
-            WHERE phone = $1
-            """,
-            normalized_phone
+            f"SELECT {USER_LOOKUP_COLUMNS} FROM users WHERE phone_digits = $1 ORDER BY id LIMIT 1",
+            key
         )
-        return dict(row) if row else None
     finally:
         await conn.close()
 
+    if row is None:
+        return None
+    user = dict(row)
+    remember_user(user)
+    return user
+
 def validate_phone(phone: str) -> bool:
     """
     Telefon raqamning to'g'riligini tekshirish.
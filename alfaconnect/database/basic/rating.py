@@ -1,8 +1,7 @@
 # database/basic/rating.py
 
-import asyncpg
 from typing import Optional, Dict, Any
-from config import settings
+from database.connections import get_connection
 
 async def save_rating(request_id: int, request_type: str, rating: int, comment: Optional[str] = None) -> bool:
     """
@@ -17,7 +16,7 @@ async def save_rating(request_id: int, request_type: str, rating: int, comment:
     Returns:
         bool: Muvaffaqiyatli saqlangan bo'lsa True
     """
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         # Ensure rating is integer and validate parameters
         rating = int(rating)
@@ -98,7 +97,7 @@ async def get_rating_stats() -> Dict[str, Any]:
     Returns:
         Dict: Reyting statistikasi
     """
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         stats = await conn.fetchrow(
             """
@@ -131,7 +130,7 @@ async def get_rating(request_id: int, request_type: str) -> Optional[Dict[str, A
     Returns:
         Dict: Reyting ma'lumotlari yoki None
     """
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         # Get application_number from the order tables
         app_number_query = """
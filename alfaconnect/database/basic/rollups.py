@@ -0,0 +1,379 @@
+# database/basic/rollups.py
+# Statistika ekranlari uchun kunlik rollup'lar (063_daily_rollups.sql).
+#
+# Avval har bir statistika tugmasi butun tarixni order/material jadvallaridan
+# qayta sanardi. Endi yopilgan kunlar (< bugun) order_daily_rollups va
+# material_daily_rollups jadvallarida saqlanadi, bugungi kun esa har doim
+# jonli hisoblanadi. Oraliq so'rovi = rollup'lar yig'indisi + bugungi qism.
+#
+# Yangilash (refresh_rollups) watermark'dan boshlab inkremental:
+#   - updated_at > watermark bo'lgan arizalarning created_at kunlari qayta
+#     hisoblanadi (status o'zgarishi eski kunning completed/cancelled sonini
+#     o'zgartiradi);
+#   - oxirgi yangilashdan beri yopilgan kunlar (watermark kuni .. kecha) ham.
+# Watermark SAFETY_LAG ga orqada turadi - uzoq tranzaksiyalar o'tkazib yuborilmaydi.
+#
+# Butun tarix 063 migratsiyasida to'ldiriladi va watermark o'sha yerda
+# qo'yiladi; o'qish yo'li (_maybe_refresh) faqat inkremental yangilaydi.
+# Watermark yo'q bo'lsa refresh hech narsa qilmaydi - tarixni qo'lda:
+#     python -m database.basic.rollups backfill --from 2024-01-01 [--to 2025-01-20]
+#     python -m database.basic.rollups refresh
+
+import argparse
+import asyncio
+import calendar
+import logging
+import time
+from datetime import date, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Union
+
+from database.connections import get_connection
+
+logger = logging.getLogger(__name__)
+
+# order jadvali -> (kind ifodasi, status ifodasi)
+ORDER_SOURCES: Dict[str, tuple] = {
+    "connection_orders": ("'connection'", "o.status::text"),
+    "staff_orders": ("o.type_of_zayavka::text", "o.status::text"),
+    "technician_orders": ("'technician'", "o.status::text"),
+    "smart_service_orders": ("'smart_service'", "NULL::text"),
+}
+
+# Yangilashlar orasidagi minimal vaqt (o'qishda avtomatik refresh uchun, soniya)
+REFRESH_INTERVAL = 300
+# Watermark now() dan shuncha orqada turadi
+SAFETY_LAG = timedelta(minutes=5)
+# Backfill bitta tranzaksiyada nechta kunni qayta hisoblaydi
+BACKFILL_CHUNK_DAYS = 31
+
+_LOCK_SQL = "SELECT pg_try_advisory_xact_lock(hashtext('daily_rollups'))"
+_last_refresh = 0.0
+
+
+def _order_rows_sql(table: str) -> str:
+    """Berilgan kunlar ($1::date[]) uchun bitta jadvaldan rollup qatorlari"""
+    kind, status = ORDER_SOURCES[table]
+    return f"""
+        SELECT d.day,
+               '{table}' AS order_type,
+               COALESCE({kind}, '') AS kind,
+               COALESCE(u.role::text, '') AS creator_role,
+               COUNT(*) AS created,
+               COUNT(*) FILTER (WHERE o.is_active) AS active,
+               COUNT(*) FILTER (WHERE {status} = 'completed') AS completed,
+               COUNT(*) FILTER (WHERE {status} = 'cancelled') AS cancelled,
+               COALESCE(SUM(EXTRACT(EPOCH FROM (o.updated_at - o.created_at)) / 3600)
+                        FILTER (WHERE {status} = 'completed'), 0) AS completion_hours_sum
+        FROM unnest($1::date[]) AS d(day)
+        JOIN {table} o ON o.created_at >= d.day AND o.created_at < d.day + 1
+        LEFT JOIN users u ON u.id = o.user_id
+        GROUP BY d.day, 3, 4
+    """
+
+
+_MATERIAL_ROWS_SQL = """
+    SELECT d.day,
+           COALESCE(m.added, 0) AS materials_added,
+           COALESCE(i.cnt, 0) AS issued_count,
+           COALESCE(i.qty, 0) AS issued_quantity,
+           COALESCE(i.cost, 0) AS issued_cost
+    FROM unnest($1::date[]) AS d(day)
+    LEFT JOIN LATERAL (
+        SELECT COUNT(*) AS added FROM materials
+        WHERE created_at >= d.day AND created_at < d.day + 1
+    ) m ON TRUE
+    LEFT JOIN LATERAL (
+        SELECT COUNT(*) AS cnt, SUM(quantity) AS qty, SUM(total_price) AS cost
+        FROM material_issued
+        WHERE issued_at >= d.day AND issued_at < d.day + 1
+    ) i ON TRUE
+"""
+
+
+# ---------- Qayta hisoblash ----------
+
+async def _recompute_days(conn, days: Sequence[date]) -> None:
+    if not days:
+        return
+    days = sorted(set(days))
+    await conn.execute("DELETE FROM order_daily_rollups WHERE day = ANY($1::date[])", days)
+    for table in ORDER_SOURCES:
+        await conn.execute(
+            f"""
+            INSERT INTO order_daily_rollups
+                (day, order_type, kind, creator_role, created, active, completed, cancelled, completion_hours_sum)
+            {_order_rows_sql(table)}
+            """,
+            days,
+        )
+    await conn.execute("DELETE FROM material_daily_rollups WHERE day = ANY($1::date[])", days)
+    await conn.execute(
+        f"""
+        INSERT INTO material_daily_rollups (day, materials_added, issued_count, issued_quantity, issued_cost)
+        {_MATERIAL_ROWS_SQL}
+        """,
+        days,
+    )
+
+
+def _day_range(start: date, end: date) -> List[date]:
+    return [start + timedelta(days=n) for n in range((end - start).days + 1)]
+
+
+async def _dirty_days(conn, watermark, today: date) -> List[date]:
+    """watermark'dan keyin o'zgargan arizalarning (yopilgan) kunlari + yangi yopilgan kunlar"""
+    union = " UNION ".join(
+        f"SELECT created_at::date AS day FROM {table} WHERE updated_at > $1" for table in ORDER_SOURCES
+    )
+    rows = await conn.fetch(f"SELECT day FROM ({union}) d WHERE day < $2", watermark, today)
+    days = {r["day"] for r in rows}
+    days.update(_day_range(watermark.date() - timedelta(days=1), today - timedelta(days=1)))
+    return sorted(d for d in days if d < today)
+
+
+async def refresh_rollups(conn=None) -> int:
+    """
+    Rollup'larni watermark'dan inkremental yangilash.
+    Boshqa jarayon yangilayotgan bo'lsa yoki watermark yo'q bo'lsa (tarix
+    to'ldirilmagan) darhol qaytadi. Qayta hisoblangan kunlar sonini qaytaradi.
+    """
+    global _last_refresh
+    if conn is None:
+        conn = await get_connection()
+        try:
+            return await refresh_rollups(conn)
+        finally:
+            await conn.close()
+
+    async with conn.transaction():
+        if not await conn.fetchval(_LOCK_SQL):
+            return 0
+        today, mark = await conn.fetchrow("SELECT CURRENT_DATE, now() - $1::interval", SAFETY_LAG)
+        watermark = await conn.fetchval("SELECT watermark FROM rollup_watermarks WHERE name = 'daily'")
+        if watermark is None:
+            # To'liq tarixni so'rov ichida hisoblamaymiz (063 migratsiyasi yoki backfill CLI)
+            logger.warning("rollup_watermarks has no 'daily' row - run: python -m database.basic.rollups backfill")
+            return 0
+        days = await _dirty_days(conn, watermark, today)
+
+        for start in range(0, len(days), BACKFILL_CHUNK_DAYS):
+            await _recompute_days(conn, days[start:start + BACKFILL_CHUNK_DAYS])
+        await conn.execute(
+            """
+            INSERT INTO rollup_watermarks (name, watermark, refreshed_at)
+            VALUES ('daily', $1, now())
+            ON CONFLICT (name) DO UPDATE SET watermark = EXCLUDED.watermark, refreshed_at = now()
+            """,
+            mark,
+        )
+    _last_refresh = time.monotonic()
+    return len(days)
+
+
+async def backfill_rollups(date_from: date, date_to: Optional[date] = None, conn=None) -> int:
+    """[date_from, date_to] kunlarini qayta hisoblash (har bir bo'lak alohida tranzaksiyada)"""
+    if conn is None:
+        conn = await get_connection()
+        try:
+            return await backfill_rollups(date_from, date_to, conn)
+        finally:
+            await conn.close()
+
+    today, mark = await conn.fetchrow("SELECT CURRENT_DATE, now() - $1::interval", SAFETY_LAG)
+    last = min(date_to or today, today - timedelta(days=1))
+    days = _day_range(date_from, last) if date_from <= last else []
+    for start in range(0, len(days), BACKFILL_CHUNK_DAYS):
+        async with conn.transaction():
+            await conn.execute("SELECT pg_advisory_xact_lock(hashtext('daily_rollups'))")
+            await _recompute_days(conn, days[start:start + BACKFILL_CHUNK_DAYS])
+    # Watermark yo'q bo'lsa - refresh butun tarixni qayta to'ldirmasligi uchun
+    await conn.execute(
+        """
+        INSERT INTO rollup_watermarks (name, watermark) VALUES ('daily', $1)
+        ON CONFLICT (name) DO NOTHING
+        """,
+        mark,
+    )
+    return len(days)
+
+
+async def _maybe_refresh(conn) -> None:
+    if time.monotonic() - _last_refresh >= REFRESH_INTERVAL:
+        await refresh_rollups(conn)
+
+
+# ---------- O'qish ----------
+
+def _as_list(value: Union[None, str, Iterable[str]]) -> Optional[List[str]]:
+    if value is None:
+        return None
+    return [value] if isinstance(value, str) else list(value)
+
+
+def _empty_day(day: date) -> Dict[str, Any]:
+    return {
+        "date": day,
+        "total_orders": 0,
+        "active_orders": 0,
+        "completed_orders": 0,
+        "cancelled_orders": 0,
+        "connection_orders": 0,
+        "technician_orders": 0,
+        "completion_hours_sum": 0.0,
+    }
+
+
+def _fold_order_rows(rows: Iterable[Any], result: Dict[date, Dict[str, Any]]) -> None:
+    for r in rows:
+        item = result.setdefault(r["day"], _empty_day(r["day"]))
+        item["total_orders"] += int(r["created"])
+        item["active_orders"] += int(r["active"])
+        item["completed_orders"] += int(r["completed"])
+        item["cancelled_orders"] += int(r["cancelled"])
+        item["completion_hours_sum"] += float(r["completion_hours_sum"])
+        if r["kind"] == "connection":
+            item["connection_orders"] += int(r["created"])
+        elif r["kind"] == "technician":
+            item["technician_orders"] += int(r["created"])
+
+
+def _finish(item: Dict[str, Any]) -> Dict[str, Any]:
+    hours = item.pop("completion_hours_sum")
+    item["avg_completion_hours"] = hours / item["completed_orders"] if item["completed_orders"] else None
+    return item
+
+
+async def order_daily_stats(
+    date_from: date,
+    date_to: date,
+    order_types: Union[None, str, Iterable[str]] = None,
+    creator_roles: Union[None, str, Iterable[str]] = None,
+    conn=None,
+) -> List[Dict[str, Any]]:
+    """
+    [date_from, date_to] oralig'idagi kunlik ariza statistikasi (yangi kun birinchi).
+    Har bir kun: total/active/completed/cancelled, connection/technician soni,
+    avg_completion_hours. Arizasiz kunlar qaytarilmaydi.
+    """
+    if conn is None:
+        conn = await get_connection()
+        try:
+            return await order_daily_stats(date_from, date_to, order_types, creator_roles, conn)
+        finally:
+            await conn.close()
+
+    await _maybe_refresh(conn)
+    types = _as_list(order_types) or list(ORDER_SOURCES)
+    roles = _as_list(creator_roles)
+    today = await conn.fetchval("SELECT CURRENT_DATE")
+
+    result: Dict[date, Dict[str, Any]] = {}
+    rows = await conn.fetch(
+        """
+        SELECT day, kind, SUM(created) AS created, SUM(active) AS active,
+               SUM(completed) AS completed, SUM(cancelled) AS cancelled,
+               SUM(completion_hours_sum) AS completion_hours_sum
+        FROM order_daily_rollups
+        WHERE day BETWEEN $1 AND $2
+          AND order_type = ANY($3::text[])
+          AND ($4::text[] IS NULL OR creator_role = ANY($4::text[]))
+        GROUP BY day, kind
+        """,
+        date_from, min(date_to, today - timedelta(days=1)), types, roles,
+    )
+    _fold_order_rows(rows, result)
+
+    # Bugungi kun - jonli
+    if date_from <= today <= date_to:
+        for table in types:
+            live = await conn.fetch(_order_rows_sql(table), [today])
+            _fold_order_rows([r for r in live if roles is None or r["creator_role"] in roles], result)
+
+    return [_finish(result[day]) for day in sorted(result, reverse=True)]
+
+
+async def order_monthly_stats(
+    months: int,
+    order_types: Union[None, str, Iterable[str]] = None,
+    creator_roles: Union[None, str, Iterable[str]] = None,
+    conn=None,
+) -> List[Dict[str, Any]]:
+    """Oxirgi N oy bo'yicha oylik statistika (kunlik rollup'lardan yig'iladi, yangi oy birinchi)"""
+    if conn is None:
+        conn = await get_connection()
+        try:
+            return await order_monthly_stats(months, order_types, creator_roles, conn)
+        finally:
+            await conn.close()
+
+    # Boshqa funksiyalar kabi DB kuni (app server va DB timezone'i farq qilishi mumkin)
+    today = await conn.fetchval("SELECT CURRENT_DATE")
+    year, month = divmod(today.year * 12 + today.month - 1 - months, 12)
+    month += 1
+    start = date(year, month, min(today.day, calendar.monthrange(year, month)[1]))
+
+    result: Dict[date, Dict[str, Any]] = {}
+    for day in await order_daily_stats(start, today, order_types, creator_roles, conn):
+        key = day["date"].replace(day=1)
+        item = result.setdefault(key, _empty_day(key))
+        for field in ("total_orders", "active_orders", "completed_orders", "cancelled_orders",
+                      "connection_orders", "technician_orders"):
+            item[field] += day[field]
+        item["completion_hours_sum"] += (day["avg_completion_hours"] or 0) * day["completed_orders"]
+
+    monthly = []
+    for key in sorted(result, reverse=True):
+        item = _finish(result[key])
+        item["month"] = item.pop("date")
+        monthly.append(item)
+    return monthly
+
+
+async def material_range_stats(date_from: date, date_to: date, conn=None) -> Dict[str, Any]:
+    """[date_from, date_to] oralig'ida qo'shilgan materiallar va chiqim (soni, miqdori, summasi)"""
+    if conn is None:
+        conn = await get_connection()
+        try:
+            return await material_range_stats(date_from, date_to, conn)
+        finally:
+            await conn.close()
+
+    await _maybe_refresh(conn)
+    today = await conn.fetchval("SELECT CURRENT_DATE")
+    rows = list(await conn.fetch(
+        """
+        SELECT day, materials_added, issued_count, issued_quantity, issued_cost
+        FROM material_daily_rollups
+        WHERE day BETWEEN $1 AND $2
+        """,
+        date_from, min(date_to, today - timedelta(days=1)),
+    ))
+    if date_from <= today <= date_to:
+        rows.extend(await conn.fetch(_MATERIAL_ROWS_SQL, [today]))
+
+    return {
+        "materials_added": sum(int(r["materials_added"]) for r in rows),
+        "issued_count": sum(int(r["issued_count"]) for r in rows),
+        "issued_quantity": sum(int(r["issued_quantity"]) for r in rows),
+        "issued_cost": float(sum(r["issued_cost"] for r in rows)),
+    }
+
+
+# ---------- CLI ----------
+
+async def _main(args) -> None:
+    if args.command == "backfill":
+        count = await backfill_rollups(args.date_from, args.date_to)
+        print(f"backfilled {count} day(s)")
+    count = await refresh_rollups()
+    print(f"refreshed {count} day(s)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Daily rollup'larni to'ldirish / yangilash")
+    sub = parser.add_subparsers(dest="command", required=True)
+    backfill = sub.add_parser("backfill", help="Kunlar oralig'ini qayta hisoblash")
+    backfill.add_argument("--from", dest="date_from", type=date.fromisoformat, required=True)
+    backfill.add_argument("--to", dest="date_to", type=date.fromisoformat, default=None)
+    sub.add_parser("refresh", help="Watermark'dan inkremental yangilash")
+    asyncio.run(_main(parser.parse_args()))
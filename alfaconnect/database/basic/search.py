@@ -0,0 +1,239 @@
+# database/basic/search.py
+# Userlar va materiallar bo'yicha umumiy qidiruv (bot handler'lari va /api/user/clients/search).
+#
+# So'rov turi bo'yicha yo'l tanlanadi:
+#   - ariza raqami (STAFF-CONN-..., CONN-..., TECH-..., SMA-...) -> application_number prefiksi
+#   - raqamlar (ID, telegram_id, abonent_id, telefon) -> teng/prefiks qidiruv
+#   - qisqa matn (< 3 belgi) -> lower(...) LIKE 'term%' prefiksi
+#   - matn -> pg_trgm: ILIKE '%term%' yoki o'xshashlik (%), similarity() bo'yicha saralash
+# Barcha yo'llar btree/GIN indekslardan foydalanadi (061_trigram_search_indexes.sql).
+#
+# Natijalar (score DESC, id) bo'yicha saralanadi va keyset pagination qilinadi:
+# sahifa oxiridagi (score, id) juftligi next_cursor sifatida qaytariladi.
+
+import base64
+import re
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from database.connections import get_connection
+
+_APPLICATION_NUMBER_RE = re.compile(r"^(STAFF-)?(CONN|TECH)(-|$)|^SMA(-|$)", re.IGNORECASE)
+_NUMERIC_RE = re.compile(r"^\+?[\d\s\-()]+$")
+_BIGINT_MAX = 2 ** 63 - 1
+
+# Trigram qidiruvi uchun minimal uzunlik (undan qisqasi prefiks bilan qidiriladi)
+TRIGRAM_MIN_LENGTH = 3
+
+USER_SEARCH_COLUMNS = """
+    u.id, u.telegram_id, u.full_name, u.username, u.phone, u.role, u.language,
+    u.region, u.address, u.abonent_id, u.is_blocked, u.is_online, u.last_seen_at,
+    u.created_at, u.updated_at
+"""
+
+MATERIAL_SEARCH_COLUMNS = """
+    m.id, m.name, m.price, m.description, m.quantity, m.serial_number,
+    m.material_unit, m.created_at, m.updated_at
+"""
+
+
+def encode_cursor(score: float, row_id: int) -> str:
+    raw = f"{score!r}:{row_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: Optional[str]) -> Optional[Tuple[float, int]]:
+    """Cursor'ni (score, id) ga aylantirish; noto'g'ri bo'lsa ValueError"""
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        score, row_id = raw.split(":", 1)
+        return float(score), int(row_id)
+    except Exception:
+        raise ValueError("Invalid search cursor")
+
+
+def _escape_like(term: str) -> str:
+    return term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+class _Params:
+    """SQL parametrlarini ($1, $2, ...) yig'ish"""
+
+    def __init__(self):
+        self.values: List[Any] = []
+
+    def add(self, value: Any) -> str:
+        self.values.append(value)
+        return f"${len(self.values)}"
+
+
+def _page_sql(
+    columns: str,
+    from_sql: str,
+    condition: str,
+    score: str,
+    params: _Params,
+    limit: int,
+    cursor: Optional[str],
+    offset: int = 0,
+) -> str:
+    """
+    Umumiy keyset so'rovi: (score DESC, id ASC) tartibida `limit` + 1 ta qator
+    (ortiqcha qator keyingi sahifa borligini bildiradi).
+    """
+    after = decode_cursor(cursor)
+    keyset = ""
+    if after is not None:
+        s = params.add(after[0])
+        i = params.add(after[1])
+        keyset = f"WHERE s.score < {s}::real OR (s.score = {s}::real AND s.id > {i})"
+    limit_p = params.add(limit + 1)
+    offset_p = params.add(offset if after is None else 0)
+
+    return f"""
+        SELECT * FROM (
+            SELECT {columns}, ({score})::real AS score
+            FROM {from_sql}
+            WHERE {condition}
+        ) s
+        {keyset}
+        ORDER BY s.score DESC, s.id
+        LIMIT {limit_p} OFFSET {offset_p}
+    """
+
+
+async def _fetch_page(sql: str, params: _Params, limit: int, conn=None) -> Dict[str, Any]:
+    if conn is not None:
+        rows = await conn.fetch(sql, *params.values)
+    else:
+        conn = await get_connection()
+        try:
+            rows = await conn.fetch(sql, *params.values)
+        finally:
+            await conn.close()
+
+    items = [dict(r) for r in rows[:limit]]
+    next_cursor = None
+    if len(rows) > limit and items:
+        next_cursor = encode_cursor(items[-1]["score"], items[-1]["id"])
+    return {"items": items, "next_cursor": next_cursor}
+
+
+def _user_match(query: str, params: _Params) -> Tuple[str, str]:
+    """So'rov turiga qarab users uchun (condition, score) SQL qismlarini qurish"""
+    q = query.strip()
+
+    if _APPLICATION_NUMBER_RE.match(q):
+        p = params.add(_escape_like(q.upper()) + "%")
+        condition = f"""u.id IN (
+            -- staff_orders.user_id - arizani yaratgan xodim; client abonent_id
+            -- da (users.id matn ko'rinishida), PK indeks uchun bigint'ga
+            SELECT abonent_id::bigint FROM staff_orders
+            WHERE application_number LIKE {p} AND abonent_id ~ '^[0-9]{{1,18}}$'
+            UNION SELECT user_id FROM connection_orders WHERE application_number LIKE {p}
+            UNION SELECT user_id FROM technician_orders WHERE application_number LIKE {p}
+            UNION SELECT user_id FROM smart_service_orders WHERE application_number LIKE {p}
+        )"""
+        return condition, "1.0"
+
+    if _NUMERIC_RE.match(q):
+        digits = re.sub(r"\D", "", q)
+        number = int(digits) if digits and int(digits) <= _BIGINT_MAX else None
+        phone_prefix = digits if digits.startswith("998") or len(digits) > 9 else "998" + digits
+        n = params.add(number)
+        a = params.add(_escape_like(digits) + "%")
+        ph = params.add(_escape_like(phone_prefix) + "%")
+        condition = (
+            f"u.id = {n}::bigint OR u.telegram_id = {n}::bigint "
+            f"OR u.abonent_id LIKE {a} OR u.phone_digits LIKE {ph}"
+        )
+        score = (
+            f"CASE WHEN u.id = {n}::bigint OR u.telegram_id = {n}::bigint THEN 1.0 "
+            f"WHEN u.abonent_id LIKE {a} THEN 0.9 ELSE 0.8 END"
+        )
+        return condition, score
+
+    q = q.lstrip("@")
+    if len(q) < TRIGRAM_MIN_LENGTH:
+        p = params.add(_escape_like(q.lower()) + "%")
+        condition = f"lower(u.full_name) LIKE {p} OR lower(u.username) LIKE {p}"
+        return condition, "1.0"
+
+    t = params.add(q)
+    p = params.add("%" + _escape_like(q) + "%")
+    condition = f"u.full_name ILIKE {p} OR u.username ILIKE {p} OR u.full_name % {t}"
+    score = f"GREATEST(similarity(u.full_name, {t}), similarity(COALESCE(u.username, ''), {t}))"
+    return condition, score
+
+
+async def search_users(
+    query: str,
+    roles: Optional[Sequence[str]] = None,
+    limit: int = 20,
+    cursor: Optional[str] = None,
+    offset: int = 0,
+    conn=None,
+) -> Dict[str, Any]:
+    """
+    Userlarni qidirish (ism, username, telefon, ID, abonent_id, ariza raqami).
+
+    Args:
+        query: Qidiruv matni
+        roles: Faqat shu rollar (masalan ['client']); None - barchasi
+        limit: Sahifa hajmi
+        cursor: Oldingi sahifaning next_cursor qiymati
+        offset: Eski offset pagination uchun (cursor bo'lmasa)
+        conn: Mavjud connection (berilmasa pool'dan olinadi)
+
+    Returns:
+        {"items": [...], "next_cursor": str | None}
+    """
+    if not (query or "").strip():
+        return {"items": [], "next_cursor": None}
+
+    params = _Params()
+    condition, score = _user_match(query, params)
+    if roles:
+        r = params.add(list(roles))
+        condition = f"({condition}) AND u.role::text = ANY({r}::text[])"
+
+    sql = _page_sql(USER_SEARCH_COLUMNS, "users u", condition, score, params, limit, cursor, offset)
+    return await _fetch_page(sql, params, limit, conn)
+
+
+async def search_materials(
+    query: str,
+    limit: int = 20,
+    cursor: Optional[str] = None,
+    conn=None,
+) -> Dict[str, Any]:
+    """
+    Materiallarni qidirish (nomi bo'yicha trigram, ID / seriya raqami prefiksi).
+
+    Returns:
+        {"items": [...], "next_cursor": str | None}
+    """
+    q = (query or "").strip()
+    if not q:
+        return {"items": [], "next_cursor": None}
+
+    params = _Params()
+    if q.isdigit():
+        n = params.add(int(q) if int(q) <= _BIGINT_MAX else None)
+        s = params.add(_escape_like(q) + "%")
+        condition = f"m.id = {n}::bigint OR m.serial_number LIKE {s}"
+        score = f"CASE WHEN m.id = {n}::bigint THEN 1.0 ELSE 0.9 END"
+    elif len(q) < TRIGRAM_MIN_LENGTH:
+        p = params.add(_escape_like(q.lower()) + "%")
+        sn = params.add(_escape_like(q) + "%")
+        condition = f"lower(m.name) LIKE {p} OR m.serial_number LIKE {sn}"
+        score = "1.0"
+    else:
+        t = params.add(q)
+        p = params.add("%" + _escape_like(q) + "%")
+        condition = f"m.name ILIKE {p} OR m.name % {t} OR m.serial_number ILIKE {p}"
+        score = f"similarity(m.name, {t})"
+
+    sql = _page_sql(MATERIAL_SEARCH_COLUMNS, "materials m", condition, score, params, limit, cursor)
+    return await _fetch_page(sql, params, limit, conn)
@@ -1,10 +1,9 @@
 # database/basic/tariff.py
 # Umumiy tariff bilan bog'liq funksiyalar
 
-import asyncpg
 import re
 from typing import Optional, Dict, Any
-from config import settings
+from database.connections import get_connection
 
 def _code_to_name(tariff_code: Optional[str]) -> Optional[str]:
     """Tarif kodini nomga aylantirish."""
@@ -56,7 +55,7 @@ async def get_or_create_tarif_by_code(tariff_code: Optional[str]) -> Optional[in
         base = re.sub(r"^tariff_", "", tariff_code)  # tariff_xxx -> xxx
         name = re.sub(r"_+", " ", base).title()
 
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         async with conn.transaction():
             row = await conn.fetchrow(
@@ -79,7 +78,7 @@ async def get_or_create_tarif_by_code(tariff_code: Optional[str]) -> Optional[in
 
 async def get_tariff_by_id(tariff_id: int) -> Optional[Dict[str, Any]]:
     """Tarif ma'lumotlarini ID bo'yicha olish."""
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         row = await conn.fetchrow(
             "SELECT * FROM tarif WHERE id = $1",
@@ -91,7 +90,7 @@ async def get_tariff_by_id(tariff_id: int) -> Optional[Dict[str, Any]]:
 
 async def get_all_tariffs() -> list[Dict[str, Any]]:
     """Barcha tariflarni olish."""
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         rows = await conn.fetch("SELECT * FROM tarif ORDER BY name")
         return [dict(row) for row in rows]
@@ -100,7 +99,7 @@ async def get_all_tariffs() -> list[Dict[str, Any]]:
 
 async def search_tariffs_by_name(name_pattern: str) -> list[Dict[str, Any]]:
     """Tarif nomi bo'yicha qidirish."""
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         rows = await conn.fetch(
             "SELECT * FROM tarif WHERE name ILIKE $1 ORDER BY name",
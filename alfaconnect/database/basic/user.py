@@ -1,8 +1,9 @@
 # database/basic/user.py
 # Umumiy user bilan bog'liq queries (barcha rollar uchun)
 
-import asyncpg
 from typing import List, Dict, Any, Optional
+from database.connections import get_connection
+from database.basic.user_cache import invalidate_user
 from config import settings
 
 # =========================================================
@@ -24,7 +25,7 @@ async def get_or_create_user(telegram_id: int, username: Optional[str], full_nam
     if telegram_id == settings.BOT_ID:
         return "client"  # Bot uchun default role qaytaradi, lekin bazaga saqlamaydi
     
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         user = await conn.fetchrow(
             'SELECT role, full_name FROM users WHERE telegram_id = $1',
@@ -53,6 +54,7 @@ async def get_or_create_user(telegram_id: int, username: Optional[str], full_nam
                     f"UPDATE users SET {', '.join(update_fields)} WHERE telegram_id = ${param_count}",
                     *params
                 )
+                invalidate_user(telegram_id)
                 
             return user['role']
         else:
@@ -89,7 +91,7 @@ async def get_user_by_id(user_id: int) -> Optional[Dict[str, Any]]:
     """
     User ID orqali user ma'lumotlarini olish.
     """
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         row = await conn.fetchrow(
             """
@@ -121,7 +123,7 @@ async def get_user_by_telegram_id(telegram_id: int) -> Optional[Dict[str, Any]]:
     Telegram ID orqali user ma'lumotlarini olish.
     Barcha rollar uchun umumiy funksiya.
     """
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         row = await conn.fetchrow(
             """
@@ -131,6 +133,7 @@ async def get_user_by_telegram_id(telegram_id: int) -> Optional[Dict[str, Any]]:
                 full_name,
                 username,
                 phone,
+                phone_digits,
                 role,
                 language,   -- 🔑 tilni ham olish kerak
                 region,
@@ -155,7 +158,7 @@ async def get_users_by_role(role: str) -> List[Dict[str, Any]]:
     Role bo'yicha userlarni olish.
     Faqat faol (is_blocked=FALSE) userlarni qaytaradi.
     """
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         rows = await conn.fetch(
             """
@@ -179,7 +182,7 @@ async def ensure_user(telegram_id: int, full_name: str, username: str, role: str
     if telegram_id == settings.BOT_ID:
         return {"id": 0, "telegram_id": telegram_id, "full_name": full_name, "username": username, "role": role}
     
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         # Avval mavjudligini tekshiramiz
         existing = await conn.fetchrow(
@@ -224,33 +227,9 @@ def normalize_phone(raw: str) -> Optional[str]:
         return "+998" + digits
     return raw if raw.startswith("+") else ("+" + digits if digits else None)
 
-async def find_user_by_phone(phone: str) -> Optional[Dict[str, Any]]:
-    """
-    Telefon bo'yicha users dagi yozuvni qidiradi (raqamlar bo'yicha taqqoslash).
-    """
-    phone_n = normalize_phone(phone)
-    if not phone_n:
-        return None
-    conn = await asyncpg.connect(settings.DB_URL)
-    try:
-        row = await conn.fetchrow(
-            """
-            SELECT id, telegram_id, full_name, username, phone, language, region, address,
-                   abonent_id, is_blocked, role
-              FROM users
-             WHERE regexp_replace(phone, '[^0-9]', '', 'g')
-                   = regexp_replace($1,   '[^0-9]', '', 'g')
-             LIMIT 1
-            """,
-            phone_n,
-        )
-        return dict(row) if row else None
-    finally:
-        await conn.close()
-
 async def update_user_phone_by_telegram_id(telegram_id: int, phone: Optional[str]) -> bool:
     """Update user's phone by telegram_id; return True if updated."""
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         sanitized = (phone or "").strip()
         if sanitized:
@@ -264,13 +243,14 @@ async def update_user_phone_by_telegram_id(telegram_id: int, phone: Optional[str
             "UPDATE users SET phone = $1 WHERE telegram_id = $2",
             normalized, telegram_id
         )
+        invalidate_user(telegram_id)
         return result != 'UPDATE 0'
     finally:
         await conn.close()
 
 async def get_user_phone_by_telegram_id(telegram_id: int) -> Optional[str]:
     """Return user's phone by telegram_id or None."""
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         return await conn.fetchval(
             "SELECT phone FROM users WHERE telegram_id = $1",
@@ -285,36 +265,39 @@ async def get_user_phone_by_telegram_id(telegram_id: int) -> Optional[str]:
 
 async def update_user_full_name(telegram_id: int, full_name: str) -> bool:
     """Foydalanuvchi to'liq ismini yangilaydi."""
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         result = await conn.execute(
             'UPDATE users SET full_name = $1 WHERE telegram_id = $2',
             full_name, telegram_id
         )
+        invalidate_user(telegram_id)
         return result != 'UPDATE 0'
     finally:
         await conn.close()
 
 async def update_user_address(telegram_id: int, address: str) -> bool:
     """Foydalanuvchi manzilini yangilaydi."""
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         result = await conn.execute(
             'UPDATE users SET address = $1 WHERE telegram_id = $2',
             address, telegram_id
         )
+        invalidate_user(telegram_id)
         return result != 'UPDATE 0'
     finally:
         await conn.close()
 
 async def update_user_region(telegram_id: int, region: str) -> bool:
     """Foydalanuvchi regionini yangilaydi."""
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         result = await conn.execute(
             'UPDATE users SET region = $1 WHERE telegram_id = $2',
             region, telegram_id
         )
+        invalidate_user(telegram_id)
         return result != 'UPDATE 0'
     finally:
         await conn.close()
@@ -342,7 +325,7 @@ async def update_user_username(telegram_id: int, username: Optional[str]) -> boo
         if not clean_username:  # Faqat @ yoki bo'sh string bo'lsa
             clean_username = None
     
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         # Avval mavjud username ni olish
         current_username = await conn.fetchval(
@@ -359,6 +342,7 @@ async def update_user_username(telegram_id: int, username: Optional[str]) -> boo
             'UPDATE users SET username = $1 WHERE telegram_id = $2',
             clean_username, telegram_id
         )
+        invalidate_user(telegram_id)
         return result != 'UPDATE 0'
     finally:
         await conn.close()
@@ -369,7 +353,7 @@ async def update_user_username(telegram_id: int, username: Optional[str]) -> boo
 
 async def is_user_blocked(telegram_id: int) -> bool:
     """Foydalanuvchi bloklanganligini tekshirish."""
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         result = await conn.fetchval(
             "SELECT COALESCE(is_blocked, FALSE) FROM users WHERE telegram_id = $1",
@@ -381,24 +365,26 @@ async def is_user_blocked(telegram_id: int) -> bool:
 
 async def block_user(telegram_id: int) -> bool:
     """Foydalanuvchini bloklash."""
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         result = await conn.execute(
             "UPDATE users SET is_blocked = TRUE WHERE telegram_id = $1",
             telegram_id
         )
+        invalidate_user(telegram_id)
         return result != 'UPDATE 0'
     finally:
         await conn.close()
 
 async def unblock_user(telegram_id: int) -> bool:
     """Foydalanuvchini blokdan chiqarish."""
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         result = await conn.execute(
             "UPDATE users SET is_blocked = FALSE WHERE telegram_id = $1",
             telegram_id
         )
+        invalidate_user(telegram_id)
         return result != 'UPDATE 0'
     finally:
         await conn.close()
@@ -409,7 +395,7 @@ async def unblock_user(telegram_id: int) -> bool:
 
 async def get_user_role(telegram_id: int) -> Optional[str]:
     """Foydalanuvchi roli."""
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         return await conn.fetchval(
             "SELECT role FROM users WHERE telegram_id = $1",
@@ -420,12 +406,13 @@ async def get_user_role(telegram_id: int) -> Optional[str]:
 
 async def update_user_role(telegram_id: int, role: str) -> bool:
     """Foydalanuvchi roli."""
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         result = await conn.execute(
             "UPDATE users SET role = $1 WHERE telegram_id = $2",
             role, telegram_id
         )
+        invalidate_user(telegram_id)
         return result != 'UPDATE 0'
     finally:
         await conn.close()
@@ -436,7 +423,7 @@ async def update_user_role(telegram_id: int, role: str) -> bool:
 
 async def get_user_orders_count(telegram_id: int) -> int:
     """Get total count of user orders (connection + technician orders)."""
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         user = await conn.fetchrow(
             "SELECT id FROM users WHERE telegram_id = $1",
@@ -463,7 +450,7 @@ async def get_user_orders_count(telegram_id: int) -> int:
 
 async def get_user_orders_paginated(telegram_id: int, offset: int = 0, limit: int = 1) -> list:
     """Get user orders with pagination (connection + technician orders)."""
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         user = await conn.fetchrow(
             "SELECT id FROM users WHERE telegram_id = $1",
@@ -0,0 +1,107 @@
+# database/basic/user_cache.py
+# Telegram user qatorini har bir update uchun bir marta yuklash va keshlash.
+#
+# UserContextMiddleware update boshida get_cached_user() orqali userni oladi va
+# uni joriy context'ga qo'yadi. RoleFilter va get_user_language shu context'dan
+# (yoki TTL keshdan) o'qiydi, shuning uchun bitta update davomida DB ga qayta
+# murojaat qilinmaydi. Role/blok/til o'zgarganda invalidate_user() chaqiriladi.
+#
+# Telefon bo'yicha qidiruv (database/basic/phone.py) uchun phone_digits ->
+# telegram_id xaritasi ham shu yerda. Qatorning o'zi _user_cache dan olinadi,
+# shuning uchun invalidate_user() ikkalasiga ham ta'sir qiladi.
+
+from contextvars import ContextVar, Token
+from typing import Any, Dict, Optional
+
+from config import settings
+from utils.ttl_cache import TTLCache
+
+_user_cache = TTLCache(maxsize=settings.USER_CACHE_MAXSIZE, ttl=settings.USER_CACHE_TTL)
+
+_phone_index = TTLCache(maxsize=settings.USER_CACHE_MAXSIZE, ttl=settings.PHONE_CACHE_TTL)
+
+# Joriy update'ning user qatori (middleware tomonidan o'rnatiladi)
+_current_user: ContextVar[Optional[Dict[str, Any]]] = ContextVar("current_db_user", default=None)
+
+
+async def get_cached_user(telegram_id: int) -> Optional[Dict[str, Any]]:
+    """
+    User qatorini olish: avval joriy update context'i, keyin TTL kesh, oxirida DB.
+    Topilmagan userlar keshlanmaydi (yangi /start qilgan user darhol ko'rinadi).
+    """
+    current = _current_user.get()
+    if current is not None and current.get("telegram_id") == telegram_id:
+        return current
+
+    user = _user_cache.get(telegram_id)
+    if user is not None:
+        return user
+
+    from database.basic.user import get_user_by_telegram_id
+    user = await get_user_by_telegram_id(telegram_id)
+    if user is not None:
+        _user_cache.set(telegram_id, user)
+    return user
+
+
+async def get_cached_user_by_phone_key(phone_key: str) -> Optional[Dict[str, Any]]:
+    """
+    phone_digits kaliti bo'yicha keshdagi userni olish (yo'q bo'lsa None).
+    Xarita eskirgan bo'lsa (telefon o'zgargan) yozuv o'chiriladi.
+    """
+    telegram_id = _phone_index.get(phone_key)
+    if telegram_id is None:
+        return None
+    user = await get_cached_user(telegram_id)
+    if user is None or user.get("phone_digits") != phone_key:
+        _phone_index.pop(phone_key)
+        return None
+    return user
+
+
+def remember_user(user: Dict[str, Any]) -> None:
+    """DB dan o'qilgan user qatorini keshga qo'yish (telefon xaritasi bilan)"""
+    telegram_id = user.get("telegram_id")
+    if telegram_id is None:
+        return
+    _user_cache.set(telegram_id, user)
+    if user.get("phone_digits"):
+        _phone_index.set(user["phone_digits"], telegram_id)
+
+
+def patch_cached_user(telegram_id: int, **fields: Any) -> None:
+    """
+    Keshdagi user qatorining maydonlarini joyida yangilash (bo'lsa).
+    TTL o'zgarmaydi; qatorda yo'q maydonlar qo'shilmaydi.
+    """
+    user = _user_cache.get(telegram_id)
+    if user is None:
+        return
+    for key, value in fields.items():
+        if key in user:
+            user[key] = value
+
+
+def set_current_user(user: Optional[Dict[str, Any]]) -> Token:
+    """Joriy update uchun user qatorini o'rnatish"""
+    return _current_user.set(user)
+
+
+def reset_current_user(token: Token) -> None:
+    _current_user.reset(token)
+
+
+def invalidate_user(telegram_id: Optional[int]) -> None:
+    """User ma'lumotlari o'zgarganda kesh va joriy context'dan olib tashlash"""
+    if telegram_id is None:
+        return
+    _user_cache.pop(telegram_id)
+    current = _current_user.get()
+    if current is not None and current.get("telegram_id") == telegram_id:
+        _current_user.set(None)
+
+
+def get_user_cache_stats() -> Dict[str, Any]:
+    stats = _user_cache.stats()
+    stats["phone_index"] = _phone_index.stats()
+    return stats
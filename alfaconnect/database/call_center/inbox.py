@@ -1,11 +1,6 @@
 # database/call_center/inbox.py
-import asyncpg
 from typing import List, Dict, Any, Optional
-from config import settings
-
-# === Ulash funksiyasi ===
-async def get_connection():
-    return await asyncpg.connect(settings.DB_URL)
+from database.connections import get_connection
 
 # =========================================================
 # USER HELPER FUNCTIONS
@@ -1,47 +1,11 @@
 # database/call_center/orders.py
 import re
-import asyncpg
-from typing import Optional, Dict, Any, Union
-from config import settings
+from typing import Optional, Union
+from database.connections import get_connection
+from database.basic.application_number import next_application_number
 from database.basic.region import normalize_region_code
 from database.basic.phone import normalize_phone
 
-# ---------- TELEFON NORMALIZATSIYA ----------
-
-_PHONE_RE = re.compile(r"^\+?998\s?\d{2}\s?\d{3}\s?\d{2}\s?\d{2}$|^\+?998\d{9}$|^\d{9,12}$")
-
-def _normalize_phone(raw: str) -> Optional[str]:
-    raw = (raw or "").strip()
-    if not _PHONE_RE.match(raw):
-        return None
-    digits = re.sub(r"[^\d]", "", raw)
-    if digits.startswith("998") and len(digits) == 12:
-        return "+" + digits
-    if len(digits) == 9:
-        return "+998" + digits
-    return raw if raw.startswith("+") else ("+" + digits if digits else None)
-
-async def find_user_by_phone(phone: str) -> Optional[Dict[str, Any]]:
-    phone_n = _normalize_phone(phone)
-    if not phone_n:
-        return None
-    conn = await asyncpg.connect(settings.DB_URL)
-    try:
-        row = await conn.fetchrow(
-            """
-            SELECT id, telegram_id, full_name, username, phone, language, region, address,
-                   abonent_id
-            FROM users
-            WHERE regexp_replace(phone, '[^0-9]', '', 'g')
-                  = regexp_replace($1,   '[^0-9]', '', 'g')
-            LIMIT 1
-            """,
-            phone_n,
-        )
-        return dict(row) if row else None
-    finally:
-        await conn.close()
-
 # ---------- TARIF BILAN ISHLASH ----------
 
 def _code_to_name(tariff_code: Optional[str]) -> Optional[str]:
@@ -90,7 +54,7 @@ async def get_or_create_tarif_by_code(tariff_code: Optional[str]) -> Optional[in
         base = re.sub(r"^tariff_", "", tariff_code)
         name = re.sub(r"_+", " ", base).title()
 
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         row = await conn.fetchrow("SELECT id FROM public.tarif WHERE name = $1 LIMIT 1", name)
         if row:
@@ -120,13 +84,9 @@ async def staff_orders_create(
     Call Center Operator TOMONIDAN ulanish arizasini yaratish.
     Default status: 'in_call_center_supervisor'.
     """
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
-        next_number = await conn.fetchval(
-            "SELECT COALESCE(MAX(CAST(SUBSTRING(application_number FROM '\\d+$') AS INTEGER)), 0) + 1 FROM staff_orders WHERE application_number LIKE $1",
-            f"STAFF-CONN-{business_type}-%"
-        )
-        application_number = f"STAFF-CONN-{business_type}-{next_number:04d}"
+        application_number = await next_application_number(conn, "STAFF-CONN", business_type)
 
         normalized_region = normalize_region_code(region) or (str(region).strip() if region is not None else None)
         normalized_phone = normalize_phone(phone) if phone else None
@@ -169,13 +129,9 @@ async def staff_orders_technician_create(
     Call Center Operator TOMONIDAN texnik xizmat arizasini yaratish.
     Default status: 'in_call_center_supervisor'.
     """
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
-        next_number = await conn.fetchval(
-            "SELECT COALESCE(MAX(CAST(SUBSTRING(application_number FROM '\\d+$') AS INTEGER)), 0) + 1 FROM staff_orders WHERE application_number LIKE $1",
-            f"STAFF-TECH-{business_type}-%"
-        )
-        application_number = f"STAFF-TECH-{business_type}-{next_number:04d}"
+        application_number = await next_application_number(conn, "STAFF-TECH", business_type)
 
         normalized_region = normalize_region_code(region) or (str(region).strip() if region is not None else None)
         normalized_phone = normalize_phone(phone) if phone else None
@@ -1,6 +1,5 @@
 # database/call_center_supervisor/export.py
-import asyncpg
-from config import settings
+from database.connections import get_connection
 from typing import List, Dict, Any, Optional
 import logging
 from datetime import datetime, timedelta
@@ -30,7 +29,7 @@ def _get_time_condition(time_period: str, column: str) -> str:
 
 async def get_ccs_connection_orders_for_export() -> List[Dict[str, Any]]:
     """Fetch connection orders handled by call center supervisors for export"""
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         
         # Get orders that are handled by call center operators under this supervisor
@@ -77,7 +76,7 @@ async def get_ccs_operator_orders_for_export(time_period: str = "total") -> List
     """Fetch operator orders handled by call center supervisors for export
     time_period: 'today', 'week', 'month', 'total'
     """
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         time_condition = _get_time_condition(time_period, "so.created_at")
         query = f"""
@@ -124,7 +123,7 @@ async def get_ccs_operator_orders_for_export(time_period: str = "total") -> List
 
 async def get_ccs_operators_for_export() -> List[Dict[str, Any]]:
     """Fetch operators under call center supervisors for export"""
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         query = """
         SELECT 
@@ -168,7 +167,7 @@ async def get_ccs_statistics_for_export(time_period: str = "total") -> List[Dict
     """Fetch statistics for call center supervisors for export
     time_period: 'today', 'week', 'month', 'total'
     """
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         # Get various statistics
         stats = {}
@@ -1,31 +1,20 @@
 # database/call_center_supervisor/inbox.py
-import asyncpg
 from typing import List, Dict, Any, Optional
-from config import settings
+from database.connections import get_connection
+from database.basic.order_counters import fetch_order_counters
 
 # ---------- CCS INBOX FUNKSIYALARI ----------
 
 async def _conn():
     """Database connection"""
-    return await asyncpg.connect(settings.DB_URL)
+    return await get_connection()
 
 # ==================== TECHNICIAN ORDERS (Controllerdan kelgan) ====================
 
 async def ccs_count_technician_orders() -> int:
-    """Controllerdan kelgan texnik arizalar soni."""
-    conn = await _conn()
-    try:
-        count = await conn.fetchval(
-            """
-            SELECT COUNT(*)
-            FROM technician_orders
-            WHERE status = 'in_call_center_supervisor'
-              AND COALESCE(is_active, TRUE) = TRUE
-            """
-        )
-        return int(count or 0)
-    finally:
-        await conn.close()
+    """Controllerdan kelgan texnik arizalar soni (order_status_counters)"""
+    counters = await fetch_order_counters()
+    return counters.count("technician_orders", status="in_call_center_supervisor")
 
 
 async def ccs_fetch_technician_orders(
@@ -112,7 +101,14 @@ async def ccs_fetch_technician_orders(
 # ==================== STAFF ORDERS (Operatordan kelgan) ====================
 
 async def ccs_count_staff_orders() -> int:
-    """Operatordan kelgan staff arizalar soni"""
+    """Operatordan kelgan staff arizalar soni (order_status_counters)"""
+    counters = await fetch_order_counters()
+    return counters.count("staff_orders", status="in_call_center_supervisor")
+
+# ==================== OPERATOR ORDERS (Call Center operatordan kelgan) ====================
+
+async def ccs_count_operator_orders() -> int:
+    """Call Center operatordan kelgan arizalar soni"""
     conn = await _conn()
     try:
         count = await conn.fetchval("""
@@ -120,93 +116,130 @@ async def ccs_count_staff_orders() -> int:
             FROM staff_orders
             WHERE status = 'in_call_center_supervisor'
               AND is_active = TRUE
+              AND user_id IN (
+                  SELECT id FROM users WHERE role = 'callcenter_operator'
+              )
         """)
         return int(count or 0)
     finally:
         await conn.close()
 
-async def ccs_fetch_staff_orders(offset: int = 0, limit: int = 1) -> Optional[Dict[str, Any]]:
-    """Operatordan kelgan staff arizalarni olish"""
+# ==================== KARUSEL (utils/carousel.py) ====================
+# Inbox ochilganda tartiblangan ID lar bir marta olinadi, tafsilotlar esa
+# oynalab `id = ANY($1)` bilan yuklanadi (OFFSET idx LIMIT 1 o'rniga).
+# Status sharti by_ids so'rovlarida ham bor: holati o'zgargan ariza qaytmaydi
+# va karusel uni snapshot'dan chiqaradi.
+
+async def ccs_technician_order_ids() -> List[int]:
+    """Controllerdan kelgan texnik arizalar ID lari (ko'rsatish tartibida)"""
+    conn = await _conn()
+    try:
+        rows = await conn.fetch(
+            """
+            SELECT id
+            FROM technician_orders
+            WHERE status = 'in_call_center_supervisor'
+              AND COALESCE(is_active, TRUE) = TRUE
+            ORDER BY created_at ASC, id ASC
+            """
+        )
+        return [r["id"] for r in rows]
+    finally:
+        await conn.close()
+
+
+async def ccs_fetch_technician_orders_by_ids(ids: List[int]) -> Dict[int, Dict[str, Any]]:
+    """Texnik arizalar tafsilotlari (id -> row), bitta so'rov bilan"""
+    if not ids:
+        return {}
     conn = await _conn()
     try:
-        row = await conn.fetchrow("""
+        rows = await conn.fetch(
+            """
             SELECT 
-                so.id,
-                so.application_number,
-                so.user_id,
-                so.phone,
-                so.region,
-                so.abonent_id,
-                so.address,
-                so.tarif_id,
-                so.description,
-                so.type_of_zayavka,
-                so.status,
-                so.created_at,
-                so.updated_at,
-                
-                -- Client ma'lumotlari
-                COALESCE(client_user.full_name, 'Mijoz') as client_name,
-                COALESCE(client_user.phone, so.phone) as client_phone,
-                client_user.telegram_id as client_telegram_id,
-                
-                -- Yaratuvchi operator ma'lumotlari
-                creator.full_name as operator_name,
-                creator.phone as operator_phone,
-                creator.role as operator_role,
-                
-                -- Tariff yoki muammo
+                tech_orders.id,
+                tech_orders.application_number,
+                tech_orders.user_id,
+                tech_orders.region,
+                tech_orders.abonent_id,
+                tech_orders.address,
+                tech_orders.media,
+                tech_orders.description,
+                tech_orders.description_operator,
+                tech_orders.status,
+                tech_orders.created_at,
+                tech_orders.updated_at,
+                tech_orders.business_type,
+                u.full_name AS client_name,
+                u.phone AS client_phone,
+                u.telegram_id AS client_telegram_id,
                 CASE 
-                    WHEN so.type_of_zayavka = 'connection' THEN t.name
-                    WHEN so.type_of_zayavka = 'technician' THEN so.description
+                    WHEN tech_orders.media IS NOT NULL THEN 'photo'
                     ELSE NULL
-                END as tariff_or_problem
-                
-            FROM staff_orders so
-            LEFT JOIN users creator ON creator.id = so.user_id
-            LEFT JOIN users client_user ON client_user.id::text = so.abonent_id
-            LEFT JOIN tarif t ON t.id = so.tarif_id
-            WHERE so.status = 'in_call_center_supervisor'
-              AND so.is_active = TRUE
-            ORDER BY so.created_at ASC
-            OFFSET $1 LIMIT $2
-        """, offset, limit)
-        
-        return dict(row) if row else None
+                END AS media_type
+            FROM technician_orders tech_orders
+            LEFT JOIN users u ON u.id = tech_orders.user_id
+            WHERE tech_orders.id = ANY($1::bigint[])
+              AND tech_orders.status = 'in_call_center_supervisor'
+              AND COALESCE(tech_orders.is_active, TRUE) = TRUE
+            """,
+            ids,
+        )
+        return {r["id"]: dict(r) for r in rows}
     finally:
         await conn.close()
 
-# ==================== OPERATOR ORDERS (Call Center operatordan kelgan) ====================
 
-async def ccs_count_operator_orders() -> int:
-    """Call Center operatordan kelgan arizalar soni"""
+async def ccs_staff_order_ids() -> List[int]:
+    """Operatordan kelgan staff arizalar ID lari (ko'rsatish tartibida)"""
     conn = await _conn()
     try:
-        count = await conn.fetchval("""
-            SELECT COUNT(*)
+        rows = await conn.fetch("""
+            SELECT id
             FROM staff_orders
             WHERE status = 'in_call_center_supervisor'
               AND is_active = TRUE
-              AND user_id IN (
-                  SELECT id FROM users WHERE role = 'callcenter_operator'
-              )
+            ORDER BY created_at ASC, id ASC
         """)
-        return int(count or 0)
+        return [r["id"] for r in rows]
+    finally:
+        await conn.close()
+
+
+async def ccs_operator_order_ids() -> List[int]:
+    """Call Center operatordan kelgan arizalar ID lari (ko'rsatish tartibida)"""
+    conn = await _conn()
+    try:
+        rows = await conn.fetch("""
+            SELECT so.id
+            FROM staff_orders so
+            JOIN users creator ON creator.id = so.user_id
+            WHERE so.status = 'in_call_center_supervisor'
+              AND so.is_active = TRUE
+              AND creator.role = 'callcenter_operator'
+            ORDER BY so.created_at ASC, so.id ASC
+        """)
+        return [r["id"] for r in rows]
     finally:
         await conn.close()
 
-async def ccs_fetch_operator_orders(offset: int = 0, limit: int = 1) -> Optional[Dict[str, Any]]:
-    """Call Center operatordan kelgan arizalarni olish"""
+
+async def ccs_fetch_staff_orders_by_ids(ids: List[int]) -> Dict[int, Dict[str, Any]]:
+    """Staff / operator arizalar tafsilotlari (id -> row), bitta so'rov bilan"""
+    if not ids:
+        return {}
     conn = await _conn()
     try:
-        row = await conn.fetchrow("""
+        rows = await conn.fetch("""
             SELECT 
                 so.id,
                 so.application_number,
                 so.user_id,
+                so.phone,
                 so.region,
                 so.abonent_id,
                 so.address,
+                so.tarif_id,
                 so.description,
                 so.business_type,
                 so.type_of_zayavka,
@@ -235,14 +268,11 @@ async def ccs_fetch_operator_orders(offset: int = 0, limit: int = 1) -> Optional
             LEFT JOIN users creator ON creator.id = so.user_id
             LEFT JOIN users client_user ON client_user.id::text = so.abonent_id
             LEFT JOIN tarif t ON t.id = so.tarif_id
-            WHERE so.status = 'in_call_center_supervisor'
+            WHERE so.id = ANY($1::bigint[])
+              AND so.status = 'in_call_center_supervisor'
               AND so.is_active = TRUE
-              AND creator.role = 'callcenter_operator'
-            ORDER BY so.created_at ASC
-            OFFSET $1 LIMIT $2
-        """, offset, limit)
-        
-        return dict(row) if row else None
+        """, ids)
+        return {r["id"]: dict(r) for r in rows}
     finally:
         await conn.close()
 
@@ -1,8 +1,8 @@
 # database/call_center_supervisor/orders.py
-import asyncpg
-from config import settings
+from database.connections import get_connection
+from database.basic.application_number import next_application_number
 import re
-from typing import List, Dict, Any, Optional, Union
+from typing import Optional, Union
 
 from database.basic.region import normalize_region_code
 from database.basic.phone import normalize_phone
@@ -19,17 +19,13 @@ async def staff_orders_create(
     business_type: str = "B2C",
     created_by_role: str = "callcenter_supervisor",
 ) -> str:
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         # Parametrlarni to'g'ri formatlash - region integer bo'lsa string'ga aylantirish
         region_str = normalize_region_code(region) or (str(region).strip() if region is not None else None)
         
         # Application number generatsiya qilish - connection arizalar uchun business_type ga qarab
-        next_number = await conn.fetchval(
-            "SELECT COALESCE(MAX(CAST(SUBSTRING(application_number FROM '\\d+$') AS INTEGER)), 0) + 1 FROM staff_orders WHERE application_number LIKE $1",
-            f"STAFF-CONN-{business_type}-%"
-        )
-        application_number = f"STAFF-CONN-{business_type}-{next_number:04d}"
+        application_number = await next_application_number(conn, "STAFF-CONN", business_type)
         
         normalized_phone = normalize_phone(phone) if phone else None
         
@@ -59,14 +55,10 @@ async def staff_orders_technician_create(
     business_type: str = "B2C",
     created_by_role: str = "callcenter_supervisor",
 ) -> str:
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         # Application number generatsiya qilish - texnik arizalar uchun business_type ga qarab
-        next_number = await conn.fetchval(
-            "SELECT COALESCE(MAX(CAST(SUBSTRING(application_number FROM '\\d+$') AS INTEGER)), 0) + 1 FROM staff_orders WHERE application_number LIKE $1",
-            f"STAFF-TECH-{business_type}-%"
-        )
-        application_number = f"STAFF-TECH-{business_type}-{next_number:04d}"
+        application_number = await next_application_number(conn, "STAFF-TECH", business_type)
         
         normalized_region = normalize_region_code(region) or (str(region).strip() if region is not None else None)
         normalized_phone = normalize_phone(phone) if phone else None
@@ -98,7 +90,7 @@ async def staff_orders_technician_create(
 
 async def ccs_send_to_control(order_id: int, supervisor_id: Optional[int] = None) -> None:
     """Controlga jo'natish: status -> in_controller"""
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         await conn.execute("""
             UPDATE staff_orders
@@ -112,7 +104,7 @@ async def ccs_send_to_control(order_id: int, supervisor_id: Optional[int] = None
 
 async def ccs_cancel(order_id: int) -> None:
     """Bekor qilish: is_active -> false"""
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         await conn.execute("""
             UPDATE staff_orders
@@ -123,42 +115,6 @@ async def ccs_cancel(order_id: int) -> None:
     finally:
         await conn.close()
 
-# ---------- FOYDALANUVCHI QIDIRISH ----------
-
-_PHONE_RE = re.compile(r"^\+?998\s?\d{2}\s?\d{3}\s?\d{2}\s?\d{2}$|^\+?998\d{9}$|^\d{9,12}$")
-
-def _normalize_phone(raw: str) -> Optional[str]:
-    raw = (raw or "").strip()
-    if not _PHONE_RE.match(raw):
-        return None
-    digits = re.sub(r"[^\d]", "", raw)
-    if digits.startswith("998") and len(digits) == 12:
-        return "+" + digits
-    if len(digits) == 9:
-        return "+998" + digits
-    return raw if raw.startswith("+") else ("+" + digits if digits else None)
-
-async def find_user_by_phone(phone: str) -> Optional[Dict[str, Any]]:
-    phone_n = _normalize_phone(phone)
-    if not phone_n:
-        return None
-    conn = await asyncpg.connect(settings.DB_URL)
-    try:
-        row = await conn.fetchrow(
-            """
-            SELECT id, telegram_id, full_name, username, phone, language, region, address,
-                   abonent_id, is_blocked
-            FROM users
-            WHERE regexp_replace(phone, '[^0-9]', '', 'g')
-                  = regexp_replace($1,   '[^0-9]', '', 'g')
-            LIMIT 1
-            """,
-            phone_n,
-        )
-        return dict(row) if row else None
-    finally:
-        await conn.close()
-
 # ---------- TARIF BILAN ISHLASH ----------
 
 def _code_to_name(tariff_code: Optional[str]) -> Optional[str]:
@@ -207,7 +163,7 @@ async def get_or_create_tarif_by_code(tariff_code: Optional[str]) -> Optional[in
         base = re.sub(r"^tariff_", "", tariff_code)
         name = re.sub(r"_+", " ", base).title()
 
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         row = await conn.fetchrow("SELECT id FROM public.tarif WHERE name = $1 LIMIT 1", name)
         if row:
@@ -1,6 +1,5 @@
-import asyncpg
 from typing import List, Dict, Any
-from config import settings
+from database.connections import get_connection
 
 async def fetch_callcenter_staff_activity_with_time_filter(time_filter: str = "total") -> List[Dict[str, Any]]:
     """
@@ -8,7 +7,7 @@ async def fetch_callcenter_staff_activity_with_time_filter(time_filter: str = "t
     Faqat call center operator va supervisorlarni ko'rsatadi.
     time_filter: 'today', '7days', 'month', 'total'
     """
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         # Vaqt filtri uchun WHERE sharti
         if time_filter == "total":
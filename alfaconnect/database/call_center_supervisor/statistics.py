@@ -1,6 +1,6 @@
 # database/call_center_supervisor/statistics.py
-import asyncpg
-from config import settings
+from database.connections import get_connection
+from database.basic.rollups import order_daily_stats, order_monthly_stats
 from typing import Dict, Any, List
 from datetime import datetime, timedelta
 
@@ -10,7 +10,7 @@ async def get_active_connection_tasks_count() -> int:
       staff_orders jadvalidan is_active = TRUE
       va status 'completed' EMAS
     """
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         return await conn.fetchval(
             """
@@ -28,7 +28,7 @@ async def get_callcenter_operator_count() -> int:
     Umumiy xodimlar soni:
       users jadvalidan role = 'callcenter_operator'
     """
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         return await conn.fetchval(
             """
@@ -45,7 +45,7 @@ async def get_canceled_connection_tasks_count() -> int:
     Bekor qilingan vazifalar soni:
       staff_orders jadvalidan is_active = False
     """
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         return await conn.fetchval(
             """
@@ -62,7 +62,7 @@ async def get_completed_connection_tasks_count() -> int:
     Yakunlangan vazifalar soni:
       staff_orders jadvalidan status = 'completed'
     """
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         return await conn.fetchval(
             """
@@ -78,7 +78,7 @@ async def get_callcenter_comprehensive_stats() -> Dict[str, Any]:
     """
     Call center uchun to'liq statistika - admin kabi
     """
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         # Umumiy statistika
         total_operators = await conn.fetchval(
@@ -189,7 +189,7 @@ async def get_operator_orders_stat() -> Dict[str, Any]:
     Operatorlar statistikasi:
       Har bir operator uchun arizalar soni
     """
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         rows = await conn.fetch(
             """
@@ -222,61 +222,47 @@ async def get_operator_orders_stat() -> Dict[str, Any]:
 async def get_daily_statistics(days: int = 7) -> List[Dict[str, Any]]:
     """
     Kunlik statistikalar:
-      Oxirgi N kun uchun kunlik arizalar soni
+      Oxirgi N kun uchun kunlik arizalar soni (order_daily_rollups + bugun)
     """
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
-        rows = await conn.fetch(
-            """
-            SELECT 
-                DATE(created_at) as date,
-                COUNT(*) as total_orders,
-                COUNT(CASE WHEN is_active = TRUE THEN 1 END) as active_orders,
-                COUNT(CASE WHEN status = 'completed' THEN 1 END) as completed_orders
-            FROM staff_orders
-            WHERE created_at >= NOW() - make_interval(days => $1)
-            GROUP BY DATE(created_at)
-            ORDER BY date DESC
-            """,
-            days
-        )
-        
-        return [dict(row) for row in rows]
+        # Bugun - DB kuni (rollups.py dagi jonli hisob bilan bir xil)
+        today = await conn.fetchval("SELECT CURRENT_DATE")
+        rows = await order_daily_stats(today - timedelta(days=days), today, order_types="staff_orders", conn=conn)
     finally:
         await conn.close()
+    return [
+        {
+            'date': row['date'],
+            'total_orders': row['total_orders'],
+            'active_orders': row['active_orders'],
+            'completed_orders': row['completed_orders'],
+        }
+        for row in rows
+    ]
 
 async def get_monthly_statistics(months: int = 12) -> List[Dict[str, Any]]:
     """
     Oylik statistikalar:
-      Oxirgi N oy uchun oylik arizalar soni
+      Oxirgi N oy uchun oylik arizalar soni (kunlik rollup'lardan)
     """
-    conn = await asyncpg.connect(settings.DB_URL)
-    try:
-        rows = await conn.fetch(
-            """
-            SELECT 
-                DATE_TRUNC('month', created_at) as month,
-                COUNT(*) as total_orders,
-                COUNT(CASE WHEN is_active = TRUE THEN 1 END) as active_orders,
-                COUNT(CASE WHEN status = 'completed' THEN 1 END) as completed_orders
-            FROM staff_orders
-            WHERE created_at >= NOW() - make_interval(months => $1)
-            GROUP BY DATE_TRUNC('month', created_at)
-            ORDER BY month DESC
-            """,
-            months
-        )
-        
-        return [dict(row) for row in rows]
-    finally:
-        await conn.close()
+    rows = await order_monthly_stats(months, order_types="staff_orders")
+    return [
+        {
+            'month': row['month'],
+            'total_orders': row['total_orders'],
+            'active_orders': row['active_orders'],
+            'completed_orders': row['completed_orders'],
+        }
+        for row in rows
+    ]
 
 async def get_status_statistics() -> Dict[str, int]:
     """
     Status bo'yicha statistikalar:
       Har bir status uchun arizalar soni
     """
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         rows = await conn.fetch(
             """
@@ -299,7 +285,7 @@ async def get_type_statistics() -> Dict[str, int]:
     Tur bo'yicha statistikalar:
       Har bir ariza turi uchun arizalar soni
     """
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         rows = await conn.fetch(
             """
@@ -322,7 +308,7 @@ async def get_performance_metrics() -> Dict[str, Any]:
     Ishlash ko'rsatkichlari:
       Call center uchun performance metrikalari
     """
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         # Bugungi ishlash ko'rsatkichlari
         today_metrics = await conn.fetchrow(
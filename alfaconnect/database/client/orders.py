@@ -1,5 +1,7 @@
 import asyncpg
-from config import settings
+from database.connections import get_connection
+from database.basic.application_number import next_application_number
+from database.basic.user_cache import patch_cached_user
 from typing import Optional
 
 # Valid region names (matching database schema)
@@ -41,7 +43,7 @@ def _tariff_code_to_name(code: str) -> str:
 
 async def ensure_user(telegram_id: int, full_name: Optional[str], username: Optional[str]) -> asyncpg.Record:
     """Create user if not exists with sequential ID; return row."""
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         # Avval mavjud userni tekshirish
         existing_user = await conn.fetchrow(
@@ -60,6 +62,12 @@ async def ensure_user(telegram_id: int, full_name: Optional[str], username: Opti
                 """,
                 telegram_id, full_name, username
             )
+            patch_cached_user(
+                telegram_id,
+                full_name=row["full_name"],
+                username=row["username"],
+                updated_at=row["updated_at"]
+            )
             return row
         else:
             # Ketma-ket ID bilan yangi user yaratish
@@ -76,7 +84,7 @@ async def ensure_user(telegram_id: int, full_name: Optional[str], username: Opti
 async def get_or_create_tarif_by_code(code: str) -> int:
     """Return existing tarif id by code. Does NOT create new rows."""
     name = _tariff_code_to_name(code)
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         tid = await conn.fetchval("SELECT id FROM tarif WHERE name = $1", name)
         return tid
@@ -107,28 +115,11 @@ async def create_service_order(user_id: int, region: str, abonent_id: str, addre
     if region_normalized not in VALID_REGIONS:
         region_normalized = 'tashkent_city'  # Default to Toshkent city if not found
 
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         # Generate application number
         # Get next number for this business type
-        next_num = await conn.fetchval(
-            """
-            SELECT COALESCE(MAX(
-                CASE 
-                    WHEN application_number ~ '^TECH-B2C-[0-9]+$' AND $1 = 'B2C' THEN 
-                        CAST(SUBSTRING(application_number FROM 'TECH-B2C-([0-9]+)$') AS INTEGER)
-                    WHEN application_number ~ '^TECH-B2B-[0-9]+$' AND $1 = 'B2B' THEN 
-                        CAST(SUBSTRING(application_number FROM 'TECH-B2B-([0-9]+)$') AS INTEGER)
-                    ELSE 0
-                END
-            ), 0) + 1
-            FROM technician_orders 
-            WHERE application_number IS NOT NULL
-            """,
-            business_type
-        )
-        
-        application_number = f"TECH-{business_type}-{next_num:04d}"
+        application_number = await next_application_number(conn, "TECH", business_type)
         
         row = await conn.fetchrow(
             """
@@ -148,28 +139,11 @@ async def create_connection_order(user_id: int, region: str, address: str, tarif
     if region_normalized not in VALID_REGIONS:
         region_normalized = 'tashkent_city'  # Default to Toshkent city if not found
     
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         # Generate application number
         # Get next number for this business type
-        next_num = await conn.fetchval(
-            """
-            SELECT COALESCE(MAX(
-                CASE 
-                    WHEN application_number ~ '^CONN-B2C-[0-9]+$' AND $1 = 'B2C' THEN 
-                        CAST(SUBSTRING(application_number FROM 'CONN-B2C-([0-9]+)$') AS INTEGER)
-                    WHEN application_number ~ '^CONN-B2B-[0-9]+$' AND $1 = 'B2B' THEN 
-                        CAST(SUBSTRING(application_number FROM 'CONN-B2B-([0-9]+)$') AS INTEGER)
-                    ELSE 0
-                END
-            ), 0) + 1
-            FROM connection_orders 
-            WHERE application_number IS NOT NULL
-            """,
-            business_type
-        )
-        
-        application_number = f"CONN-{business_type}-{next_num:04d}"
+        application_number = await next_application_number(conn, "CONN", business_type)
         
         row = await conn.fetchrow(
             """
@@ -190,25 +164,11 @@ async def create_smart_service_order(order_data: dict) -> int:
     if not user_id or user_id == 0:
         raise ValueError("user_id is required and cannot be NULL or 0")
     
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         # Generate application number for smart service
         # Get next number for smart service orders
-        next_num = await conn.fetchval(
-            """
-            SELECT COALESCE(MAX(
-                CASE 
-                    WHEN application_number ~ '^SMA-[0-9]+$' THEN 
-                        CAST(SUBSTRING(application_number FROM 'SMA-([0-9]+)$') AS INTEGER)
-                    ELSE 0
-                END
-            ), 0) + 1
-            FROM smart_service_orders 
-            WHERE application_number IS NOT NULL
-            """
-        )
-        
-        application_number = f"SMA-{next_num:04d}"
+        application_number = await next_application_number(conn, "SMA")
         
         row = await conn.fetchrow(
             """
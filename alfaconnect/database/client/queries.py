@@ -1,11 +1,12 @@
 import asyncpg
-from config import settings
+from database.connections import get_connection
 from typing import Optional
 
 from database.basic.phone import normalize_phone
+from database.basic.user_cache import invalidate_user
 
 async def find_user_by_telegram_id(telegram_id: int) -> Optional[asyncpg.Record]:
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         result = await conn.fetchrow(
             """
@@ -53,7 +54,7 @@ def get_region_display_name(region_code):
 
 async def get_user_phone_by_telegram_id(telegram_id: int) -> Optional[str]:
     """Return user's phone by telegram_id or None."""
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         return await conn.fetchval(
             "SELECT phone FROM users WHERE telegram_id = $1",
@@ -64,7 +65,7 @@ async def get_user_phone_by_telegram_id(telegram_id: int) -> Optional[str]:
 
 async def update_user_phone_by_telegram_id(telegram_id: int, phone: Optional[str]) -> bool:
     """Update user's phone by telegram_id; return True if updated."""
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         sanitized = (phone or "").strip()
         if sanitized:
@@ -78,6 +79,7 @@ async def update_user_phone_by_telegram_id(telegram_id: int, phone: Optional[str
             "UPDATE users SET phone = $1 WHERE telegram_id = $2",
             normalized, telegram_id
         )
+        invalidate_user(telegram_id)
         return result != 'UPDATE 0'
     finally:
         await conn.close()
@@ -88,7 +90,7 @@ async def update_user_phone_by_telegram_id(telegram_id: int, phone: Optional[str
 
 async def get_user_orders_count(telegram_id: int) -> int:
     """Get total count of user orders (connection + technician orders)."""
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         user = await conn.fetchrow(
             "SELECT id FROM users WHERE telegram_id = $1",
@@ -115,7 +117,7 @@ async def get_user_orders_count(telegram_id: int) -> int:
 
 async def get_user_orders_paginated(telegram_id: int, offset: int = 0, limit: int = 1) -> list:
     """Get user orders with pagination (connection + technician orders)."""
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         user = await conn.fetchrow(
             "SELECT id FROM users WHERE telegram_id = $1",
@@ -181,7 +183,7 @@ async def get_user_orders_paginated(telegram_id: int, offset: int = 0, limit: in
 
 async def get_smart_service_orders_by_user(user_id: int, limit: int = 10, offset: int = 0):
     """Get smart service orders for a specific user."""
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         orders = await conn.fetch(
             """
@@ -215,12 +217,13 @@ async def update_user_full_name(telegram_id: int, full_name: str) -> bool:
     Returns:
         bool: Muvaffaqiyatli yangilangan bo'lsa True, aks holda False
     """
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         result = await conn.execute(
             'UPDATE users SET full_name = $1 WHERE telegram_id = $2',
             full_name, telegram_id
         )
+        invalidate_user(telegram_id)
         return result != 'UPDATE 0'
     finally:
         await conn.close()
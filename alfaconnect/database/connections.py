@@ -1,36 +1,199 @@
 # database/connections.py
 # Database connection utilities
+#
+# Jarayon bo'ylab umumiy asyncpg pool. Bot (main.py) va FastAPI (api/server.py)
+# turli event loop'larda ishlaydi (uvicorn alohida thread'da), asyncpg pool esa
+# o'z loop'iga bog'langan - shuning uchun har bir loop uchun alohida pool saqlanadi.
+
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, Optional
 
 import asyncpg
 from config import settings
 
+logger = logging.getLogger(__name__)
+
+# loop -> pool
+_pools: Dict[asyncio.AbstractEventLoop, asyncpg.Pool] = {}
+_pool_locks: Dict[asyncio.AbstractEventLoop, asyncio.Lock] = {}
+
+# Pool metrikalari (/api/metrics uchun)
+_pool_stats = {
+    "acquire_count": 0,
+    "acquire_wait_total_ms": 0.0,
+    "acquire_wait_max_ms": 0.0,
+    "acquire_timeouts": 0,
+}
+
+
 def get_connection_url() -> str:
     """
     Get the database connection URL from settings.
-    
+
     Returns:
         str: The database connection URL
     """
     return settings.DB_URL
 
-async def get_asyncpg_connection():
-    """
-    Get asyncpg connection with SSL disabled for local network connections.
-    This helps when pg_hba.conf doesn't allow connections from specific IPs.
-    
-    Returns:
-        asyncpg.Connection: Database connection
-    """
+
+def _resolve_ssl():
+    """DB_SSL_MODE sozlamasidan asyncpg uchun ssl parametrini aniqlash"""
     # SSL ni disable qilish - local network uchun
     # Agar kerak bo'lsa, .env da DB_SSL_MODE ni qo'shish mumkin
     ssl_mode = getattr(settings, 'DB_SSL_MODE', None)
-    
+
     if ssl_mode == 'require':
-        ssl = 'require'
-    elif ssl_mode == 'disable':
-        ssl = False
-    else:
-        # Default: SSL ni disable qilish (local network uchun)
-        ssl = False
-    
-    return await asyncpg.connect(settings.DB_URL, ssl=ssl)
+        return 'require'
+    # Default: SSL ni disable qilish (local network uchun)
+    return False
+
+
+async def init_pool() -> asyncpg.Pool:
+    """
+    Joriy event loop uchun connection pool yaratish (agar hali yaratilmagan bo'lsa).
+
+    main.py va api/server.py startup hook'ida chaqiriladi. Boshqa joylarda
+    birinchi get_connection() chaqiruvida avtomatik yaratiladi.
+
+    Returns:
+        asyncpg.Pool: Joriy loop uchun pool
+    """
+    loop = asyncio.get_running_loop()
+    pool = _pools.get(loop)
+    if pool is not None:
+        return pool
+
+    lock = _pool_locks.setdefault(loop, asyncio.Lock())
+    async with lock:
+        pool = _pools.get(loop)
+        if pool is None:
+            pool = await asyncpg.create_pool(
+                settings.DB_URL,
+                ssl=_resolve_ssl(),
+                min_size=settings.DB_POOL_MIN_SIZE,
+                max_size=settings.DB_POOL_MAX_SIZE,
+                max_inactive_connection_lifetime=settings.DB_POOL_MAX_INACTIVE_LIFETIME,
+                max_queries=settings.DB_POOL_MAX_QUERIES,
+            )
+            _pools[loop] = pool
+            logger.info(
+                "DB pool created (min=%s, max=%s)",
+                settings.DB_POOL_MIN_SIZE,
+                settings.DB_POOL_MAX_SIZE,
+            )
+    return pool
+
+
+async def close_pool() -> None:
+    """Joriy event loop'ning pool'ini yopish (shutdown uchun)"""
+    loop = asyncio.get_running_loop()
+    pool = _pools.pop(loop, None)
+    _pool_locks.pop(loop, None)
+    if pool is not None:
+        await pool.close()
+        logger.info("DB pool closed")
+
+
+async def _acquire_raw() -> tuple[asyncpg.Pool, asyncpg.Connection]:
+    pool = _pools.get(asyncio.get_running_loop()) or await init_pool()
+    started = time.perf_counter()
+    try:
+        conn = await pool.acquire(timeout=settings.DB_POOL_ACQUIRE_TIMEOUT)
+    except asyncio.TimeoutError:
+        _pool_stats["acquire_timeouts"] += 1
+        logger.warning("DB pool acquire timed out after %ss", settings.DB_POOL_ACQUIRE_TIMEOUT)
+        raise
+    waited_ms = (time.perf_counter() - started) * 1000
+    _pool_stats["acquire_count"] += 1
+    _pool_stats["acquire_wait_total_ms"] += waited_ms
+    if waited_ms > _pool_stats["acquire_wait_max_ms"]:
+        _pool_stats["acquire_wait_max_ms"] = waited_ms
+    return pool, conn
+
+
+@asynccontextmanager
+async def acquire() -> AsyncIterator[asyncpg.Connection]:
+    """
+    Pool'dan connection olish uchun context manager.
+
+    Usage:
+        async with acquire() as conn:
+            row = await conn.fetchrow(...)
+    """
+    pool, conn = await _acquire_raw()
+    try:
+        yield conn
+    finally:
+        await pool.release(conn)
+
+
+class PooledConnection:
+    """
+    asyncpg.connect() natijasi o'rnida ishlatiladigan pool connection.
+
+    Mavjud `conn = ...; try: ... finally: await conn.close()` kodlari
+    o'zgarmasdan ishlashi uchun: close() connection'ni yopmaydi, pool'ga qaytaradi.
+    Qolgan barcha atributlar (fetch, execute, transaction, ...) asl connection'ga
+    delegatsiya qilinadi.
+    """
+    __slots__ = ("_pool", "_conn")
+
+    def __init__(self, pool: asyncpg.Pool, conn: asyncpg.Connection):
+        self._pool = pool
+        self._conn = conn
+
+    def __getattr__(self, name: str) -> Any:
+        if self._conn is None:
+            raise asyncpg.InterfaceError("connection has been released back to the pool")
+        return getattr(self._conn, name)
+
+    def is_closed(self) -> bool:
+        return self._conn is None or self._conn.is_closed()
+
+    async def close(self, *, timeout: Optional[float] = None) -> None:
+        """Connection'ni pool'ga qaytarish (takroriy chaqiruv xavfsiz)"""
+        conn, self._conn = self._conn, None
+        if conn is not None:
+            await self._pool.release(conn, timeout=timeout)
+
+
+async def get_connection() -> PooledConnection:
+    """
+    Pool'dan connection olish (asyncpg.connect() o'rniga).
+
+    Returns:
+        PooledConnection: close() chaqirilganda pool'ga qaytadigan connection
+    """
+    pool, conn = await _acquire_raw()
+    return PooledConnection(pool, conn)
+
+
+async def get_asyncpg_connection() -> PooledConnection:
+    """
+    Get asyncpg connection from the shared pool.
+    SSL sozlamasi pool yaratilganda DB_SSL_MODE dan olinadi.
+
+    Returns:
+        PooledConnection: Database connection
+    """
+    return await get_connection()
+
+
+def get_pool_stats() -> Dict[str, Any]:
+    """Pool hajmi va kutish vaqti metrikalari"""
+    pools = [pool for pool in _pools.values() if not pool.is_closing()]
+    count = _pool_stats["acquire_count"]
+    return {
+        "pools": len(pools),
+        "min_size": settings.DB_POOL_MIN_SIZE,
+        "max_size": settings.DB_POOL_MAX_SIZE,
+        "size": sum(pool.get_size() for pool in pools),
+        "idle": sum(pool.get_idle_size() for pool in pools),
+        "acquire_count": count,
+        "acquire_timeouts": _pool_stats["acquire_timeouts"],
+        "avg_wait_ms": _pool_stats["acquire_wait_total_ms"] / count if count else 0.0,
+        "max_wait_ms": _pool_stats["acquire_wait_max_ms"],
+    }
@@ -1,9 +1,8 @@
 # database/controller/export.py
 
 from typing import List, Dict, Any
-import asyncpg
 import logging
-from config import settings
+from database.connections import get_connection
 
 logger = logging.getLogger(__name__)
 
@@ -39,7 +38,7 @@ async def get_controller_orders_for_export(time_period: str = "total") -> List[D
     Faqat texnik arizalar: technician_orders va staff_orders (type_of_zayavka = 'technician').
     time_period: 'today', 'week', 'month', 'total'
     """
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         # Time filter WHERE condition
         time_condition = _get_time_condition(time_period, "t.created_at")
@@ -134,7 +133,7 @@ async def get_controller_statistics_for_export(time_period: str = "total") -> Di
     Controller uchun statistika export.
     time_period: 'today', 'week', 'month', 'total'
     """
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         # 1. Asosiy statistika
         stats = {}
@@ -270,7 +269,7 @@ async def get_controller_employees_for_export() -> List[Dict[str, Any]]:
     """
     Controller uchun xodimlar ro'yxatini export uchun olish.
     """
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         users = await conn.fetch(
             """
@@ -1,9 +1,8 @@
 # database/controller/monitoring.py
 
 from typing import Dict, Any, List
-import asyncpg
 import logging
-from config import settings
+from database.connections import get_connection
 
 logger = logging.getLogger(__name__)
 
@@ -15,7 +14,7 @@ async def get_realtime_counts() -> Dict[str, int]:
     """
     Controller uchun real-time counts olish.
     """
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         stats = await conn.fetchrow(
             """
@@ -49,7 +48,7 @@ async def list_active_orders_detailed(limit: int = 50) -> List[Dict[str, Any]]:
     """
     Controller uchun aktiv orders ro'yxatini batafsil olish.
     """
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         rows = await conn.fetch(
             """
@@ -116,7 +115,7 @@ async def get_controller_workflow_history(order_id: int) -> Dict[str, Any]:
     """
     Controller uchun workflow history olish.
     """
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         # Order ma'lumotlarini olamiz
         order_info = await conn.fetchrow(
@@ -196,7 +195,7 @@ async def get_controller_technician_load() -> List[Dict[str, Any]]:
     Controller uchun technician load monitoring.
     Counts ALL order types: connection_orders, technician_orders, and staff_orders.
     """
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         rows = await conn.fetch(
             """
@@ -1,9 +1,8 @@
 # database/controller/queries.py
 
 from typing import List, Dict, Any, Optional
-import asyncpg
 import logging
-from config import settings
+from database.connections import get_connection
 
 logger = logging.getLogger(__name__)
 
@@ -32,7 +31,7 @@ async def fetch_controller_inbox_staff(limit: int = 50, offset: int = 0) -> List
     Controller inbox - staff orders ro'yxatini olish.
     Faqat 'in_controller' statusdagi staff orders va faqat texnik xizmat arizalari (type_of_zayavka = 'technician').
     """
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         rows = await conn.fetch(
             """
@@ -106,7 +105,7 @@ async def count_controller_inbox_staff() -> int:
     Controller inbox - staff orders sonini olish.
     Faqat texnik xizmat arizalari (type_of_zayavka = 'technician').
     """
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         count = await conn.fetchval(
             """
@@ -154,7 +153,7 @@ async def assign_to_technician_for_staff(request_id: int | str, tech_id: int, ac
     except Exception:
         request_id_int = int(request_id)
 
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         async with conn.transaction():
             # Technician mavjudmi? + uning ma'lumotlarini olamiz
@@ -264,7 +263,7 @@ async def get_technicians_with_load_via_history() -> List[Dict[str, Any]]:
     Technicianlarni hozirgi yuklamasi (barcha turdagi arizalar soni) bilan olish.
     Counts ALL order types: connection_orders, technician_orders, and staff_orders.
     """
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         rows = await conn.fetch(
             """
@@ -345,7 +344,7 @@ async def get_technicians_with_load_via_history() -> List[Dict[str, Any]]:
 
 async def list_controller_orders_by_status(status: str, limit: int = 50) -> List[Dict[str, Any]]:
     """Controller arizalarini status bo'yicha olish."""
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         rows = await conn.fetch(
             """
@@ -378,7 +377,7 @@ async def fetch_controller_inbox_connection(limit: int = 50, offset: int = 0) ->
     Faqat 'in_controller' statusdagi connection orders.
     jm_notes ni ham olamiz.
     """
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         rows = await conn.fetch(
             """
@@ -421,7 +420,7 @@ async def fetch_controller_inbox_tech(limit: int = 50, offset: int = 0) -> List[
     1. technician_orders.media ustunidagi eski usul
     2. media_files jadvalidagi yangi usul
     """
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         rows = await conn.fetch(
             """
@@ -492,7 +491,7 @@ async def assign_to_technician_connection(request_id: int, tech_id: int, actor_i
     Connection order ni texnikka yuborish.
     Status: in_controller -> in_technician
     """
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         # Update connection_orders
         await conn.execute(
@@ -595,7 +594,7 @@ async def assign_to_technician_tech(request_id: int, tech_id: int, actor_id: int
     Tech service order ni texnikka yuborish.
     Status: in_controller -> in_technician
     """
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         # Update technician_orders
         await conn.execute(
@@ -698,7 +697,7 @@ async def assign_to_technician_staff(request_id: int, tech_id: int, actor_id: in
     Staff order ni texnikka yuborish (xodim yaratgan ariza).
     Status: in_controller -> in_technician
     """
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         # Update staff_orders
         await conn.execute(
@@ -801,7 +800,7 @@ async def assign_to_ccs_connection(request_id: int, ccs_id: int, actor_id: int)
     Connection order ni CCS Supervisorga yuborish.
     Status: in_controller -> in_call_center_supervisor
     """
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         # Update connection_orders
         await conn.execute(
@@ -874,7 +873,7 @@ async def assign_to_ccs_tech(request_id: int, ccs_id: int, actor_id: int) -> Dic
     Tech service order ni CCS Supervisorga yuborish.
     Status: in_controller -> in_call_center_supervisor
     """
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         # Update technician_orders
         await conn.execute(
@@ -947,7 +946,7 @@ async def assign_to_ccs_staff(request_id: int, ccs_id: int, actor_id: int) -> Di
     Staff order ni CCS Supervisorga yuborish.
     Status: in_controller -> in_call_center_supervisor
     """
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         # Update staff_orders
         await conn.execute(
@@ -1028,7 +1027,7 @@ async def fetch_controller_staff_activity_with_time_filter(time_filter: str = "t
     Controller uchun xodimlar faoliyati - vaqt filtri bilan.
     time_filter: 'today', '3days', '7days', 'month', 'total'
     """
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         # Vaqt filtri uchun WHERE sharti
         if time_filter == "total":
@@ -1464,7 +1463,7 @@ async def get_ccs_supervisors_with_load() -> List[Dict[str, Any]]:
     CCS Supervisorlar ro'yxatini yuklama bilan olish.
     Yangi.sql ma'lumotlari bilan moslashtirilgan.
     """
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         rows = await conn.fetch(
             """
@@ -1502,7 +1501,7 @@ async def list_controller_orders_by_status(status: str, limit: int = 50) -> List
     Controller orders ro'yxatini status bo'yicha olish.
     Faqat texnik xizmat arizalari (type_of_zayavka = 'technician').
     """
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         rows = await conn.fetch(
             """
@@ -1561,7 +1560,7 @@ async def get_controller_statistics() -> Dict[str, Any]:
     Controller uchun statistika olish.
     Faqat texnik xizmat arizalari (type_of_zayavka = 'technician').
     """
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         stats = await conn.fetchrow(
             """
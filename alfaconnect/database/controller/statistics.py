@@ -1,9 +1,8 @@
 # database/controller/statistics.py
 
 from typing import Dict, Any, List
-import asyncpg
 import logging
-from config import settings
+from database.connections import get_connection
 
 logger = logging.getLogger(__name__)
 
@@ -15,7 +14,7 @@ async def get_controller_statistics() -> Dict[str, Any]:
     """
     Controller uchun umumiy statistika olish.
     """
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         stats = await conn.fetchrow(
             """
@@ -51,7 +50,7 @@ async def get_controller_daily_statistics(days: int = 7) -> List[Dict[str, Any]]
     """
     Controller uchun kunlik statistika olish.
     """
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         rows = await conn.fetch(
             """
@@ -90,7 +89,7 @@ async def get_controller_technician_performance() -> List[Dict[str, Any]]:
     """
     Controller uchun technician performance statistika.
     """
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         rows = await conn.fetch(
             """
@@ -131,7 +130,7 @@ async def get_controller_order_types_statistics() -> Dict[str, Any]:
     """
     Controller uchun order types bo'yicha statistika.
     """
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         stats = await conn.fetchrow(
             """
@@ -170,7 +169,7 @@ async def ctrl_total_tech_orders_count() -> int:
     Controller uchun jami aktiv buyurtmalar soni.
     Barcha 3 xil order type: connection_orders, technician_orders, va staff_orders.
     """
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         count = await conn.fetchval(
             """
@@ -189,7 +188,7 @@ async def ctrl_new_in_controller_count() -> int:
     Controller uchun yangi kelgan buyurtmalar soni.
     Barcha 3 xil order type: connection_orders, technician_orders, va staff_orders.
     """
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         count = await conn.fetchval(
             """
@@ -209,7 +208,7 @@ async def ctrl_in_progress_count() -> int:
     Barcha 3 xil order type: connection_orders, technician_orders, va staff_orders.
     Excludes completed and cancelled orders.
     """
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         count = await conn.fetchval(
             """
@@ -229,7 +228,7 @@ async def ctrl_completed_today_count() -> int:
     Barcha 3 xil order type: connection_orders, technician_orders, va staff_orders.
     Only orders completed today, excludes cancelled orders.
     """
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         count = await conn.fetchval(
             """
@@ -260,7 +259,7 @@ async def ctrl_get_new_orders(limit: int = 20) -> List[Dict[str, Any]]:
     Controller uchun yangi kelgan buyurtmalar ro'yxati.
     Barcha 3 xil order type: connection_orders, technician_orders, va staff_orders.
     """
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         rows = await conn.fetch(
             """
@@ -361,7 +360,7 @@ async def ctrl_get_in_progress_orders(limit: int = 20) -> List[Dict[str, Any]]:
     Both technician_orders (client-created) and staff_orders with type_of_zayavka='technician' (staff-created).
     Excludes completed and cancelled orders.
     """
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         rows = await conn.fetch(
             """
@@ -438,7 +437,7 @@ async def ctrl_get_completed_today_orders(limit: int = 20) -> List[Dict[str, Any
     Both technician_orders (client-created) and staff_orders with type_of_zayavka='technician' (staff-created).
     Only orders completed today, excludes cancelled orders.
     """
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         rows = await conn.fetch(
             """
@@ -523,7 +522,7 @@ async def ctrl_get_order_media(order_id: int, order_type: str) -> List[Dict[str,
     """
     Ariza uchun media fayllarni olish.
     """
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         if order_type == 'technician':
             # Technician orders uchun media ustunidan olamiz
@@ -1,15 +1,16 @@
 # database/junior_manager/orders.py
 # Junior Manager roli uchun orders bilan bog'liq queries
 
-import asyncpg
 import re
 from typing import List, Dict, Any, Optional, Union
-from config import settings
+from database.connections import get_connection
+from database.basic.application_number import next_application_number
 
 # Umumiy funksiyalarni import qilamiz
 from database.basic.user import ensure_user
 from database.basic.tariff import get_or_create_tarif_by_code
-from database.basic.phone import normalize_phone
+from database.basic.phone import normalize_phone, find_user_by_phone
+from database.basic.search import search_users
 from database.basic.region import normalize_region_code
 
 # =========================================================
@@ -43,15 +44,11 @@ async def staff_orders_create(
     user_id: YARATUVCHI xodim (Junior Manager) ID
     abonent_id: MIJOZ (Client) ID
     """
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         async with conn.transaction():
             # Application number generatsiya qilamiz - har bir business_type uchun alohida ketma-ketlikda
-            next_number = await conn.fetchval(
-                "SELECT COALESCE(MAX(CAST(SUBSTRING(application_number FROM '\\d+$') AS INTEGER)), 0) + 1 FROM staff_orders WHERE application_number LIKE $1",
-                f"STAFF-CONN-{business_type}-%"
-            )
-            application_number = f"STAFF-CONN-{business_type}-{next_number:04d}"
+            application_number = await next_application_number(conn, "STAFF-CONN", business_type)
             
             normalized_region = normalize_region_code(region) or (str(region).strip() if region is not None else None)
             normalized_phone = normalize_phone(phone) if phone else None
@@ -118,14 +115,10 @@ async def staff_orders_technician_create(
     user_id: YARATUVCHI xodim (Junior Manager) ID
     abonent_id: MIJOZ (Client) ID
     """
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         async with conn.transaction():
-            next_number = await conn.fetchval(
-                "SELECT COALESCE(MAX(CAST(SUBSTRING(application_number FROM '\\d+$') AS INTEGER)), 0) + 1 FROM staff_orders WHERE application_number LIKE $1",
-                f"STAFF-TECH-{business_type}-%"
-            )
-            application_number = f"STAFF-TECH-{business_type}-{next_number:04d}"
+            application_number = await next_application_number(conn, "STAFF-TECH", business_type)
             
             normalized_region = normalize_region_code(region) or (str(region).strip() if region is not None else None)
             normalized_phone = normalize_phone(phone) if phone else None
@@ -183,7 +176,7 @@ async def update_jm_notes(order_id: int, notes: str, order_type: str = "connecti
     """
     Update jm_notes field for a connection order only.
     """
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         await conn.execute(
             "UPDATE connection_orders SET jm_notes = $1, updated_at = NOW() WHERE id = $2",
@@ -204,7 +197,7 @@ async def list_new_for_jm(jm_id: int, limit: int = 50) -> List[Dict[str, Any]]:
     """
     Junior Manager uchun yangi arizalar ro'yxati.
     """
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         rows = await conn.fetch(
             """
@@ -245,7 +238,7 @@ async def list_inprogress_for_jm(jm_id: int, limit: int = 50) -> List[Dict[str,
     Statuslar: in_controller, in_technician, in_repairs, in_warehouse, in_technician_work, between_controller_technician
     Faqat shu JM dan o'tgan arizalar.
     """
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         rows = await conn.fetch(
             """
@@ -287,7 +280,7 @@ async def list_assigned_for_jm(jm_id: int, limit: int = 50) -> List[Dict[str, An
     """
     Junior Manager uchun biriktirilgan arizalar ro'yxati (faqat o'ziga biriktirilganlar, faqat connection_orders).
     """
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         rows = await conn.fetch(
             """
@@ -335,7 +328,7 @@ async def list_completed_for_jm(jm_id: int, limit: int = 50) -> List[Dict[str, A
     Junior Manager uchun yakunlangan arizalar (faqat connection_orders, status 'completed').
     Faqat shu JM dan o'tgan arizalar.
     """
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         rows = await conn.fetch(
             """
@@ -378,7 +371,7 @@ async def list_staff_created_by_jm(jm_id: int, limit: int = 50) -> List[Dict[str
     Junior Manager yaratgan staff_orders (user_id = jm_id)
     user_id bu yerda yaratuvchi xodim IDsi
     """
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         rows = await conn.fetch(
             """
@@ -423,7 +416,7 @@ async def count_active_jm_orders() -> int:
     """
     Junior Manager inboxdagi aktiv arizalar soni.
     """
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         return await conn.fetchval(
             """
@@ -440,7 +433,7 @@ async def fetch_jm_order_by_offset(offset: int) -> Optional[Dict[str, Any]]:
     """
     Junior Manager inboxdan offset bo'yicha bitta arizani olish.
     """
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         row = await conn.fetchrow(
             """
@@ -478,7 +471,7 @@ async def send_to_controller(order_id: int, jm_id: int) -> bool:
     """
     Junior Manager -> Controller: order yuborish.
     """
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         async with conn.transaction():
             # Staff order statusini yangilash
@@ -524,57 +517,22 @@ async def send_to_controller(order_id: int, jm_id: int) -> bool:
 
 async def search_client_by_phone(phone: str) -> Optional[Dict[str, Any]]:
     """
-    Telefon raqam bo'yicha mijozni qidirish.
+    Telefon raqam bo'yicha mijozni qidirish (phone_digits indeksi + kesh).
     """
-    conn = await asyncpg.connect(settings.DB_URL)
-    try:
-        # Telefon raqamni normalize qilamiz
-        normalized_phone = normalize_phone(phone)
-        
-        row = await conn.fetchrow(
-            """
-            SELECT 
-                id, telegram_id, full_name, phone, username, 
-                region, address, abonent_id, created_at
-            FROM users 
-            WHERE phone = $1 
-            LIMIT 1
-            """,
-            normalized_phone
-        )
-        
-        return dict(row) if row else None
-    finally:
-        await conn.close()
+    return await find_user_by_phone(phone)
 
 async def search_client_by_name(name: str) -> List[Dict[str, Any]]:
     """
-    Ism bo'yicha mijozlarni qidirish.
+    Ism bo'yicha mijozlarni qidirish (trigram, o'xshashlik bo'yicha saralangan).
     """
-    conn = await asyncpg.connect(settings.DB_URL)
-    try:
-        rows = await conn.fetch(
-            """
-            SELECT 
-                id, telegram_id, full_name, phone, username, 
-                region, address, abonent_id, created_at
-            FROM users 
-            WHERE LOWER(full_name) LIKE LOWER($1)
-            ORDER BY full_name
-            LIMIT 10
-            """,
-            f"%{name}%"
-        )
-        
-        return [dict(r) for r in rows]
-    finally:
-        await conn.close()
+    page = await search_users(name, limit=10)
+    return page["items"]
 
 async def get_client_order_history(user_id: int) -> List[Dict[str, Any]]:
     """
     Mijozning oldingi arizalarini olish (barcha turdagi arizalar).
     """
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         rows = await conn.fetch(
             """
@@ -664,7 +622,7 @@ async def get_client_order_count(user_id: int) -> Dict[str, int]:
     """
     Mijozning arizalar sonini olish (barcha turdagi arizalar).
     """
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         row = await conn.fetchrow(
             """
@@ -1,8 +1,7 @@
 
 
-import asyncpg
 from typing import Any, Dict, List, Optional
-from config import settings
+from database.connections import get_connection
 
 # =========================================================
 #  User ma'lumotlari bilan ishlash
@@ -13,7 +12,7 @@ async def get_user_by_telegram_id(telegram_id: int) -> Optional[Dict[str, Any]]:
     Telegram ID orqali user ma'lumotlarini olish.
     Junior Manager uchun umumiy funksiya.
     """
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         row = await conn.fetchrow(
             """
@@ -39,7 +38,7 @@ async def get_connections_by_recipient(recipient_id: int, limit: int = 20) -> Li
     Faqat hali controller'ga yuborilmagan arizalar ko'rsatiladi.
     Connection_orders va staff_orders bilan join qilib to'liq ma'lumot olish.
     """
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         rows = await conn.fetch(
             """
@@ -122,7 +121,7 @@ async def get_connection_order_by_id(order_id: int) -> Optional[Dict[str, Any]]:
     """
     Connection order ma'lumotlarini ID bo'yicha olish.
     """
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         row = await conn.fetchrow(
             """
@@ -153,7 +152,7 @@ async def get_staff_order_by_id(order_id: int) -> Optional[Dict[str, Any]]:
     """
     Staff order ma'lumotlarini ID bo'yicha olish.
     """
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         row = await conn.fetchrow(
             """
@@ -193,7 +192,7 @@ async def move_order_to_controller(order_id: int, jm_id: int) -> Dict[str, Any]:
     Returns:
         Dict with controller info for notification
     """
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         async with conn.transaction():
             # Controller ma'lumotlarini olamiz
@@ -313,7 +312,7 @@ async def set_jm_notes(order_id: int, notes: str) -> bool:
     """
     Junior Manager notes qo'shish (faqat connection_orders uchun).
     """
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         # Check if it's a connection order
         connection_order = await conn.fetchrow(
@@ -1,8 +1,7 @@
 # database/manager/export.py
 # Manager roli uchun export queries
 
-import asyncpg
-from config import settings
+from database.connections import get_connection
 import logging
 from typing import List, Dict, Any, Optional
 from datetime import datetime
@@ -43,7 +42,7 @@ async def get_manager_connection_orders_for_export(time_period: str = "total") -
     """Fetch all connection orders for manager export
     time_period: 'today', 'week', 'month', 'total'
     """
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         time_condition = _get_time_condition(time_period, "co.created_at")
         query = f"""
@@ -80,7 +79,7 @@ async def get_manager_statistics_for_export(time_period: str = "total") -> Dict[
     """Fetch detailed statistics for manager export
     time_period: 'today', 'week', 'month', 'total'
     """
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         # 1. Asosiy statistika
         stats = {}
@@ -271,7 +270,7 @@ async def get_manager_statistics_for_export(time_period: str = "total") -> Dict[
 
 async def get_manager_employees_for_export() -> List[Dict[str, Any]]:
     """Fetch employees list for manager export"""
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         query = """
         SELECT 
@@ -300,7 +299,7 @@ async def get_manager_employees_for_export() -> List[Dict[str, Any]]:
 
 async def get_manager_staff_orders_for_export() -> List[Dict[str, Any]]:
     """Fetch staff orders for manager export"""
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         query = """
         SELECT 
@@ -339,7 +338,7 @@ async def get_manager_staff_orders_for_export() -> List[Dict[str, Any]]:
 
 async def get_manager_smart_service_orders_for_export() -> List[Dict[str, Any]]:
     """Fetch smart service orders for manager export"""
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         query = """
         SELECT 
@@ -375,7 +374,7 @@ async def get_manager_smart_service_orders_for_export() -> List[Dict[str, Any]]:
 
 async def get_manager_technician_orders_for_export() -> List[Dict[str, Any]]:
     """Fetch technician orders for manager export"""
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         query = """
         SELECT 
@@ -2,9 +2,9 @@
 # Manager roli uchun realtime monitoring queries
 
 from typing import List, Dict, Any, Optional
-import asyncpg
 from asyncpg.exceptions import UndefinedColumnError
-from config import settings
+from database.connections import get_connection
+from database.basic.order_counters import fetch_order_counters
 from datetime import datetime, timezone, timedelta
 
 # =========================================================
@@ -14,32 +14,16 @@ from datetime import datetime, timezone, timedelta
 async def get_realtime_counts() -> Dict[str, int]:
     """
     Faol va shoshilinch (24 soatdan oshgan) connection_orders sonlari.
+    order_status_counters dan olinadi (database/basic/order_counters.py).
     """
-    sql = """
-    SELECT
-      COUNT(*) FILTER (
-        WHERE status <> 'completed'::connection_order_status
-          AND is_active = TRUE
-      ) AS active_total,
-      COUNT(*) FILTER (
-         WHERE status <> 'completed'::connection_order_status
-           AND is_active = TRUE
-           AND now() - created_at > INTERVAL '1 day'
-      ) AS urgent_total
-    FROM connection_orders;
-    """
-    conn = await asyncpg.connect(settings.DB_URL)
-    try:
-        row = await conn.fetchrow(sql)
-        active = int(row["active_total"] or 0)
-        urgent = int(row["urgent_total"] or 0)
-        return {
-            "active_total": active,
-            "urgent_total": urgent,
-            "normal_total": max(active - urgent, 0),
-        }
-    finally:
-        await conn.close()
+    counters = await fetch_order_counters()
+    active = counters.count("connection_orders", exclude_status="completed")
+    urgent = counters.count("connection_orders", exclude_status="completed", urgent=True)
+    return {
+        "active_total": active,
+        "urgent_total": urgent,
+        "normal_total": max(active - urgent, 0),
+    }
 
 # =========================================================
 #  LISTS for cards (faqat connection_orders)
@@ -73,7 +57,7 @@ async def _list_detailed(limit: int, urgent_only: bool) -> List[Dict[str, Any]]:
     ORDER BY co.created_at {order_dir}, co.id {order_dir}
     LIMIT $1;
     """
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         rows = await conn.fetch(sql, limit)
         return [dict(r) for r in rows]
@@ -122,7 +106,7 @@ async def get_workflow_history(application_number: str) -> Dict[str, Any]:
     - STAFF-CONN-* → controller logikasi (client_created → in_controller)
     - CONN-* → manager logikasi (client_created → in_manager)
     """
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         if not application_number:
             return {"steps": [], "user_times": []}
@@ -395,7 +379,7 @@ async def get_smart_service_realtime_counts() -> Dict[str, int]:
       ) AS urgent_total
     FROM smart_service_orders;
     """
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         row = await conn.fetchrow(sql)
         active = int(row["active_total"] or 0)
@@ -429,7 +413,7 @@ async def list_smart_service_active_detailed(limit: int = 50) -> List[Dict[str,
     ORDER BY sso.created_at DESC
     LIMIT $1;
     """
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         rows = await conn.fetch(sql, limit)
         return [dict(r) for r in rows]
@@ -455,7 +439,7 @@ async def get_staff_orders_realtime_counts() -> Dict[str, int]:
       ) AS urgent_total
     FROM staff_orders;
     """
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         row = await conn.fetchrow(sql)
         active = int(row["active_total"] or 0)
@@ -491,7 +475,7 @@ async def list_staff_orders_active_detailed(limit: int = 50) -> List[Dict[str, A
     ORDER BY so.created_at DESC
     LIMIT $1;
     """
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         rows = await conn.fetch(sql, limit)
         return [dict(r) for r in rows]
@@ -517,7 +501,7 @@ async def get_technician_orders_realtime_counts() -> Dict[str, int]:
       ) AS urgent_total
     FROM technician_orders;
     """
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         row = await conn.fetchrow(sql)
         active = int(row["active_total"] or 0)
@@ -553,7 +537,7 @@ async def list_technician_orders_active_detailed(limit: int = 50) -> List[Dict[s
     ORDER BY tech_orders.created_at DESC
     LIMIT $1;
     """
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         rows = await conn.fetch(sql, limit)
         return [dict(r) for r in rows]
@@ -567,74 +551,22 @@ async def list_technician_orders_active_detailed(limit: int = 50) -> List[Dict[s
 async def get_overall_dashboard_stats() -> Dict[str, Any]:
     """
     Umumiy dashboard statistikasi - barcha order turlari uchun.
+    Bitta so'rov: order_status_counters (trigger bilan yangilanadi).
     """
-    conn = await asyncpg.connect(settings.DB_URL)
-    try:
-        # Connection orders
-        connection_stats = await conn.fetchrow("""
-            SELECT 
-                COUNT(*) as total,
-                COUNT(*) FILTER (WHERE is_active = TRUE AND status <> 'completed') as active,
-                COUNT(*) FILTER (WHERE is_active = TRUE AND now() - created_at > INTERVAL '1 day') as urgent
-            FROM connection_orders
-        """)
-        
-        # Staff orders
-        staff_stats = await conn.fetchrow("""
-            SELECT 
-                COUNT(*) as total,
-                COUNT(*) FILTER (WHERE is_active = TRUE) as active,
-                COUNT(*) FILTER (WHERE is_active = TRUE AND now() - created_at > INTERVAL '1 day') as urgent
-            FROM staff_orders
-        """)
-        
-        # Smart service orders
-        smart_stats = await conn.fetchrow("""
-            SELECT 
-                COUNT(*) as total,
-                COUNT(*) FILTER (WHERE is_active = TRUE) as active,
-                COUNT(*) FILTER (WHERE is_active = TRUE AND now() - created_at > INTERVAL '1 day') as urgent
-            FROM smart_service_orders
-        """)
-        
-        # Technician orders
-        technician_stats = await conn.fetchrow("""
-            SELECT 
-                COUNT(*) as total,
-                COUNT(*) FILTER (WHERE is_active = TRUE) as active,
-                COUNT(*) FILTER (WHERE is_active = TRUE AND now() - created_at > INTERVAL '1 day') as urgent
-            FROM technician_orders
-        """)
-        
-        return {
-            "connection_orders": {
-                "total": connection_stats["total"] or 0,
-                "active": connection_stats["active"] or 0,
-                "urgent": connection_stats["urgent"] or 0,
-            },
-            "staff_orders": {
-                "total": staff_stats["total"] or 0,
-                "active": staff_stats["active"] or 0,
-                "urgent": staff_stats["urgent"] or 0,
-            },
-            "smart_service_orders": {
-                "total": smart_stats["total"] or 0,
-                "active": smart_stats["active"] or 0,
-                "urgent": smart_stats["urgent"] or 0,
-            },
-            "technician_orders": {
-                "total": technician_stats["total"] or 0,
-                "active": technician_stats["active"] or 0,
-                "urgent": technician_stats["urgent"] or 0,
-            },
-            "overall": {
-                "total": (connection_stats["total"] or 0) + (staff_stats["total"] or 0) + 
-                        (smart_stats["total"] or 0) + (technician_stats["total"] or 0),
-                "active": (connection_stats["active"] or 0) + (staff_stats["active"] or 0) + 
-                         (smart_stats["active"] or 0) + (technician_stats["active"] or 0),
-                "urgent": (connection_stats["urgent"] or 0) + (staff_stats["urgent"] or 0) + 
-                         (smart_stats["urgent"] or 0) + (technician_stats["urgent"] or 0),
-            }
-        }
-    finally:
-        await conn.close()
+    counters = await fetch_order_counters()
+    return {
+        # connection_orders uchun "active" yakunlanganlarni hisoblamaydi
+        "connection_orders": {
+            "total": counters.count("connection_orders", active=None),
+            "active": counters.count("connection_orders", exclude_status="completed"),
+            "urgent": counters.count("connection_orders", urgent=True),
+        },
+        "staff_orders": counters.summary("staff_orders"),
+        "smart_service_orders": counters.summary("smart_service_orders"),
+        "technician_orders": counters.summary("technician_orders"),
+        "overall": {
+            "total": counters.count(active=None),
+            "active": counters.count() - counters.count("connection_orders", status="completed"),
+            "urgent": counters.count(urgent=True),
+        },
+    }
@@ -1,7 +1,7 @@
-import asyncpg
 import re
 from typing import List, Dict, Any, Optional, Union
-from config import settings
+from database.connections import get_connection
+from database.basic.application_number import next_application_number
 
 from database.basic.user import ensure_user
 from database.basic.tariff import get_or_create_tarif_by_code
@@ -29,14 +29,10 @@ async def staff_orders_create(
     Default status: 'in_controller'.
     Connections jadvaliga ham yozuv qo'shadi.
     """
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         async with conn.transaction():
-            next_number = await conn.fetchval(
-                "SELECT COALESCE(MAX(CAST(SUBSTRING(application_number FROM '\\d+$') AS INTEGER)), 0) + 1 FROM staff_orders WHERE application_number LIKE $1",
-                f"STAFF-CONN-{business_type}-%"
-            )
-            application_number = f"STAFF-CONN-{business_type}-{next_number:04d}"
+            application_number = await next_application_number(conn, "STAFF-CONN", business_type)
 
             normalized_region = normalize_region_code(region) or (str(region).strip() if region is not None else None)
             normalized_phone = normalize_phone(phone) if phone else None
@@ -96,14 +92,10 @@ async def staff_orders_technician_create(
     """
     Manager TOMONIDAN texnik xizmat arizasini yaratish.
     """
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         async with conn.transaction():
-            next_number = await conn.fetchval(
-                "SELECT COALESCE(MAX(CAST(SUBSTRING(application_number FROM '\\d+$') AS INTEGER)), 0) + 1 FROM staff_orders WHERE application_number LIKE $1",
-                f"STAFF-TECH-{business_type}-%"
-            )
-            application_number = f"STAFF-TECH-{business_type}-{next_number:04d}"
+            application_number = await next_application_number(conn, "STAFF-TECH", business_type)
 
             normalized_region = normalize_region_code(region) or (str(region).strip() if region is not None else None)
             normalized_phone = normalize_phone(phone) if phone else None
@@ -139,7 +131,7 @@ async def fetch_manager_orders(user_id: int, limit: int = 50, offset: int = 0) -
     """
     Manager yaratgan arizalarni olish.
     """
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         rows = await conn.fetch(
             """
@@ -174,7 +166,7 @@ async def count_manager_orders(user_id: int) -> int:
     """
     Manager yaratgan arizalar soni.
     """
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         return await conn.fetchval(
             """
@@ -194,7 +186,7 @@ async def count_manager_orders(user_id: int) -> int:
 
 async def get_all_total_connection_orders_count() -> int:
     """Barcha faol ulanish arizalarining umumiy sonini qaytaradi (mijozlar va xodimlar ochgan)."""
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         total_count = await conn.fetchval(
             """
@@ -214,7 +206,7 @@ async def get_total_orders_count(user_id: int) -> int:
 
 async def get_in_progress_count(user_id: int) -> int:
     """Manager yaratgan ish jarayonidagi arizalar soni."""
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         return await conn.fetchval(
             """
@@ -231,7 +223,7 @@ async def get_in_progress_count(user_id: int) -> int:
 
 async def get_completed_today_count(user_id: int) -> int:
     """Manager yaratgan bugun yakunlangan arizalar soni."""
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         return await conn.fetchval(
             """
@@ -249,7 +241,7 @@ async def get_completed_today_count(user_id: int) -> int:
 
 async def get_cancelled_count(user_id: int) -> int:
     """Manager yaratgan bekor qilingan arizalar soni."""
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         return await conn.fetchval(
             """
@@ -266,7 +258,7 @@ async def get_cancelled_count(user_id: int) -> int:
 
 async def get_all_cancelled_count() -> int:
     """Barcha bekor qilingan ulanish arizalari soni (client va xodim yaratgani)."""
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         total_count = await conn.fetchval(
             """
@@ -282,7 +274,7 @@ async def get_all_cancelled_count() -> int:
 
 async def get_all_new_orders_count() -> int:
     """Barcha manager'ga kelgan yangi arizalar soni (mijozlar va xodimlar ochgani)."""
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         total_count = await conn.fetchval(
             """
@@ -298,7 +290,7 @@ async def get_all_new_orders_count() -> int:
 
 async def get_new_orders_today_count(user_id: int) -> int:
     """Manager yaratgan bugungi yangi arizalar soni."""
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         return await conn.fetchval(
             """
@@ -320,7 +312,7 @@ async def get_new_orders_today_count(user_id: int) -> int:
 
 async def list_new_orders(user_id: int, limit: int = 10) -> List[Dict[str, Any]]:
     """Barcha yangi ulanish arizalari (client va xodim yaratgani)."""
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         # Client arizalari va staff arizalarini birlashtiramiz
         rows = await conn.fetch(
@@ -378,7 +370,7 @@ async def list_new_orders(user_id: int, limit: int = 10) -> List[Dict[str, Any]]
 
 async def list_all_in_progress_orders(limit: int = 50) -> List[Dict[str, Any]]:
     """Barcha jarayondagi ulanish arizalari - mijozlar va xodimlar ochgani."""
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         rows = await conn.fetch(
             """
@@ -432,7 +424,7 @@ async def list_all_in_progress_orders(limit: int = 50) -> List[Dict[str, Any]]:
 
 async def get_all_in_progress_count() -> int:
     """Barcha jarayondagi ulanish arizalari soni."""
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         count = await conn.fetchval(
             """
@@ -448,7 +440,7 @@ async def get_all_in_progress_count() -> int:
 
 async def list_completed_today_orders(user_id: int, limit: int = 10) -> List[Dict[str, Any]]:
     """Manager yaratgan bugun yakunlangan arizalar."""
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         rows = await conn.fetch(
             """
@@ -481,7 +473,7 @@ async def list_completed_today_orders(user_id: int, limit: int = 10) -> List[Dic
 
 async def list_cancelled_orders(user_id: int, limit: int = 10) -> List[Dict[str, Any]]:
     """Manager yaratgan bekor qilingan arizalar."""
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         rows = await conn.fetch(
             """
@@ -513,7 +505,7 @@ async def list_cancelled_orders(user_id: int, limit: int = 10) -> List[Dict[str,
 
 async def list_my_created_orders_by_type(user_id: int, order_type: str, limit: int = 10) -> List[Dict[str, Any]]:
     """Manager yaratgan arizalar turi bo'yicha."""
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         rows = await conn.fetch(
             """
@@ -549,7 +541,7 @@ async def list_my_created_orders_by_type(user_id: int, order_type: str, limit: i
 
 async def get_connection_orders_count() -> int:
     """Barcha connection orders soni."""
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         count = await conn.fetchval("SELECT COUNT(*) FROM connection_orders WHERE is_active = TRUE")
         return int(count or 0)
@@ -558,7 +550,7 @@ async def get_connection_orders_count() -> int:
 
 async def get_connection_orders_in_progress_count() -> int:
     """Jarayondagi connection orders soni."""
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         count = await conn.fetchval(
             "SELECT COUNT(*) FROM connection_orders WHERE is_active = TRUE AND status IN ('in_junior_manager', 'in_controller', 'in_technician', 'in_warehouse', 'in_repairs', 'in_technician_work')"
@@ -569,7 +561,7 @@ async def get_connection_orders_in_progress_count() -> int:
 
 async def get_connection_orders_completed_today_count() -> int:
     """Bugun bajarilgan connection orders soni."""
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         count = await conn.fetchval(
             "SELECT COUNT(*) FROM connection_orders WHERE is_active = TRUE AND status = 'completed' AND DATE(updated_at) = CURRENT_DATE"
@@ -580,7 +572,7 @@ async def get_connection_orders_completed_today_count() -> int:
 
 async def get_connection_orders_cancelled_count() -> int:
     """Bekor qilingan connection orders soni."""
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         count = await conn.fetchval(
             "SELECT COUNT(*) FROM connection_orders WHERE is_active = FALSE"
@@ -591,7 +583,7 @@ async def get_connection_orders_cancelled_count() -> int:
 
 async def get_connection_orders_new_today_count() -> int:
     """Bugun yaratilgan connection orders soni."""
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         count = await conn.fetchval(
             "SELECT COUNT(*) FROM connection_orders WHERE is_active = TRUE AND status = 'in_manager' AND DATE(created_at) = CURRENT_DATE"
@@ -602,7 +594,7 @@ async def get_connection_orders_new_today_count() -> int:
 
 async def list_connection_orders_new(limit: int = 10) -> List[Dict[str, Any]]:
     """Yangi connection orders."""
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         rows = await conn.fetch(
             """
@@ -632,7 +624,7 @@ async def list_connection_orders_new(limit: int = 10) -> List[Dict[str, Any]]:
 
 async def list_connection_orders_in_progress(limit: int = 10) -> List[Dict[str, Any]]:
     """Jarayondagi connection orders."""
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         rows = await conn.fetch(
             """
@@ -662,7 +654,7 @@ async def list_connection_orders_in_progress(limit: int = 10) -> List[Dict[str,
 
 async def list_connection_orders_completed_today(limit: int = 10) -> List[Dict[str, Any]]:
     """Bugun bajarilgan connection orders."""
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         rows = await conn.fetch(
             """
@@ -693,7 +685,7 @@ async def list_connection_orders_completed_today(limit: int = 10) -> List[Dict[s
 
 async def list_connection_orders_cancelled(limit: int = 10) -> List[Dict[str, Any]]:
     """Bekor qilingan connection orders."""
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         rows = await conn.fetch(
             """
@@ -730,7 +722,7 @@ async def fetch_staff_activity_with_time_filter(time_filter: str = "total") -> L
     time_filter: 'today', '3days', '7days', 'month', 'total'
     Counts connection_orders and staff_orders where connection exists.
     """
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         # Vaqt filtri uchun WHERE sharti
         # created - order yaratilgan vaqt
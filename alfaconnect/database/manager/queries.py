@@ -1,9 +1,8 @@
 # database/manager/queries.py
 # Manager roli uchun asosiy queries (inbox)
 
-import asyncpg
 from typing import List, Dict, Any, Optional
-from config import settings
+from database.connections import get_connection
 
 # Umumiy user funksiyalarini import qilamiz
 from database.basic.user import get_user_by_telegram_id, get_users_by_role
@@ -17,7 +16,7 @@ async def fetch_manager_inbox(limit: int = 50, offset: int = 0) -> List[Dict[str
     Manager ko'rishi uchun inbox arizalari.
     Statusi 'in_manager' bo'lgan arizalar.
     """
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         rows = await conn.fetch(
             """
@@ -50,7 +49,7 @@ async def count_manager_inbox() -> int:
     """
     Manager inboxdagi arizalar soni.
     """
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         return await conn.fetchval(
             """
@@ -81,7 +80,7 @@ async def assign_to_junior_manager(request_id: int | str, jm_id: int, actor_id:
     except Exception:
         request_id_int = int(request_id)
 
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         async with conn.transaction():
             # JM mavjudmi? + uning ma'lumotlarini olamiz
@@ -189,7 +188,7 @@ async def get_juniors_with_load_via_history() -> List[Dict[str, Any]]:
     """
     Junior managerlarni hozirgi yuklamasi (ochiq arizalar soni) bilan olish.
     """
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         rows = await conn.fetch(
             """
@@ -242,7 +241,7 @@ async def fetch_manager_inbox_staff(limit: int = 50, offset: int = 0) -> List[Di
     Manager ko'rishi uchun staff_orders inbox arizalari.
     Statusi 'in_manager' bo'lgan staff_orders arizalar.
     """
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         rows = await conn.fetch(
             """
@@ -284,7 +283,7 @@ async def count_manager_inbox_staff() -> int:
     """
     Manager inboxdagi staff_orders arizalar soni.
     """
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         return await conn.fetchval(
             """
@@ -311,7 +310,7 @@ async def assign_to_junior_manager_for_staff(request_id: int | str, jm_id: int,
     except Exception:
         request_id_int = int(request_id)
 
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         async with conn.transaction():
             # JM mavjudmi?
@@ -394,7 +393,7 @@ async def assign_to_controller_for_staff(request_id: int | str, controller_id: i
     except Exception:
         request_id_int = int(request_id)
 
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         async with conn.transaction():
             # Controller mavjudmi? + uning ma'lumotlarini olamiz
@@ -502,7 +501,7 @@ async def get_controllers_with_load_via_history() -> List[Dict[str, Any]]:
     """
     Controllerlarni hozirgi yuklamasi (ochiq staff arizalar soni) bilan olish.
     """
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         rows = await conn.fetch(
             """
@@ -0,0 +1,48 @@
+-- Migration: Application number counters
+-- Date: 2025-01-20
+-- Description: Per-prefix counters for application_number generation
+--              (database/basic/application_number.py). Replaces the
+--              MAX(SUBSTRING(application_number ...)) + 1 scan on every insert.
+--              Counters are seeded from the current maxima of each table.
+
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS public.application_number_counters (
+    prefix text PRIMARY KEY,
+    last_value bigint NOT NULL DEFAULT 0,
+    updated_at timestamp with time zone NOT NULL DEFAULT NOW()
+);
+
+COMMENT ON TABLE public.application_number_counters IS 'Last allocated application_number per prefix (e.g. STAFF-CONN-B2C-)';
+
+-- Seed counters from existing application numbers.
+-- Prefix = everything before the trailing number, e.g. 'STAFF-TECH-B2B-0012' -> 'STAFF-TECH-B2B-'
+INSERT INTO public.application_number_counters (prefix, last_value)
+SELECT prefix, MAX(num)
+FROM (
+    SELECT SUBSTRING(application_number FROM '^(.*-)[0-9]+$') AS prefix,
+           CAST(SUBSTRING(application_number FROM '([0-9]+)$') AS bigint) AS num
+    FROM public.staff_orders
+    WHERE application_number ~ '^STAFF-(CONN|TECH)-[A-Z0-9]+-[0-9]+$'
+    UNION ALL
+    SELECT SUBSTRING(application_number FROM '^(.*-)[0-9]+$'),
+           CAST(SUBSTRING(application_number FROM '([0-9]+)$') AS bigint)
+    FROM public.connection_orders
+    WHERE application_number ~ '^CONN-[A-Z0-9]+-[0-9]+$'
+    UNION ALL
+    SELECT SUBSTRING(application_number FROM '^(.*-)[0-9]+$'),
+           CAST(SUBSTRING(application_number FROM '([0-9]+)$') AS bigint)
+    FROM public.technician_orders
+    WHERE application_number ~ '^TECH-[A-Z0-9]+-[0-9]+$'
+    UNION ALL
+    SELECT 'SMA-',
+           CAST(SUBSTRING(application_number FROM '([0-9]+)$') AS bigint)
+    FROM public.smart_service_orders
+    WHERE application_number ~ '^SMA-[0-9]+$'
+) existing
+GROUP BY prefix
+ON CONFLICT (prefix) DO UPDATE
+    SET last_value = GREATEST(application_number_counters.last_value, EXCLUDED.last_value),
+        updated_at = NOW();
+
+COMMIT;
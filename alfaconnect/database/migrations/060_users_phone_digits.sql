@@ -0,0 +1,29 @@
+-- Migration: Indexed normalized phone column for users
+-- Date: 2025-01-20
+-- Description: Adds users.phone_digits - E.164 digits without '+' (e.g. 998901234567),
+--              computed from users.phone with the same rules as normalize_phone()
+--              in database/basic/phone.py. A STORED generated column is maintained
+--              by Postgres on every INSERT/UPDATE, so all write paths stay consistent.
+--              Replaces WHERE regexp_replace(phone, '[^0-9]', '', 'g') = ... scans
+--              with a btree lookup.
+
+BEGIN;
+
+ALTER TABLE public.users
+ADD COLUMN IF NOT EXISTS phone_digits text GENERATED ALWAYS AS (
+    CASE
+        WHEN regexp_replace(phone, '[^0-9]', '', 'g') = '' THEN NULL
+        WHEN length(regexp_replace(phone, '[^0-9]', '', 'g')) = 9
+            THEN '998' || regexp_replace(phone, '[^0-9]', '', 'g')
+        ELSE regexp_replace(phone, '[^0-9]', '', 'g')
+    END
+) STORED;
+
+COMMENT ON COLUMN public.users.phone_digits IS 'Normalized phone (E.164 digits, no plus) for indexed lookup';
+
+-- Plain (non-unique) btree: the lookup only needs an index, and existing
+-- registration/phone-update paths do not expect a uniqueness conflict.
+CREATE INDEX IF NOT EXISTS idx_users_phone_digits
+    ON public.users(phone_digits);
+
+COMMIT;
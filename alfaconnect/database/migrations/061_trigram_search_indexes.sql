@@ -0,0 +1,45 @@
+-- Migration: Trigram search indexes
+-- Date: 2025-01-20
+-- Description: Indexes for database/basic/search.py.
+--              - pg_trgm GIN indexes serve ILIKE '%term%' and similarity (%) on
+--                users.full_name / users.username / materials.name
+--              - text_pattern_ops btree indexes serve prefix lookups
+--                (short terms, abonent_id, phone_digits, application_number)
+
+BEGIN;
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+-- USERS
+CREATE INDEX IF NOT EXISTS idx_users_full_name_trgm
+    ON public.users USING gin (full_name gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_users_username_trgm
+    ON public.users USING gin (username gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_users_full_name_prefix
+    ON public.users (lower(full_name) text_pattern_ops);
+CREATE INDEX IF NOT EXISTS idx_users_username_prefix
+    ON public.users (lower(username) text_pattern_ops);
+CREATE INDEX IF NOT EXISTS idx_users_abonent_id_prefix
+    ON public.users (abonent_id text_pattern_ops);
+CREATE INDEX IF NOT EXISTS idx_users_phone_digits_prefix
+    ON public.users (phone_digits text_pattern_ops);
+
+-- MATERIALS
+CREATE INDEX IF NOT EXISTS idx_materials_name_trgm
+    ON public.materials USING gin (name gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_materials_name_prefix
+    ON public.materials (lower(name) text_pattern_ops);
+CREATE INDEX IF NOT EXISTS idx_materials_serial_number_prefix
+    ON public.materials (serial_number text_pattern_ops);
+
+-- APPLICATION NUMBER PREFIX (client search by order number)
+CREATE INDEX IF NOT EXISTS idx_staff_orders_application_number_prefix
+    ON public.staff_orders (application_number text_pattern_ops);
+CREATE INDEX IF NOT EXISTS idx_connection_orders_application_number_prefix
+    ON public.connection_orders (application_number text_pattern_ops);
+CREATE INDEX IF NOT EXISTS idx_technician_orders_application_number_prefix
+    ON public.technician_orders (application_number text_pattern_ops);
+CREATE INDEX IF NOT EXISTS idx_smart_service_orders_application_number_prefix
+    ON public.smart_service_orders (application_number text_pattern_ops);
+
+COMMIT;
@@ -0,0 +1,227 @@
+-- Migration: Order status counters
+-- Date: 2025-01-21
+-- Description: Trigger-maintained counters for dashboards (database/basic/order_counters.py).
+--              One row per (order_type, status, is_active, region, business_type)
+--              with `total` and `urgent` (active and created before urgent_before).
+--              - row triggers on the four order tables keep `total`/`urgent` exact
+--              - order_counters_sweep() advances urgent_before to now() - 1 day and
+--                adds the rows that aged past it (range scan on created_at)
+--              - order_counters_snapshot() sweeps if stale and returns all counters
+--              Columns missing on a table (smart_service_orders: status, region,
+--              business_type) are stored as ''.
+
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS public.order_status_counters (
+    order_type    text    NOT NULL,
+    status        text    NOT NULL DEFAULT '',
+    is_active     boolean NOT NULL,
+    region        text    NOT NULL DEFAULT '',
+    business_type text    NOT NULL DEFAULT '',
+    total         bigint  NOT NULL DEFAULT 0,
+    urgent        bigint  NOT NULL DEFAULT 0,
+    updated_at    timestamp with time zone NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (order_type, status, is_active, region, business_type)
+);
+
+COMMENT ON TABLE public.order_status_counters IS 'Order counts per status/region/business_type, maintained by trg_*_status_counters';
+
+-- Urgent chegarasi: is_active va created_at <= urgent_before bo'lgan arizalar "urgent"
+CREATE TABLE IF NOT EXISTS public.order_counter_state (
+    id            smallint PRIMARY KEY DEFAULT 1 CHECK (id = 1),
+    urgent_before timestamp with time zone NOT NULL,
+    swept_at      timestamp with time zone NOT NULL DEFAULT NOW()
+);
+
+-- Sweep indekslari (aktiv arizalar created_at bo'yicha)
+CREATE INDEX IF NOT EXISTS idx_connection_orders_active_created_at
+    ON public.connection_orders (created_at) WHERE is_active = TRUE;
+CREATE INDEX IF NOT EXISTS idx_staff_orders_active_created_at
+    ON public.staff_orders (created_at) WHERE is_active = TRUE;
+CREATE INDEX IF NOT EXISTS idx_technician_orders_active_created_at
+    ON public.technician_orders (created_at) WHERE is_active = TRUE;
+CREATE INDEX IF NOT EXISTS idx_smart_service_orders_active_created_at
+    ON public.smart_service_orders (created_at) WHERE is_active = TRUE;
+
+-- Bitta qatorni hisoblagichga qo'shish (sign = +1 / -1)
+CREATE OR REPLACE FUNCTION public.order_counter_apply(
+    p_order_type text, r jsonb, p_cutoff timestamptz, p_sign integer
+) RETURNS void AS $$
+DECLARE
+    v_active boolean := COALESCE((r->>'is_active')::boolean, TRUE);
+BEGIN
+    INSERT INTO public.order_status_counters AS c
+        (order_type, status, is_active, region, business_type, total, urgent)
+    VALUES (
+        p_order_type,
+        COALESCE(r->>'status', ''),
+        v_active,
+        COALESCE(r->>'region', ''),
+        COALESCE(r->>'business_type', ''),
+        p_sign,
+        CASE WHEN v_active AND (r->>'created_at')::timestamptz <= p_cutoff THEN p_sign ELSE 0 END
+    )
+    ON CONFLICT (order_type, status, is_active, region, business_type) DO UPDATE
+        SET total = c.total + EXCLUDED.total,
+            urgent = c.urgent + EXCLUDED.urgent,
+            updated_at = NOW();
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION public.order_status_counters_trg() RETURNS trigger AS $$
+DECLARE
+    o jsonb;
+    n jsonb;
+    v_cutoff timestamptz;
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN o := to_jsonb(OLD); END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN n := to_jsonb(NEW); END IF;
+
+    -- Kalit va urgent'ga ta'sir qilmaydigan UPDATE (masalan description) - hech narsa qilmaymiz
+    IF TG_OP = 'UPDATE'
+       AND o->'status' IS NOT DISTINCT FROM n->'status'
+       AND o->'is_active' IS NOT DISTINCT FROM n->'is_active'
+       AND o->'region' IS NOT DISTINCT FROM n->'region'
+       AND o->'business_type' IS NOT DISTINCT FROM n->'business_type'
+       AND o->'created_at' IS NOT DISTINCT FROM n->'created_at' THEN
+        RETURN NULL;
+    END IF;
+
+    -- Sweep (exclusive) bilan bir vaqtda urgent_before o'zgarib qolmasligi uchun
+    PERFORM pg_advisory_xact_lock_shared(hashtext('order_status_counters'));
+    SELECT urgent_before INTO v_cutoff FROM public.order_counter_state WHERE id = 1;
+
+    -- Hisoblagich qatorlarini doimiy tartibda yangilash (deadlock oldini olish)
+    IF o IS NOT NULL AND n IS NOT NULL
+       AND (o->>'status', o->>'region', o->>'business_type', o->>'is_active')
+         > (n->>'status', n->>'region', n->>'business_type', n->>'is_active') THEN
+        PERFORM public.order_counter_apply(TG_TABLE_NAME, n, v_cutoff, 1);
+        PERFORM public.order_counter_apply(TG_TABLE_NAME, o, v_cutoff, -1);
+        RETURN NULL;
+    END IF;
+
+    IF o IS NOT NULL THEN PERFORM public.order_counter_apply(TG_TABLE_NAME, o, v_cutoff, -1); END IF;
+    IF n IS NOT NULL THEN PERFORM public.order_counter_apply(TG_TABLE_NAME, n, v_cutoff, 1); END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- urgent_before ni now() - 1 day ga surish va shu oraliqda "qarigan" arizalarni urgent ga qo'shish
+CREATE OR REPLACE FUNCTION public.order_counters_sweep(p_min_interval interval DEFAULT INTERVAL '1 minute')
+RETURNS void AS $$
+DECLARE
+    v_old timestamptz;
+    v_new timestamptz;
+    v_swept timestamptz;
+BEGIN
+    SELECT swept_at INTO v_swept FROM public.order_counter_state WHERE id = 1;
+    IF v_swept > NOW() - p_min_interval THEN
+        RETURN;
+    END IF;
+
+    -- Yozuvchilar (trigger) tugashini kutamiz; keyingi so'rovlar yangi snapshot ko'radi
+    PERFORM pg_advisory_xact_lock(hashtext('order_status_counters'));
+    SELECT urgent_before, swept_at INTO v_old, v_swept FROM public.order_counter_state WHERE id = 1;
+    IF v_swept > NOW() - p_min_interval THEN
+        RETURN;  -- boshqa sessiya hozirgina sweep qildi
+    END IF;
+    v_new := NOW() - INTERVAL '1 day';
+
+    INSERT INTO public.order_status_counters AS c (order_type, status, is_active, region, business_type, urgent)
+    SELECT 'connection_orders', status::text, TRUE, COALESCE(region, ''), COALESCE(business_type::text, ''), COUNT(*)
+    FROM public.connection_orders
+    WHERE is_active = TRUE AND created_at > v_old AND created_at <= v_new
+    GROUP BY 2, 4, 5
+    ON CONFLICT (order_type, status, is_active, region, business_type) DO UPDATE
+        SET urgent = c.urgent + EXCLUDED.urgent, updated_at = NOW();
+
+    INSERT INTO public.order_status_counters AS c (order_type, status, is_active, region, business_type, urgent)
+    SELECT 'staff_orders', status::text, TRUE, COALESCE(region, ''), COALESCE(business_type::text, ''), COUNT(*)
+    FROM public.staff_orders
+    WHERE is_active = TRUE AND created_at > v_old AND created_at <= v_new
+    GROUP BY 2, 4, 5
+    ON CONFLICT (order_type, status, is_active, region, business_type) DO UPDATE
+        SET urgent = c.urgent + EXCLUDED.urgent, updated_at = NOW();
+
+    INSERT INTO public.order_status_counters AS c (order_type, status, is_active, region, business_type, urgent)
+    SELECT 'technician_orders', status::text, TRUE, COALESCE(region, ''), COALESCE(business_type::text, ''), COUNT(*)
+    FROM public.technician_orders
+    WHERE is_active = TRUE AND created_at > v_old AND created_at <= v_new
+    GROUP BY 2, 4, 5
+    ON CONFLICT (order_type, status, is_active, region, business_type) DO UPDATE
+        SET urgent = c.urgent + EXCLUDED.urgent, updated_at = NOW();
+
+    INSERT INTO public.order_status_counters AS c (order_type, status, is_active, region, business_type, urgent)
+    SELECT 'smart_service_orders', '', TRUE, '', '', COUNT(*)
+    FROM public.smart_service_orders
+    WHERE is_active = TRUE AND created_at > v_old AND created_at <= v_new
+    HAVING COUNT(*) > 0
+    ON CONFLICT (order_type, status, is_active, region, business_type) DO UPDATE
+        SET urgent = c.urgent + EXCLUDED.urgent, updated_at = NOW();
+
+    UPDATE public.order_counter_state SET urgent_before = v_new, swept_at = NOW() WHERE id = 1;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Dashboard o'qishi: kerak bo'lsa sweep, so'ng barcha hisoblagichlar (bitta so'rov)
+CREATE OR REPLACE FUNCTION public.order_counters_snapshot(p_min_interval interval DEFAULT INTERVAL '1 minute')
+RETURNS SETOF public.order_status_counters AS $$
+BEGIN
+    PERFORM public.order_counters_sweep(p_min_interval);
+    RETURN QUERY
+        SELECT * FROM public.order_status_counters
+        WHERE total <> 0 OR urgent <> 0;
+END;
+$$ LANGUAGE plpgsql;
+
+-- TRIGGERS
+DROP TRIGGER IF EXISTS trg_connection_orders_status_counters ON public.connection_orders;
+CREATE TRIGGER trg_connection_orders_status_counters
+    AFTER INSERT OR UPDATE OR DELETE ON public.connection_orders
+    FOR EACH ROW EXECUTE FUNCTION public.order_status_counters_trg();
+
+DROP TRIGGER IF EXISTS trg_staff_orders_status_counters ON public.staff_orders;
+CREATE TRIGGER trg_staff_orders_status_counters
+    AFTER INSERT OR UPDATE OR DELETE ON public.staff_orders
+    FOR EACH ROW EXECUTE FUNCTION public.order_status_counters_trg();
+
+DROP TRIGGER IF EXISTS trg_technician_orders_status_counters ON public.technician_orders;
+CREATE TRIGGER trg_technician_orders_status_counters
+    AFTER INSERT OR UPDATE OR DELETE ON public.technician_orders
+    FOR EACH ROW EXECUTE FUNCTION public.order_status_counters_trg();
+
+DROP TRIGGER IF EXISTS trg_smart_service_orders_status_counters ON public.smart_service_orders;
+CREATE TRIGGER trg_smart_service_orders_status_counters
+    AFTER INSERT OR UPDATE OR DELETE ON public.smart_service_orders
+    FOR EACH ROW EXECUTE FUNCTION public.order_status_counters_trg();
+
+-- SEED (CREATE TRIGGER jadvallarni commit'gacha yozishdan bloklaydi - hisob aniq)
+INSERT INTO public.order_counter_state (id, urgent_before, swept_at)
+VALUES (1, NOW() - INTERVAL '1 day', NOW())
+ON CONFLICT (id) DO UPDATE SET urgent_before = EXCLUDED.urgent_before, swept_at = EXCLUDED.swept_at;
+
+TRUNCATE public.order_status_counters;
+
+INSERT INTO public.order_status_counters (order_type, status, is_active, region, business_type, total, urgent)
+SELECT order_type, status, is_active, region, business_type,
+       COUNT(*),
+       COUNT(*) FILTER (WHERE is_active AND created_at <= NOW() - INTERVAL '1 day')
+FROM (
+    SELECT 'connection_orders' AS order_type, status::text AS status, COALESCE(is_active, TRUE) AS is_active,
+           COALESCE(region, '') AS region, COALESCE(business_type::text, '') AS business_type, created_at
+    FROM public.connection_orders
+    UNION ALL
+    SELECT 'staff_orders', status::text, COALESCE(is_active, TRUE),
+           COALESCE(region, ''), COALESCE(business_type::text, ''), created_at
+    FROM public.staff_orders
+    UNION ALL
+    SELECT 'technician_orders', status::text, COALESCE(is_active, TRUE),
+           COALESCE(region, ''), COALESCE(business_type::text, ''), created_at
+    FROM public.technician_orders
+    UNION ALL
+    SELECT 'smart_service_orders', '', COALESCE(is_active, TRUE), '', '', created_at
+    FROM public.smart_service_orders
+) o
+GROUP BY order_type, status, is_active, region, business_type;
+
+COMMIT;
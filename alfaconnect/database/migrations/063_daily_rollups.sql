@@ -0,0 +1,116 @@
+-- Migration: Daily rollups for statistics screens
+-- Date: 2025-01-21
+-- Description: Per-day aggregates maintained by database/basic/rollups.py.
+--              - order_daily_rollups: orders created per day by order table, kind
+--                (type_of_zayavka) and creator role, with their current
+--                active/completed/cancelled state and completion time
+--              - material_daily_rollups: materials added and material_issued
+--                quantity/cost per day
+--              - rollup_watermarks: last refresh point per rollup; days touched
+--                since then (updated_at > watermark) are recomputed
+--              Only closed days (< CURRENT_DATE) are stored; "today" is always
+--              read live. All closed days are backfilled here and the 'daily'
+--              watermark is seeded, so the read path only refreshes
+--              incrementally. The same rows can be rebuilt later with:
+--                  python -m database.basic.rollups backfill --from 2024-01-01
+
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS public.order_daily_rollups (
+    day                   date    NOT NULL,
+    order_type            text    NOT NULL,
+    kind                  text    NOT NULL DEFAULT '',
+    creator_role          text    NOT NULL DEFAULT '',
+    created               integer NOT NULL DEFAULT 0,
+    active                integer NOT NULL DEFAULT 0,
+    completed             integer NOT NULL DEFAULT 0,
+    cancelled             integer NOT NULL DEFAULT 0,
+    completion_hours_sum  double precision NOT NULL DEFAULT 0,
+    PRIMARY KEY (day, order_type, kind, creator_role)
+);
+
+CREATE TABLE IF NOT EXISTS public.material_daily_rollups (
+    day              date    PRIMARY KEY,
+    materials_added  integer NOT NULL DEFAULT 0,
+    issued_count     integer NOT NULL DEFAULT 0,
+    issued_quantity  bigint  NOT NULL DEFAULT 0,
+    issued_cost      numeric(14,2) NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS public.rollup_watermarks (
+    name          text PRIMARY KEY,
+    watermark     timestamp with time zone NOT NULL,
+    refreshed_at  timestamp with time zone NOT NULL DEFAULT NOW()
+);
+
+COMMENT ON TABLE public.order_daily_rollups IS 'Closed-day order aggregates (database/basic/rollups.py)';
+COMMENT ON TABLE public.material_daily_rollups IS 'Closed-day material aggregates (database/basic/rollups.py)';
+
+-- O'zgargan kunlarni topish (updated_at > watermark) va kunni qayta hisoblash (created_at oralig'i)
+CREATE INDEX IF NOT EXISTS idx_connection_orders_updated_at ON public.connection_orders (updated_at);
+CREATE INDEX IF NOT EXISTS idx_staff_orders_updated_at ON public.staff_orders (updated_at);
+CREATE INDEX IF NOT EXISTS idx_technician_orders_updated_at ON public.technician_orders (updated_at);
+CREATE INDEX IF NOT EXISTS idx_smart_service_orders_updated_at ON public.smart_service_orders (updated_at);
+CREATE INDEX IF NOT EXISTS idx_connection_orders_created_at ON public.connection_orders (created_at);
+CREATE INDEX IF NOT EXISTS idx_staff_orders_created_at ON public.staff_orders (created_at);
+CREATE INDEX IF NOT EXISTS idx_technician_orders_created_at ON public.technician_orders (created_at);
+CREATE INDEX IF NOT EXISTS idx_smart_service_orders_created_at ON public.smart_service_orders (created_at);
+CREATE INDEX IF NOT EXISTS idx_materials_created_at ON public.materials (created_at);
+CREATE INDEX IF NOT EXISTS idx_material_issued_issued_at ON public.material_issued (issued_at);
+
+-- Backfill: all closed days (same aggregates as database/basic/rollups.py _order_rows_sql)
+INSERT INTO public.order_daily_rollups
+    (day, order_type, kind, creator_role, created, active, completed, cancelled, completion_hours_sum)
+SELECT day, order_type, kind, creator_role,
+       COUNT(*),
+       COUNT(*) FILTER (WHERE is_active),
+       COUNT(*) FILTER (WHERE status = 'completed'),
+       COUNT(*) FILTER (WHERE status = 'cancelled'),
+       COALESCE(SUM(EXTRACT(EPOCH FROM (updated_at - created_at)) / 3600)
+                FILTER (WHERE status = 'completed'), 0)
+FROM (
+    SELECT o.created_at::date AS day, 'connection_orders' AS order_type, 'connection' AS kind,
+           COALESCE(u.role::text, '') AS creator_role, o.is_active, o.status::text AS status,
+           o.created_at, o.updated_at
+    FROM public.connection_orders o LEFT JOIN public.users u ON u.id = o.user_id
+    WHERE o.created_at < CURRENT_DATE
+    UNION ALL
+    SELECT o.created_at::date, 'staff_orders', COALESCE(o.type_of_zayavka::text, ''),
+           COALESCE(u.role::text, ''), o.is_active, o.status::text, o.created_at, o.updated_at
+    FROM public.staff_orders o LEFT JOIN public.users u ON u.id = o.user_id
+    WHERE o.created_at < CURRENT_DATE
+    UNION ALL
+    SELECT o.created_at::date, 'technician_orders', 'technician',
+           COALESCE(u.role::text, ''), o.is_active, o.status::text, o.created_at, o.updated_at
+    FROM public.technician_orders o LEFT JOIN public.users u ON u.id = o.user_id
+    WHERE o.created_at < CURRENT_DATE
+    UNION ALL
+    SELECT o.created_at::date, 'smart_service_orders', 'smart_service',
+           COALESCE(u.role::text, ''), o.is_active, NULL::text, o.created_at, o.updated_at
+    FROM public.smart_service_orders o LEFT JOIN public.users u ON u.id = o.user_id
+    WHERE o.created_at < CURRENT_DATE
+) src
+GROUP BY day, order_type, kind, creator_role
+ON CONFLICT (day, order_type, kind, creator_role) DO NOTHING;
+
+INSERT INTO public.material_daily_rollups (day, materials_added, issued_count, issued_quantity, issued_cost)
+SELECT COALESCE(m.day, i.day),
+       COALESCE(m.added, 0), COALESCE(i.cnt, 0), COALESCE(i.qty, 0), COALESCE(i.cost, 0)
+FROM (
+    SELECT created_at::date AS day, COUNT(*) AS added
+    FROM public.materials WHERE created_at < CURRENT_DATE
+    GROUP BY 1
+) m
+FULL JOIN (
+    SELECT issued_at::date AS day, COUNT(*) AS cnt, SUM(quantity) AS qty, SUM(total_price) AS cost
+    FROM public.material_issued WHERE issued_at < CURRENT_DATE
+    GROUP BY 1
+) i ON i.day = m.day
+ON CONFLICT (day) DO NOTHING;
+
+-- Incremental refreshes start from here (rollups.SAFETY_LAG = 5 minutes)
+INSERT INTO public.rollup_watermarks (name, watermark)
+VALUES ('daily', NOW() - INTERVAL '5 minutes')
+ON CONFLICT (name) DO NOTHING;
+
+COMMIT;
@@ -0,0 +1,134 @@
+-- Migration: Denormalized message counters
+-- Date: 2025-01-21
+-- Description: message_counters keeps per-message reaction summary and read count
+--              so the chat loader (database/webapp/message_queries.py) returns
+--              everything in one statement instead of message query +
+--              GROUP BY over message_reactions + GROUP BY over message_reads.
+--              - reactions: [{"emoji", "count", "users": [user_id, ...]}]
+--                (count DESC, emoji), rebuilt per message on reaction change
+--              - read_count: incremented/decremented by statement-level
+--                triggers on message_reads (bulk "mark chat read" = one upsert)
+
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS public.message_counters (
+    message_id  bigint PRIMARY KEY REFERENCES public.messages(id) ON DELETE CASCADE,
+    reactions   jsonb   NOT NULL DEFAULT '[]'::jsonb,
+    read_count  integer NOT NULL DEFAULT 0
+);
+
+COMMENT ON TABLE public.message_counters IS 'Per-message reaction summary and read count (maintained by triggers)';
+
+-- REACTIONS: xabar reaksiyalari yig'indisini qayta qurish
+CREATE OR REPLACE FUNCTION public.message_counters_rebuild_reactions(p_message_id bigint)
+RETURNS void AS $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM public.messages WHERE id = p_message_id) THEN
+        RETURN;  -- xabar o'chirilmoqda (CASCADE)
+    END IF;
+
+    -- Qatorni lock'lab, keyin qayta sanaymiz: parallel reaksiyalar bir-birini
+    -- yo'qotmasligi uchun (lock'dan keyingi so'rov yangi snapshot ko'radi)
+    INSERT INTO public.message_counters (message_id) VALUES (p_message_id)
+    ON CONFLICT (message_id) DO NOTHING;
+    PERFORM 1 FROM public.message_counters WHERE message_id = p_message_id FOR UPDATE;
+
+    UPDATE public.message_counters
+    SET reactions = COALESCE((
+        SELECT jsonb_agg(
+                   jsonb_build_object('emoji', s.emoji, 'count', s.count, 'users', s.users)
+                   ORDER BY s.count DESC, s.emoji
+               )
+        FROM (
+            SELECT emoji, COUNT(*) AS count, array_agg(user_id ORDER BY created_at) AS users
+            FROM public.message_reactions
+            WHERE message_id = p_message_id
+            GROUP BY emoji
+        ) s
+    ), '[]'::jsonb)
+    WHERE message_id = p_message_id;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION public.message_reactions_counters_trg() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        PERFORM public.message_counters_rebuild_reactions(OLD.message_id);
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') AND (TG_OP = 'INSERT' OR NEW.message_id <> OLD.message_id) THEN
+        PERFORM public.message_counters_rebuild_reactions(NEW.message_id);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_message_reactions_counters ON public.message_reactions;
+CREATE TRIGGER trg_message_reactions_counters
+    AFTER INSERT OR UPDATE OR DELETE ON public.message_reactions
+    FOR EACH ROW EXECUTE FUNCTION public.message_reactions_counters_trg();
+
+-- READS: statement darajasidagi triggerlar (transition table bilan)
+CREATE OR REPLACE FUNCTION public.message_reads_counters_ins() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO public.message_counters AS c (message_id, read_count)
+    SELECT n.message_id, COUNT(*)
+    FROM new_rows n
+    JOIN public.messages m ON m.id = n.message_id
+    GROUP BY n.message_id
+    ORDER BY n.message_id
+    ON CONFLICT (message_id) DO UPDATE SET read_count = c.read_count + EXCLUDED.read_count;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION public.message_reads_counters_del() RETURNS trigger AS $$
+BEGIN
+    UPDATE public.message_counters c
+    SET read_count = GREATEST(0, c.read_count - d.cnt)
+    FROM (
+        SELECT message_id, COUNT(*) AS cnt FROM old_rows GROUP BY message_id
+    ) d
+    WHERE c.message_id = d.message_id;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_message_reads_counters_ins ON public.message_reads;
+CREATE TRIGGER trg_message_reads_counters_ins
+    AFTER INSERT ON public.message_reads
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION public.message_reads_counters_ins();
+
+DROP TRIGGER IF EXISTS trg_message_reads_counters_del ON public.message_reads;
+CREATE TRIGGER trg_message_reads_counters_del
+    AFTER DELETE ON public.message_reads
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION public.message_reads_counters_del();
+
+-- SEED (mavjud reaksiya va o'qilganlar)
+INSERT INTO public.message_counters (message_id, reactions, read_count)
+SELECT m.id,
+       COALESCE(r.reactions, '[]'::jsonb),
+       COALESCE(rd.read_count, 0)
+FROM public.messages m
+LEFT JOIN (
+    SELECT message_id,
+           jsonb_agg(jsonb_build_object('emoji', emoji, 'count', count, 'users', users)
+                     ORDER BY count DESC, emoji) AS reactions
+    FROM (
+        SELECT message_id, emoji, COUNT(*) AS count, array_agg(user_id ORDER BY created_at) AS users
+        FROM public.message_reactions
+        GROUP BY message_id, emoji
+    ) s
+    GROUP BY message_id
+) r ON r.message_id = m.id
+LEFT JOIN (
+    SELECT message_id, COUNT(*)::int AS read_count
+    FROM public.message_reads
+    GROUP BY message_id
+) rd ON rd.message_id = m.id
+WHERE r.message_id IS NOT NULL OR rd.message_id IS NOT NULL
+ON CONFLICT (message_id) DO UPDATE
+    SET reactions = EXCLUDED.reactions, read_count = EXCLUDED.read_count;
+
+COMMIT;
@@ -0,0 +1,33 @@
+-- Migration: Stored search vector for messages
+-- Date: 2025-01-22
+-- Description: messages.search_vector - generated (STORED) tsvector so search
+--              and ts_rank read the vector from the row instead of re-parsing
+--              message_text twice per matching row.
+--              - GIN index on search_vector replaces the expression index from
+--                053_add_message_search_index.sql
+--              - (created_at, id) index for the date filter of cross-chat search
+--              Adding a STORED column rewrites the table: run in a maintenance
+--              window on large installations.
+
+BEGIN;
+
+ALTER TABLE public.messages
+ADD COLUMN IF NOT EXISTS search_vector tsvector
+    GENERATED ALWAYS AS (to_tsvector('simple', coalesce(message_text, ''))) STORED;
+
+CREATE INDEX IF NOT EXISTS idx_messages_search_vector
+ON public.messages
+USING gin(search_vector);
+
+DROP INDEX IF EXISTS public.idx_messages_message_text_gin;
+
+CREATE INDEX IF NOT EXISTS idx_messages_created_at_id
+ON public.messages(created_at DESC, id DESC);
+
+CREATE INDEX IF NOT EXISTS idx_chats_operator_id
+ON public.chats(operator_id);
+
+COMMENT ON COLUMN public.messages.search_vector IS 'to_tsvector(''simple'', message_text), maintained by PostgreSQL';
+COMMENT ON INDEX idx_messages_search_vector IS 'GIN index for full-text search on messages.search_vector';
+
+COMMIT;
@@ -0,0 +1,97 @@
+-- Migration: Per-user chat read watermarks
+-- Date: 2025-01-22
+-- Description: chat_read_state(chat_id, user_id) replaces per-message
+--              message_reads rows.
+--              - last_read_message_id: every message with id <= watermark is
+--                read by the user; receipts/read counts are derived from it
+--              - unread_count: incremented by a trigger on message insert for
+--                every participant except the sender (system messages skipped),
+--                recomputed from the watermark on each read action
+--              - client/operator rows are created on their chat's first new
+--                message; supervisors get a row on their first read
+--              Existing message_reads rows are compacted into watermarks
+--              (MAX(message_id) per chat and user), then the table is dropped
+--              together with the read_count part of 064_message_counters.sql.
+
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS public.chat_read_state (
+    chat_id               bigint  NOT NULL REFERENCES public.chats(id) ON DELETE CASCADE,
+    user_id               bigint  NOT NULL REFERENCES public.users(id) ON DELETE CASCADE,
+    last_read_message_id  bigint  NOT NULL DEFAULT 0,
+    last_read_at          timestamp with time zone,
+    unread_count          integer NOT NULL DEFAULT 0,
+    CONSTRAINT chat_read_state_pkey PRIMARY KEY (chat_id, user_id)
+);
+
+COMMENT ON TABLE public.chat_read_state IS 'Per-user read watermark and unread counter per chat';
+
+-- Xabar uchun o'qiganlar: chat_id + watermark >= message_id
+CREATE INDEX IF NOT EXISTS idx_chat_read_state_chat_watermark
+ON public.chat_read_state(chat_id, last_read_message_id);
+
+-- Chatdagi oxirgi xabar / watermark'dan keyingi xabarlar
+CREATE INDEX IF NOT EXISTS idx_messages_chat_id_id
+ON public.messages(chat_id, id);
+
+-- Watermark'dan keyingi o'qilmagan xabarlar soni
+CREATE OR REPLACE FUNCTION public.chat_unread_after(p_chat_id bigint, p_user_id bigint, p_after_id bigint)
+RETURNS integer AS $$
+    SELECT COUNT(*)::int
+    FROM public.messages m
+    WHERE m.chat_id = p_chat_id
+      AND m.id > p_after_id
+      AND m.sender_id IS DISTINCT FROM p_user_id
+      AND m.sender_type <> 'system';
+$$ LANGUAGE sql STABLE;
+
+CREATE OR REPLACE FUNCTION public.chat_read_state_on_message() RETURNS trigger AS $$
+BEGIN
+    IF NEW.sender_type = 'system' THEN
+        RETURN NULL;
+    END IF;
+
+    -- Mavjud ishtirokchilar: +1
+    UPDATE public.chat_read_state
+    SET unread_count = unread_count + 1
+    WHERE chat_id = NEW.chat_id
+      AND user_id IS DISTINCT FROM NEW.sender_id;
+
+    -- Mijoz/operator uchun hali qator bo'lmasa - to'liq sanash bilan yaratiladi (bir marta)
+    INSERT INTO public.chat_read_state (chat_id, user_id, unread_count)
+    SELECT c.id, p.user_id, public.chat_unread_after(c.id, p.user_id, 0)
+    FROM public.chats c
+    CROSS JOIN LATERAL (VALUES (c.client_id), (c.operator_id)) AS p(user_id)
+    WHERE c.id = NEW.chat_id
+      AND p.user_id IS NOT NULL
+      AND p.user_id IS DISTINCT FROM NEW.sender_id
+    ON CONFLICT (chat_id, user_id) DO NOTHING;
+
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_chat_read_state_on_message ON public.messages;
+CREATE TRIGGER trg_chat_read_state_on_message
+    AFTER INSERT ON public.messages
+    FOR EACH ROW EXECUTE FUNCTION public.chat_read_state_on_message();
+
+-- COMPACTION: message_reads -> watermark
+INSERT INTO public.chat_read_state (chat_id, user_id, last_read_message_id, last_read_at)
+SELECT m.chat_id, mr.user_id, MAX(mr.message_id), MAX(mr.read_at)
+FROM public.message_reads mr
+JOIN public.messages m ON m.id = mr.message_id
+GROUP BY m.chat_id, mr.user_id
+ON CONFLICT (chat_id, user_id) DO UPDATE
+    SET last_read_message_id = GREATEST(chat_read_state.last_read_message_id, EXCLUDED.last_read_message_id),
+        last_read_at = GREATEST(chat_read_state.last_read_at, EXCLUDED.last_read_at);
+
+UPDATE public.chat_read_state s
+SET unread_count = public.chat_unread_after(s.chat_id, s.user_id, s.last_read_message_id);
+
+DROP TABLE IF EXISTS public.message_reads;
+DROP FUNCTION IF EXISTS public.message_reads_counters_ins();
+DROP FUNCTION IF EXISTS public.message_reads_counters_del();
+ALTER TABLE public.message_counters DROP COLUMN IF EXISTS read_count;
+
+COMMIT;
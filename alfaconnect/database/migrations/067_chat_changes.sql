@@ -0,0 +1,177 @@
+-- Migration: Chat change log for cross-chat delta sync
+-- Date: 2025-01-23
+-- Description: chat_changes records every chat/message change so one
+--              /api/chat/sync?cursor= request brings a client up to date.
+--              Kinds: message.created, message.edited, message.reaction,
+--              chat.read, chat.created, chat.assigned, chat.closed,
+--              chat.inactive, chat.reopened.
+--              - client_id / operator_id / prev_operator_id are copied from the
+--                chat at event time, so visibility needs no join
+--              - xid is the writing transaction; readers only take rows whose
+--                xid is below the snapshot xmin (all such transactions have
+--                finished) and page by (xid, seq), so a late commit with a
+--                smaller seq is never skipped
+--              - close_chat() sets alfaconnect.chat_change_reason = 'closed'
+--                to tell a manual close from the inactivity sweep
+--              - prune_chat_changes() drops old rows and remembers the prune
+--                point; older cursors get "reset" and reload everything
+--              Needs PostgreSQL 13+ (xid8, pg_current_xact_id).
+
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS public.chat_changes (
+    seq               bigserial PRIMARY KEY,
+    xid               xid8   NOT NULL DEFAULT pg_current_xact_id(),
+    chat_id           bigint NOT NULL,
+    kind              text   NOT NULL,
+    entity_id         bigint,
+    client_id         bigint,
+    operator_id       bigint,
+    prev_operator_id  bigint,
+    payload           jsonb,
+    created_at        timestamp with time zone NOT NULL DEFAULT now()
+);
+
+CREATE INDEX IF NOT EXISTS idx_chat_changes_xid_seq ON public.chat_changes(xid, seq);
+CREATE INDEX IF NOT EXISTS idx_chat_changes_created_at ON public.chat_changes(created_at);
+
+COMMENT ON TABLE public.chat_changes IS 'Chat/message change log for /api/chat/sync (maintained by triggers)';
+
+CREATE TABLE IF NOT EXISTS public.chat_changes_pruned (
+    id    smallint PRIMARY KEY DEFAULT 1 CHECK (id = 1),
+    xid   xid8   NOT NULL,
+    seq   bigint NOT NULL
+);
+
+CREATE OR REPLACE FUNCTION public.chat_change_log(
+    p_chat_id bigint, p_kind text, p_entity_id bigint, p_payload jsonb DEFAULT NULL
+) RETURNS void AS $$
+    INSERT INTO public.chat_changes (chat_id, kind, entity_id, client_id, operator_id, payload)
+    SELECT p_chat_id, p_kind, p_entity_id, c.client_id, c.operator_id, p_payload
+    FROM public.chats c
+    WHERE c.id = p_chat_id;
+$$ LANGUAGE sql;
+
+-- MESSAGES
+CREATE OR REPLACE FUNCTION public.chat_changes_messages_trg() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        PERFORM public.chat_change_log(NEW.chat_id, 'message.created', NEW.id);
+    ELSIF NEW.message_text IS DISTINCT FROM OLD.message_text
+       OR NEW.attachments IS DISTINCT FROM OLD.attachments
+       OR NEW.edited_at IS DISTINCT FROM OLD.edited_at THEN
+        PERFORM public.chat_change_log(NEW.chat_id, 'message.edited', NEW.id);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_chat_changes_messages ON public.messages;
+CREATE TRIGGER trg_chat_changes_messages
+    AFTER INSERT OR UPDATE ON public.messages
+    FOR EACH ROW EXECUTE FUNCTION public.chat_changes_messages_trg();
+
+-- REACTIONS
+CREATE OR REPLACE FUNCTION public.chat_changes_reactions_trg() RETURNS trigger AS $$
+DECLARE
+    v_message_id bigint := CASE WHEN TG_OP = 'DELETE' THEN OLD.message_id ELSE NEW.message_id END;
+BEGIN
+    PERFORM public.chat_change_log(m.chat_id, 'message.reaction', m.id)
+    FROM public.messages m
+    WHERE m.id = v_message_id;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_chat_changes_reactions ON public.message_reactions;
+CREATE TRIGGER trg_chat_changes_reactions
+    AFTER INSERT OR UPDATE OR DELETE ON public.message_reactions
+    FOR EACH ROW EXECUTE FUNCTION public.chat_changes_reactions_trg();
+
+-- READS (faqat watermark siljiganda; unread_count o'zgarishi log qilinmaydi)
+CREATE OR REPLACE FUNCTION public.chat_changes_reads_trg() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'UPDATE' AND NEW.last_read_message_id IS NOT DISTINCT FROM OLD.last_read_message_id THEN
+        RETURN NULL;
+    END IF;
+    IF NEW.last_read_message_id > 0 THEN
+        PERFORM public.chat_change_log(
+            NEW.chat_id, 'chat.read', NEW.user_id,
+            jsonb_build_object('user_id', NEW.user_id, 'last_read_message_id', NEW.last_read_message_id)
+        );
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_chat_changes_reads ON public.chat_read_state;
+CREATE TRIGGER trg_chat_changes_reads
+    AFTER INSERT OR UPDATE OF last_read_message_id ON public.chat_read_state
+    FOR EACH ROW EXECUTE FUNCTION public.chat_changes_reads_trg();
+
+-- CHATS
+CREATE OR REPLACE FUNCTION public.chat_changes_chats_trg() RETURNS trigger AS $$
+DECLARE
+    v_kind text;
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        v_kind := 'chat.created';
+    ELSIF NEW.status = 'inactive' AND OLD.status <> 'inactive' THEN
+        v_kind := CASE WHEN current_setting('alfaconnect.chat_change_reason', true) = 'closed'
+                       THEN 'chat.closed' ELSE 'chat.inactive' END;
+    ELSIF NEW.status = 'active' AND OLD.status <> 'active' THEN
+        v_kind := 'chat.reopened';
+    ELSIF NEW.operator_id IS DISTINCT FROM OLD.operator_id THEN
+        v_kind := 'chat.assigned';
+    ELSE
+        RETURN NULL;
+    END IF;
+
+    INSERT INTO public.chat_changes (chat_id, kind, entity_id, client_id, operator_id, prev_operator_id, payload)
+    VALUES (
+        NEW.id, v_kind, NEW.id, NEW.client_id, NEW.operator_id,
+        CASE WHEN TG_OP = 'UPDATE' THEN OLD.operator_id END,
+        jsonb_build_object('status', NEW.status, 'operator_id', NEW.operator_id)
+    );
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_chat_changes_chats ON public.chats;
+CREATE TRIGGER trg_chat_changes_chats
+    AFTER INSERT OR UPDATE OF status, operator_id ON public.chats
+    FOR EACH ROW EXECUTE FUNCTION public.chat_changes_chats_trg();
+
+-- PRUNE: eski yozuvlarni o'chirish va o'chirilgan chegara (xid, seq) ni saqlash
+CREATE OR REPLACE FUNCTION public.prune_chat_changes(p_keep interval)
+RETURNS integer AS $$
+DECLARE
+    v_xid xid8;
+    v_seq bigint;
+    v_count integer;
+BEGIN
+    IF NOT pg_try_advisory_xact_lock(hashtext('chat_changes_prune')) THEN
+        RETURN 0;
+    END IF;
+
+    WITH deleted AS (
+        DELETE FROM public.chat_changes
+        WHERE created_at < now() - p_keep
+        RETURNING xid, seq
+    )
+    SELECT d.xid, d.seq, (SELECT COUNT(*) FROM deleted)
+    INTO v_xid, v_seq, v_count
+    FROM deleted d
+    ORDER BY d.xid DESC, d.seq DESC
+    LIMIT 1;
+
+    IF v_count > 0 THEN
+        INSERT INTO public.chat_changes_pruned (id, xid, seq) VALUES (1, v_xid, v_seq)
+        ON CONFLICT (id) DO UPDATE SET xid = EXCLUDED.xid, seq = EXCLUDED.seq
+        WHERE (chat_changes_pruned.xid, chat_changes_pruned.seq) < (EXCLUDED.xid, EXCLUDED.seq);
+    END IF;
+    RETURN COALESCE(v_count, 0);
+END;
+$$ LANGUAGE plpgsql;
+
+COMMIT;
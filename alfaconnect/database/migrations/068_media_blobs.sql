@@ -0,0 +1,137 @@
+-- Migration: Content-addressed media/document store
+-- Date: 2025-01-24
+-- Description: Media fayllar (voice, chat rasmlari va variantlari, AKT hujjatlari)
+--              bir marta, sha256 bo'yicha saqlanadi:
+--                  {MEDIA_ROOT}/{MEDIA_BLOB_DIR}/ab/cd/abcd...  (utils/blob_store.py)
+--              media_blobs - har bir blob uchun bitta qator, ref_count
+--              triggerlar bilan yuritiladi:
+--              - messages.attachments->'blobs' ({"original": sha, "webp": sha,
+--                "thumb": sha}) - forward qilingan xabar attachments'ni
+--                nusxalaydi, demak faqat ref_count oshadi, baytlar nusxalanmaydi
+--              - akt_documents.file_hash - qayta yaratilgan AKT eski blob'ni
+--                bo'shatadi
+--              Store'da yo'q hash'lar (eski fayllar) e'tiborga olinmaydi.
+--              ref_count 0 ga tushganda unreferenced_at yoziladi; GC
+--              (python -m database.basic.media_blobs gc) grace muddatidan
+--              keyin qatorni va faylni o'chiradi.
+--              Eski fayllarni ko'chirish: python -m database.basic.media_blobs import-legacy
+
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS public.media_blobs (
+    sha256           text    PRIMARY KEY CHECK (length(sha256) = 64),
+    size             bigint  NOT NULL,
+    content_type     text,
+    ref_count        integer NOT NULL DEFAULT 0,
+    created_at       timestamptz NOT NULL DEFAULT now(),
+    unreferenced_at  timestamptz DEFAULT now()
+);
+
+-- GC nomzodlari
+CREATE INDEX IF NOT EXISTS idx_media_blobs_unreferenced
+    ON public.media_blobs (unreferenced_at)
+    WHERE ref_count <= 0;
+
+-- hash'lar ro'yxati bo'yicha ref_count ni o'zgartirish
+CREATE OR REPLACE FUNCTION public.media_blobs_adjust(p_hashes text[], p_delta integer) RETURNS void AS $$
+    UPDATE public.media_blobs b
+    SET ref_count = b.ref_count + p_delta * d.cnt,
+        unreferenced_at = CASE WHEN b.ref_count + p_delta * d.cnt <= 0 THEN now() END
+    FROM (
+        SELECT h, count(*)::int AS cnt
+        FROM unnest(p_hashes) AS h
+        WHERE h IS NOT NULL
+        GROUP BY h
+    ) d
+    WHERE b.sha256 = d.h;
+$$ LANGUAGE sql;
+
+CREATE OR REPLACE FUNCTION public.message_blob_hashes(p_attachments jsonb) RETURNS text[] AS $$
+    SELECT COALESCE(array_agg(value), '{}')
+    FROM jsonb_each_text(
+        CASE WHEN jsonb_typeof(p_attachments -> 'blobs') = 'object'
+             THEN p_attachments -> 'blobs' ELSE '{}'::jsonb END
+    );
+$$ LANGUAGE sql IMMUTABLE;
+
+-- MESSAGES
+CREATE OR REPLACE FUNCTION public.media_blobs_messages_trg() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        PERFORM public.media_blobs_adjust(public.message_blob_hashes(OLD.attachments), -1);
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        PERFORM public.media_blobs_adjust(public.message_blob_hashes(NEW.attachments), 1);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_media_blobs_messages_ins ON public.messages;
+CREATE TRIGGER trg_media_blobs_messages_ins
+    AFTER INSERT ON public.messages
+    FOR EACH ROW
+    WHEN (NEW.attachments ? 'blobs')
+    EXECUTE FUNCTION public.media_blobs_messages_trg();
+
+DROP TRIGGER IF EXISTS trg_media_blobs_messages_del ON public.messages;
+CREATE TRIGGER trg_media_blobs_messages_del
+    AFTER DELETE ON public.messages
+    FOR EACH ROW
+    WHEN (OLD.attachments ? 'blobs')
+    EXECUTE FUNCTION public.media_blobs_messages_trg();
+
+DROP TRIGGER IF EXISTS trg_media_blobs_messages_upd ON public.messages;
+CREATE TRIGGER trg_media_blobs_messages_upd
+    AFTER UPDATE OF attachments ON public.messages
+    FOR EACH ROW
+    WHEN (OLD.attachments -> 'blobs' IS DISTINCT FROM NEW.attachments -> 'blobs')
+    EXECUTE FUNCTION public.media_blobs_messages_trg();
+
+-- AKT DOCUMENTS
+CREATE OR REPLACE FUNCTION public.media_blobs_akt_trg() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        PERFORM public.media_blobs_adjust(ARRAY[OLD.file_hash::text], -1);
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        PERFORM public.media_blobs_adjust(ARRAY[NEW.file_hash::text], 1);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_media_blobs_akt ON public.akt_documents;
+CREATE TRIGGER trg_media_blobs_akt
+    AFTER INSERT OR DELETE OR UPDATE OF file_hash ON public.akt_documents
+    FOR EACH ROW EXECUTE FUNCTION public.media_blobs_akt_trg();
+
+-- Triggerlardan qat'i nazar ref_count ni qayta hisoblash (GC --recount)
+CREATE OR REPLACE FUNCTION public.media_blobs_recount() RETURNS integer AS $$
+    WITH refs AS (
+        SELECT h, count(*)::int AS cnt
+        FROM (
+            SELECT unnest(public.message_blob_hashes(attachments)) AS h
+            FROM public.messages
+            WHERE attachments ? 'blobs'
+            UNION ALL
+            SELECT file_hash::text FROM public.akt_documents
+        ) s
+        GROUP BY h
+    ), fixed AS (
+        UPDATE public.media_blobs b
+        SET ref_count = c.cnt,
+            unreferenced_at = CASE WHEN c.cnt > 0 THEN NULL ELSE COALESCE(b.unreferenced_at, now()) END
+        FROM (
+            SELECT b2.sha256, COALESCE(r.cnt, 0) AS cnt
+            FROM public.media_blobs b2
+            LEFT JOIN refs r ON r.h = b2.sha256
+        ) c
+        WHERE b.sha256 = c.sha256
+          AND b.ref_count <> c.cnt
+        RETURNING 1
+    )
+    SELECT count(*)::int FROM fixed;
+$$ LANGUAGE sql;
+
+COMMIT;
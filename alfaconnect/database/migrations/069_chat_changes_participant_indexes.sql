@@ -0,0 +1,21 @@
+-- Migration: Per-participant indexes for chat_changes
+-- Date: 2025-01-25
+-- Description: Non-supervisor /api/chat/sync reads only rows where the caller is
+--              client_id, operator_id or prev_operator_id. With only (xid, seq)
+--              indexed, every sync scanned all users' rows since the cursor.
+--              get_chat_changes() (database/webapp/chat_sync_queries.py) now
+--              runs one (participant, xid, seq) index range scan per column and
+--              merges them with UNION.
+
+BEGIN;
+
+CREATE INDEX IF NOT EXISTS idx_chat_changes_client_xid_seq
+    ON public.chat_changes(client_id, xid, seq);
+CREATE INDEX IF NOT EXISTS idx_chat_changes_operator_xid_seq
+    ON public.chat_changes(operator_id, xid, seq)
+    WHERE operator_id IS NOT NULL;
+CREATE INDEX IF NOT EXISTS idx_chat_changes_prev_operator_xid_seq
+    ON public.chat_changes(prev_operator_id, xid, seq)
+    WHERE prev_operator_id IS NOT NULL;
+
+COMMIT;
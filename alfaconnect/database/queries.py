@@ -1,4 +1,7 @@
 import asyncpg
+from database.connections import get_connection
+from database.basic.application_number import next_application_number
+from database.basic.user_cache import invalidate_user
 from config import settings
 from typing import Optional
 
@@ -19,7 +22,7 @@ async def get_or_create_user(telegram_id: int, username: Optional[str], full_nam
     if telegram_id == settings.BOT_ID:
         return "client"  # Bot uchun default role qaytaradi, lekin bazaga saqlamaydi
     
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         user = await conn.fetchrow(
             'SELECT role, full_name FROM users WHERE telegram_id = $1',
@@ -64,7 +67,7 @@ async def get_or_create_user(telegram_id: int, username: Optional[str], full_nam
 
 async def reset_user_sequence() -> None:
     """User ID sequence ni hozirgi ma'lumotlarga moslashtiradi."""
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         await conn.execute("SELECT reset_user_sequential_sequence()")
     finally:
@@ -72,7 +75,7 @@ async def reset_user_sequence() -> None:
 
 async def get_next_user_id() -> int:
     """Keyingi ketma-ket user ID ni qaytaradi."""
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         result = await conn.fetchval("SELECT get_next_sequential_user_id()")
         return result
@@ -81,7 +84,7 @@ async def get_next_user_id() -> int:
 
 async def find_user_by_telegram_id(telegram_id: int) -> Optional[asyncpg.Record]:
     """Finds a user by their Telegram ID."""
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         user = await conn.fetchrow(
             'SELECT * FROM users WHERE telegram_id = $1',
@@ -91,37 +94,18 @@ async def find_user_by_telegram_id(telegram_id: int) -> Optional[asyncpg.Record]
     finally:
         await conn.close()
 
-async def find_user_by_phone(phone: str) -> Optional[asyncpg.Record]:
+async def find_user_by_phone(phone: str) -> Optional[dict]:
     """Finds a user by their phone number.
     
-    After migration 046, all phones in users table are normalized to +998XXXXXXXXX format.
-    This function normalizes input and does exact match for efficiency.
+    users.phone_digits indeksi va jarayon ichidagi kesh orqali
+    (database/basic/phone.py).
     """
-    from database.basic.phone import normalize_phone
-    
-    conn = await asyncpg.connect(settings.DB_URL)
-    try:
-        # Normalize input phone (after migration, all phones in DB are normalized)
-        normalized = normalize_phone(phone)
-        if not normalized:
-            return None
-        
-        # Exact match (efficient - phones are normalized in DB after migration 046)
-        user = await conn.fetchrow(
-            """
-            SELECT * FROM users 
-            WHERE phone = $1
-            LIMIT 1
-            """,
-            normalized
-        )
-        return user
-    finally:
-        await conn.close()
+    from database.basic.phone import find_user_by_phone as _find_user_by_phone
+    return await _find_user_by_phone(phone)
 
 async def update_user_phone(telegram_id: int, phone: Optional[str]) -> bool:
     """Updates the phone number of a user by their Telegram ID."""
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         sanitized = (phone or "").strip()
         if sanitized:
@@ -135,18 +119,20 @@ async def update_user_phone(telegram_id: int, phone: Optional[str]) -> bool:
             'UPDATE users SET phone = $1 WHERE telegram_id = $2',
             normalized, telegram_id
         )
+        invalidate_user(telegram_id)
         return result != 'UPDATE 0'
     finally:
         await conn.close()
 
 async def update_user_role(telegram_id: int, new_role: str) -> bool:
     """Updates the role of a user by their Telegram ID."""
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         result = await conn.execute(
             'UPDATE users SET role = $1 WHERE telegram_id = $2',
             new_role, telegram_id
         )
+        invalidate_user(telegram_id)
         return result != 'UPDATE 0'
     finally:
         await conn.close()
@@ -161,19 +147,20 @@ async def update_user_full_name(telegram_id: int, full_name: str) -> bool:
     Returns:
         bool: Muvaffaqiyatli yangilangan bo'lsa True, aks holda False
     """
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         result = await conn.execute(
             'UPDATE users SET full_name = $1 WHERE telegram_id = $2',
             full_name, telegram_id
         )
+        invalidate_user(telegram_id)
         return result != 'UPDATE 0'
     finally:
         await conn.close()
 
 async def get_user_language(telegram_id: int) -> str:
     """Get user's language by telegram_id; return 'uz' as default."""
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         language = await conn.fetchval(
             "SELECT language FROM users WHERE telegram_id = $1",
@@ -194,7 +181,7 @@ async def get_smart_service_orders_for_manager(limit: int = 10, offset: int = 0)
     Returns:
         list: SmartService arizalari ro'yxati
     """
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         orders = await conn.fetch(
             """
@@ -221,7 +208,7 @@ async def get_smart_service_order_by_id(order_id: int) -> Optional[dict]:
     Returns:
         dict: Ariza ma'lumotlari yoki None
     """
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         order = await conn.fetchrow(
             """
@@ -244,7 +231,7 @@ async def get_smart_service_orders_count() -> int:
     Returns:
         int: Jami arizalar soni
     """
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         count = await conn.fetchval("SELECT COUNT(*) FROM smart_service_orders")
         return count or 0
@@ -263,25 +250,11 @@ async def create_smart_service_order(user_id: int, category: str, service_type:
     Returns:
         int: Yaratilgan ariza IDsi
     """
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         # Generate application number for smart service
         # Get next number for smart service orders
-        next_num = await conn.fetchval(
-            """
-            SELECT COALESCE(MAX(
-                CASE 
-                    WHEN application_number ~ '^SMA-[0-9]+$' THEN 
-                        CAST(SUBSTRING(application_number FROM 'SMA-([0-9]+)$') AS INTEGER)
-                    ELSE 0
-                END
-            ), 0) + 1
-            FROM smart_service_orders 
-            WHERE application_number IS NOT NULL
-            """
-        )
-        
-        application_number = f"SMA-{next_num:04d}"
+        application_number = await next_application_number(conn, "SMA")
         
         order_id = await conn.fetchval(
             """
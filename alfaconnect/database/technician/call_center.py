@@ -1,16 +1,17 @@
 # database/technician/call_center.py
-from config import settings  # settings.DB_URL
 from typing import List, Dict, Any, Optional, Union
 import asyncpg
 
+from database.connections import get_connection
+from database.basic.application_number import next_application_number
 from database.basic.region import normalize_region_code
 from database.basic.phone import normalize_phone
 
 __all__ = ["list_technicians_by_region", "staff_orders_create", "staff_orders_technician_create"]
 
 async def _conn() -> asyncpg.Connection:
-    # Endi fallback DSN YO'Q. Faqat settings.DB_URL ishlatiladi.
-    return await asyncpg.connect(settings.DB_URL)
+    # Umumiy pool'dan (database/connections.py); close() connection'ni pool'ga qaytaradi.
+    return await get_connection()
 
 
 async def list_technicians_by_region(region_id: int, limit: int = 100) -> List[Dict[str, Any]]:
@@ -54,11 +55,7 @@ async def staff_orders_create(
     try:
         region_value = normalize_region_code(region) or (str(region).strip() if region is not None else None)
         normalized_phone = normalize_phone(phone) if phone else None
-        next_number = await conn.fetchval(
-            "SELECT COALESCE(MAX(CAST(SUBSTRING(application_number FROM '\\d+$') AS INTEGER)), 0) + 1 FROM staff_orders WHERE application_number LIKE $1",
-            f"STAFF-TECH-{business_type}-%"
-        )
-        application_number = f"STAFF-TECH-{business_type}-{next_number:04d}"
+        application_number = await next_application_number(conn, "STAFF-TECH", business_type)
         row = await conn.fetchrow(
             """
             INSERT INTO staff_orders (
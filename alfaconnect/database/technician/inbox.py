@@ -1,12 +1,11 @@
 # database/technician/inbox.py
-import asyncpg
 from typing import List, Dict, Any, Optional
-from config import settings
+from database.connections import get_connection
 
 
 # ----------------- YORDAMCHI -----------------
 async def _conn():
-    return await asyncpg.connect(settings.DB_URL)
+    return await get_connection()
 
 def _as_dicts(rows):
     return [dict(r) for r in rows]
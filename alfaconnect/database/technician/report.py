@@ -1,11 +1,10 @@
 # database/technician/report.py
 from typing import Dict, Optional, Tuple
-import asyncpg
-from config import settings
+from database.connections import get_connection
 
 # ---------------- DB helpers ----------------
 async def _conn():
-    return await asyncpg.connect(settings.DB_URL)
+    return await get_connection()
 
 async def _pick_column(conn, table: str, candidates: list[str]) -> Optional[str]:
     rows = await conn.fetch(
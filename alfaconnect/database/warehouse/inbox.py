@@ -1,11 +1,10 @@
 # database/warehouse/inbox.py
-import asyncpg
 from typing import List, Dict, Any, Optional
-from config import settings
+from database.connections import get_connection
 
 async def _conn():
     """Database connection helper"""
-    return await asyncpg.connect(settings.DB_URL)
+    return await get_connection()
 
 # ==================== CONNECTION ORDERS ====================
 
@@ -694,140 +693,107 @@ async def get_all_warehouse_orders_count() -> Dict[str, int]:
 
 # ==================== HELPER FUNCTIONS ====================
 
-async def create_material_and_technician_entry(order_id: int, order_type: str, warehouse_user_id: int) -> bool:
+_ORDER_TABLES = {
+    "connection": "connection_orders",
+    "technician": "technician_orders",
+    "staff": "staff_orders",
+}
+
+# Arizaning tasdiqlanmagan material so'rovlarini bitta so'rovda berish:
+#   1) material_requests -> warehouse_approved = TRUE (qatorlar lock'lanadi,
+#      parallel ikkinchi tasdiqlash hech narsa topmaydi);
+#   2) ombordan ('warehouse') so'ralganlar material_id bo'yicha yig'iladi;
+#   3) material_and_technician ga UPSERT (user_id, material_id);
+#   4) ombor zaxirasi bitta UPDATE ... FROM bilan kamaytiriladi.
+_ISSUE_MATERIALS_SQL = """
+    WITH pending AS (
+        UPDATE material_requests
+        SET warehouse_approved = TRUE
+        WHERE application_number = $1
+          AND COALESCE(warehouse_approved, FALSE) = FALSE
+        RETURNING material_id, quantity, COALESCE(source_type, 'warehouse') AS source_type
+    ),
+    issued AS (
+        SELECT p.material_id,
+               SUM(p.quantity)::int AS quantity,
+               m.name AS material_name,
+               COALESCE(m.material_unit, 'dona') AS material_unit,
+               COALESCE(m.price, 0) AS price
+        FROM pending p
+        JOIN materials m ON m.id = p.material_id
+        WHERE p.source_type = 'warehouse'
+        GROUP BY p.material_id, m.name, m.material_unit, m.price
+    ),
+    upserted AS (
+        INSERT INTO material_and_technician
+            (user_id, material_id, quantity, application_number, material_name,
+             material_unit, price, total_price, issued_by, issued_at)
+        SELECT $2, material_id, quantity, $1, material_name,
+               material_unit, price, price * quantity, $3, NOW()
+        FROM issued
+        ON CONFLICT (user_id, material_id) DO UPDATE
+            SET quantity = material_and_technician.quantity + EXCLUDED.quantity,
+                application_number = EXCLUDED.application_number,
+                material_name = EXCLUDED.material_name,
+                price = EXCLUDED.price,
+                total_price = material_and_technician.total_price + EXCLUDED.total_price,
+                issued_by = EXCLUDED.issued_by,
+                issued_at = NOW()
+        RETURNING material_id
+    ),
+    stock AS (
+        UPDATE materials m
+        SET quantity = GREATEST(0, m.quantity - i.quantity)
+        FROM issued i
+        WHERE m.id = i.material_id
+        RETURNING m.id
+    )
+    SELECT (SELECT COUNT(*) FROM pending) AS approved,
+           (SELECT COUNT(*) FROM upserted) AS issued,
+           (SELECT COUNT(*) FROM stock) AS stock_updated
+"""
+
+async def create_material_and_technician_entry(
+    order_id: int, order_type: str, warehouse_user_id: int, conn=None
+) -> bool:
     """
     Ariza tasdiqlangandan so'ng material_and_technician jadvaliga yozish
-    issued_by va issued_at bir vaqtda yoziladi
+    issued_by va issued_at bir vaqtda yoziladi.
+    Barcha materiallar bitta tranzaksiyada (set-based) beriladi; faqat hali
+    tasdiqlanmagan material_requests qatorlari hisobga olinadi.
     """
-    conn = await _conn()
+    table_name = _ORDER_TABLES.get(order_type)
+    if table_name is None:
+        return False
+
+    own_conn = conn is None
+    if own_conn:
+        conn = await _conn()
     try:
-        # Order type ga qarab material_requests dan materiallarni olish
-        if order_type == "connection":
-            table_name = "connection_orders"
-        elif order_type == "technician":
-            table_name = "technician_orders"
-        elif order_type == "staff":
-            table_name = "staff_orders"
-        else:
-            return False
-        
-        # Get application_number and technician_id from the order table
-        order_info = await conn.fetchrow(
-            f"""
-            SELECT user_id, application_number 
-            FROM {table_name} 
-            WHERE id = $1
-            """,
-            order_id
-        )
-        
-        if not order_info:
-            print(f"No order found for {order_type} order {order_id}")
-            return False
-            
-        technician_id = order_info['user_id']
-        application_number = order_info['application_number']
-        
-        if not application_number:
-            print(f"No application_number found for {order_type} order {order_id}")
-            return False
-        
-        # Material requests dan materiallarni olish
-        material_requests = await conn.fetch(
-            """
-            SELECT mr.material_id, mr.quantity, mr.application_number, mr.source_type
-            FROM material_requests mr
-            WHERE mr.application_number = $1
-            """,
-            application_number
-        )
-        
-        if not material_requests:
-            print(f"No material requests found for {order_type} order {order_id}")
-            return True  
-        
-        for mr in material_requests:
-            material_id = mr['material_id']
-            quantity = mr['quantity']
-            source_type = mr.get('source_type', 'warehouse')
-            
-            if source_type == 'warehouse':
-                # Get material details for the new columns
-                material_info = await conn.fetchrow(
-                    "SELECT name, price, COALESCE(material_unit, 'dona') as material_unit FROM materials WHERE id = $1",
-                    material_id
-                )
-                
-                if material_info:
-                    material_name = material_info['name']
-                    price = material_info['price'] or 0
-                    material_unit = material_info.get('material_unit', 'dona')
-                    total_price = price * quantity
-                    
-                    # Check if entry exists
-                    existing = await conn.fetchrow(
-                        "SELECT id, quantity, total_price FROM material_and_technician WHERE user_id = $1 AND material_id = $2",
-                        technician_id, material_id
-                    )
-                    
-                    if existing:
-                        # Update existing entry - add quantity
-                        # issued_by va issued_at yangilanadi
-                        await conn.execute(
-                            """
-                            UPDATE material_and_technician 
-                            SET quantity = quantity + $1,
-                                application_number = $2,
-                                material_name = $3,
-                                price = $4,
-                                total_price = total_price + $5,
-                                issued_by = $6,
-                                issued_at = NOW()
-                            WHERE user_id = $7 AND material_id = $8
-                            """,
-                            quantity, application_number, material_name, price, total_price,
-                            warehouse_user_id, technician_id, material_id
-                        )
-                    else:
-                        # Insert new entry
-                        # issued_by va issued_at bir vaqtda yoziladi
-                        await conn.execute(
-                            """
-                            INSERT INTO material_and_technician 
-                            (user_id, material_id, quantity, application_number, material_name, 
-                             material_unit, price, total_price, issued_by, issued_at)
-                            VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, NOW())
-                            """,
-                            technician_id, material_id, quantity, application_number, 
-                            material_name, material_unit, price, total_price, warehouse_user_id
-                        )
-                
-                # Ombor zaxirasini kamaytirish
-                await conn.execute(
-                    """
-                    UPDATE materials 
-                    SET quantity = GREATEST(0, quantity - $1)
-                    WHERE id = $2
-                    """,
-                    quantity, material_id
-                )
-            
-            # warehouse_approved ni TRUE qilish
-            await conn.execute(
-                """
-                UPDATE material_requests 
-                SET warehouse_approved = TRUE
-                WHERE application_number = $1 AND material_id = $2
-                """,
-                application_number, material_id
+        async with conn.transaction():
+            # Get application_number and technician_id from the order table
+            order_info = await conn.fetchrow(
+                f"SELECT user_id, application_number FROM {table_name} WHERE id = $1",
+                order_id
+            )
+            if not order_info:
+                print(f"No order found for {order_type} order {order_id}")
+                return False
+            if not order_info['application_number']:
+                print(f"No application_number found for {order_type} order {order_id}")
+                return False
+
+            await conn.fetchrow(
+                _ISSUE_MATERIALS_SQL,
+                order_info['application_number'], order_info['user_id'], warehouse_user_id
             )
-        
         return True
     except Exception as e:
         print(f"Error creating material_and_technician entries: {e}")
         return False
     finally:
-        await conn.close()
+        if own_conn:
+            await conn.close()
 
 # ==================== CONFIRMATION FUNCTIONS ====================
 
@@ -843,7 +809,7 @@ async def confirm_materials_and_update_status_for_connection(order_id: int, ware
         # Faqat materiallarni texnikka beramiz
         
         # Material_and_technician jadvaliga yozish va ombor zaxirasini kamaytirish
-        success = await create_material_and_technician_entry(order_id, "connection", warehouse_user_id)
+        success = await create_material_and_technician_entry(order_id, "connection", warehouse_user_id, conn)
         if not success:
             print(f"Failed to create material_and_technician entries for connection order {order_id}")
         
@@ -866,7 +832,7 @@ async def confirm_materials_and_update_status_for_technician(order_id: int, ware
         # Faqat materiallarni texnikka beramiz
         
         # Material_and_technician jadvaliga yozish va ombor zaxirasini kamaytirish
-        success = await create_material_and_technician_entry(order_id, "technician", warehouse_user_id)
+        success = await create_material_and_technician_entry(order_id, "technician", warehouse_user_id, conn)
         if not success:
             print(f"Failed to create material_and_technician entries for technician order {order_id}")
         
@@ -889,7 +855,7 @@ async def confirm_materials_and_update_status_for_staff(order_id: int, warehouse
         # Faqat materiallarni texnikka beramiz
         
         # Material_and_technician jadvaliga yozish va ombor zaxirasini kamaytirish
-        success = await create_material_and_technician_entry(order_id, "staff", warehouse_user_id)
+        success = await create_material_and_technician_entry(order_id, "staff", warehouse_user_id, conn)
         if not success:
             print(f"Failed to create material_and_technician entries for staff order {order_id}")
         
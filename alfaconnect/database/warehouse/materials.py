@@ -1,8 +1,8 @@
 # database/warehouse/materials.py
-import asyncpg
 from typing import Optional, Dict, Any, List
 from decimal import Decimal
-from config import settings
+from database.connections import get_connection
+from database.basic.search import search_materials as _search_materials
 
 # ---------- MATERIALLAR ASOSIY CRUD / SELEKTLAR ----------
 async def create_material(
@@ -13,7 +13,7 @@ async def create_material(
     serial_number: Optional[str] = None,
     material_unit: str = "dona",
 ) -> Dict[str, Any]:
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         row = await conn.fetchrow(
             """
@@ -28,24 +28,12 @@ async def create_material(
         await conn.close()
 
 async def search_materials(search_term: str) -> List[Dict[str, Any]]:
-    conn = await asyncpg.connect(settings.DB_URL)
-    try:
-        rows = await conn.fetch(
-            """
-            SELECT id, name, price, description, quantity, serial_number, material_unit, created_at, updated_at
-            FROM materials
-            WHERE name ILIKE $1
-            ORDER BY name
-            LIMIT 20
-            """,
-            f"%{search_term}%"
-        )
-        return [dict(r) for r in rows]
-    finally:
-        await conn.close()
+    """Nomi (trigram), ID yoki seriya raqami bo'yicha qidirish - database/basic/search.py"""
+    page = await _search_materials(search_term, limit=20)
+    return page["items"]
 
 async def get_all_materials() -> List[Dict[str, Any]]:
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         rows = await conn.fetch(
             """
@@ -59,7 +47,7 @@ async def get_all_materials() -> List[Dict[str, Any]]:
         await conn.close()
 
 async def get_material_by_id(material_id: int) -> Optional[Dict[str, Any]]:
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         row = await conn.fetchrow(
             """
@@ -74,7 +62,7 @@ async def get_material_by_id(material_id: int) -> Optional[Dict[str, Any]]:
         await conn.close()
 
 async def update_material_quantity(material_id: int, additional_quantity: int) -> Dict[str, Any]:
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         row = await conn.fetchrow(
             """
@@ -90,7 +78,7 @@ async def update_material_quantity(material_id: int, additional_quantity: int) -
         await conn.close()
 
 async def update_material_name_description(material_id: int, name: str, description: Optional[str] = None) -> Dict[str, Any]:
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         row = await conn.fetchrow(
             """
@@ -106,7 +94,7 @@ async def update_material_name_description(material_id: int, name: str, descript
         await conn.close()
 
 async def get_low_stock_materials(threshold: int = 10) -> List[Dict[str, Any]]:
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         rows = await conn.fetch(
             """
@@ -122,7 +110,7 @@ async def get_low_stock_materials(threshold: int = 10) -> List[Dict[str, Any]]:
         await conn.close()
 
 async def get_out_of_stock_materials() -> List[Dict[str, Any]]:
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         rows = await conn.fetch(
             """
@@ -139,7 +127,7 @@ async def get_out_of_stock_materials() -> List[Dict[str, Any]]:
 # ---------- EXPORT FUNKSIYALARI ----------
 async def get_warehouse_inventory_for_export() -> List[Dict[str, Any]]:
     """Export uchun ombor inventarini olish"""
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         rows = await conn.fetch(
             """
@@ -1,13 +1,13 @@
 # database/warehouse/statistics.py
-import asyncpg
 from typing import Dict, Any, List
-from datetime import date, datetime
-from config import settings
+from datetime import date, datetime, timedelta
+from database.connections import get_connection
+from database.basic.rollups import material_range_stats
 
 # ---------- STATISTIKA BOSHLANG'ICH KO'RSATKICHLAR ----------
 
 async def get_warehouse_head_counters() -> Dict[str, Any]:
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         total_materials = await conn.fetchval("SELECT COUNT(*) FROM materials")
         total_quantity = await conn.fetchval("SELECT COALESCE(SUM(quantity),0) FROM materials")
@@ -36,72 +36,95 @@ async def get_warehouse_head_counters() -> Dict[str, Any]:
     finally:
         await conn.close()
 
+# Qo'shilgan materiallar va chiqim material_daily_rollups dan (database/basic/rollups.py);
+# "updated" - materialning oxirgi o'zgarishi, rollup qilib bo'lmaydi, jonli sanaladi.
+
+def _week_start(today: date) -> date:
+    return today - timedelta(days=today.weekday())
+
 async def get_warehouse_daily_statistics(date_str: str | None = None) -> Dict[str, Any]:
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
-        if date_str:
-            daily_added = await conn.fetchval("SELECT COUNT(*) FROM materials WHERE DATE(created_at) = $1", date_str)
-            daily_updated = await conn.fetchval("SELECT COUNT(*) FROM materials WHERE DATE(updated_at) = $1", date_str)
-        else:
-            daily_added = await conn.fetchval("SELECT COUNT(*) FROM materials WHERE DATE(created_at) = CURRENT_DATE")
-            daily_updated = await conn.fetchval("SELECT COUNT(*) FROM materials WHERE DATE(updated_at) = CURRENT_DATE")
-        return {"daily_added": int(daily_added or 0), "daily_updated": int(daily_updated or 0)}
+        # Bugun - DB kuni (rollups.py dagi jonli hisob bilan bir xil)
+        day = date.fromisoformat(date_str) if date_str else await conn.fetchval("SELECT CURRENT_DATE")
+        rollup = await material_range_stats(day, day, conn)
+        daily_updated = await conn.fetchval(
+            "SELECT COUNT(*) FROM materials WHERE updated_at >= $1::date AND updated_at < $1::date + 1", day
+        )
+        return {
+            "daily_added": rollup["materials_added"],
+            "daily_updated": int(daily_updated or 0),
+            "daily_issued_cost": rollup["issued_cost"],
+        }
     finally:
         await conn.close()
 
 async def get_warehouse_weekly_statistics() -> Dict[str, Any]:
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
-        weekly_added = await conn.fetchval("SELECT COUNT(*) FROM materials WHERE created_at >= date_trunc('week', CURRENT_DATE)")
+        today = await conn.fetchval("SELECT CURRENT_DATE")
+        rollup = await material_range_stats(_week_start(today), today, conn)
         weekly_updated = await conn.fetchval("SELECT COUNT(*) FROM materials WHERE updated_at >= date_trunc('week', CURRENT_DATE)")
         weekly_value = await conn.fetchval("SELECT COALESCE(SUM(quantity * COALESCE(price,0)),0) FROM materials WHERE created_at >= date_trunc('week', CURRENT_DATE)")
         return {
-            "weekly_added": int(weekly_added or 0), 
+            "weekly_added": rollup["materials_added"],
             "weekly_updated": int(weekly_updated or 0),
-            "weekly_value": float(weekly_value or 0)
+            "weekly_value": float(weekly_value or 0),
+            "weekly_issued_cost": rollup["issued_cost"],
         }
     finally:
         await conn.close()
 
 async def get_warehouse_monthly_statistics() -> Dict[str, Any]:
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
-        monthly_added = await conn.fetchval("SELECT COUNT(*) FROM materials WHERE created_at >= date_trunc('month', CURRENT_DATE)")
+        today = await conn.fetchval("SELECT CURRENT_DATE")
+        rollup = await material_range_stats(today.replace(day=1), today, conn)
         monthly_updated = await conn.fetchval("SELECT COUNT(*) FROM materials WHERE updated_at >= date_trunc('month', CURRENT_DATE)")
         monthly_value = await conn.fetchval("SELECT COALESCE(SUM(quantity * COALESCE(price,0)),0) FROM materials WHERE created_at >= date_trunc('month', CURRENT_DATE)")
         return {
-            "monthly_added": int(monthly_added or 0), 
+            "monthly_added": rollup["materials_added"],
             "monthly_updated": int(monthly_updated or 0),
-            "monthly_value": float(monthly_value or 0)
+            "monthly_value": float(monthly_value or 0),
+            "monthly_issued_cost": rollup["issued_cost"],
         }
     finally:
         await conn.close()
 
 async def get_warehouse_yearly_statistics() -> Dict[str, Any]:
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
-        yearly_added = await conn.fetchval("SELECT COUNT(*) FROM materials WHERE created_at >= date_trunc('year', CURRENT_DATE)")
+        today = await conn.fetchval("SELECT CURRENT_DATE")
+        rollup = await material_range_stats(today.replace(month=1, day=1), today, conn)
         yearly_updated = await conn.fetchval("SELECT COUNT(*) FROM materials WHERE updated_at >= date_trunc('year', CURRENT_DATE)")
         yearly_value = await conn.fetchval("SELECT COALESCE(SUM(quantity * COALESCE(price,0)),0) FROM materials WHERE created_at >= date_trunc('year', CURRENT_DATE)")
         return {
-            "yearly_added": int(yearly_added or 0), 
+            "yearly_added": rollup["materials_added"],
             "yearly_updated": int(yearly_updated or 0),
-            "yearly_value": float(yearly_value or 0)
+            "yearly_value": float(yearly_value or 0),
+            "yearly_issued_cost": rollup["issued_cost"],
         }
     finally:
         await conn.close()
 
 async def get_warehouse_range_statistics(date_from: str, date_to: str) -> Dict[str, Any]:
-    conn = await asyncpg.connect(settings.DB_URL)
+    start, end = date.fromisoformat(str(date_from)), date.fromisoformat(str(date_to))
+    conn = await get_connection()
     try:
-        range_added = await conn.fetchval("SELECT COUNT(*) FROM materials WHERE DATE(created_at) BETWEEN $1 AND $2", date_from, date_to)
-        range_updated = await conn.fetchval("SELECT COUNT(*) FROM materials WHERE DATE(updated_at) BETWEEN $1 AND $2", date_from, date_to)
-        return {"range_added": int(range_added or 0), "range_updated": int(range_updated or 0)}
+        rollup = await material_range_stats(start, end, conn)
+        range_updated = await conn.fetchval(
+            "SELECT COUNT(*) FROM materials WHERE updated_at >= $1::date AND updated_at < $2::date + 1", start, end
+        )
+        return {
+            "range_added": rollup["materials_added"],
+            "range_updated": int(range_updated or 0),
+            "range_issued_cost": rollup["issued_cost"],
+        }
     finally:
         await conn.close()
 
 async def get_warehouse_financial_report() -> Dict[str, Any]:
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         total_value = await conn.fetchval("SELECT COALESCE(SUM(quantity * COALESCE(price,0)),0) FROM materials")
         avg_price = await conn.fetchval("SELECT COALESCE(AVG(price),0) FROM materials WHERE price IS NOT NULL")
@@ -119,7 +142,7 @@ async def get_warehouse_financial_report() -> Dict[str, Any]:
 
 async def get_warehouse_statistics() -> Dict[str, Any]:
     """Umumiy ombor statistikasi"""
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         # Asosiy ko'rsatkichlar
         total_materials = await conn.fetchval("SELECT COUNT(*) FROM materials")
@@ -148,7 +171,7 @@ async def get_warehouse_statistics() -> Dict[str, Any]:
 
 async def get_warehouse_statistics_for_export() -> List[Dict[str, Any]]:
     """Export uchun ombor statistikasi"""
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         rows = await conn.fetch(
             """
@@ -2,9 +2,9 @@
 CCS (Call Center System) Statistics Queries
 Real-time statistics for CCO and clients
 """
-import asyncpg
 from typing import Dict, Any, List, Optional
-from config import settings
+from database.connections import get_connection
+from database.webapp.presence import presence
 from datetime import datetime, timedelta
 
 
@@ -15,7 +15,7 @@ async def get_ccs_comprehensive_statistics() -> Dict[str, Any]:
     - Clientlar ro'yxati (online status, last seen)
     - Umumiy statistika
     """
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         # Operatorlar statistikasi
         operators = await conn.fetch(
@@ -176,7 +176,7 @@ async def get_operator_statistics(operator_id: int) -> Dict[str, Any]:
     """
     Bitta operator uchun batafsil statistika
     """
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         # Operator ma'lumotlari
         operator = await conn.fetchrow(
@@ -248,42 +248,41 @@ async def get_operator_statistics(operator_id: int) -> Dict[str, Any]:
 async def get_online_users_summary() -> Dict[str, Any]:
     """
     Online userlar haqida qisqacha ma'lumot (WebSocket uchun)
+    
+    Online holat presence tracker'dan (xotira), DB dan faqat chat sonlari.
     """
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         result = await conn.fetchrow(
             """
             SELECT
-                (SELECT COUNT(*) FROM users WHERE role = 'callcenter_operator' AND is_online = TRUE AND COALESCE(is_blocked, FALSE) = FALSE) as online_operators,
-                (SELECT COUNT(*) FROM users WHERE role = 'callcenter_supervisor' AND is_online = TRUE AND COALESCE(is_blocked, FALSE) = FALSE) as online_supervisors,
-                (SELECT COUNT(*) FROM users WHERE role = 'client' AND is_online = TRUE) as online_clients,
                 (SELECT COUNT(*) FROM chats WHERE status = 'active' AND operator_id IS NULL) as inbox_count,
                 (SELECT COUNT(*) FROM chats WHERE status = 'active' AND operator_id IS NOT NULL) as assigned_count
             """
         )
-        
-        # Online userlar ro'yxati
-        online_users = await conn.fetch(
-            """
-            SELECT id, role
-            FROM users
-            WHERE is_online = TRUE
-            """
-        )
-        
-        return {
-            'summary': dict(result) if result else {},
-            'online_user_ids': [r['id'] for r in online_users]
-        }
     finally:
         await conn.close()
+    
+    # Online userlar ro'yxati
+    online_users = presence.online_users()
+    counts = presence.count_by_role()
+    summary = {
+        'online_operators': counts.get('callcenter_operator', 0),
+        'online_supervisors': counts.get('callcenter_supervisor', 0),
+        'online_clients': counts.get('client', 0),
+        **(dict(result) if result else {})
+    }
+    return {
+        'summary': summary,
+        'online_user_ids': list(online_users)
+    }
 
 
 async def get_recent_clients(limit: int = 50) -> List[Dict[str, Any]]:
     """
     Oxirgi faol clientlar (chat yaratgan yoki xabar yuborgan)
     """
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         rows = await conn.fetch(
             """
@@ -1,18 +1,17 @@
 """
 Chat queries for WebApp
 """
-import asyncpg
 import logging
 from typing import Optional, List, Dict, Any
 from datetime import datetime
-from config import settings
+from database.connections import get_connection
 
 logger = logging.getLogger(__name__)
 
 
 async def create_chat(client_id: int, operator_id: Optional[int] = None) -> Dict[str, Any]:
     """Create a new chat or reactivate inactive chat"""
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         # Check for existing inactive chat
         existing = await conn.fetchrow(
@@ -57,7 +56,7 @@ async def create_chat(client_id: int, operator_id: Optional[int] = None) -> Dict
 
 async def get_chat_by_id(chat_id: int) -> Optional[Dict[str, Any]]:
     """Get chat by ID with user names"""
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         row = await conn.fetchrow(
             """
@@ -80,7 +79,7 @@ async def get_chat_by_id(chat_id: int) -> Optional[Dict[str, Any]]:
 
 async def get_user_chats(user_id: int, role: str, status: Optional[str] = None) -> List[Dict[str, Any]]:
     """Get chats for user based on role"""
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         if role == 'client':
             # Client sees their own chats
@@ -150,7 +149,7 @@ async def get_user_chats(user_id: int, role: str, status: Optional[str] = None)
 
 async def assign_chat_to_operator(chat_id: int, operator_id: int) -> bool:
     """Assign chat to operator (race-safe)"""
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         result = await conn.execute(
             """
@@ -170,18 +169,21 @@ async def assign_chat_to_operator(chat_id: int, operator_id: int) -> bool:
 
 async def close_chat(chat_id: int) -> bool:
     """Close chat (mark as inactive)"""
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
-        result = await conn.execute(
-            """
-            UPDATE chats
-            SET status = 'inactive',
-                operator_id = NULL,
-                updated_at = now()
-            WHERE id = $1
-            """,
-            chat_id
-        )
+        async with conn.transaction():
+            # chat_changes triggeri uchun: inactivity sweep emas, qo'lda yopish
+            await conn.execute("SELECT set_config('alfaconnect.chat_change_reason', 'closed', true)")
+            result = await conn.execute(
+                """
+                UPDATE chats
+                SET status = 'inactive',
+                    operator_id = NULL,
+                    updated_at = now()
+                WHERE id = $1
+                """,
+                chat_id
+            )
         return result == "UPDATE 1"
     finally:
         await conn.close()
@@ -189,7 +191,7 @@ async def close_chat(chat_id: int) -> bool:
 
 async def update_chat_activity(chat_id: int) -> None:
     """Update chat last_activity_at"""
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         await conn.execute(
             """
@@ -206,7 +208,7 @@ async def update_chat_activity(chat_id: int) -> None:
 
 async def mark_inactive_chats() -> int:
     """Mark inactive chats (1 hour threshold)"""
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         result = await conn.execute(
             """
@@ -227,7 +229,7 @@ async def mark_inactive_chats() -> int:
 
 async def get_supervisor_inbox(limit: int = 20, cursor_ts: Optional[datetime] = None, cursor_id: Optional[int] = None) -> Dict[str, Any]:
     """Get supervisor inbox (unassigned active chats)"""
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         if cursor_ts is not None and cursor_id is not None:
             rows = await conn.fetch(
@@ -281,7 +283,7 @@ async def get_supervisor_inbox(limit: int = 20, cursor_ts: Optional[datetime] =
 
 async def get_operator_chats(operator_id: int, limit: int = 20, cursor_ts: Optional[datetime] = None, cursor_id: Optional[int] = None) -> Dict[str, Any]:
     """Get operator's assigned chats"""
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         if cursor_ts is not None and cursor_id is not None:
             rows = await conn.fetch(
@@ -336,7 +338,7 @@ async def get_operator_chats(operator_id: int, limit: int = 20, cursor_ts: Optio
 
 async def get_supervisor_active_chats(limit: int = 20, cursor_ts: Optional[datetime] = None, cursor_id: Optional[int] = None) -> Dict[str, Any]:
     """Get supervisor active chats (assigned chats) with cursor-based pagination"""
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         if cursor_ts is not None and cursor_id is not None:
             rows = await conn.fetch(
@@ -419,7 +421,7 @@ async def get_supervisor_active_chats(limit: int = 20, cursor_ts: Optional[datet
 
 async def get_active_chats_count() -> int:
     """Get count of active chats"""
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         row = await conn.fetchrow(
             "SELECT COUNT(*) as cnt FROM chats WHERE status = 'active'"
@@ -431,7 +433,7 @@ async def get_active_chats_count() -> int:
 
 async def get_active_chat_counts() -> Dict[str, Any]:
     """Get active chat statistics"""
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         inbox_count = await conn.fetchrow(
             "SELECT COUNT(*) as cnt FROM chats WHERE status = 'active' AND operator_id IS NULL"
@@ -459,7 +461,7 @@ async def pin_chat(user_id: int, chat_id: int) -> bool:
     Pin a chat for a user. If already pinned, update position.
     Returns True if successful, False otherwise.
     """
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         # Get current max position for this user
         max_position = await conn.fetchval(
@@ -498,7 +500,7 @@ async def unpin_chat(user_id: int, chat_id: int) -> bool:
     Unpin a chat for a user.
     Returns True if successful, False otherwise.
     """
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         result = await conn.execute(
             """
@@ -520,7 +522,7 @@ async def get_pinned_chats(user_id: int) -> List[Dict[str, Any]]:
     Get all pinned chats for a user, ordered by position.
     Returns list of chat dictionaries with pinned_at and position.
     """
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         rows = await conn.fetch(
             """
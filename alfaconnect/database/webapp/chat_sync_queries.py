@@ -0,0 +1,173 @@
+"""
+Cross-chat delta sync queries for WebApp (chat_changes change log)
+
+Cursor format: "<xid>-<seq>" (067_chat_changes.sql). Changes are read only
+from finished transactions and paged by (xid, seq), so nothing committed
+late is skipped. The result is compacted: each changed message is returned
+once in its current state, reads as the latest watermark per (chat, user),
+chats as their latest event.
+"""
+import json
+import logging
+import re
+import time
+from typing import Optional, List, Dict, Any, Tuple
+
+from database.connections import get_connection
+from database.webapp.message_queries import load_messages_by_ids
+
+logger = logging.getLogger(__name__)
+
+CHANGE_LOG_RETENTION_DAYS = 7
+PRUNE_INTERVAL = 600  # soniya
+SYNC_MAX_CHANGES = 1000
+
+_CURSOR_RE = re.compile(r"^(\d+)-(\d+)$")
+_MESSAGE_KINDS = ("message.created", "message.edited", "message.reaction")
+
+_last_prune = 0.0
+
+
+class InvalidSyncCursor(ValueError):
+    """Sync cursor noto'g'ri formatda"""
+
+
+def parse_sync_cursor(cursor: str) -> Tuple[str, int]:
+    match = _CURSOR_RE.match(cursor.strip())
+    if not match:
+        raise InvalidSyncCursor(f"Invalid sync cursor: {cursor!r}")
+    return match.group(1), int(match.group(2))
+
+
+async def _maybe_prune(conn) -> None:
+    """Eski yozuvlarni PRUNE_INTERVAL da bir marta o'chirish (advisory lock bilan)"""
+    global _last_prune
+    now = time.monotonic()
+    if now - _last_prune < PRUNE_INTERVAL:
+        return
+    _last_prune = now
+    try:
+        deleted = await conn.fetchval(
+            "SELECT prune_chat_changes(make_interval(days => $1))", CHANGE_LOG_RETENTION_DAYS
+        )
+        if deleted:
+            logger.info(f"Pruned {deleted} chat_changes rows")
+    except Exception as e:
+        logger.error(f"Error pruning chat_changes: {e}")
+
+
+def _compact(rows: List[Any]) -> Tuple[List[int], List[Dict[str, Any]], List[Dict[str, Any]]]:
+    message_ids: Dict[int, None] = {}
+    reads: Dict[Tuple[int, int], Dict[str, Any]] = {}
+    chats: Dict[int, Dict[str, Any]] = {}
+    for row in rows:
+        kind = row["kind"]
+        if kind in _MESSAGE_KINDS:
+            message_ids[row["entity_id"]] = None
+            continue
+        payload = json.loads(row["payload"]) if row["payload"] else {}
+        if kind == "chat.read":
+            key = (row["chat_id"], payload["user_id"])
+            previous = reads.get(key)
+            if previous is None or payload["last_read_message_id"] > previous["last_read_message_id"]:
+                reads[key] = {"chat_id": row["chat_id"], **payload}
+        else:
+            chats[row["chat_id"]] = {"chat_id": row["chat_id"], "event": kind, **payload}
+    return list(message_ids), list(reads.values()), list(chats.values())
+
+
+async def get_chat_changes(
+    user_id: int,
+    see_all: bool = False,
+    cursor: Optional[str] = None,
+    limit: int = SYNC_MAX_CHANGES
+) -> Dict[str, Any]:
+    """
+    Get every change visible to the user since the cursor.
+
+    Args:
+        user_id: Caller's user ID (client or operator of the chat)
+        see_all: Supervisors see changes of all chats
+        cursor: Cursor from the previous sync; None = start (reset)
+        limit: Maximum number of change log rows per call
+
+    Returns:
+        {"cursor", "has_more", "reset", "messages", "reads", "chats"}
+        reset=True means the client must reload chats/messages and continue from "cursor".
+    """
+    position = parse_sync_cursor(cursor) if cursor else None
+
+    conn = await get_connection()
+    try:
+        await _maybe_prune(conn)
+
+        head = await conn.fetchval("SELECT pg_snapshot_xmin(pg_current_snapshot())::text")
+        empty = {"has_more": False, "messages": [], "reads": [], "chats": []}
+        if position is None:
+            return {"cursor": f"{head}-0", "reset": True, **empty}
+
+        pruned = await conn.fetchval(
+            "SELECT 1 FROM chat_changes_pruned WHERE id = 1 AND (xid, seq) >= ($1::text::xid8, $2)",
+            *position
+        )
+        if pruned:
+            return {"cursor": f"{head}-0", "reset": True, **empty}
+
+        # xid matn ko'rinishi boshqa nom bilan: ORDER BY xid xid8 bo'yicha
+        # tartiblasin (matn bo'yicha 10000000 < 9999999 bo'lib qoladi)
+        columns = "seq, xid::text AS xid_text, chat_id, kind, entity_id, payload"
+        window = """
+            (xid, seq) > ($1::text::xid8, $2)
+            AND xid < pg_snapshot_xmin(pg_current_snapshot())
+        """
+        if see_all:
+            rows = await conn.fetch(
+                f"""
+                SELECT {columns}
+                FROM chat_changes
+                WHERE {window}
+                ORDER BY xid, seq
+                LIMIT $3
+                """,
+                *position, limit + 1
+            )
+        else:
+            # Har bir ishtirokchi ustuni uchun alohida (ustun, xid, seq) indeks
+            # range scan (069 migratsiya); UNION bir qatorni ikki marta bermaydi
+            branches = " UNION ".join(
+                f"""
+                (SELECT seq, xid, chat_id, kind, entity_id, payload
+                 FROM chat_changes
+                 WHERE {column} = $4 AND {window}
+                 ORDER BY xid, seq
+                 LIMIT $3)
+                """
+                for column in ("client_id", "operator_id", "prev_operator_id")
+            )
+            rows = await conn.fetch(
+                f"""
+                SELECT {columns}
+                FROM ({branches}) visible
+                ORDER BY xid, seq
+                LIMIT $3
+                """,
+                *position, limit + 1, user_id
+            )
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        if not rows:
+            return {"cursor": cursor, "reset": False, **empty}
+
+        message_ids, reads, chats = _compact(rows)
+        messages = await load_messages_by_ids(conn, message_ids)
+        last = rows[-1]
+        return {
+            "cursor": f"{last['xid_text']}-{last['seq']}",
+            "has_more": has_more,
+            "reset": False,
+            "messages": messages,
+            "reads": reads,
+            "chats": chats,
+        }
+    finally:
+        await conn.close()
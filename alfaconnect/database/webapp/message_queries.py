@@ -1,15 +1,60 @@
 """
 Message queries for WebApp
 """
-import asyncpg
+import html
+import json
 import logging
-from typing import Optional, List, Dict, Any
-from datetime import datetime, timezone
-from config import settings
+import re
+from typing import Optional, List, Dict, Any, Awaitable, Callable
+from datetime import date, datetime, timezone
+from database.connections import get_connection
 
 logger = logging.getLogger(__name__)
 
 
+async def _insert_message(
+    conn,
+    chat_id: int,
+    sender_id: Optional[int],
+    sender_type: str,
+    message_text: str,
+    operator_id: Optional[int] = None,
+    attachments: Optional[Dict[str, Any]] = None,
+    reply_to_message_id: Optional[int] = None,
+    message_id: Optional[int] = None
+) -> Optional[int]:
+    """Xabar yaratish + chat last_activity_at (chaqiruvchi tranzaksiyasi ichida)"""
+    # 1. Xabar yaratish (message_id berilsa - oldindan band qilingan ID)
+    row = await conn.fetchrow(
+        """
+        INSERT INTO messages (
+            id, chat_id, sender_id, sender_type, operator_id, message_text, attachments, reply_to_message_id
+        )
+        VALUES (COALESCE($8, nextval('messages_id_seq')), $1, $2, $3, $4, $5, $6::jsonb, $7)
+        RETURNING id
+        """,
+        chat_id, sender_id, sender_type, operator_id, message_text,
+        json.dumps(attachments) if attachments else None,
+        reply_to_message_id, message_id
+    )
+    
+    message_id = row['id'] if row else None
+    
+    if message_id:
+        # 2. Chat last_activity_at ni yangilash (har bir xabar yuborilganda!)
+        await conn.execute(
+            """
+            UPDATE chats
+            SET last_activity_at = now(),
+                updated_at = now()
+            WHERE id = $1
+            """,
+            chat_id
+        )
+    
+    return message_id
+
+
 async def create_message(
     chat_id: int,
     sender_id: Optional[int],
@@ -25,131 +70,188 @@ async def create_message(
     This is an atomic operation - both message creation and activity update
     happen in the same transaction.
     """
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         # Transaction ichida xabar yaratish va chat activity yangilash
         async with conn.transaction():
-            # 1. Xabar yaratish
-            row = await conn.fetchrow(
-                """
-                INSERT INTO messages (
-                    chat_id, sender_id, sender_type, operator_id, message_text, attachments, reply_to_message_id
-                )
-                VALUES ($1, $2, $3, $4, $5, $6, $7)
-                RETURNING id
-                """,
-                chat_id, sender_id, sender_type, operator_id, message_text,
-                asyncpg.types.pgjsonb.encode(attachments) if attachments else None,
-                reply_to_message_id
+            return await _insert_message(
+                conn, chat_id, sender_id, sender_type, message_text,
+                operator_id, attachments, reply_to_message_id
             )
-            
-            message_id = row['id'] if row else None
-            
-            if message_id:
-                # 2. Chat last_activity_at ni yangilash (har bir xabar yuborilganda!)
-                await conn.execute(
-                    """
-                    UPDATE chats
-                    SET last_activity_at = now(),
-                        updated_at = now()
-                    WHERE id = $1
-                    """,
-                    chat_id
-                )
-            
-            return message_id
     finally:
         await conn.close()
 
 
+async def create_media_message(
+    chat_id: int,
+    sender_id: int,
+    sender_type: str,
+    message_text: str,
+    operator_id: Optional[int],
+    place_file: Callable[[Any, int], Awaitable[Dict[str, Any]]]
+) -> int:
+    """
+    Create a message with a media attachment in one transaction.
+
+    The message ID is reserved first; place_file(conn, message_id) moves the
+    uploaded file into the blob store (registering it on conn) and returns
+    the attachments dict. If place_file or the insert fails, nothing is committed.
+    """
+    conn = await get_connection()
+    try:
+        async with conn.transaction():
+            message_id = await conn.fetchval("SELECT nextval('messages_id_seq')")
+            attachments = await place_file(conn, message_id)
+            return await _insert_message(
+                conn, chat_id, sender_id, sender_type, message_text,
+                operator_id, attachments, message_id=message_id
+            )
+    finally:
+        await conn.close()
+
+
+# ---------- Xabarlarni yuklash (bitta so'rov) ----------
+# Xabar + yuboruvchi + reply preview + reaksiyalar + o'qilganlar soni bitta
+# so'rovda qaytadi. Reaksiyalar message_counters jadvalida triggerlar bilan
+# saqlanadi (064_message_counters.sql), o'qilganlar soni chat_read_state
+# watermark'laridan olinadi (066_chat_read_state.sql). Sahifa avval ichki so'rovda
+# (faqat messages, indeks bo'yicha) tanlanadi, JOIN'lar faqat sahifa qatorlariga.
+
+_MESSAGE_SELECT = """
+    SELECT
+        m.*,
+        u.full_name as sender_name,
+        u.telegram_id as sender_telegram_id,
+        u.role as sender_role,
+        reply_msg.id as reply_to_id,
+        reply_msg.message_text as reply_to_text,
+        reply_msg.sender_id as reply_to_sender_id,
+        reply_msg.sender_type as reply_to_sender_type,
+        reply_user.full_name as reply_to_sender_name,
+        COALESCE(mc.reactions, '[]'::jsonb) as reactions,
+        (
+            SELECT COUNT(*)::int FROM chat_read_state rs
+            WHERE rs.chat_id = m.chat_id
+              AND rs.last_read_message_id >= m.id
+              AND rs.user_id IS DISTINCT FROM m.sender_id
+        ) as read_count
+    FROM ({page}) m
+    LEFT JOIN users u ON m.sender_id = u.id
+    LEFT JOIN messages reply_msg ON m.reply_to_message_id = reply_msg.id
+    LEFT JOIN users reply_user ON reply_msg.sender_id = reply_user.id
+    LEFT JOIN message_counters mc ON mc.message_id = m.id
+    ORDER BY {outer_order}
+"""
+
+_CHRONOLOGICAL = "m.created_at ASC, m.id ASC"
+
+# messages ustunlari (search_vector API'ga qaytarilmaydi)
+_MESSAGE_COLUMNS = ", ".join(
+    f"m.{column}" for column in (
+        "id", "chat_id", "sender_type", "sender_id", "operator_id", "message_text",
+        "attachments", "created_at", "forwarded_from_message_id", "forwarded_from_chat_id",
+        "forwarded_from_user_id", "edited_at", "reply_to_message_id",
+    )
+)
+
+
+def _build_message_query(
+    where: str,
+    order: str = _CHRONOLOGICAL,
+    limit: Optional[str] = None,
+    offset: Optional[str] = None,
+    outer_order: str = _CHRONOLOGICAL,
+    extra_columns: str = "",
+    source: str = "messages m",
+) -> str:
+    """
+    Xabarlar so'rovini qurish.
+    where/order/limit/offset - ichki sahifa (source, messages m) uchun; outer_order - natija tartibi.
+    """
+    page = f"SELECT {_MESSAGE_COLUMNS}{extra_columns} FROM {source} WHERE {where} ORDER BY {order}"
+    if limit:
+        page += f" LIMIT {limit}"
+    if offset:
+        page += f" OFFSET {offset}"
+    return _MESSAGE_SELECT.format(page=page, outer_order=outer_order)
+
+
+def _decode_reactions(value: Any) -> List[Dict[str, Any]]:
+    if value is None:
+        return []
+    return json.loads(value) if isinstance(value, (str, bytes)) else value
+
+
+def _message_from_row(row) -> Dict[str, Any]:
+    message = dict(row)
+    message["reactions"] = _decode_reactions(message.get("reactions"))
+    return message
+
+
+async def _fetch_messages(conn, sql: str, *params) -> List[Dict[str, Any]]:
+    rows = await conn.fetch(sql, *params)
+    return [_message_from_row(r) for r in rows]
+
+
 async def _get_message_reactions(conn, message_id: int) -> List[Dict[str, Any]]:
-    """Helper function to get reactions for a message"""
-    reaction_rows = await conn.fetch(
-        """
-        SELECT 
-            emoji,
-            COUNT(*) as count,
-            array_agg(user_id ORDER BY created_at) as user_ids
-        FROM message_reactions
-        WHERE message_id = $1
-        GROUP BY emoji
-        ORDER BY count DESC, emoji
-        """,
+    """Helper function to get reactions for a message (message_counters dan)"""
+    value = await conn.fetchval(
+        "SELECT reactions FROM message_counters WHERE message_id = $1",
         message_id
     )
-    return [
-        {
-            "emoji": row["emoji"],
-            "count": row["count"],
-            "users": row["user_ids"]
-        }
-        for row in reaction_rows
-    ]
+    return _decode_reactions(value)
 
 
-async def _get_bulk_reactions(conn, message_ids: List[int]) -> Dict[int, List[Dict[str, Any]]]:
-    """Get reactions for multiple messages in one query"""
-    if not message_ids:
-        return {}
-    
-    rows = await conn.fetch(
-        """
-        SELECT 
-            message_id,
-            emoji,
-            COUNT(*) as count,
-            array_agg(user_id ORDER BY created_at) as user_ids
-        FROM message_reactions
-        WHERE message_id = ANY($1::bigint[])
-        GROUP BY message_id, emoji
-        ORDER BY message_id, count DESC, emoji
-        """,
-        message_ids
-    )
-    
-    # Group by message_id
-    reactions_by_message: Dict[int, List[Dict[str, Any]]] = {}
-    for row in rows:
-        message_id = row["message_id"]
-        if message_id not in reactions_by_message:
-            reactions_by_message[message_id] = []
-        reactions_by_message[message_id].append({
-            "emoji": row["emoji"],
-            "count": row["count"],
-            "users": row["user_ids"]
-        })
-    
-    # Ensure all message_ids have empty list if no reactions
-    for msg_id in message_ids:
-        if msg_id not in reactions_by_message:
-            reactions_by_message[msg_id] = []
-    
-    return reactions_by_message
+async def load_chat_messages(
+    conn,
+    chat_id: int,
+    limit: int = 100,
+    offset: int = 0,
+    cursor_ts: Optional[datetime] = None,
+    cursor_id: Optional[int] = None,
+    since_ts: Optional[datetime] = None,
+    since_id: Optional[int] = None,
+    all_messages: bool = False
+) -> List[Dict[str, Any]]:
+    """get_chat_messages ning mavjud connection bilan ishlaydigan varianti (xronologik tartibda)"""
+    if all_messages:
+        # Load ALL messages in chronological order (oldest first) - for supervisors viewing full chat history
+        sql = _build_message_query("m.chat_id = $1")
+        return await _fetch_messages(conn, sql, chat_id)
+
+    if since_ts or since_id:
+        # Sync mode: get messages after timestamp/id
+        where = "m.chat_id = $1"
+        params: List[Any] = [chat_id]
+        if since_ts:
+            params.append(since_ts)
+            where += f" AND m.created_at > ${len(params)}"
+        if since_id:
+            params.append(since_id)
+            where += f" AND m.id > ${len(params)}"
+        params.append(limit)
+        sql = _build_message_query(where, limit=f"${len(params)}")
+        return await _fetch_messages(conn, sql, *params)
+
+    newest_first = "m.created_at DESC, m.id DESC"
+    if cursor_ts and cursor_id:
+        # Cursor pagination
+        sql = _build_message_query(
+            "m.chat_id = $1 AND (m.created_at, m.id) < ($2::timestamp, $3)",
+            order=newest_first, limit="$4",
+        )
+        return await _fetch_messages(conn, sql, chat_id, cursor_ts, cursor_id, limit)
 
+    # Offset pagination
+    sql = _build_message_query("m.chat_id = $1", order=newest_first, limit="$2", offset="$3")
+    return await _fetch_messages(conn, sql, chat_id, limit, offset)
 
-async def _get_bulk_read_counts(conn, message_ids: List[int]) -> Dict[int, int]:
-    """Get read counts for multiple messages in one query"""
+
+async def load_messages_by_ids(conn, message_ids: List[int]) -> List[Dict[str, Any]]:
+    """Xabarlarni ID ro'yxati bo'yicha (xronologik tartibda) bitta so'rovda olish"""
     if not message_ids:
-        return {}
-    
-    rows = await conn.fetch(
-        """
-        SELECT 
-            message_id,
-            COUNT(*) as read_count
-        FROM message_reads
-        WHERE message_id = ANY($1::bigint[])
-        GROUP BY message_id
-        """,
-        message_ids
-    )
-    
-    # Create dict with all message_ids (default 0)
-    read_counts = {msg_id: 0 for msg_id in message_ids}
-    for row in rows:
-        read_counts[row["message_id"]] = row["read_count"]
-    
-    return read_counts
+        return []
+    return await _fetch_messages(conn, _build_message_query("m.id = ANY($1::bigint[])"), list(message_ids))
 
 
 async def get_chat_messages(
@@ -163,287 +265,62 @@ async def get_chat_messages(
     all_messages: bool = False
 ) -> List[Dict[str, Any]]:
     """Get messages for a chat"""
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
-        if all_messages:
-            # Load ALL messages in chronological order (oldest first) - for supervisors viewing full chat history
-            rows = await conn.fetch(
-                """
-                SELECT 
-                    m.*,
-                    u.full_name as sender_name,
-                    u.telegram_id as sender_telegram_id,
-                    u.role as sender_role,
-                    reply_msg.id as reply_to_id,
-                    reply_msg.message_text as reply_to_text,
-                    reply_msg.sender_id as reply_to_sender_id,
-                    reply_msg.sender_type as reply_to_sender_type,
-                    reply_user.full_name as reply_to_sender_name
-                FROM messages m
-                LEFT JOIN users u ON m.sender_id = u.id
-                LEFT JOIN messages reply_msg ON m.reply_to_message_id = reply_msg.id
-                LEFT JOIN users reply_user ON reply_msg.sender_id = reply_user.id
-                WHERE m.chat_id = $1
-                ORDER BY m.created_at ASC, m.id ASC
-                """,
-                chat_id
-            )
-            messages = [dict(r) for r in rows]
-            # Bulk load reactions and read counts
-            if messages:
-                message_ids = [msg["id"] for msg in messages]
-                reactions_by_message = await _get_bulk_reactions(conn, message_ids)
-                read_counts = await _get_bulk_read_counts(conn, message_ids)
-                # Add to each message
-                for msg in messages:
-                    msg["reactions"] = reactions_by_message.get(msg["id"], [])
-                    msg["read_count"] = read_counts.get(msg["id"], 0)
-            return messages
-        elif since_ts or since_id:
-            # Sync mode: get messages after timestamp/id
-            query = """
-                SELECT 
-                    m.*,
-                    u.full_name as sender_name,
-                    u.telegram_id as sender_telegram_id,
-                    u.role as sender_role,
-                    reply_msg.id as reply_to_id,
-                    reply_msg.message_text as reply_to_text,
-                    reply_msg.sender_id as reply_to_sender_id,
-                    reply_msg.sender_type as reply_to_sender_type,
-                    reply_user.full_name as reply_to_sender_name
-                FROM messages m
-                LEFT JOIN users u ON m.sender_id = u.id
-                LEFT JOIN messages reply_msg ON m.reply_to_message_id = reply_msg.id
-                LEFT JOIN users reply_user ON reply_msg.sender_id = reply_user.id
-                WHERE m.chat_id = $1
-            """
-            params = [chat_id]
-            param_index = 2
-            if since_ts:
-                query += f" AND m.created_at > ${param_index}"
-                params.append(since_ts)
-                param_index += 1
-            if since_id:
-                query += f" AND m.id > ${param_index}"
-                params.append(since_id)
-                param_index += 1
-            query += f" ORDER BY m.created_at ASC, m.id ASC LIMIT ${param_index}"
-            params.append(limit)
-            # Execute the query and return results
-            rows = await conn.fetch(query, *params)
-            messages = [dict(r) for r in rows]
-            # Bulk load reactions and read counts
-            if messages:
-                message_ids = [msg["id"] for msg in messages]
-                reactions_by_message = await _get_bulk_reactions(conn, message_ids)
-                read_counts = await _get_bulk_read_counts(conn, message_ids)
-                # Add to each message
-                for msg in messages:
-                    msg["reactions"] = reactions_by_message.get(msg["id"], [])
-                    msg["read_count"] = read_counts.get(msg["id"], 0)
-            return messages
-        elif cursor_ts and cursor_id:
-            # Cursor pagination
-            rows = await conn.fetch(
-                """
-                SELECT 
-                    m.*,
-                    u.full_name as sender_name,
-                    u.telegram_id as sender_telegram_id,
-                    u.role as sender_role,
-                    reply_msg.id as reply_to_id,
-                    reply_msg.message_text as reply_to_text,
-                    reply_msg.sender_id as reply_to_sender_id,
-                    reply_msg.sender_type as reply_to_sender_type,
-                    reply_user.full_name as reply_to_sender_name
-                FROM messages m
-                LEFT JOIN users u ON m.sender_id = u.id
-                LEFT JOIN messages reply_msg ON m.reply_to_message_id = reply_msg.id
-                LEFT JOIN users reply_user ON reply_msg.sender_id = reply_user.id
-                WHERE m.chat_id = $1
-                  AND (m.created_at, m.id) < ($2::timestamp, $3)
-                ORDER BY m.created_at DESC, m.id DESC
-                LIMIT $4
-                """,
-                chat_id, cursor_ts, cursor_id, limit
-            )
-            messages = [dict(r) for r in reversed(rows)]  # Reverse to get chronological order
-            # Bulk load reactions and read counts
-            if messages:
-                message_ids = [msg["id"] for msg in messages]
-                reactions_by_message = await _get_bulk_reactions(conn, message_ids)
-                read_counts = await _get_bulk_read_counts(conn, message_ids)
-                # Add to each message
-                for msg in messages:
-                    msg["reactions"] = reactions_by_message.get(msg["id"], [])
-                    msg["read_count"] = read_counts.get(msg["id"], 0)
-            return messages
-        else:
-            # Offset pagination
-            rows = await conn.fetch(
-                """
-                SELECT 
-                    m.*,
-                    u.full_name as sender_name,
-                    u.telegram_id as sender_telegram_id,
-                    u.role as sender_role,
-                    reply_msg.id as reply_to_id,
-                    reply_msg.message_text as reply_to_text,
-                    reply_msg.sender_id as reply_to_sender_id,
-                    reply_msg.sender_type as reply_to_sender_type,
-                    reply_user.full_name as reply_to_sender_name
-                FROM messages m
-                LEFT JOIN users u ON m.sender_id = u.id
-                LEFT JOIN messages reply_msg ON m.reply_to_message_id = reply_msg.id
-                LEFT JOIN users reply_user ON reply_msg.sender_id = reply_user.id
-                WHERE m.chat_id = $1
-                ORDER BY m.created_at DESC, m.id DESC
-                LIMIT $2 OFFSET $3
-                """,
-                chat_id, limit, offset
-            )
-            messages = [dict(r) for r in reversed(rows)]  # Reverse to get chronological order
-            # Bulk load reactions and read counts
-            if messages:
-                message_ids = [msg["id"] for msg in messages]
-                reactions_by_message = await _get_bulk_reactions(conn, message_ids)
-                read_counts = await _get_bulk_read_counts(conn, message_ids)
-                # Add to each message
-                for msg in messages:
-                    msg["reactions"] = reactions_by_message.get(msg["id"], [])
-                    msg["read_count"] = read_counts.get(msg["id"], 0)
-            return messages
+        return await load_chat_messages(
+            conn, chat_id, limit, offset, cursor_ts, cursor_id, since_ts, since_id, all_messages
+        )
     finally:
         await conn.close()
 
 
 async def get_message_by_id(message_id: int) -> Optional[Dict[str, Any]]:
     """Get message by ID with reactions and reply data"""
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
-        row = await conn.fetchrow(
-            """
-            SELECT 
-                m.*,
-                u.full_name as sender_name,
-                u.telegram_id as sender_telegram_id,
-                u.role as sender_role,
-                reply_msg.id as reply_to_id,
-                reply_msg.message_text as reply_to_text,
-                reply_msg.sender_id as reply_to_sender_id,
-                reply_msg.sender_type as reply_to_sender_type,
-                reply_user.full_name as reply_to_sender_name
-            FROM messages m
-            LEFT JOIN users u ON m.sender_id = u.id
-            LEFT JOIN messages reply_msg ON m.reply_to_message_id = reply_msg.id
-            LEFT JOIN users reply_user ON reply_msg.sender_id = reply_user.id
-            WHERE m.id = $1
-            """,
-            message_id
-        )
-        if not row:
-            return None
-        
-        message = dict(row)
-        # Add reactions
-        reaction_rows = await conn.fetch(
-            """
-            SELECT 
-                emoji,
-                COUNT(*) as count,
-                array_agg(user_id ORDER BY created_at) as user_ids
-            FROM message_reactions
-            WHERE message_id = $1
-            GROUP BY emoji
-            ORDER BY count DESC, emoji
-            """,
-            message_id
-        )
-        message["reactions"] = [
-            {
-                "emoji": r["emoji"],
-                "count": r["count"],
-                "users": r["user_ids"]
-            }
-            for r in reaction_rows
-        ]
-        # Add read count
-        read_count = await conn.fetchval(
-            """
-            SELECT COUNT(*) FROM message_reads WHERE message_id = $1
-            """,
-            message_id
-        )
-        message["read_count"] = read_count or 0
-        return message
+        messages = await _fetch_messages(conn, _build_message_query("m.id = $1"), message_id)
+        return messages[0] if messages else None
     finally:
         await conn.close()
 
 
 async def get_message_thread(message_id: int) -> List[Dict[str, Any]]:
     """Get all messages that reply to a specific message (thread)"""
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
-        # Get all messages that reply to this message
-        rows = await conn.fetch(
-            """
-            SELECT 
-                m.*,
-                u.full_name as sender_name,
-                u.telegram_id as sender_telegram_id,
-                u.role as sender_role,
-                reply_msg.id as reply_to_id,
-                reply_msg.message_text as reply_to_text,
-                reply_msg.sender_id as reply_to_sender_id,
-                reply_msg.sender_type as reply_to_sender_type,
-                reply_user.full_name as reply_to_sender_name
-            FROM messages m
-            LEFT JOIN users u ON m.sender_id = u.id
-            LEFT JOIN messages reply_msg ON m.reply_to_message_id = reply_msg.id
-            LEFT JOIN users reply_user ON reply_msg.sender_id = reply_user.id
-            WHERE m.reply_to_message_id = $1
-            ORDER BY m.created_at ASC, m.id ASC
-            """,
-            message_id
-        )
-        
-        messages = [dict(r) for r in rows]
-        
-        # Bulk load reactions and read counts
-        if messages:
-            message_ids = [msg["id"] for msg in messages]
-            reactions_by_message = await _get_bulk_reactions(conn, message_ids)
-            read_counts = await _get_bulk_read_counts(conn, message_ids)
-            
-            # Add to each message
-            for msg in messages:
-                msg["reactions"] = reactions_by_message.get(msg["id"], [])
-                msg["read_count"] = read_counts.get(msg["id"], 0)
-        
-        return messages
+        return await _fetch_messages(conn, _build_message_query("m.reply_to_message_id = $1"), message_id)
     finally:
         await conn.close()
 
 
+# ---------- O'qilganlik (chat_read_state watermark'lari) ----------
+# Har bir (chat, user) uchun bitta qator: last_read_message_id gacha bo'lgan
+# barcha xabarlar o'qilgan. unread_count xabar qo'shilganda trigger bilan
+# oshiriladi va har bir o'qish amalida watermark'dan keyin qayta sanaladi.
+
+_ADVANCE_WATERMARK_SQL = """
+    INSERT INTO chat_read_state AS s (chat_id, user_id, last_read_message_id, last_read_at, unread_count)
+    VALUES ($1, $2, $3, now(), chat_unread_after($1, $2, $3))
+    ON CONFLICT (chat_id, user_id) DO UPDATE
+    SET last_read_message_id = GREATEST(s.last_read_message_id, EXCLUDED.last_read_message_id),
+        last_read_at = now(),
+        unread_count = chat_unread_after($1, $2, GREATEST(s.last_read_message_id, EXCLUDED.last_read_message_id))
+"""
+
+
 async def get_unread_messages_count(chat_id: int, user_id: int) -> int:
     """
     Get unread messages count for a user in a chat.
-    Unread = messages not read by this user (excluding own messages).
+    Unread = messages after the user's read watermark (excluding own and system messages).
     """
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         count = await conn.fetchval(
             """
-            SELECT COUNT(*)
-            FROM messages m
-            WHERE m.chat_id = $1
-              AND m.sender_id != $2
-              AND m.sender_type != 'system'
-              AND NOT EXISTS (
-                  SELECT 1 FROM message_reads mr
-                  WHERE mr.message_id = m.id AND mr.user_id = $2
-              )
+            SELECT COALESCE(
+                (SELECT unread_count FROM chat_read_state WHERE chat_id = $1 AND user_id = $2),
+                chat_unread_after($1, $2, 0)
+            )
             """,
             chat_id, user_id
         )
@@ -454,20 +331,15 @@ async def get_unread_messages_count(chat_id: int, user_id: int) -> int:
 
 async def mark_message_read(message_id: int, user_id: int) -> bool:
     """
-    Mark a message as read by a user.
+    Mark a message (and everything before it in the chat) as read by a user.
     Returns True if successful, False otherwise.
     """
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
-        await conn.execute(
-            """
-            INSERT INTO message_reads (message_id, user_id, read_at)
-            VALUES ($1, $2, now())
-            ON CONFLICT (message_id, user_id) 
-            DO UPDATE SET read_at = now()
-            """,
-            message_id, user_id
-        )
+        chat_id = await conn.fetchval("SELECT chat_id FROM messages WHERE id = $1", message_id)
+        if chat_id is None:
+            return False
+        await conn.execute(_ADVANCE_WATERMARK_SQL, chat_id, user_id, message_id)
         return True
     except Exception as e:
         logger.error(f"Error marking message as read: {e}")
@@ -478,22 +350,25 @@ async def mark_message_read(message_id: int, user_id: int) -> bool:
 
 async def get_message_reads(message_id: int) -> List[Dict[str, Any]]:
     """
-    Get list of users who read a message.
-    Returns list of user dictionaries with read_at timestamp.
+    Get list of users who read a message (watermark >= message_id, sender excluded).
+    read_at is the time the user's watermark last moved.
     """
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         rows = await conn.fetch(
             """
             SELECT 
-                mr.user_id,
-                mr.read_at,
+                rs.user_id,
+                rs.last_read_at as read_at,
                 u.full_name as user_name,
                 u.telegram_id as user_telegram_id
-            FROM message_reads mr
-            INNER JOIN users u ON mr.user_id = u.id
-            WHERE mr.message_id = $1
-            ORDER BY mr.read_at ASC
+            FROM messages m
+            INNER JOIN chat_read_state rs
+                ON rs.chat_id = m.chat_id AND rs.last_read_message_id >= m.id
+            INNER JOIN users u ON rs.user_id = u.id
+            WHERE m.id = $1
+              AND rs.user_id IS DISTINCT FROM m.sender_id
+            ORDER BY rs.last_read_at ASC
             """,
             message_id
         )
@@ -504,33 +379,27 @@ async def get_message_reads(message_id: int) -> List[Dict[str, Any]]:
 
 async def mark_chat_messages_read(chat_id: int, user_id: int) -> int:
     """
-    Mark all unread messages in a chat as read for a user.
-    Returns number of messages marked as read.
+    Mark all messages in a chat as read for a user (watermark -> last message).
+    Returns number of messages that were unread.
     """
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
-        result = await conn.execute(
-            """
-            INSERT INTO message_reads (message_id, user_id, read_at)
-            SELECT m.id, $2, now()
-            FROM messages m
-            WHERE m.chat_id = $1
-              AND m.sender_id != $2
-              AND m.sender_type != 'system'
-              AND NOT EXISTS (
-                  SELECT 1 FROM message_reads mr
-                  WHERE mr.message_id = m.id AND mr.user_id = $2
-              )
-            ON CONFLICT (message_id, user_id) DO NOTHING
-            """,
-            chat_id, user_id
-        )
-        # Extract count from result string like "INSERT 0 5"
-        if result.startswith("INSERT"):
-            parts = result.split()
-            if len(parts) >= 3:
-                return int(parts[2])
-        return 0
+        async with conn.transaction():
+            state = await conn.fetchrow(
+                """
+                SELECT
+                    (SELECT COALESCE(MAX(id), 0) FROM messages WHERE chat_id = $1) as last_id,
+                    COALESCE(
+                        (SELECT unread_count FROM chat_read_state WHERE chat_id = $1 AND user_id = $2),
+                        chat_unread_after($1, $2, 0)
+                    ) as unread
+                """,
+                chat_id, user_id
+            )
+            if not state["last_id"]:
+                return 0
+            await conn.execute(_ADVANCE_WATERMARK_SQL, chat_id, user_id, state["last_id"])
+            return state["unread"] or 0
     except Exception as e:
         logger.error(f"Error marking chat messages as read: {e}")
         return 0
@@ -554,7 +423,7 @@ async def get_chat_media(
     Returns:
         List of messages with media attachments
     """
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         # Build query with parameterized conditions
         if media_type == "image":
@@ -630,29 +499,9 @@ async def get_message_reactions(message_id: int) -> List[Dict[str, Any]]:
     Returns:
         List of dicts: [{"emoji": "👍", "count": 3, "users": [user_id1, user_id2, ...]}, ...]
     """
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
-        rows = await conn.fetch(
-            """
-            SELECT 
-                emoji,
-                COUNT(*) as count,
-                array_agg(user_id ORDER BY created_at) as user_ids
-            FROM message_reactions
-            WHERE message_id = $1
-            GROUP BY emoji
-            ORDER BY count DESC, emoji
-            """,
-            message_id
-        )
-        return [
-            {
-                "emoji": row["emoji"],
-                "count": row["count"],
-                "users": row["user_ids"]
-            }
-            for row in rows
-        ]
+        return await _get_message_reactions(conn, message_id)
     finally:
         await conn.close()
 
@@ -667,7 +516,7 @@ async def toggle_message_reaction(message_id: int, user_id: int, emoji: str) ->
     Returns:
         Dict with "action" ("added" or "removed") and "reactions" (updated reactions list)
     """
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         async with conn.transaction():
             # If emoji is empty, remove reaction
@@ -739,46 +588,204 @@ async def search_messages(chat_id: int, query: str, limit: int = 50) -> List[Dic
     if not query or not query.strip():
         return []
     
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
-        rows = await conn.fetch(
-            """
-            SELECT 
-                m.*,
-                u.full_name as sender_name,
-                u.telegram_id as sender_telegram_id,
-                u.role as sender_role,
-                ts_rank(to_tsvector('simple', m.message_text), plainto_tsquery('simple', $2)) as rank
-            FROM messages m
-            LEFT JOIN users u ON m.sender_id = u.id
-            WHERE m.chat_id = $1
-              AND to_tsvector('simple', m.message_text) @@ plainto_tsquery('simple', $2)
-            ORDER BY rank DESC, m.created_at DESC
-            LIMIT $3
-            """,
-            chat_id, query.strip(), limit
+        sql = _build_message_query(
+            "m.chat_id = $1 AND m.search_vector @@ plainto_tsquery('simple', $2)",
+            order="rank DESC, m.created_at DESC",
+            limit="$3",
+            outer_order="m.rank DESC, m.created_at DESC",
+            extra_columns=", ts_rank(m.search_vector, plainto_tsquery('simple', $2)) as rank",
         )
-        
-        messages = [dict(r) for r in rows]
+        messages = await _fetch_messages(conn, sql, chat_id, query.strip(), limit)
         # Remove rank from message dict (internal use only)
         for msg in messages:
             msg.pop('rank', None)
-        
-        # Bulk load reactions and read counts
-        if messages:
-            message_ids = [msg["id"] for msg in messages]
-            reactions_by_message = await _get_bulk_reactions(conn, message_ids)
-            read_counts = await _get_bulk_read_counts(conn, message_ids)
-            # Add to each message
-            for msg in messages:
-                msg["reactions"] = reactions_by_message.get(msg["id"], [])
-                msg["read_count"] = read_counts.get(msg["id"], 0)
-        
         return messages
     finally:
         await conn.close()
 
 
+# ---------- Barcha chatlar bo'yicha qidiruv (supervisor/operator) ----------
+# Faqat eng yangi SEARCH_MAX_CANDIDATES ta mos xabar reyting qilinadi - juda
+# keng so'rovlar ham millionlab xabarlarda interaktiv vaqtda qaytadi. Eski
+# xabarlar oynadan tashqarida qoladi (sana/operator filtrlari bilan toraytiriladi).
+# Sahifalash (rank, id) keyset bo'yicha; oyna birinchi sahifadagi MAX(messages.id)
+# bilan qotiriladi (cursor'da max_id), shuning uchun yangi xabarlar keyingi
+# sahifalarni siljitmaydi. ts_headline faqat sahifa qatorlariga.
+
+SEARCH_MAX_CANDIDATES = 5000
+SEARCH_TIMEOUT_MS = 3000
+
+# ts_headline belgilari: snippet HTML-escape qilingandan keyin <mark> ga almashtiriladi
+_HIGHLIGHT_START = "\x01"
+_HIGHLIGHT_STOP = "\x02"
+_HEADLINE_OPTIONS = (
+    f"StartSel={_HIGHLIGHT_START}, StopSel={_HIGHLIGHT_STOP}, "
+    'MaxWords=30, MinWords=10, MaxFragments=2, FragmentDelimiter=" … "'
+)
+
+
+def _highlight(snippet: Optional[str]) -> str:
+    if not snippet:
+        return ""
+    return (
+        html.escape(snippet)
+        .replace(_HIGHLIGHT_START, "<mark>")
+        .replace(_HIGHLIGHT_STOP, "</mark>")
+    )
+
+
+async def search_all_messages(
+    query: str,
+    limit: int = 20,
+    cursor_rank: Optional[float] = None,
+    cursor_id: Optional[int] = None,
+    operator_id: Optional[int] = None,
+    client_id: Optional[int] = None,
+    chat_id: Optional[int] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    cursor_max_id: Optional[int] = None,
+) -> Dict[str, Any]:
+    """
+    Search messages across chats (search_vector + GIN).
+
+    Only the newest SEARCH_MAX_CANDIDATES matches (with id <= the window bound)
+    are ranked; older matches are reachable only through narrower filters.
+
+    Args:
+        query: Search query string
+        limit: Page size
+        cursor_rank, cursor_id: Keyset cursor from previous page's next_cursor
+        cursor_max_id: Window bound from next_cursor.max_id (None on the first page)
+        operator_id: Only chats assigned to this operator
+        client_id: Only chats of this client
+        chat_id: Only this chat
+        date_from, date_to: Message date range (inclusive)
+
+    Returns:
+        {"results": [message + rank + snippet], "next_cursor": {"rank", "id", "max_id"} | None}
+    """
+    if not query or not query.strip():
+        return {"results": [], "next_cursor": None}
+
+    # $2 - candidate window bound (first page: current MAX(id), set below)
+    params: List[Any] = [query.strip(), cursor_max_id]
+    filters = ["m.search_vector @@ (SELECT q FROM q)", "m.id <= $2"]
+    if operator_id is not None:
+        params.append(operator_id)
+        filters.append(f"c.operator_id = ${len(params)}")
+    if client_id is not None:
+        params.append(client_id)
+        filters.append(f"c.client_id = ${len(params)}")
+    if chat_id is not None:
+        params.append(chat_id)
+        filters.append(f"m.chat_id = ${len(params)}")
+    if date_from is not None:
+        params.append(date_from)
+        filters.append(f"m.created_at >= ${len(params)}::date")
+    if date_to is not None:
+        params.append(date_to)
+        filters.append(f"m.created_at < ${len(params)}::date + 1")
+    join_chats = "JOIN chats c ON c.id = m.chat_id" if operator_id is not None or client_id is not None else ""
+
+    cursor_filter = "TRUE"
+    if cursor_rank is not None and cursor_id is not None:
+        params.extend([cursor_rank, cursor_id])
+        cursor_filter = f"(r.rank, r.id) < (${len(params) - 1}::real, ${len(params)})"
+
+    params.append(SEARCH_MAX_CANDIDATES)
+    candidates_limit = f"${len(params)}"
+    params.append(limit + 1)
+    page_limit = f"${len(params)}"
+    params.append(_HEADLINE_OPTIONS)
+    headline_options = f"${len(params)}"
+
+    sql = f"""
+        WITH q AS (SELECT plainto_tsquery('simple', $1) AS q),
+        candidates AS (
+            SELECT m.id, m.search_vector
+            FROM messages m
+            {join_chats}
+            WHERE {' AND '.join(filters)}
+            ORDER BY m.id DESC
+            LIMIT {candidates_limit}
+        ),
+        ranked AS (
+            SELECT r.id, r.rank
+            FROM (
+                SELECT id, ts_rank(search_vector, (SELECT q FROM q)) AS rank FROM candidates
+            ) r
+            WHERE {cursor_filter}
+            ORDER BY r.rank DESC, r.id DESC
+            LIMIT {page_limit}
+        )
+    """ + _build_message_query(
+        "TRUE",
+        order="r.rank DESC, m.id DESC",
+        outer_order="m.rank DESC, m.id DESC",
+        extra_columns=(
+            ", r.rank, ts_headline('simple', m.message_text, (SELECT q FROM q), "
+            f"{headline_options}) AS snippet"
+        ),
+        source="messages m JOIN ranked r ON r.id = m.id",
+    )
+
+    conn = await get_connection()
+    try:
+        async with conn.transaction():
+            await conn.execute(f"SET LOCAL statement_timeout = {int(SEARCH_TIMEOUT_MS)}")
+            if params[1] is None:
+                params[1] = await conn.fetchval("SELECT COALESCE(MAX(id), 0) FROM messages")
+            messages = await _fetch_messages(conn, sql, *params)
+    finally:
+        await conn.close()
+
+    next_cursor = None
+    if len(messages) > limit:
+        messages = messages[:limit]
+        last = messages[-1]
+        next_cursor = {"rank": last["rank"], "id": last["id"], "max_id": params[1]}
+    for msg in messages:
+        msg["snippet"] = _highlight(msg.get("snippet"))
+    return {"results": messages, "next_cursor": next_cursor}
+
+
+_MEDIA_URL_RE = re.compile(r"^(/api/media/(?:voice|images)/)\d+/\d+(.*)$")
+
+
+def _forward_attachments(raw: Any, chat_id: int, message_id: int) -> Optional[str]:
+    """
+    Store'dagi media (attachments["blobs"]) uchun URL'larni yangi xabarga
+    moslash: fayl nusxalanmaydi, blob'lar ref_count'ini trigger oshiradi,
+    media esa maqsad chatning o'z URL'i orqali beriladi.
+    Eski (blobs'siz) attachments o'zgarishsiz ko'chiriladi.
+    """
+    if raw is None:
+        return None
+    attachments = json.loads(raw) if isinstance(raw, str) else raw
+    if not isinstance(attachments, dict) or not attachments.get("blobs"):
+        return json.dumps(attachments)
+
+    def rewrite(url: Any) -> Any:
+        match = _MEDIA_URL_RE.match(url) if isinstance(url, str) else None
+        if not match:
+            return url
+        # {chat}/{eski_id}.ext, {chat}/{eski_id}_thumb.webp -> {chat}/{yangi_id}...
+        return f"{match.group(1)}{chat_id}/{message_id}{match.group(2)}"
+
+    attachments = dict(attachments)
+    attachments["url"] = rewrite(attachments.get("url"))
+    if isinstance(attachments.get("url"), str):
+        attachments["filename"] = attachments["url"].rsplit("/", 1)[-1]
+    if isinstance(attachments.get("variants"), dict):
+        attachments["variants"] = {
+            variant: rewrite(url) for variant, url in attachments["variants"].items()
+        }
+    return json.dumps(attachments)
+
+
 async def forward_message(
     message_id: int,
     target_chat_id: int,
@@ -799,7 +806,7 @@ async def forward_message(
     Returns:
         ID of the new forwarded message, or None if failed
     """
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         async with conn.transaction():
             # 1. Get original message
@@ -834,23 +841,25 @@ async def forward_message(
                 forwarded_from_chat_id = original_message['chat_id']
                 forwarded_from_user_id = original_message['original_sender_id']
             
-            # 3. Create forwarded message
+            # 3. Create forwarded message (media - faqat metadata, blob'lar umumiy)
+            new_id = await conn.fetchval("SELECT nextval('messages_id_seq')")
             row = await conn.fetchrow(
                 """
                 INSERT INTO messages (
-                    chat_id, sender_id, sender_type, operator_id, 
+                    id, chat_id, sender_id, sender_type, operator_id, 
                     message_text, attachments,
                     forwarded_from_message_id, forwarded_from_chat_id, forwarded_from_user_id
                 )
-                VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9)
+                VALUES ($1, $2, $3, $4, $5, $6, $7::jsonb, $8, $9, $10)
                 RETURNING id
                 """,
+                new_id,
                 target_chat_id,
                 sender_id,
                 sender_type,
                 operator_id,
                 original_message['message_text'],
-                original_message['attachments'],
+                _forward_attachments(original_message['attachments'], target_chat_id, new_id),
                 forwarded_from_message_id,
                 forwarded_from_chat_id,
                 forwarded_from_user_id
@@ -884,7 +893,7 @@ async def edit_message(
     Edit a message. Only the message owner can edit it within 15 minutes.
     Returns updated message or None if not found/unauthorized.
     """
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         # Check if message exists and user is the owner
         message = await conn.fetchrow(
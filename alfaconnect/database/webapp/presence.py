@@ -0,0 +1,271 @@
+"""
+In-memory presence (online holat + last_seen)
+
+Heartbeat (/api/user/me/status, stats WS ping) endi DB ga yozmaydi: holat
+shu jarayon xotirasida saqlanadi, users.last_seen_at / is_online esa har
+PRESENCE_FLUSH_INTERVAL soniyada bitta batch UPDATE bilan yoziladi.
+
+- User online: ochiq WS ulanishi bor yoki oxirgi heartbeat ONLINE_TTL ichida
+  (va u "offline" deb yubormagan).
+- ONLINE_TTL o'tgan yozuvlar offline'ga o'tadi (on_change chaqiriladi, DB ga
+  is_online = FALSE yoziladi); PRESENCE_RETENTION dan eski, ulanishsiz va
+  yozilgan yozuvlar xotiradan o'chiriladi.
+- REDIS_ENABLED bo'lsa har flush'da lokal online userlar Redis'ga
+  (presence:last_seen ZSET, presence:role HASH) yoziladi va boshqa
+  instance'larning online userlari o'qiladi - o'qishlar baribir xotiradan.
+
+Faqat API event loop'idan foydalaniladi (start() shu loop'da chaqiriladi).
+"""
+import asyncio
+import logging
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from config import settings
+from database.basic.user_cache import patch_cached_user
+from database.connections import get_connection
+
+logger = logging.getLogger(__name__)
+
+# Online status TTL: user is considered online if last_seen_at is within this duration
+ONLINE_TTL = timedelta(seconds=60)
+
+_REDIS_LAST_SEEN = "presence:last_seen"
+_REDIS_ROLE = "presence:role"
+
+_FLUSH_SQL = """
+    UPDATE users u
+    SET last_seen_at = v.last_seen_at,
+        is_online = v.is_online,
+        updated_at = v.last_seen_at
+    FROM unnest($1::bigint[], $2::timestamptz[], $3::boolean[]) AS v(id, last_seen_at, is_online)
+    WHERE u.id = v.id
+    RETURNING u.telegram_id, v.last_seen_at, v.is_online
+"""
+
+
+@dataclass
+class _Entry:
+    role: Optional[str]
+    last_seen: datetime
+    heartbeat_online: bool = False  # oxirgi heartbeat "online" edimi
+    connections: int = 0            # ochiq WS ulanishlari
+    online: bool = False            # oxirgi hisoblangan holat (o'tishlarni aniqlash uchun)
+    dirty: bool = True              # DB ga yozilmagan o'zgarish bor
+
+
+class PresenceTracker:
+    def __init__(self, flush_interval: float = 5.0, retention: float = 600.0):
+        self.flush_interval = flush_interval
+        self.retention = timedelta(seconds=retention)
+        self._entries: Dict[int, _Entry] = {}
+        self._remote: Dict[int, Optional[str]] = {}  # boshqa instance'lardagi online userlar -> role
+        self._task: Optional[asyncio.Task] = None
+        self._redis = None
+        # (user_id, is_online, role) - holat o'zgarganda (masalan, WS broadcast)
+        self.on_change: Optional[Callable[[int, bool, Optional[str]], Awaitable[None]]] = None
+
+    # ---------- Holatni yangilash ----------
+
+    def _entry(self, user_id: int, role: Optional[str], now: datetime) -> _Entry:
+        entry = self._entries.get(user_id)
+        if entry is None:
+            entry = self._entries[user_id] = _Entry(role=role, last_seen=now)
+        elif role:
+            entry.role = role
+        return entry
+
+    def _compute(self, entry: _Entry, now: datetime) -> bool:
+        return entry.connections > 0 or (entry.heartbeat_online and now - entry.last_seen <= ONLINE_TTL)
+
+    def _update(self, entry: _Entry, now: datetime) -> bool:
+        """Holatni qayta hisoblash; o'zgargan bo'lsa True"""
+        online = self._compute(entry, now)
+        changed = online != entry.online
+        entry.online = online
+        entry.dirty = True
+        return changed
+
+    def touch(self, user_id: int, role: Optional[str] = None, is_online: bool = True,
+              at: Optional[datetime] = None) -> bool:
+        """Heartbeat (is_online=False - user webapp'ni yopdi). Returns: holat o'zgardimi"""
+        now = datetime.now(timezone.utc)
+        entry = self._entry(user_id, role, now)
+        entry.last_seen = at or now
+        entry.heartbeat_online = is_online
+        return self._update(entry, now)
+
+    def connect(self, user_id: int, role: Optional[str] = None) -> bool:
+        """WS ulanishi ochildi. Returns: user endi online bo'ldimi"""
+        now = datetime.now(timezone.utc)
+        entry = self._entry(user_id, role, now)
+        entry.connections += 1
+        entry.last_seen = now
+        return self._update(entry, now)
+
+    def disconnect(self, user_id: int) -> bool:
+        """WS ulanishi yopildi. Returns: user endi offline bo'ldimi"""
+        entry = self._entries.get(user_id)
+        if entry is None:
+            return False
+        now = datetime.now(timezone.utc)
+        entry.connections = max(0, entry.connections - 1)
+        entry.last_seen = now
+        if entry.connections == 0:
+            entry.heartbeat_online = False  # ulanish yopildi - heartbeat holati ham tugadi
+        return self._update(entry, now)
+
+    # ---------- O'qish (faqat xotira) ----------
+
+    def is_online(self, user_id: int) -> bool:
+        entry = self._entries.get(user_id)
+        if entry is not None and self._compute(entry, datetime.now(timezone.utc)):
+            return True
+        return user_id in self._remote
+
+    def status(self, user_id: int) -> Optional[Dict[str, Any]]:
+        """{"is_online", "last_seen_at"} yoki None (bu instance userni bilmaydi)"""
+        entry = self._entries.get(user_id)
+        if entry is None:
+            return None
+        return {"is_online": self.is_online(user_id), "last_seen_at": entry.last_seen}
+
+    def online_users(self, role: Optional[str] = None) -> Dict[int, Optional[str]]:
+        """Online userlar: {user_id: role}"""
+        now = datetime.now(timezone.utc)
+        result = {uid: r for uid, r in self._remote.items() if role is None or r == role}
+        for user_id, entry in self._entries.items():
+            if (role is None or entry.role == role) and self._compute(entry, now):
+                result[user_id] = entry.role
+        return result
+
+    def online_user_ids(self, role: Optional[str] = None) -> List[int]:
+        return list(self.online_users(role))
+
+    def count_by_role(self) -> Dict[Optional[str], int]:
+        counts: Dict[Optional[str], int] = {}
+        for role in self.online_users().values():
+            counts[role] = counts.get(role, 0) + 1
+        return counts
+
+    # ---------- Flush ----------
+
+    async def _expire(self) -> None:
+        """TTL o'tgan heartbeat'larni offline qilish, eski yozuvlarni o'chirish"""
+        now = datetime.now(timezone.utc)
+        went_offline = []
+        for user_id, entry in list(self._entries.items()):
+            if entry.online and not self._compute(entry, now):
+                entry.online = False
+                entry.dirty = True
+                went_offline.append((user_id, entry.role))
+            elif not entry.online and not entry.dirty and entry.connections == 0 \
+                    and now - entry.last_seen > self.retention:
+                del self._entries[user_id]
+        if self.on_change:
+            for user_id, role in went_offline:
+                try:
+                    await self.on_change(user_id, False, role)
+                except Exception as e:
+                    logger.warning(f"Presence on_change failed for user {user_id}: {e}")
+
+    async def flush(self) -> int:
+        """O'zgargan yozuvlarni bitta UPDATE bilan yozish. Returns: yozilgan userlar soni"""
+        dirty = [(user_id, entry) for user_id, entry in self._entries.items() if entry.dirty]
+        if not dirty:
+            return 0
+        for _, entry in dirty:
+            entry.dirty = False
+        try:
+            conn = await get_connection()
+            try:
+                rows = await conn.fetch(
+                    _FLUSH_SQL,
+                    [user_id for user_id, _ in dirty],
+                    [entry.last_seen for _, entry in dirty],
+                    [entry.online for _, entry in dirty],
+                )
+            finally:
+                await conn.close()
+        except Exception:
+            for _, entry in dirty:
+                entry.dirty = True  # keyingi flush'da qayta urinish
+            raise
+        # Faqat last_seen o'zgardi - keshdagi qatorni joyida yangilaymiz
+        # (invalidate har flush'da barcha faol userlarni keshdan chiqarardi)
+        for row in rows:
+            patch_cached_user(row["telegram_id"], last_seen_at=row["last_seen_at"],
+                              is_online=row["is_online"], updated_at=row["last_seen_at"])
+        return len(dirty)
+
+    async def _sync_redis(self) -> None:
+        now = datetime.now(timezone.utc)
+        local = {
+            user_id: entry for user_id, entry in self._entries.items() if self._compute(entry, now)
+        }
+        pipe = self._redis.pipeline(transaction=False)
+        if local:
+            pipe.zadd(_REDIS_LAST_SEEN, {str(uid): now.timestamp() for uid in local})
+            pipe.hset(_REDIS_ROLE, mapping={str(uid): e.role or "" for uid, e in local.items()})
+        pipe.zremrangebyscore(_REDIS_LAST_SEEN, "-inf", (now - self.retention).timestamp())
+        pipe.zrangebyscore(_REDIS_LAST_SEEN, (now - ONLINE_TTL).timestamp(), "+inf")
+        results = await pipe.execute()
+        remote_ids = [int(uid) for uid in results[-1] if int(uid) not in self._entries]
+        roles = await self._redis.hmget(_REDIS_ROLE, [str(uid) for uid in remote_ids]) if remote_ids else []
+        self._remote = {uid: (role or None) for uid, role in zip(remote_ids, roles)}
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self._expire()
+                await self.flush()
+                if self._redis is not None:
+                    await self._sync_redis()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Presence flush failed: {e}")
+
+    async def start(self) -> None:
+        if self._task is not None:
+            return
+        if settings.REDIS_ENABLED:
+            try:
+                import redis.asyncio as aioredis
+                self._redis = aioredis.Redis(
+                    host=settings.REDIS_HOST,
+                    port=settings.REDIS_PORT,
+                    password=settings.REDIS_PASSWORD,
+                    db=settings.REDIS_DB,
+                    decode_responses=True
+                )
+                await self._redis.ping()
+            except Exception as e:
+                logger.warning(f"Presence: Redis unavailable, tracking locally only: {e}")
+                self._redis = None
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Flush loop'ni to'xtatish va oxirgi holatni yozish"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        try:
+            await self.flush()
+        except Exception as e:
+            logger.error(f"Presence final flush failed: {e}")
+        if self._redis is not None:
+            await self._redis.close()
+            self._redis = None
+
+
+presence = PresenceTracker(
+    flush_interval=settings.PRESENCE_FLUSH_INTERVAL,
+    retention=settings.PRESENCE_RETENTION,
+)
@@ -3,12 +3,12 @@ Staff chat queries for WebApp
 """
 import asyncpg
 from typing import Optional, List, Dict, Any
-from config import settings
+from database.connections import get_connection
 
 
 async def create_staff_chat(sender_id: int, receiver_id: int) -> Dict[str, Any]:
     """Create a new staff chat or reactivate inactive chat"""
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         # Check for existing inactive chat
         existing = await conn.fetchrow(
@@ -52,7 +52,7 @@ async def create_staff_chat(sender_id: int, receiver_id: int) -> Dict[str, Any]:
 
 async def get_staff_chat_by_id(chat_id: int, user_id: Optional[int] = None) -> Optional[Dict[str, Any]]:
     """Get staff chat by ID (with optional authorization check)"""
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         if user_id:
             # Check if user is participant (sender or receiver)
@@ -91,7 +91,7 @@ async def get_staff_chat_by_id(chat_id: int, user_id: Optional[int] = None) -> O
 
 async def get_staff_chats(user_id: int, limit: int = 50, offset: int = 0) -> Dict[str, Any]:
     """Get staff chats for user"""
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         rows = await conn.fetch(
             """
@@ -133,7 +133,7 @@ async def create_staff_message(
     attachments: Optional[Dict[str, Any]] = None
 ) -> int:
     """Create a staff message"""
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         row = await conn.fetchrow(
             """
@@ -155,7 +155,7 @@ async def get_staff_messages(
     offset: int = 0
 ) -> List[Dict[str, Any]]:
     """Get staff messages"""
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         rows = await conn.fetch(
             """
@@ -179,7 +179,7 @@ async def get_staff_messages(
 
 async def get_staff_message_by_id(message_id: int) -> Optional[Dict[str, Any]]:
     """Get staff message by ID"""
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         row = await conn.fetchrow(
             """
@@ -201,7 +201,7 @@ async def get_staff_message_by_id(message_id: int) -> Optional[Dict[str, Any]]:
 
 async def get_available_staff(user_id: int) -> List[Dict[str, Any]]:
     """Get available staff members for chat"""
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         rows = await conn.fetch(
             """
@@ -226,7 +226,7 @@ async def get_available_staff(user_id: int) -> List[Dict[str, Any]]:
 
 async def close_staff_chat(chat_id: int) -> bool:
     """Close staff chat"""
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         result = await conn.execute(
             """
@@ -3,18 +3,22 @@ WebApp uchun user queries
 """
 from typing import Optional, Dict, Any, List
 from database.basic.user import (
-    get_user_by_telegram_id as _get_user_by_telegram_id,
     get_user_by_id as _get_user_by_id,
     ensure_user as _ensure_user,
     get_users_by_role
 )
-import asyncpg
-from config import settings
+from database.connections import get_connection
+from database.basic.search import search_users
+from database.basic.user_cache import get_cached_user
 
 
 async def get_user_by_telegram_id(telegram_id: int) -> Optional[Dict[str, Any]]:
-    """Telegram ID orqali user ma'lumotlarini olish"""
-    return await _get_user_by_telegram_id(telegram_id)
+    """
+    Telegram ID orqali user ma'lumotlarini olish (user_cache TTL keshidan;
+    role/blok o'zgarganda invalidate_user() tozalaydi). Nusxa qaytariladi.
+    """
+    user = await get_cached_user(telegram_id)
+    return dict(user) if user else None
 
 
 async def get_user_by_id(user_id: int) -> Optional[Dict[str, Any]]:
@@ -34,7 +38,7 @@ async def create_or_get_user(telegram_id: int, first_name: Optional[str] = None,
 
 async def get_client_info(user_id: int) -> Optional[Dict[str, Any]]:
     """Client ma'lumotlarini olish (chat stats bilan)"""
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         row = await conn.fetchrow(
             """
@@ -69,7 +73,7 @@ async def get_client_info(user_id: int) -> Optional[Dict[str, Any]]:
 
 async def get_available_clients(limit: int = 50, offset: int = 0) -> List[Dict[str, Any]]:
     """Mavjud clientlarni olish"""
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         rows = await conn.fetch(
             """
@@ -104,53 +108,45 @@ async def get_available_clients(limit: int = 50, offset: int = 0) -> List[Dict[s
         await conn.close()
 
 
-async def search_clients(query: str, limit: int = 20) -> List[Dict[str, Any]]:
-    """Clientlarni qidirish"""
-    conn = await asyncpg.connect(settings.DB_URL)
+async def search_clients(query: str, limit: int = 20, cursor: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Clientlarni qidirish (database/basic/search.py: trigram + prefix, keyset pagination).
+
+    Returns:
+        {"items": [...], "next_cursor": str | None}
+    """
+    page = await search_users(query, roles=["client"], limit=limit, cursor=cursor)
+    clients = page["items"]
+    if not clients:
+        return page
+
+    conn = await get_connection()
     try:
-        search_term = f"%{query}%"
         rows = await conn.fetch(
             """
-            SELECT 
-                u.id,
-                u.telegram_id,
-                u.full_name,
-                u.username,
-                u.phone,
-                u.role,
-                u.language,
-                u.region,
-                u.address,
-                u.abonent_id,
-                u.is_online,
-                u.last_seen_at,
-                u.created_at,
-                u.updated_at,
-                COUNT(DISTINCT c.id) as total_chats,
-                COUNT(DISTINCT CASE WHEN c.status = 'active' THEN c.id END) as active_chats
-            FROM users u
-            LEFT JOIN chats c ON c.client_id = u.id
-            WHERE u.role = 'client'
-              AND (
-                u.full_name ILIKE $1
-                OR u.username ILIKE $1
-                OR u.phone ILIKE $1
-                OR CAST(u.telegram_id AS TEXT) ILIKE $1
-              )
-            GROUP BY u.id
-            ORDER BY u.full_name
-            LIMIT $2
+            SELECT client_id,
+                   COUNT(*) AS total_chats,
+                   COUNT(*) FILTER (WHERE status = 'active') AS active_chats
+              FROM chats
+             WHERE client_id = ANY($1::bigint[])
+             GROUP BY client_id
             """,
-            search_term, limit
+            [c["id"] for c in clients]
         )
-        return [dict(r) for r in rows]
     finally:
         await conn.close()
 
+    counts = {r["client_id"]: r for r in rows}
+    for client in clients:
+        row = counts.get(client["id"])
+        client["total_chats"] = row["total_chats"] if row else 0
+        client["active_chats"] = row["active_chats"] if row else 0
+    return page
+
 
 async def get_operators(limit: int = 100) -> List[Dict[str, Any]]:
     """Operatorlarni olish"""
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         rows = await conn.fetch(
             """
@@ -2,12 +2,9 @@
 User online/offline status queries
 """
 from typing import Optional, Dict, Any
-from datetime import datetime, timezone, timedelta
-import asyncpg
-from config import settings
-
-# Online status TTL: user is considered online if last_seen_at is within this duration
-ONLINE_TTL = timedelta(seconds=60)
+from datetime import datetime, timezone
+from database.connections import get_connection
+from database.webapp.presence import ONLINE_TTL, presence
 
 
 def is_user_online(last_seen_at: Optional[datetime]) -> bool:
@@ -35,59 +32,50 @@ def is_user_online(last_seen_at: Optional[datetime]) -> bool:
     return time_diff <= ONLINE_TTL
 
 
-async def update_user_last_seen(user_id: int, last_seen_at: Optional[datetime] = None, is_online: Optional[bool] = None) -> bool:
+async def update_user_last_seen(
+    user_id: int,
+    last_seen_at: Optional[datetime] = None,
+    is_online: Optional[bool] = None,
+    role: Optional[str] = None
+) -> bool:
     """
-    Update user last_seen_at timestamp and is_online status (heartbeat).
+    Record a heartbeat (last_seen_at + is_online) in the presence tracker.
+    
+    No DB write here: users.last_seen_at / is_online are written by the
+    presence flush loop in one batched UPDATE (see database/webapp/presence.py).
     
     Args:
         user_id: User ID
         last_seen_at: Timestamp (defaults to now if None)
-        is_online: Online status (True/False). If None, calculated from TTL.
+        is_online: Online status (True/False). If None, user is online (heartbeat).
+        role: User role (for online_users(role) / summary counts)
         
     Returns:
-        True if update successful, False otherwise
+        True if the user's online state changed (online <-> offline)
     """
-    if last_seen_at is None:
-        last_seen_at = datetime.now(timezone.utc)
-    
-    # Calculate is_online if not provided
     if is_online is None:
         is_online = True  # If sending heartbeat, user is online
-    
-    conn = await asyncpg.connect(settings.DB_URL)
-    try:
-        await conn.execute(
-            """
-            UPDATE users
-            SET last_seen_at = $1,
-                is_online = $2,
-                updated_at = $1
-            WHERE id = $3
-            """,
-            last_seen_at,
-            is_online,
-            user_id
-        )
-        return True
-    except Exception as e:
-        import logging
-        logging.error(f"Error updating user last_seen_at: {e}")
-        return False
-    finally:
-        await conn.close()
+    return presence.touch(user_id, role, is_online=is_online, at=last_seen_at)
 
 
 async def get_user_status(user_id: int) -> Optional[Dict[str, Any]]:
     """
-    Get user online status (calculated from last_seen_at) and last_seen_at.
+    Get user online status and last_seen_at.
+    
+    Served from the presence tracker; falls back to users.last_seen_at for
+    users this instance has not seen yet.
     
     Args:
         user_id: User ID
         
     Returns:
-        Dict with is_online (calculated) and last_seen_at, or None if user not found
+        Dict with is_online and last_seen_at, or None if user not found
     """
-    conn = await asyncpg.connect(settings.DB_URL)
+    status = presence.status(user_id)
+    if status is not None:
+        return {'id': user_id, **status}
+    
+    conn = await get_connection()
     try:
         row = await conn.fetchrow(
             """
@@ -101,11 +89,9 @@ async def get_user_status(user_id: int) -> Optional[Dict[str, Any]]:
             return None
         
         last_seen_at = row['last_seen_at']
-        is_online = is_user_online(last_seen_at)
-        
         return {
             'id': row['id'],
-            'is_online': is_online,
+            'is_online': presence.is_online(user_id) or is_user_online(last_seen_at),
             'last_seen_at': last_seen_at
         }
     finally:
@@ -114,46 +100,43 @@ async def get_user_status(user_id: int) -> Optional[Dict[str, Any]]:
 
 async def get_online_users(role: Optional[str] = None) -> list[Dict[str, Any]]:
     """
-    Get list of online users (calculated from last_seen_at), optionally filtered by role.
+    Get list of online users, optionally filtered by role.
+    
+    Online user IDs come from the presence tracker (in memory, shared via Redis
+    when enabled); only names of those users are read from the DB.
     
     Args:
         role: Optional role filter (e.g., 'callcenter_operator', 'client')
         
     Returns:
-        List of user dicts with id, full_name, role, is_online (calculated), last_seen_at
+        List of user dicts with id, full_name, role, is_online, last_seen_at
     """
-    conn = await asyncpg.connect(settings.DB_URL)
+    online = presence.online_users(role)
+    if not online:
+        return []
+    
+    conn = await get_connection()
     try:
-        if role:
-            rows = await conn.fetch(
-                """
-                SELECT id, full_name, role, last_seen_at
-                FROM users
-                WHERE role = $1
-                ORDER BY last_seen_at DESC NULLS LAST
-                """,
-                role
-            )
-        else:
-            rows = await conn.fetch(
-                """
-                SELECT id, full_name, role, last_seen_at
-                FROM users
-                ORDER BY last_seen_at DESC NULLS LAST
-                """
-            )
-        
-        # Filter and calculate is_online for each user
-        now = datetime.now(timezone.utc)
-        online_users = []
-        for row in rows:
-            last_seen_at = row['last_seen_at']
-            if last_seen_at and (now - last_seen_at) <= ONLINE_TTL:
-                user_dict = dict(row)
-                user_dict['is_online'] = True
-                online_users.append(user_dict)
-        
-        return online_users
+        rows = await conn.fetch(
+            """
+            SELECT id, full_name, role, last_seen_at
+            FROM users
+            WHERE id = ANY($1::bigint[])
+            """,
+            list(online)
+        )
     finally:
         await conn.close()
-
+    
+    online_users = []
+    for row in rows:
+        user_dict = dict(row)
+        status = presence.status(row['id'])
+        if status:
+            user_dict['last_seen_at'] = status['last_seen_at']
+        user_dict['is_online'] = True
+        online_users.append(user_dict)
+    
+    epoch = datetime.min.replace(tzinfo=timezone.utc)
+    online_users.sort(key=lambda u: u['last_seen_at'] or epoch, reverse=True)
+    return online_users
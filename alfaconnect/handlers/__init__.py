@@ -1,5 +1,5 @@
 # handlers/__init__.py
-from aiogram import Router
+from utils.role_dispatch import RoleDispatchRouter
 
 from . import (
     start_handler,
@@ -19,24 +19,25 @@ from . import (
     call_center_supervisor,
 )
 
-router = Router()
+# Root router userning rolini bir marta aniqlab, update'ni to'g'ridan-to'g'ri
+# shu rol router'iga yuboradi (utils/role_dispatch.py).
+router = RoleDispatchRouter()
 
-router.include_routers(
-    start_handler.router,
-    client_rating.router,  # Bu qatorni qo'shing
+# Barcha rollar uchun umumiy router'lar - har doim birinchi tekshiriladi
+router.include_shared_router(start_handler.router)
+router.include_shared_router(client_rating.router)  # Bu qatorni qo'shing
 
-    # Omborni oldin ulaymiz
-    warehouse.router,
-    # warehouse_inventory.router,  # agar alohida router bo'lsa, shu yerga qo'shing
+# Omborni oldin ulaymiz (fallback tartibi shu ketma-ketlikda)
+router.include_role_router("warehouse", warehouse.router)
+# router.include_role_router("warehouse", warehouse_inventory.router)  # agar alohida router bo'lsa
 
-    # Keyin admin
-    admin.router,
+# Keyin admin
+router.include_role_router("admin", admin.router)
 
-    client.router,
-    manager.router,
-    junior_manager.router,
-    controller.router,
-    technician.router,
-    call_center.router,
-    call_center_supervisor.router,
-)
+router.include_role_router("client", client.router)
+router.include_role_router("manager", manager.router)
+router.include_role_router("junior_manager", junior_manager.router)
+router.include_role_router("controller", controller.router)
+router.include_role_router("technician", technician.router)
+router.include_role_router("callcenter_operator", call_center.router)
+router.include_role_router("callcenter_supervisor", call_center_supervisor.router)
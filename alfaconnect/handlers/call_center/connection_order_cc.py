@@ -31,11 +31,11 @@ from states.call_center_states import staffConnectionOrderStates
 
 # === DB functions ===
 from database.call_center.orders import (
-    find_user_by_phone,
     staff_orders_create,
     get_or_create_tarif_by_code,
 )
 from database.basic.user import ensure_user
+from database.basic.phone import find_user_by_phone
 from database.basic.language import get_user_language  # <<< TIL
 from database.basic.region import normalize_region_code
 
@@ -6,23 +6,23 @@ from typing import Optional, Dict, Any
 import html
 from datetime import datetime
 import logging
-import asyncpg
-from config import settings
+from database.connections import get_connection
 
 from filters.role_filter import RoleFilter
 from database.basic.language import get_user_language
 from database.call_center_supervisor.inbox import (
-    ccs_count_technician_orders,
     ccs_fetch_technician_orders,
-    ccs_count_staff_orders,
-    ccs_fetch_staff_orders,
-    ccs_count_operator_orders,
-    ccs_fetch_operator_orders,
+    ccs_technician_order_ids,
+    ccs_fetch_technician_orders_by_ids,
+    ccs_staff_order_ids,
+    ccs_operator_order_ids,
+    ccs_fetch_staff_orders_by_ids,
     ccs_send_technician_to_operator,
     ccs_send_staff_to_operator,
     ccs_complete_technician_order,
     ccs_complete_staff_order
 )
+from utils.carousel import InboxCarousel, CarouselPage
 
 logger = logging.getLogger(__name__)
 
@@ -33,6 +33,11 @@ router = Router()
 router.message.filter(RoleFilter("callcenter_supervisor"))
 router.callback_query.filter(RoleFilter("callcenter_supervisor"))
 
+# Inbox karusellari: ID snapshot + oldindan yuklanadigan oyna (utils/carousel.py)
+tech_carousel = InboxCarousel("ccs_tech", ccs_technician_order_ids, ccs_fetch_technician_orders_by_ids)
+staff_carousel = InboxCarousel("ccs_staff", ccs_staff_order_ids, ccs_fetch_staff_orders_by_ids)
+operator_carousel = InboxCarousel("ccs_operator", ccs_operator_order_ids, ccs_fetch_staff_orders_by_ids)
+
 # ========== Media Type Detection Helper Functions ==========
 
 def _detect_media_kind(file_id: str | None, media_type: str | None = None) -> str | None:
@@ -201,29 +206,28 @@ async def ccs_inbox(message: Message):
 @router.callback_query(F.data == "ccs_tech_orders")
 async def show_technician_orders_cb(callback: CallbackQuery):
     """Show technician orders from controller (callback)"""
-    await _show_technician_item_with_media(callback, idx=0, user_id=callback.from_user.id)
+    page = await tech_carousel.open(callback.from_user.id)
+    await _show_technician_item_with_media(callback, idx=0, user_id=callback.from_user.id, page=page)
 
 async def show_technician_orders(target):
     """Show technician orders from controller (both Message and CallbackQuery)"""
     user_id = target.from_user.id if hasattr(target, 'from_user') else target.message.from_user.id
-    await _show_technician_item_with_media(target, idx=0, user_id=user_id)
+    page = await tech_carousel.open(user_id)
+    await _show_technician_item_with_media(target, idx=0, user_id=user_id, page=page)
 
-async def _show_technician_item_with_media(target, idx: int, user_id: int):
+async def _show_technician_item_with_media(target, idx: int, user_id: int, page: Optional[CarouselPage] = None):
     """Show technician order item with media support"""
     lang = await get_user_language(user_id) or "uz"
     
-    total = await ccs_count_technician_orders()
-    if total == 0:
+    if page is None:
+        page = await tech_carousel.at(user_id, idx)
+    if page.empty:
         text = "📭 Texnik arizalar yo'q." if lang == "uz" else "📭 Технических заявок нет."
         if isinstance(target, Message):
             return await target.answer(text, parse_mode="HTML")
         return await target.message.edit_text(text, parse_mode="HTML")
     
-    idx = max(0, min(idx, total - 1))
-    row = await ccs_fetch_technician_orders(offset=idx, limit=1)
-    if not row:
-        idx = max(0, total - 1)
-        row = await ccs_fetch_technician_orders(offset=idx, limit=1)
+    idx, total, row = page.index, page.total, page.item
     
     kb = _tech_kb(idx, total, row["id"], lang)
     text = _format_technician_card(row, idx, total, lang)
@@ -459,8 +463,8 @@ async def _show_technician_item_with_media(target, idx: int, user_id: int):
 
 def _tech_kb(idx: int, total: int, order_id: int, lang: str = "uz") -> InlineKeyboardMarkup:
     """Technician orders keyboard"""
-    prev_cb = f"ccs_tech_prev:{idx}"
-    next_cb = f"ccs_tech_next:{idx}"
+    prev_cb = f"ccs_tech_prev:{order_id}"
+    next_cb = f"ccs_tech_next:{order_id}"
     send_to_operator_cb = f"ccs_tech_send_operator:{order_id}:{idx}"
 
     texts = {
@@ -559,14 +563,16 @@ def _format_technician_card(row: dict, idx: int, total: int, lang: str = "uz") -
 
 @router.callback_query(F.data.startswith("ccs_tech_prev:"))
 async def ccs_tech_prev(cb: CallbackQuery):
-    cur = int(cb.data.split(":")[1])
-    await _show_technician_item_with_media(cb, idx=cur - 1, user_id=cb.from_user.id)
+    order_id = int(cb.data.split(":")[1])
+    page = await tech_carousel.step(cb.from_user.id, order_id, -1)
+    await _show_technician_item_with_media(cb, idx=page.index, user_id=cb.from_user.id, page=page)
     await cb.answer()
 
 @router.callback_query(F.data.startswith("ccs_tech_next:"))
 async def ccs_tech_next(cb: CallbackQuery):
-    cur = int(cb.data.split(":")[1])
-    await _show_technician_item_with_media(cb, idx=cur + 1, user_id=cb.from_user.id)
+    order_id = int(cb.data.split(":")[1])
+    page = await tech_carousel.step(cb.from_user.id, order_id, +1)
+    await _show_technician_item_with_media(cb, idx=page.index, user_id=cb.from_user.id, page=page)
     await cb.answer()
 
 
@@ -580,10 +586,7 @@ async def ccs_tech_send_operator(cb: CallbackQuery):
     lang = await get_user_language(cb.from_user.id) or "uz"
     
     # Operatorlarni olish
-    import asyncpg
-    from config import settings
-    
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         operators = await conn.fetch("SELECT id, full_name, telegram_id FROM users WHERE role = 'callcenter_operator'")
         
@@ -660,10 +663,7 @@ async def ccs_tech_select_operator(cb: CallbackQuery):
             return
         
         # Operator ma'lumotlarini olish
-        import asyncpg
-        from config import settings
-        
-        conn = await asyncpg.connect(settings.DB_URL)
+        conn = await get_connection()
         try:
             operator = await conn.fetchrow("SELECT id, full_name, telegram_id, language FROM users WHERE id = $1", operator_id)
             if not operator:
@@ -736,6 +736,8 @@ async def ccs_tech_select_operator(cb: CallbackQuery):
         }.get(lang, "✅ Sent")
 
         await cb.answer(toast_text)
+        # Ariza supervisor inbox'idan chiqdi - o'rniga keyingisi ko'rsatiladi
+        tech_carousel.discard(order_id)
         await _show_technician_item_with_media(cb, idx=cur, user_id=cb.from_user.id)
         
     except Exception as e:
@@ -762,24 +764,22 @@ async def ccs_tech_back_to_item(cb: CallbackQuery):
 @router.callback_query(F.data == "ccs_staff_orders")
 async def show_staff_orders(callback: CallbackQuery):
     """Show staff orders from operators"""
-    await _show_staff_item(callback, idx=0, user_id=callback.from_user.id)
+    page = await staff_carousel.open(callback.from_user.id)
+    await _show_staff_item(callback, idx=0, user_id=callback.from_user.id, page=page)
 
-async def _show_staff_item(target, idx: int, user_id: int):
+async def _show_staff_item(target, idx: int, user_id: int, page: Optional[CarouselPage] = None):
     """Show staff order item"""
     lang = await get_user_language(user_id) or "uz"
     
-    total = await ccs_count_staff_orders()
-    if total == 0:
+    if page is None:
+        page = await staff_carousel.at(user_id, idx)
+    if page.empty:
         text = "📭 Operator arizalari yo'q." if lang == "uz" else "📭 Заявок операторов нет."
         if isinstance(target, Message):
             return await target.answer(text, parse_mode="HTML")
         return await target.message.edit_text(text, parse_mode="HTML")
     
-    idx = max(0, min(idx, total - 1))
-    row = await ccs_fetch_staff_orders(offset=idx, limit=1)
-    if not row:
-        idx = max(0, total - 1)
-        row = await ccs_fetch_staff_orders(offset=idx, limit=1)
+    idx, total, row = page.index, page.total, page.item
     
     kb = _staff_kb(idx, total, row["id"], lang)
     text = _format_staff_card(row, idx, total, lang)
@@ -791,8 +791,8 @@ async def _show_staff_item(target, idx: int, user_id: int):
 
 def _staff_kb(idx: int, total: int, order_id: int, lang: str = "uz") -> InlineKeyboardMarkup:
     """Staff orders keyboard"""
-    prev_cb = f"ccs_staff_prev:{idx}"
-    next_cb = f"ccs_staff_next:{idx}"
+    prev_cb = f"ccs_staff_prev:{order_id}"
+    next_cb = f"ccs_staff_next:{order_id}"
     send_to_operator_cb = f"ccs_staff_send_operator:{order_id}:{idx}"
     back_cb = "ccs_back_to_categories"
 
@@ -912,14 +912,16 @@ def _format_staff_card(row: dict, idx: int, total: int, lang: str = "uz") -> str
 
 @router.callback_query(F.data.startswith("ccs_staff_prev:"))
 async def ccs_staff_prev(cb: CallbackQuery):
-    cur = int(cb.data.split(":")[1])
-    await _show_staff_item(cb, idx=cur - 1, user_id=cb.from_user.id)
+    order_id = int(cb.data.split(":")[1])
+    page = await staff_carousel.step(cb.from_user.id, order_id, -1)
+    await _show_staff_item(cb, idx=page.index, user_id=cb.from_user.id, page=page)
     await cb.answer()
 
 @router.callback_query(F.data.startswith("ccs_staff_next:"))
 async def ccs_staff_next(cb: CallbackQuery):
-    cur = int(cb.data.split(":")[1])
-    await _show_staff_item(cb, idx=cur + 1, user_id=cb.from_user.id)
+    order_id = int(cb.data.split(":")[1])
+    page = await staff_carousel.step(cb.from_user.id, order_id, +1)
+    await _show_staff_item(cb, idx=page.index, user_id=cb.from_user.id, page=page)
     await cb.answer()
 
 @router.callback_query(F.data.startswith("ccs_staff_send_operator:"))
@@ -932,10 +934,7 @@ async def ccs_staff_send_operator(cb: CallbackQuery):
     lang = await get_user_language(cb.from_user.id) or "uz"
     
     # Operatorlarni olish
-    import asyncpg
-    from config import settings
-    
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         operators = await conn.fetch("SELECT id, full_name, telegram_id FROM users WHERE role = 'callcenter_operator'")
         
@@ -1003,7 +1002,7 @@ async def ccs_staff_select_operator(cb: CallbackQuery):
     
     try:
         # Ariza ma'lumotlarini olish
-        row = await ccs_fetch_staff_orders(offset=cur, limit=1)
+        row = (await ccs_fetch_staff_orders_by_ids([order_id])).get(order_id)
         if not row:
             await cb.answer(
                 ("❌ Ariza topilmadi!" if lang == "uz" else "❌ Заявка не найдена!"), 
@@ -1012,10 +1011,7 @@ async def ccs_staff_select_operator(cb: CallbackQuery):
             return
         
         # Operator ma'lumotlarini olish
-        import asyncpg
-        from config import settings
-        
-        conn = await asyncpg.connect(settings.DB_URL)
+        conn = await get_connection()
         try:
             operator = await conn.fetchrow("SELECT id, full_name, telegram_id, language FROM users WHERE id = $1", operator_id)
             if not operator:
@@ -1082,6 +1078,9 @@ async def ccs_staff_select_operator(cb: CallbackQuery):
         finally:
             await conn.close()
         
+        staff_carousel.discard(order_id)
+        operator_carousel.discard(order_id)
+        
         # Tasdiqlash xabari
         operator_name = (operator.get('full_name') or '').strip() or f"ID: {operator_id}"
         
@@ -1149,14 +1148,17 @@ async def ccs_staff_back_to_item(cb: CallbackQuery):
 @router.callback_query(F.data == "ccs_operator_orders")
 async def show_operator_orders(callback: CallbackQuery):
     """Call Center operator arizalarini ko'rsatish"""
-    await _show_operator_item(callback, idx=0, user_id=callback.from_user.id)
+    page = await operator_carousel.open(callback.from_user.id)
+    await _show_operator_item(callback, idx=0, user_id=callback.from_user.id, page=page)
 
-async def _show_operator_item(target, idx: int, user_id: int):
+async def _show_operator_item(target, idx: int, user_id: int, page: Optional[CarouselPage] = None):
     """Operator arizalarini ko'rsatish"""
     lang = await get_user_language(user_id) or "uz"
     
     try:
-        row = await ccs_fetch_operator_orders(offset=idx, limit=1)
+        if page is None:
+            page = await operator_carousel.at(user_id, idx)
+        idx, row = page.index, page.item
         if not row:
             text = (
                 "📞 <b>Call Center operator arizalari</b>\n\n"
@@ -1213,7 +1215,7 @@ async def _show_operator_item(target, idx: int, user_id: int):
         )
         
         # Navigation keyboard
-        total_count = await ccs_count_operator_orders()
+        total_count = page.total
         
         # Paginatsiya tugmalari mantiqiy tarzda ko'rinadi
         keyboard_rows = []
@@ -1223,14 +1225,14 @@ async def _show_operator_item(target, idx: int, user_id: int):
             
             # Orqaga tugmasi - faqat boshida bo'lmasa
             if idx > 0:
-                pagination_row.append(InlineKeyboardButton(text="⬅️", callback_data=f"ccs_operator_prev:{idx}"))
+                pagination_row.append(InlineKeyboardButton(text="⬅️", callback_data=f"ccs_operator_prev:{row['id']}"))
             
             # O'rta qismda raqam ko'rsatish
             pagination_row.append(InlineKeyboardButton(text=f"{idx + 1}/{total_count}", callback_data="noop"))
             
             # Oldinga tugmasi - faqat oxirida bo'lmasa
             if idx < total_count - 1:
-                pagination_row.append(InlineKeyboardButton(text="➡️", callback_data=f"ccs_operator_next:{idx}"))
+                pagination_row.append(InlineKeyboardButton(text="➡️", callback_data=f"ccs_operator_next:{row['id']}"))
             
             if pagination_row:  # Agar kamida bitta tugma bo'lsa
                 keyboard_rows.append(pagination_row)
@@ -1262,17 +1264,17 @@ async def _show_operator_item(target, idx: int, user_id: int):
 @router.callback_query(F.data.startswith("ccs_operator_prev:"))
 async def ccs_operator_prev(cb: CallbackQuery):
     """Operator arizalarida oldingi"""
-    _, idx = cb.data.split(":")
-    idx = max(0, int(idx) - 1)
-    await _show_operator_item(cb, idx, cb.from_user.id)
+    _, order_id = cb.data.split(":")
+    page = await operator_carousel.step(cb.from_user.id, int(order_id), -1)
+    await _show_operator_item(cb, page.index, cb.from_user.id, page=page)
     await cb.answer()
 
 @router.callback_query(F.data.startswith("ccs_operator_next:"))
 async def ccs_operator_next(cb: CallbackQuery):
     """Operator arizalarida keyingi"""
-    _, idx = cb.data.split(":")
-    idx = int(idx) + 1
-    await _show_operator_item(cb, idx, cb.from_user.id)
+    _, order_id = cb.data.split(":")
+    page = await operator_carousel.step(cb.from_user.id, int(order_id), +1)
+    await _show_operator_item(cb, page.index, cb.from_user.id, page=page)
     await cb.answer()
 
 @router.callback_query(F.data.startswith("ccs_operator_send_controller:"))
@@ -1285,10 +1287,10 @@ async def ccs_operator_send_controller(cb: CallbackQuery):
     lang = await get_user_language(cb.from_user.id) or "uz"
     
     try:
-        import asyncpg
-        from config import settings
+        # Guruh xabari uchun ariza ma'lumotlari (holat o'zgarishidan oldin)
+        row = (await ccs_fetch_staff_orders_by_ids([order_id])).get(order_id)
         
-        conn = await asyncpg.connect(settings.DB_URL)
+        conn = await get_connection()
         try:
             # Ariza holatini yangilash
             result = await conn.execute("""
@@ -1310,7 +1312,6 @@ async def ccs_operator_send_controller(cb: CallbackQuery):
                 from loader import bot
                 from utils.notification_service import send_group_notification_for_staff_order
                 
-                row = await ccs_fetch_operator_orders(offset=idx, limit=1)
                 if row:
                     await send_group_notification_for_staff_order(
                         bot=bot,
@@ -1334,6 +1335,8 @@ async def ccs_operator_send_controller(cb: CallbackQuery):
             )
             
             # Keyingi arizaga o'tish
+            operator_carousel.discard(order_id)
+            staff_carousel.discard(order_id)
             await _show_operator_item(cb, idx, cb.from_user.id)
             
         finally:
@@ -22,11 +22,11 @@ from database.basic.user import get_user_by_telegram_id, get_user_phone_by_teleg
 from database.basic.language import get_user_language
 from database.client.orders import create_service_order
 from utils.directory_utils import setup_media_structure
+from database.connections import get_connection
 from config import settings
 from loader import bot
 import os
 import asyncio
-import asyncpg
 from datetime import datetime
 
 logger = logging.getLogger(__name__)
@@ -65,7 +65,7 @@ async def save_service_media_file(file_id: str, media_type: str, user_id: int, o
             file_size = os.path.getsize(file_path) if os.path.exists(file_path) else 0
 
             # Media faylini database ga saqlash (asyncpg bilan)
-            conn = await asyncpg.connect(settings.DB_URL)
+            conn = await get_connection()
             try:
                 await conn.execute("""
                     INSERT INTO media_files (
@@ -514,7 +514,7 @@ async def finish_service_order(callback_or_message, state: FSMContext, lang: str
             business_type
         )
         
-        conn = await asyncpg.connect(settings.DB_URL)
+        conn = await get_connection()
         try:
             app_number_result = await conn.fetchrow(
                 "SELECT application_number FROM technician_orders WHERE id = $1",
@@ -36,7 +36,8 @@ from database.junior_manager.orders import (
     staff_orders_create,
     ensure_user_junior_manager,
 )
-from database.basic.user import get_user_by_telegram_id, find_user_by_phone
+from database.basic.user import get_user_by_telegram_id
+from database.basic.phone import find_user_by_phone
 from database.basic.tariff import get_or_create_tarif_by_code
 from database.basic.region import normalize_region_code
 
@@ -8,8 +8,7 @@ from database.basic.user import find_user_by_telegram_id
 from database.technician.materials import fetch_technician_materials
 from loader import bot
 import logging
-import asyncpg
-from config import settings
+from database.connections import get_connection
 
 logger = logging.getLogger(__name__)
 
@@ -584,11 +583,10 @@ async def get_client_data_for_notification(request_id: int, request_type: str):
     """
     Client ma'lumotlarini olish notification uchun.
     """
-    from database.connections import get_connection_url
-    import asyncpg
+    from database.connections import get_connection
     
     try:
-        conn = await asyncpg.connect(get_connection_url())
+        conn = await get_connection()
         try:
             if request_type == "connection":
                 query = """
@@ -643,10 +641,9 @@ async def get_used_materials_info(request_id: int, request_type: str, client_lan
     Ishlatilgan materiallar haqida ma'lumot olish.
     """
     try:
-        from database.connections import get_connection_url
-        import asyncpg
+        from database.connections import get_connection
         
-        conn = await asyncpg.connect(get_connection_url())
+        conn = await get_connection()
         try:
             # Get application_number from the order tables
             app_number_query = """
@@ -708,10 +705,9 @@ async def get_diagnosis_info(request_id: int, request_type: str, client_lang: st
         if request_type != "technician":
             return ""
             
-        from database.connections import get_connection_url
-        import asyncpg
+        from database.connections import get_connection
         
-        conn = await asyncpg.connect(get_connection_url())
+        conn = await get_connection()
         try:
             query = """
                 SELECT description
@@ -1298,11 +1294,10 @@ async def tech_accept(cb: CallbackQuery, state: FSMContext):
         # Controller'ga notification yuboramiz (texnik qabul qildi)
         try:
             from utils.notification_service import send_role_notification
-            from database.connections import get_connection_url
-            import asyncpg
+            from database.connections import get_connection
             
             # Controller'ning telegram_id ni olamiz (connections jadvalidan)
-            conn = await asyncpg.connect(get_connection_url())
+            conn = await get_connection()
             try:
                 # Get controller who assigned this order to technician
                 controller_info = None
@@ -1457,7 +1452,7 @@ async def tech_diag_text(msg: Message, state: FSMContext):
         mode = st.get("tech_mode", "connection")
         if mode == "staff":
             # Staff arizalar uchun staff_orders jadvaliga yozish (faqat technician type uchun)
-            conn = await asyncpg.connect(settings.DB_URL)
+            conn = await get_connection()
             try:
                 await conn.execute(
                     """
@@ -1694,7 +1689,7 @@ async def tech_qty_cancel(cb: CallbackQuery, state: FSMContext):
     mode = st.get("tech_mode", "connection")
     
     # 🟢 YANGI YONDASHUV: To'g'ridan-to'g'ri DB'dan olish
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         if mode == "technician":
             query = """
@@ -1797,7 +1792,7 @@ async def tech_qty_entered(msg: Message, state: FSMContext):
     except Exception:
         pass
 
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         if mode == "technician":
             query = """
@@ -1907,7 +1902,7 @@ async def tech_back_to_order(cb: CallbackQuery, state: FSMContext):
     mode = st.get("tech_mode", "connection")
     
     # 🟢 YANGI YONDASHUV: To'g'ridan-to'g'ri DB'dan olish
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         if mode == "technician":
             query = """
@@ -1995,7 +1990,7 @@ async def tech_back_to_materials(cb: CallbackQuery, state: FSMContext):
     mode = st.get("tech_mode", "connection")
     
     # 🟢 YANGI YONDASHUV: To'g'ridan-to'g'ri DB'dan olish
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         if mode == "technician":
             query = """
@@ -2141,7 +2136,7 @@ async def tech_add_more(cb: CallbackQuery, state: FSMContext):
     mode = st.get("tech_mode", "connection")
     
     # 🟢 YANGI YONDASHUV: To'g'ridan-to'g'ri DB'dan olish
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         if mode == "technician":
             query = """
@@ -2230,7 +2225,7 @@ async def tech_review(cb: CallbackQuery, state: FSMContext):
     # Material_issued ga yozmaslik - faqat Yakunlash bosganda yoziladi!
     
     # 🟢 YANGI YONDASHUV: To'g'ridan-to'g'ri DB'dan olish
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         if mode == "technician":
             query = """
@@ -2404,7 +2399,7 @@ async def tech_confirm_warehouse(cb: CallbackQuery, state: FSMContext):
             
             # Show finish/cancel/back buttons
             # 🟢 YANGI YONDASHUV: To'g'ridan-to'g'ri DB'dan olish
-            conn = await asyncpg.connect(settings.DB_URL)
+            conn = await get_connection()
             try:
                 if mode == "technician":
                     query = """
@@ -2549,7 +2544,7 @@ async def tech_cancellation_note(msg: Message, state: FSMContext):
         logger.error(f"Error restoring materials on cancel: {e}")
     
     # Arizani bekor qilish va sababni saqlash
-    conn = await asyncpg.connect(settings.DB_URL)
+    conn = await get_connection()
     try:
         if mode == "technician":
             await conn.execute(
@@ -301,9 +301,9 @@ async def confirm_assignment(callback: CallbackQuery, state: FSMContext):
         
         # Material berishni amalga oshirish
         import asyncpg
-        from config import settings
+        from database.connections import get_connection
         
-        conn = await asyncpg.connect(settings.DB_URL)
+        conn = await get_connection()
         try:
             async with conn.transaction():
                 # Ombordagi materialni kamaytirish
@@ -9,7 +9,7 @@ from aiohttp import ClientTimeout, TCPConnector
 from aiogram.client.default import DefaultBotProperties
 from aiogram.fsm.storage.memory import MemoryStorage
 from config import settings
-from middlewares import ErrorHandlingMiddleware
+from middlewares import ErrorHandlingMiddleware, UserContextMiddleware
 import os
 
 # =========================================================
@@ -232,9 +232,12 @@ async def create_bot_and_dp() -> tuple[Bot, Dispatcher]:
 
     # Middleware'ni qo'shish
     real_dp.update.middleware(ErrorHandlingMiddleware(bot=real_bot))
+    # User qatorini har bir update uchun bir marta yuklash (RoleFilter/til uchun)
+    real_dp.update.outer_middleware(UserContextMiddleware())
 
     logger.info("Bot va Dispatcher muvaffaqiyatli yaratildi!")
     logger.info("ErrorHandlingMiddleware qo'shildi!")
+    logger.info("UserContextMiddleware qo'shildi!")
 
     # Legacy proxy obyektlarni to'ldirish
     bot._set(real_bot)
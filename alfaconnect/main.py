@@ -14,6 +14,7 @@ import atexit
 
 from config import settings
 from loader import create_bot_and_dp
+from database.connections import init_pool, close_pool
 from handlers import router as handlers_router
 from utils.directory_utils import setup_media_structure, setup_static_structure
 
@@ -85,6 +86,12 @@ async def main():
     # Production da webapp build qilingan va nginx orqali serve qilinadi
     logger.info("Webapp server da nginx orqali serve qilinadi (alohida ishlaydi)")
     
+    # Umumiy DB connection pool (bot event loop uchun)
+    try:
+        await init_pool()
+    except Exception as e:
+        logger.error(f"DB pool init failed: {e}")
+    
     # Server qayta ishga tushganda material recovery
     try:
         from database.technician.materials import recover_technician_materials_after_crash, recover_warehouse_materials_after_crash
@@ -122,6 +129,8 @@ async def main():
             except Exception:
                 pass
             logger.info("Bot session closed")
+    
+    await close_pool()
 
 def signal_handler(signum, frame):
     """Handle signals (SIGTERM, SIGINT) gracefully - Linux specific"""
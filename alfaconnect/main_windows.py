@@ -18,6 +18,7 @@ from pathlib import Path
 
 from config import settings
 from loader import create_bot_and_dp
+from database.connections import init_pool, close_pool
 from handlers import router as handlers_router
 from utils.directory_utils import setup_media_structure, setup_static_structure
 
@@ -649,6 +650,12 @@ async def main():
             logger.warning(f"⚠️ Could not open browser automatically: {e}")
             logger.info(f"   Please open manually: http://localhost:{WEBAPP_PORT}")
     
+    # Umumiy DB connection pool (bot event loop uchun)
+    try:
+        await init_pool()
+    except Exception as e:
+        logger.error(f"DB pool init failed: {e}")
+    
     # Server qayta ishga tushganda material recovery
     try:
         from database.technician.materials import recover_technician_materials_after_crash, recover_warehouse_materials_after_crash
@@ -686,6 +693,8 @@ async def main():
             except Exception:
                 pass
             logger.info("Bot session closed")
+    
+    await close_pool()
 
 def signal_handler(signum, frame):
     """Handle signals (CTRL+C) gracefully - Windows specific"""
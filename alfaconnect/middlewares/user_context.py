@@ -0,0 +1,40 @@
+from typing import Any, Awaitable, Callable, Dict
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject, User
+import logging
+
+from database.basic.user_cache import get_cached_user, set_current_user, reset_current_user
+
+logger = logging.getLogger(__name__)
+
+
+class UserContextMiddleware(BaseMiddleware):
+    """Har bir update uchun DB user qatorini bir marta yuklab, data["db_user"] ga qo'yuvchi outer middleware.
+
+    RoleFilter va get_user_language shu qatordan foydalanadi, shuning uchun
+    rol router'lari ketma-ket tekshirilganda ham DB ga qayta murojaat bo'lmaydi.
+    """
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        tg_user: User | None = data.get("event_from_user")
+        if tg_user is None:
+            return await handler(event, data)
+
+        try:
+            db_user = await get_cached_user(tg_user.id)
+        except Exception as e:
+            # DB xatosida filtrlar o'zlari qayta urinib ko'radi
+            logger.error(f"Failed to load user context for {tg_user.id}: {e}")
+            return await handler(event, data)
+
+        data["db_user"] = db_user
+        token = set_current_user(db_user)
+        try:
+            return await handler(event, data)
+        finally:
+            reset_current_user(token)
@@ -14,8 +14,11 @@ from database.akt_queries import (
     check_akt_exists
 )
 from utils.word_generator import AKTGenerator
+from database.basic.media_blobs import store_file
 from config import settings
 
+DOCX_CONTENT_TYPE = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+
 class AKTService:
     def __init__(self):
         self.documents_dir = "documents"
@@ -104,8 +107,9 @@ class AKTService:
 
             print(f"AKT generated successfully: {file_path}")
 
-            # 7) Hash
-            file_hash = self._calculate_file_hash(file_path)
+            # 7) Content-addressed store'ga (sha256 bo'yicha bitta nusxa, hash bo'laklab)
+            file_hash, blob_path = await store_file(file_path, DOCX_CONTENT_TYPE)
+            file_path = str(blob_path)
 
             # 8) Bazaga yozish
             await create_akt_document(request_id, request_type, akt_number, file_path, file_hash)
@@ -137,8 +141,7 @@ class AKTService:
                     f"<i>Hujjat media ichida saqlanadi va kerak bo'lganda foydalanishingiz mumkin.</i>"
                 )
 
-                doc_path = Path(file_path)
-                input_file = FSInputFile(doc_path, filename=doc_path.name)
+                input_file = FSInputFile(Path(file_path), filename=f"{akt_number}.docx")
                 
                 # AKT ni media sifatida yuborish (rating keyboard yo'q)
                 sent_message = await bot.send_document(
@@ -180,8 +183,7 @@ class AKTService:
                 f"❌ Mijoz telegram_id topilmadi"
             )
 
-            doc_path = Path(file_path)
-            input_file = FSInputFile(doc_path, filename=doc_path.name)
+            input_file = FSInputFile(Path(file_path), filename=f"{akt_number}.docx")
             
             await bot.send_document(
                 chat_id=manager_group_id,
@@ -201,33 +203,12 @@ class AKTService:
     async def _save_akt_to_media_storage(self, request_id: int, request_type: str, file_path: str, sent_message):
         """
         AKT ni media ichida saqlash.
+        Fayl allaqachon blob store'da (media/blobs/..) - nusxa olinmaydi,
+        akt_documents faqat yuborilgan vaqt bilan yangilanadi.
         """
         try:
-            # AKT faylini media papkasiga ko'chirish
-            import shutil
-            from pathlib import Path
-            
-            # Hozirgi yil va oy (dinamik)
-            now = datetime.now()
-            year = now.strftime('%Y')
-            month = now.strftime('%m')
-            
-            # To'g'ri papka yo'li: media\2025\01\orders\akt (hozirgi yil/oy)
-            media_dir = Path(f"media/{year}/{month}/orders/akt")
-            media_dir.mkdir(parents=True, exist_ok=True)
-            
-            # Fayl nomini yaratish
-            akt_filename = f"AKT-{request_type}-{request_id}-{now.strftime('%Y%m%d_%H%M%S')}.docx"
-            media_file_path = media_dir / akt_filename
-            
-            # Faylni ko'chirish
-            shutil.copy2(file_path, media_file_path)
-            
-            # Database'ga media ma'lumotlarini saqlash
-            await self._save_akt_media_info(request_id, request_type, str(media_file_path), sent_message)
-            
-            print(f"AKT saved to media storage: {media_file_path}")
-            
+            await self._save_akt_media_info(request_id, request_type, file_path, sent_message)
+            print(f"AKT saved to media storage: {file_path}")
         except Exception as e:
             print(f"Error saving AKT to media storage: {e}")
 
@@ -236,10 +217,9 @@ class AKTService:
         AKT media ma'lumotlarini database'ga saqlash (mavjud akt_documents jadvaliga).
         """
         try:
-            from database.connections import get_connection_url
-            import asyncpg
+            from database.connections import get_connection
             
-            conn = await asyncpg.connect(get_connection_url())
+            conn = await get_connection()
             try:
                 # Get application_number from the order tables
                 app_number_query = """
@@ -271,8 +251,3 @@ class AKTService:
                 
         except Exception as e:
             print(f"Error saving AKT media info: {e}")
-
-    def _calculate_file_hash(self, file_path: str) -> str:
-        with open(file_path, 'rb') as f:
-            import hashlib
-            return hashlib.sha256(f.read()).hexdigest()
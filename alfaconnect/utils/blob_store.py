@@ -0,0 +1,122 @@
+"""
+Content-addressed blob store (fayl tizimi qismi).
+
+Har bir fayl sha256 bo'yicha bir marta saqlanadi:
+    {root}/ab/cd/abcd1234...      (2 darajali shard, papkada ~65k fayl emas)
+    {root}/tmp/                   (upload'lar shu yerga yoziladi - rename
+                                   bir fayl tizimi ichida, atomik)
+
+Blob o'zgarmaydi: bir xil hash - bir xil baytlar. Shuning uchun put() blob
+mavjud bo'lsa yangi nusxani tashlab yuboradi (deduplikatsiya), bir vaqtdagi
+ikki yozuvchi esa bir-birining faylini xavfsiz almashtira oladi.
+Qaysi blob kerakligi (ref_count) DB da: database/basic/media_blobs.py.
+"""
+import hashlib
+import os
+import re
+import shutil
+import time
+from pathlib import Path
+from typing import Iterator, Tuple
+
+import aiofiles.os
+
+_utime = aiofiles.os.wrap(os.utime)
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+_SHA256_RE = re.compile(r"^[0-9a-f]{64}$")
+
+
+def is_sha256(value: str) -> bool:
+    return bool(value) and bool(_SHA256_RE.match(value))
+
+
+def hash_file(path) -> Tuple[str, int]:
+    """Faylni bo'laklab o'qib (sha256, size) - butun fayl xotiraga olinmaydi"""
+    digest = hashlib.sha256()
+    size = 0
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+            size += len(chunk)
+    return digest.hexdigest(), size
+
+
+class BlobStore:
+    """sha256 -> {root}/ab/cd/sha256"""
+
+    def __init__(self, root):
+        self.root = Path(root)
+        self.tmp_dir = self.root / "tmp"
+
+    def path_for(self, sha256: str) -> Path:
+        if not is_sha256(sha256):
+            raise ValueError(f"Invalid sha256: {sha256!r}")
+        return self.root / sha256[:2] / sha256[2:4] / sha256
+
+    def exists(self, sha256: str) -> bool:
+        return self.path_for(sha256).is_file()
+
+    def put_sync(self, source, sha256: str, keep_source: bool = False) -> Path:
+        """
+        source faylni blob sifatida joylash.
+
+        keep_source=False - source ko'chiriladi (rename) yoki, blob allaqachon
+        bo'lsa, o'chiriladi. keep_source=True - hard link (boshqa fayl
+        tizimida nusxa), source joyida qoladi.
+        Blob'ning mtime har doim yangilanadi (mavjud blob ham, hard link
+        qilingan eski fayl ham) - GC yetim fayl skanida hali commit
+        qilinmagan import/upload blob'ini o'chirmaydi.
+        """
+        target = self.path_for(sha256)
+        if target.is_file():
+            os.utime(target)
+            if not keep_source:
+                os.remove(source)
+            return target
+        target.parent.mkdir(parents=True, exist_ok=True)
+        if not keep_source:
+            os.utime(source)
+            os.replace(source, target)
+            return target
+        temp = target.with_name(f".{sha256}.{os.getpid()}.{time.monotonic_ns()}")
+        try:
+            os.link(source, temp)
+        except OSError:
+            shutil.copyfile(source, temp)
+        os.utime(temp)  # hard link eski faylning mtime'ini saqlaydi
+        os.replace(temp, target)
+        return target
+
+    async def put(self, source, sha256: str) -> Path:
+        """put_sync(keep_source=False) ning asinxron varianti (event loop bloklanmaydi)"""
+        target = self.path_for(sha256)
+        if await aiofiles.os.path.isfile(target):
+            await _utime(target)
+            await aiofiles.os.remove(source)
+            return target
+        await aiofiles.os.makedirs(target.parent, exist_ok=True)
+        await aiofiles.os.replace(source, target)
+        return target
+
+    def remove(self, sha256: str) -> bool:
+        try:
+            os.remove(self.path_for(sha256))
+            return True
+        except FileNotFoundError:
+            return False
+
+    def iter_blobs(self) -> Iterator[Tuple[str, Path]]:
+        """Store'dagi barcha blob'lar (tmp va yarim yozilgan fayllarsiz)"""
+        if not self.root.is_dir():
+            return
+        for first in os.scandir(self.root):
+            if not first.is_dir() or len(first.name) != 2:
+                continue
+            for second in os.scandir(first.path):
+                if not second.is_dir():
+                    continue
+                for entry in os.scandir(second.path):
+                    if entry.is_file() and is_sha256(entry.name):
+                        yield entry.name, Path(entry.path)
@@ -0,0 +1,179 @@
+"""
+Inbox karuseli (⬅️ / ➡️ bilan bittalab ko'rsatiladigan arizalar ro'yxati).
+
+Har bir rol inbox'i `OFFSET idx LIMIT 1` + COUNT(*) ni har bir bosishda qayta
+so'rardi: chuqurlashgan sari sekinlashadi va ro'yxat o'zgarsa elementlar
+takrorlanadi yoki tushib qoladi. InboxCarousel esa:
+
+  1. Inbox ochilganda tartiblangan ID ro'yxatini bir marta oladi (snapshot);
+  2. joriy pozitsiya atrofidagi `window` ta element tafsilotini bitta
+     `WHERE id = ANY($1)` so'rovi bilan oldindan yuklaydi;
+  3. ⬅️ / ➡️ ni shu oynadan beradi - DB ga faqat oyna chegarasida murojaat;
+  4. ariza holati o'zgarganda (discard) uni barcha ochiq snapshot'lardan
+     olib tashlaydi - qayta yuklashsiz.
+
+Foydalanish:
+
+    tech_carousel = InboxCarousel(
+        "ccs_tech",
+        load_ids=ccs_technician_order_ids,          # async () -> List[int]
+        load_items=ccs_fetch_technician_orders_by_ids,  # async (ids) -> Dict[int, dict]
+    )
+    page = await tech_carousel.open(user_id)          # yangi snapshot, 0-pozitsiya
+    page = await tech_carousel.step(user_id, order_id, +1)
+    tech_carousel.discard(order_id)                   # holat o'zgardi
+
+Holat jarayon xotirasida saqlanadi (user bo'yicha, TTL bilan), FSM ga tegmaydi.
+"""
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional
+
+from utils.ttl_cache import TTLCache
+
+LoadIds = Callable[..., Awaitable[List[int]]]
+LoadItems = Callable[[List[int]], Awaitable[Dict[int, Dict[str, Any]]]]
+
+# Barcha karusellar (discard_everywhere uchun)
+_registry: Dict[str, "InboxCarousel"] = {}
+
+
+@dataclass
+class CarouselPage:
+    item: Optional[Dict[str, Any]]
+    index: int
+    total: int
+
+    @property
+    def empty(self) -> bool:
+        return self.item is None
+
+    @property
+    def has_prev(self) -> bool:
+        return self.index > 0
+
+    @property
+    def has_next(self) -> bool:
+        return self.index < self.total - 1
+
+
+@dataclass
+class _Session:
+    ids: List[int]
+    position: int = 0
+    items: Dict[int, Dict[str, Any]] = field(default_factory=dict)
+
+
+class InboxCarousel:
+    """Snapshot + oldindan yuklanadigan oyna asosidagi inbox karuseli"""
+
+    def __init__(
+        self,
+        name: str,
+        load_ids: LoadIds,
+        load_items: LoadItems,
+        window: int = 10,
+        ttl: float = 900.0,
+        maxsize: int = 5000,
+    ):
+        self.name = name
+        self.load_ids = load_ids
+        self.load_items = load_items
+        self.window = max(1, window)
+        self._sessions = TTLCache(maxsize=maxsize, ttl=ttl)
+        _registry[name] = self
+
+    # ---------- Sessiyalar ----------
+
+    async def open(self, user_id: int, *args: Any) -> CarouselPage:
+        """Yangi snapshot olish va birinchi elementni ko'rsatish"""
+        session = await self._snapshot(user_id, args)
+        return await self._page(session, 0)
+
+    async def at(self, user_id: int, position: int, *args: Any) -> CarouselPage:
+        """Berilgan pozitsiyadagi element (snapshot bo'lmasa yaratiladi)"""
+        session = self._sessions.get(self._key(user_id, args))
+        if session is None:
+            session = await self._snapshot(user_id, args)
+        return await self._page(session, position)
+
+    async def step(self, user_id: int, current_id: int, delta: int, *args: Any) -> CarouselPage:
+        """
+        Joriy elementdan `delta` qadam siljish.
+        Joriy element snapshot'dan chiqib ketgan bo'lsa (discard), uning o'rnidan davom etiladi.
+        """
+        session = self._sessions.get(self._key(user_id, args))
+        if session is None:
+            session = await self._snapshot(user_id, args)
+            return await self._page(session, 0)
+
+        try:
+            position = session.ids.index(current_id) + delta
+        except ValueError:
+            position = session.position + (delta if delta < 0 else delta - 1)
+        return await self._page(session, position)
+
+    def discard(self, item_id: int) -> None:
+        """Element holati o'zgardi - barcha sessiyalardan olib tashlash"""
+        for session in self._sessions.values():
+            self._remove(session, item_id)
+
+    def reset(self, user_id: int, *args: Any) -> None:
+        """Userning snapshot'ini tashlab yuborish (keyingi so'rovda qayta olinadi)"""
+        self._sessions.pop(self._key(user_id, args))
+
+    # ---------- Ichki ----------
+
+    def _key(self, user_id: int, args: tuple) -> Hashable:
+        return (user_id,) + tuple(args)
+
+    async def _snapshot(self, user_id: int, args: tuple) -> _Session:
+        ids = await self.load_ids(*args)
+        session = _Session(ids=list(ids))
+        self._sessions.set(self._key(user_id, args), session)
+        return session
+
+    @staticmethod
+    def _remove(session: _Session, item_id: int) -> None:
+        session.items.pop(item_id, None)
+        try:
+            index = session.ids.index(item_id)
+        except ValueError:
+            return
+        del session.ids[index]
+        if index < session.position:
+            session.position -= 1
+
+    async def _page(self, session: _Session, position: int) -> CarouselPage:
+        # Oynani yuklash; yo'qolgan (holati o'zgargan) elementlar snapshot'dan chiqariladi
+        while session.ids:
+            position = max(0, min(position, len(session.ids) - 1))
+            item_id = session.ids[position]
+            if item_id not in session.items:
+                await self._prefetch(session, position)
+                if item_id not in session.items:
+                    continue
+            session.position = position
+            return CarouselPage(session.items[item_id], position, len(session.ids))
+
+        session.position = 0
+        return CarouselPage(None, 0, 0)
+
+    async def _prefetch(self, session: _Session, position: int) -> None:
+        half = self.window // 2
+        start = max(0, position - half)
+        wanted = [i for i in session.ids[start:start + self.window] if i not in session.items]
+        loaded = await self.load_items(wanted)
+        # Oynadan tashqaridagi eski elementlarni tashlab, xotirani cheklaymiz
+        keep = set(session.ids[max(0, start - self.window):start + 2 * self.window])
+        for old in [i for i in session.items if i not in keep]:
+            del session.items[old]
+        session.items.update(loaded)
+        for missing in [i for i in wanted if i not in loaded]:
+            self._remove(session, missing)
+
+
+def discard_everywhere(item_id: int, *names: str) -> None:
+    """Ariza holati o'zgarganda uni ko'rsatilgan (yoki barcha) karusellardan olib tashlash"""
+    for name, carousel in _registry.items():
+        if not names or name in names:
+            carousel.discard(item_id)
@@ -0,0 +1,174 @@
+"""
+Chat rasmlari uchun variantlar (Pillow, ProcessPoolExecutor).
+
+process_image() worker jarayonida ishlaydi (faqat Pillow import qilinadi):
+  - EXIF orientatsiyasi qo'llanadi va EXIF/metadata olib tashlanadi
+  - asl rasm max_dimension gacha kichraytiriladi (shu formatda qayta yoziladi)
+  - "{stem}.webp" (display) va "{stem}_thumb.webp" (thumbnail) variantlari
+Animatsiyali rasmlar (GIF/WebP) o'zgartirilmaydi, faqat thumbnail olinadi.
+
+ImagePipeline - event loop tomoni: pool'ga topshirish va backpressure
+(bir vaqtda max_pending dan ortiq ish bo'lsa queue_timeout kutib,
+ImagePipelineBusy).
+"""
+import asyncio
+import hashlib
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Optional
+
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+THUMB_SUFFIX = "_thumb"
+
+_SAVE_FORMATS = {"jpg": "JPEG", "jpeg": "JPEG", "png": "PNG", "gif": "GIF", "webp": "WEBP"}
+
+
+class ImagePipelineBusy(Exception):
+    """Pool navbati to'la"""
+
+
+def variant_names(stem: str) -> Dict[str, str]:
+    return {"webp": f"{stem}.webp", "thumb": f"{stem}{THUMB_SUFFIX}.webp"}
+
+
+def _sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _save_atomic(image: Image.Image, path: str, fmt: str, **options) -> None:
+    temp_path = f"{path}.tmp"
+    image.save(temp_path, fmt, **options)
+    os.replace(temp_path, path)
+
+
+def _rgb(image: Image.Image) -> Image.Image:
+    if image.mode in ("RGB", "RGBA"):
+        return image
+    return image.convert("RGBA" if "transparency" in image.info or image.mode in ("LA", "P") else "RGB")
+
+
+def process_image(
+    path: str,
+    ext: str,
+    max_dimension: int,
+    thumb_dimension: int,
+    webp_quality: int,
+) -> Dict[str, Any]:
+    """
+    Rasmni joyida qayta ishlash va variantlarni yonida yaratish (worker jarayon).
+
+    Returns:
+        {"width", "height", "size", "sha256", "variants": {"webp": name, "thumb": name},
+         "variant_sha256": {"webp": sha256, "thumb": sha256}, "thumb_width", "thumb_height"}
+    """
+    directory, filename = os.path.split(path)
+    stem = filename.rsplit(".", 1)[0]
+    names = variant_names(stem)
+    save_format = _SAVE_FORMATS.get(ext.lower(), "JPEG")
+
+    with Image.open(path) as source:
+        animated = getattr(source, "is_animated", False)
+        image = ImageOps.exif_transpose(source) if not animated else source.copy()
+        image.load()
+
+    variants: Dict[str, str] = {}
+    if not animated:
+        if max(image.size) > max_dimension:
+            image.thumbnail((max_dimension, max_dimension), Image.Resampling.LANCZOS)
+        # Metadata'siz qayta yozish (EXIF/GPS olib tashlanadi)
+        options: Dict[str, Any] = {"optimize": True}
+        if save_format == "JPEG":
+            image = image.convert("RGB")
+            options["quality"] = 85
+        elif save_format == "WEBP":
+            options = {"quality": webp_quality, "method": 4}
+        _save_atomic(image, path, save_format, **options)
+
+        if save_format != "WEBP":
+            _save_atomic(_rgb(image), os.path.join(directory, names["webp"]), "WEBP",
+                         quality=webp_quality, method=4)
+            variants["webp"] = names["webp"]
+
+    thumb = _rgb(image.copy())
+    thumb.thumbnail((thumb_dimension, thumb_dimension), Image.Resampling.LANCZOS)
+    _save_atomic(thumb, os.path.join(directory, names["thumb"]), "WEBP", quality=webp_quality, method=4)
+    variants["thumb"] = names["thumb"]
+
+    return {
+        "width": image.width,
+        "height": image.height,
+        "size": os.path.getsize(path),
+        "sha256": _sha256(path),
+        "variants": variants,
+        "variant_sha256": {
+            variant: _sha256(os.path.join(directory, name)) for variant, name in variants.items()
+        },
+        "thumb_width": thumb.width,
+        "thumb_height": thumb.height,
+    }
+
+
+class ImagePipeline:
+    """ProcessPoolExecutor ustidagi asinxron interfeys (lazy pool, backpressure)"""
+
+    def __init__(
+        self,
+        workers: int = 0,
+        max_pending: int = 32,
+        queue_timeout: float = 5.0,
+        max_dimension: int = 2048,
+        thumb_dimension: int = 320,
+        webp_quality: int = 80,
+    ):
+        self.workers = workers or (os.cpu_count() or 1)
+        self.max_pending = max_pending
+        self.queue_timeout = queue_timeout
+        self.max_dimension = max_dimension
+        self.thumb_dimension = thumb_dimension
+        self.webp_quality = webp_quality
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+
+    def _ensure_started(self) -> None:
+        if self._executor is None:
+            # API thread ichida ishlaydi - fork emas, spawn
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_pending)
+
+    async def process(self, path: str, ext: str) -> Dict[str, Any]:
+        """Rasmni pool'da qayta ishlash; navbat to'la bo'lsa ImagePipelineBusy"""
+        self._ensure_started()
+        if self._slots.locked():
+            try:
+                await asyncio.wait_for(self._slots.acquire(), timeout=self.queue_timeout)
+            except asyncio.TimeoutError:
+                raise ImagePipelineBusy(f"Image pipeline queue is full ({self.max_pending} pending)")
+        else:
+            await self._slots.acquire()
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(
+                self._executor, process_image, path, ext,
+                self.max_dimension, self.thumb_dimension, self.webp_quality,
+            )
+        finally:
+            self._slots.release()
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+        self._slots = None
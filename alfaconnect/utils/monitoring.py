@@ -8,6 +8,7 @@ from typing import Callable, Any, Dict
 from datetime import datetime
 import asyncpg
 from config import settings
+from database.connections import get_pool_stats
 
 logger = logging.getLogger(__name__)
 
@@ -116,7 +117,8 @@ async def get_metrics_summary() -> Dict[str, Any]:
         "api": {},
         "ws": metrics["ws_connections"].copy(),
         "cron": metrics["cron_jobs"].copy(),
-        "db_conflicts": metrics["db_conflicts"].copy()
+        "db_conflicts": metrics["db_conflicts"].copy(),
+        "db_pool": get_pool_stats()
     }
     
     # Calculate p95 for each endpoint
@@ -312,11 +312,10 @@ async def get_recipient_load(
     Returns:
         Aktiv arizalar soni
     """
-    from database.connections import get_connection_url
-    import asyncpg
+    from database.connections import get_connection
     
     try:
-        conn = await asyncpg.connect(get_connection_url())
+        conn = await get_connection()
         try:
             if role == "junior_manager":
                 # Junior manager uchun connection_orders hisoblaymiz
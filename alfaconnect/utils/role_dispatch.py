@@ -0,0 +1,362 @@
+"""
+Rol bo'yicha update dispatch (RoleDispatchRouter).
+
+Oddiy aiogram Router update'ni barcha rol router'lariga ketma-ket beradi va har
+birida RoleFilter + F.text.in_ / F.data filtrlari bittalab tekshiriladi (sync
+magic filtrlar aiogram'da har biri alohida thread'da bajariladi). RoleDispatchRouter
+esa userning rolini bir marta aniqlaydi (UserContextMiddleware yuklagan db_user dan)
+va update'ni to'g'ridan-to'g'ri kerakli router'ga yuboradi:
+
+- Umumiy router'lar (start, rating) har doim birinchi tekshiriladi.
+- Oldindan tuzilgan xarita: reply-keyboard matni (F.text == / F.text.in_) va
+  callback data (F.data == / F.data.in_ / F.data.startswith) -> handler turgan
+  router. Xarita (update turi, rol, FSM holati) bo'yicha bir marta tuziladi.
+- Xaritada bo'lmasa (yoki u yerda handle bo'lmasa): userning o'z rol router'i,
+  so'ng faqat shu rolga xizmat qila oladigan (RoleFilter'siz handler'i bor yoki
+  RoleFilter shu rolga teng) boshqa router'lar. Boshqa rolga qattiq bog'langan
+  router'lar umuman tekshirilmaydi.
+
+Xarita konservativ tuziladi: handler'lar aiogram tartibida ko'rib chiqiladi va
+matnni/data'ni ushlab qolishi mumkin bo'lgan noma'lum filtrli handler uchrasa,
+xarita shu yerda to'xtaydi - shuning uchun tanlangan handler oddiy ketma-ket
+dispatch tanlaydigan handler bilan bir xil bo'ladi.
+"""
+import logging
+import operator
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from aiogram import Router
+from aiogram.dispatcher.event.bases import UNHANDLED
+from aiogram.filters import Command, StateFilter
+from aiogram.fsm.state import State, StatesGroup
+from magic_filter import MagicFilter
+from magic_filter.operations import CallOperation, ComparatorOperation, FunctionOperation, GetAttributeOperation
+from magic_filter.util import in_op
+
+from database.basic.user_cache import get_cached_user
+from filters.role_filter import RoleFilter
+
+logger = logging.getLogger(__name__)
+
+# Update turi -> xarita kaliti bo'ladigan atribut
+_KEY_ATTRS = {"message": "text", "callback_query": "data"}
+
+# Matnli xabarda hech qachon bo'lmaydigan kontent turlari (F.contact, F.photo, ...)
+_NON_TEXT_CONTENT = {
+    "photo", "contact", "location", "voice", "document", "video",
+    "audio", "video_note", "sticker", "web_app_data", "animation",
+}
+
+# Filtr klassifikatsiyasi natijalari
+_ANY = object()     # noma'lum - istalgan qiymatni qabul qilishi mumkin
+_NEVER = object()   # bu holatda hech qachon qabul qilmaydi
+
+
+def _handler_roles(filters: Iterable[Any]) -> Set[str]:
+    return {f.callback.role for f in filters if isinstance(f.callback, RoleFilter)}
+
+
+def _state_matches(state: Any, raw_state: Optional[str]) -> bool:
+    """StateFilter mantiqini takrorlaydi (event kerak emas)"""
+    if state is None or isinstance(state, str):
+        return state == "*" or raw_state == state
+    if isinstance(state, (State, StatesGroup)):
+        return bool(state(event=None, raw_state=raw_state))
+    if isinstance(state, type) and issubclass(state, StatesGroup):
+        return bool(state()(event=None, raw_state=raw_state))
+    return True
+
+
+def _classify(flt: Any, attr: str, raw_state: Optional[str]) -> Any:
+    """
+    Bitta filtr berilgan FSM holatida qaysi qiymatlarni (text/data) qabul qilishi mumkin.
+
+    Returns:
+        ("exact", set[str]) | ("prefix", str) | _NEVER | _ANY
+    """
+    callback = flt.callback
+    if isinstance(callback, RoleFilter):
+        return _ANY  # rol alohida hisobga olinadi
+    if isinstance(callback, StateFilter):
+        return _ANY if any(_state_matches(s, raw_state) for s in callback.states) else _NEVER
+    if isinstance(callback, (State, StatesGroup)):
+        return _ANY if _state_matches(callback, raw_state) else _NEVER
+    if isinstance(callback, Command):
+        return ("prefix", callback.prefix[:1]) if attr == "text" and callback.prefix else _ANY
+
+    magic = flt.magic
+    if not isinstance(magic, MagicFilter):
+        return _ANY
+    ops = magic._operations
+    if ops and isinstance(ops[0], GetAttributeOperation) and ops[0].name == attr:
+        if len(ops) == 2:
+            op = ops[1]
+            if isinstance(op, FunctionOperation) and op.function is in_op and len(op.args) == 1 and not op.kwargs:
+                values = op.args[0]
+                if isinstance(values, (list, tuple, set, frozenset)) and all(isinstance(v, str) for v in values):
+                    return ("exact", set(values))
+            if isinstance(op, ComparatorOperation) and op.comparator is operator.eq and isinstance(op.right, str):
+                return ("exact", {op.right})
+        if (
+            len(ops) == 3
+            and isinstance(ops[1], GetAttributeOperation)
+            and ops[1].name == "startswith"
+            and isinstance(ops[2], CallOperation)
+            and len(ops[2].args) == 1
+            and isinstance(ops[2].args[0], str)
+            and not ops[2].kwargs
+        ):
+            return ("prefix", ops[2].args[0])
+        return _ANY
+    if (
+        attr == "text"
+        and ops
+        and all(isinstance(op, GetAttributeOperation) for op in ops)
+        and ops[0].name in _NON_TEXT_CONTENT
+    ):
+        return _NEVER
+    return _ANY
+
+
+def _handler_keys(filters: Iterable[Any], attr: str, raw_state: Optional[str]) -> Any:
+    """
+    Handler'ning barcha filtrlari (AND) bo'yicha qabul qilinishi mumkin bo'lgan qiymatlar.
+    Aniq to'plamning ustma-ust tushishi shart emas - har doim ustki to'plam qaytariladi.
+    """
+    result: Any = _ANY
+    for flt in filters:
+        accepted = _classify(flt, attr, raw_state)
+        if accepted is _NEVER:
+            return _NEVER
+        if accepted is _ANY:
+            continue
+        if result is _ANY:
+            result = accepted
+        elif result[0] == "exact" and accepted[0] == "exact":
+            result = ("exact", result[1] & accepted[1])
+        elif result[0] == "exact":
+            result = ("exact", {v for v in result[1] if v.startswith(accepted[1])})
+        elif accepted[0] == "exact":
+            result = ("exact", {v for v in accepted[1] if v.startswith(result[1])})
+    return result
+
+
+class _RouteMap:
+    """Qiymat (text/data) -> birinchi qabul qila oladigan handler'ning router'i"""
+    __slots__ = ("exact", "prefixes")
+
+    def __init__(self) -> None:
+        # qiymat -> (tartib raqami, router yoki None)
+        self.exact: Dict[str, Tuple[int, Optional[Router]]] = {}
+        # (tartib raqami, prefiks, router yoki None)
+        self.prefixes: List[Tuple[int, str, Optional[Router]]] = []
+
+    def lookup(self, value: str) -> Optional[Router]:
+        best = self.exact.get(value)
+        for order, prefix, router in self.prefixes:
+            if best is not None and order > best[0]:
+                break
+            if value.startswith(prefix):
+                best = (order, router)
+                break
+        return best[1] if best is not None else None
+
+
+class RoleDispatchRouter(Router):
+    """Update'ni userning roliga mos router'ga to'g'ridan-to'g'ri yuboruvchi root router"""
+
+    def __init__(self, *, name: Optional[str] = None) -> None:
+        super().__init__(name=name)
+        self._shared_routers: List[Router] = []
+        self._role_routers: Dict[str, Router] = {}
+        # (update_type, role) -> tekshiriladigan router'lar ketma-ketligi
+        self._route_cache: Dict[Tuple[str, Optional[str]], List[Router]] = {}
+        # (update_type, role, raw_state) -> xarita
+        self._map_cache: Dict[Tuple[str, Optional[str], Optional[str]], _RouteMap] = {}
+        self._serves_cache: Dict[Tuple[int, str], Tuple[bool, Set[str]]] = {}
+
+    def include_shared_router(self, router: Router) -> Router:
+        """Barcha rollar uchun umumiy router (har doim birinchi tekshiriladi)"""
+        self.include_router(router)
+        self._shared_routers.append(router)
+        return router
+
+    def include_role_router(self, role: str, router: Router) -> Router:
+        """Muayyan rolning asosiy router'i"""
+        self.include_router(router)
+        self._role_routers[role] = router
+        self._route_cache.clear()
+        self._map_cache.clear()
+        self._serves_cache.clear()
+        return router
+
+    # ---------------------------------------------------------------
+    # Oldindan hisoblash
+    # ---------------------------------------------------------------
+
+    def _serves(self, router: Router, update_type: str) -> Tuple[bool, Set[str]]:
+        """
+        Router (butun daraxti) berilgan update turi uchun kimga xizmat qila oladi.
+
+        Returns:
+            (open, roles) - open=True bo'lsa RoleFilter'siz handler bor;
+            roles - handler'lardagi RoleFilter rollari
+        """
+        key = (id(router), update_type)
+        cached = self._serves_cache.get(key)
+        if cached is not None:
+            return cached
+
+        is_open = False
+        roles: Set[str] = set()
+
+        def walk(r: Router, inherited: Set[str]) -> None:
+            nonlocal is_open
+            observer = r.observers.get(update_type)
+            guard = set(inherited)
+            if observer is not None:
+                guard |= _handler_roles(observer._handler.filters or [])
+                for handler in observer.handlers:
+                    handler_roles = guard | _handler_roles(handler.filters or [])
+                    if handler_roles:
+                        roles.update(handler_roles)
+                    else:
+                        is_open = True
+            for sub in r.sub_routers:
+                walk(sub, guard)
+
+        walk(router, set())
+        self._serves_cache[key] = (is_open, roles)
+        return is_open, roles
+
+    def _routes_for(self, update_type: str, role: Optional[str]) -> List[Router]:
+        key = (update_type, role)
+        routes = self._route_cache.get(key)
+        if routes is not None:
+            return routes
+
+        routes = []
+        primary = self._role_routers.get(role) if role else None
+        if primary is not None:
+            routes.append(primary)
+        for router in self._role_routers.values():
+            if router is primary:
+                continue
+            is_open, roles = self._serves(router, update_type)
+            if is_open or (role is not None and role in roles):
+                routes.append(router)
+        self._route_cache[key] = routes
+        return routes
+
+    def _map_for(self, update_type: str, role: Optional[str], raw_state: Optional[str]) -> _RouteMap:
+        key = (update_type, role, raw_state)
+        route_map = self._map_cache.get(key)
+        if route_map is not None:
+            return route_map
+
+        attr = _KEY_ATTRS[update_type]
+        route_map = _RouteMap()
+        order = 0
+        stopped = False
+
+        def direct_ok(r: Router) -> bool:
+            # Fast-path router'ni bevosita chaqiradi - ajdodlarda RoleFilter'dan
+            # boshqa root filtr yoki outer middleware bo'lmasligi kerak
+            observer = r.observers.get(update_type)
+            if observer is None:
+                return True
+            if len(observer.outer_middleware):
+                return False
+            return all(isinstance(f.callback, RoleFilter) for f in observer._handler.filters or [])
+
+        def walk(r: Router, inherited: Set[str], chain: List[Any], path_ok: bool) -> None:
+            nonlocal order, stopped
+            observer = r.observers.get(update_type)
+            guard = set(inherited)
+            if observer is not None:
+                guard |= _handler_roles(observer._handler.filters or [])
+                if guard and role not in guard:
+                    return  # butun router boshqa rol uchun
+                chain = chain + list(observer._handler.filters or [])
+                if _handler_keys(chain, attr, raw_state) is _NEVER:
+                    return
+                for handler in observer.handlers:
+                    handler_roles = guard | _handler_roles(handler.filters or [])
+                    if handler_roles and role not in handler_roles:
+                        continue
+                    keys = _handler_keys(chain + list(handler.filters or []), attr, raw_state)
+                    if keys is _NEVER:
+                        continue
+                    if keys is _ANY:
+                        stopped = True
+                        return
+                    order += 1
+                    target = r if path_ok else None
+                    if keys[0] == "exact":
+                        for value in keys[1]:
+                            route_map.exact.setdefault(value, (order, target))
+                    else:
+                        route_map.prefixes.append((order, keys[1], target))
+            child_ok = path_ok and direct_ok(r)
+            for sub in r.sub_routers:
+                if stopped:
+                    return
+                walk(sub, guard, chain, child_ok)
+
+        # Umumiy router'lar har ikkala yo'lda ham birinchi tekshiriladi
+        for router in self._routes_for(update_type, role):
+            if stopped:
+                break
+            walk(router, set(), [], True)
+
+        self._map_cache[key] = route_map
+        return route_map
+
+    # ---------------------------------------------------------------
+    # Dispatch
+    # ---------------------------------------------------------------
+
+    @staticmethod
+    async def _resolve_role(kwargs: Dict[str, Any]) -> Optional[str]:
+        if "db_user" in kwargs:
+            user = kwargs["db_user"]
+        else:
+            tg_user = kwargs.get("event_from_user")
+            user = await get_cached_user(tg_user.id) if tg_user else None
+        if not user or user.get("is_blocked"):
+            return None
+        return (user.get("role") or "").strip() or None
+
+    async def _propagate_event(self, observer, update_type: str, event: Any, **kwargs: Any) -> Any:
+        response = UNHANDLED
+        if observer:
+            result, data = await observer.check_root_filters(event, **kwargs)
+            if not result:
+                return UNHANDLED
+            kwargs.update(data)
+            response = await observer.trigger(event, **kwargs)
+            if response is not UNHANDLED:
+                return response
+
+        for router in self._shared_routers:
+            response = await router.propagate_event(update_type=update_type, event=event, **kwargs)
+            if response is not UNHANDLED:
+                return response
+
+        role = await self._resolve_role(kwargs)
+
+        attr = _KEY_ATTRS.get(update_type)
+        value = getattr(event, attr, None) if attr else None
+        if value:
+            target = self._map_for(update_type, role, kwargs.get("raw_state")).lookup(value)
+            if target is not None:
+                response = await target.propagate_event(update_type=update_type, event=event, **kwargs)
+                if response is not UNHANDLED:
+                    return response
+
+        for router in self._routes_for(update_type, role):
+            response = await router.propagate_event(update_type=update_type, event=event, **kwargs)
+            if response is not UNHANDLED:
+                return response
+
+        return response